@@ -0,0 +1,89 @@
+"""
+Access control for the API's admin surface.
+
+Routes under /admin/ (memory accounting, allocation tracing, profiling) and
+admin-only query parameters such as ?include_deleted=1 expose internals and
+can be expensive, so they require an `Authorization: Bearer <token>` header
+matching HBNB_ADMIN_TOKEN. Without a configured token the admin routes
+answer 404 and admin-only parameters are ignored.
+"""
+
+import hmac
+import os
+from flask import jsonify, request
+
+class AdminAuth:
+    """
+    Guards admin routes and admin-only query parameters with a shared bearer token.
+
+    Attributes:
+        token (str): The token admin requests must present, or None to disable admin access.
+        prefix (str): Path prefix of the guarded routes.
+    """
+
+    def __init__(self, app=None, token=None, prefix='/admin/'):
+        """
+        Initializes a new AdminAuth instance.
+
+        Args:
+            app (Flask, optional): App to register the guard with.
+            token (str, optional): The token admin requests must present; None disables admin access.
+            prefix (str): Path prefix of the guarded routes.
+        """
+        self.token = token or None  # Set the admin token; an empty one disables admin access
+        self.prefix = prefix  # Set the guarded path prefix
+        if app is not None:
+            self.init_app(app)
+
+    @staticmethod
+    def config_from_env():
+        """
+        Read the admin token from HBNB_ADMIN_TOKEN.
+
+        Returns:
+            dict: Keyword arguments for AdminAuth.
+        """
+        options = {}
+        if os.environ.get('HBNB_ADMIN_TOKEN'):
+            options['token'] = os.environ['HBNB_ADMIN_TOKEN']
+        return options
+
+    def init_app(self, app):
+        """Register the guard with a Flask app."""
+        app.before_request(self.check)
+
+    def is_admin(self):
+        """
+        Check if the current request carries the admin token.
+
+        Returns:
+            bool: True if admin access is enabled and the request presented the token.
+        """
+        if self.token is None:
+            return False
+        scheme, _, presented = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer':
+            return False
+        return hmac.compare_digest(presented.strip().encode(), self.token.encode())  # Constant time
+
+    def check(self):
+        """
+        Refuse requests to guarded routes that do not carry the admin token.
+
+        Runs as a before_request hook, and for batch sub-requests, which skip the hooks.
+
+        Returns:
+            Response: 404 while admin access is disabled, 401 without the token, otherwise None.
+        """
+        if not request.path.startswith(self.prefix):
+            return None
+        if self.token is None:
+            response = jsonify({"error": "Admin routes are disabled; set HBNB_ADMIN_TOKEN"})
+            response.status_code = 404
+            return response
+        if not self.is_admin():
+            response = jsonify({"error": "Admin token required"})
+            response.status_code = 401
+            response.headers['WWW-Authenticate'] = 'Bearer'
+            return response
+        return None
@@ -0,0 +1,271 @@
+"""
+Request admission control for the API.
+
+Every write (POST, PUT, PATCH, DELETE) first takes a token from a bucket
+keyed by client and route, then waits for one of a few write slots in a
+bounded queue. When the bucket is empty or the queue is full the request
+is rejected with 429 and a Retry-After header instead of piling more disk
+writes onto storage. Reads never queue, and a waiting write also yields
+while many reads are in flight, so a burst of writes cannot starve readers.
+
+Buckets live in memory by default; SQLiteBucketBackend shares them between
+worker processes through a small SQLite file.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from flask import g, jsonify, request
+
+WRITE_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+class MemoryBucketBackend:
+    """
+    Token buckets kept in this process's memory.
+    """
+
+    def __init__(self):
+        self._buckets = {}  # Key -> (tokens, last refill time)
+        self._lock = threading.Lock()  # Guards the buckets across request threads
+
+    def take(self, key, rate, burst, now=None):
+        """
+        Take one token from a bucket, refilling it for the time elapsed.
+
+        Args:
+            key (str): The bucket key.
+            rate (float): Tokens added per second.
+            burst (int): Bucket capacity.
+            now (float, optional): The current time in seconds.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+class SQLiteBucketBackend:
+    """
+    Token buckets shared between processes through a SQLite file.
+
+    Each take() runs in an immediate transaction, so concurrent workers
+    refill and spend a bucket one at a time.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes a new SQLiteBucketBackend instance.
+
+        Args:
+            path (str): The SQLite file holding the buckets.
+        """
+        self.path = path  # Set the database path
+        self._local = threading.local()  # One connection per thread
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+
+    def _connection(self):
+        """Returns this thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        return connection
+
+    def take(self, key, rate, burst, now=None):
+        """
+        Take one token from a bucket, refilling it for the time elapsed.
+
+        Args:
+            key (str): The bucket key.
+            rate (float): Tokens added per second.
+            burst (int): Bucket capacity.
+            now (float, optional): The current time in seconds.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available.
+        """
+        now = time.time() if now is None else now
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')  # Lock the database for the read-modify-write
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row is not None else (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            connection.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+class AdmissionController:
+    """
+    Flask hooks that rate limit writes and bound the write queue.
+
+    Attributes:
+        write_rate (float): Default tokens per second of a (client, route) write bucket.
+        write_burst (int): Default capacity of a write bucket.
+        read_rate (float): Tokens per second of a (client, route) read bucket, or None for unlimited reads.
+        read_burst (int): Capacity of a read bucket.
+        route_limits (dict): 'METHOD /rule' -> (rate, burst) overrides, e.g. {'POST /places': (1, 5)}.
+        write_concurrency (int): Writes allowed to run at once.
+        max_pending_writes (int): Writes allowed to wait for a slot before new ones get 429.
+        queue_timeout (float): Seconds a write may wait for a slot.
+        read_priority_threshold (int): While more reads than this are in flight, waiting writes hold back.
+    """
+
+    def __init__(self, app=None, backend=None, write_rate=10.0, write_burst=50, read_rate=None, read_burst=200,
+                 route_limits=None, write_concurrency=2, max_pending_writes=32, queue_timeout=5.0,
+                 read_priority_threshold=8):
+        """
+        Initializes a new AdmissionController instance.
+
+        Args:
+            app (Flask, optional): The app to register with.
+            backend (object, optional): Bucket backend; defaults to MemoryBucketBackend().
+            write_rate (float): Default tokens per second of a write bucket.
+            write_burst (int): Default capacity of a write bucket.
+            read_rate (float, optional): Tokens per second of a read bucket; None leaves reads unlimited.
+            read_burst (int): Capacity of a read bucket.
+            route_limits (dict, optional): 'METHOD /rule' -> (rate, burst) overrides.
+            write_concurrency (int): Writes allowed to run at once.
+            max_pending_writes (int): Writes allowed to wait for a slot.
+            queue_timeout (float): Seconds a write may wait for a slot.
+            read_priority_threshold (int): In-flight reads above which waiting writes hold back.
+        """
+        self.backend = backend or MemoryBucketBackend()  # Set the bucket backend
+        self.write_rate = write_rate  # Set the default write rate
+        self.write_burst = write_burst  # Set the default write burst
+        self.read_rate = read_rate  # Set the read rate
+        self.read_burst = read_burst  # Set the read burst
+        self.route_limits = dict(route_limits or {})  # Set the per-route overrides
+        self.write_concurrency = write_concurrency  # Set the concurrent write bound
+        self.max_pending_writes = max_pending_writes  # Set the write queue bound
+        self.queue_timeout = queue_timeout  # Set the write queue timeout
+        self.read_priority_threshold = read_priority_threshold  # Set the read pressure threshold
+        self._condition = threading.Condition()  # Guards the counters below
+        self._active_reads = 0  # Reads in flight
+        self._active_writes = 0  # Writes holding a slot
+        self._pending_writes = 0  # Writes waiting for a slot
+        if app is not None:
+            self.init_app(app)
+
+    @staticmethod
+    def config_from_env():
+        """
+        Read options from HBNB_WRITE_RATE, HBNB_WRITE_BURST, HBNB_READ_RATE,
+        HBNB_MAX_PENDING_WRITES and HBNB_RATELIMIT_DB (a SQLite file that
+        shares buckets between workers).
+
+        Returns:
+            dict: Keyword arguments for AdmissionController.
+        """
+        options = {}
+        if os.environ.get('HBNB_WRITE_RATE'):
+            options['write_rate'] = float(os.environ['HBNB_WRITE_RATE'])
+        if os.environ.get('HBNB_WRITE_BURST'):
+            options['write_burst'] = int(os.environ['HBNB_WRITE_BURST'])
+        if os.environ.get('HBNB_READ_RATE'):
+            options['read_rate'] = float(os.environ['HBNB_READ_RATE'])
+        if os.environ.get('HBNB_MAX_PENDING_WRITES'):
+            options['max_pending_writes'] = int(os.environ['HBNB_MAX_PENDING_WRITES'])
+        if os.environ.get('HBNB_RATELIMIT_DB'):
+            options['backend'] = SQLiteBucketBackend(os.environ['HBNB_RATELIMIT_DB'])
+        return options
+
+    def init_app(self, app):
+        """Register the hooks with a Flask app."""
+        app.before_request(self.admit)
+        app.teardown_request(self.release)
+
+    @staticmethod
+    def _reject(message, retry_after):
+        """Builds a 429 response with a Retry-After header in whole seconds."""
+        response = jsonify({"error": message})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def _limits(self, route, is_write):
+        """Returns the (rate, burst) of a route, or None if it is unlimited."""
+        if route in self.route_limits:
+            return self.route_limits[route]
+        if is_write:
+            return self.write_rate, self.write_burst
+        return (self.read_rate, self.read_burst) if self.read_rate else None
+
+    def charge(self, method, rule, client):
+        """
+        Take a token for a request from its (client, route) bucket.
+
+        Args:
+            method (str): The HTTP method.
+            rule (str): The matched URL rule, e.g. '/places/<place_id>'.
+            client (str): The client address.
+
+        Returns:
+            float: 0 if the request may proceed, otherwise seconds until it may.
+        """
+        route = f'{method} {rule}'
+        limits = self._limits(route, method in WRITE_METHODS)
+        if limits is None:
+            return 0.0
+        return self.backend.take(f'{client}|{route}', *limits)
+
+    def admit(self):
+        """
+        before_request hook: apply the rate limit, then admit the request.
+
+        Returns:
+            Response: A 429 response if the request is rejected, otherwise None.
+        """
+        is_write = request.method in WRITE_METHODS
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        wait = self.charge(request.method, rule, request.remote_addr)
+        if wait:
+            return self._reject("Rate limit exceeded", wait)
+        with self._condition:
+            if not is_write:
+                self._active_reads += 1
+                g.admission = 'read'
+                return None
+            if self._pending_writes >= self.max_pending_writes:
+                return self._reject("Too many pending writes", self.queue_timeout)
+            self._pending_writes += 1
+            try:
+                admitted = self._condition.wait_for(self._write_slot_free, timeout=self.queue_timeout)
+            finally:
+                self._pending_writes -= 1
+            if not admitted:
+                return self._reject("Write queue is full", self.queue_timeout)
+            self._active_writes += 1
+            g.admission = 'write'
+        return None
+
+    def _write_slot_free(self):
+        """Returns True when a waiting write may start (called with the condition held)."""
+        return self._active_writes < self.write_concurrency and self._active_reads <= self.read_priority_threshold
+
+    def release(self, exc=None):
+        """teardown_request hook: free the slot the request was admitted with."""
+        admission = g.pop('admission', None)
+        if admission is None:
+            return
+        with self._condition:
+            if admission == 'read':
+                self._active_reads -= 1
+            else:
+                self._active_writes -= 1
+            self._condition.notify_all()
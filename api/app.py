@@ -1,10 +1,26 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_restx import Api, Resource, fields
-from persistence import IPersistenceManager, DataManager, FileStorage
-from models import Amenity, Country, City, Place, Review, User
+from persistence import IPersistenceManager, DataManager, FileStorage, ChangeFeed, InMemoryStorage, PartitionedStorage
+from persistence import RelationshipRegistry, ReferentialIntegrityError, Vacuum, VacuumPolicy
+from persistence import VersionStore, AvailabilityIndex, BookingConflictError, CatalogStats
+from persistence import VersionConflictError, entity_version
+from models import Amenity, Country, City, Place, Review, User, Booking, PricingRule
 from datetime import datetime
+from contextlib import nullcontext
+import os
 import re
 import logging
+from api.serialization import FastJSONProvider, EntityEncodingCache, to_columns
+from api.compression import ResponseCompressor
+from api.pricing import QuoteEngine, validate_rule
+from api.recommendations import SimilarityIndex
+from api.admission import AdmissionController
+from api.admin import AdminAuth
+from api.validation import compile_model
+from api.profiling import SamplingProfiler
+from api.memory import MemoryAccountant
+from api.batch import BatchDispatcher
+from api.changes import ChangeStream
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -13,8 +29,121 @@ logging.basicConfig(level=logging.DEBUG)
 app = Flask(__name__)
 api = Api(app, version='1.0', title='My API', description='A simple demonstration API')
 
-# Initialize DataManager for persistence
-data_manager = DataManager()
+# Initialize DataManager for persistence, emitting its mutations to an in-process change feed
+# Deletes cascade through the foreign keys between the models; set HBNB_VALIDATE_REFERENCES=1 to also
+# reject creates and updates that point at missing parents
+# Set HBNB_CHANGE_LOG to also append every mutation to a JSON lines log; the feed resumes its numbering
+# from it and the version history below is rebuilt from it on start. Every HBNB_CHANGE_LOG_CHECKPOINT
+# events (default 1000, 0 disables) the log is checkpointed down to the events still in the feed buffer
+change_feed = ChangeFeed(log_file=os.environ.get('HBNB_CHANGE_LOG') or None,
+                         checkpoint_every=int(os.environ.get('HBNB_CHANGE_LOG_CHECKPOINT', 1000)) or None)
+relationships = RelationshipRegistry(validate_references=os.environ.get('HBNB_VALIDATE_REFERENCES') == '1')
+# Deletes leave tombstones that every read skips (admin requests can pass ?include_deleted=1); the
+# vacuum removes them later under the policy from the HBNB_VACUUM_* environment variables
+# Set HBNB_STORAGE=memory to keep storage in memory only, seeded read-only from HBNB_STORAGE_SEED
+# (default storage.json), for tests and benchmarks that snapshot and restore it between cases, or
+# HBNB_STORAGE=partitioned to hash entities across HBNB_PARTITIONS SQLite files in HBNB_PARTITION_DIR
+# (deletes there remove rows outright)
+if os.environ.get('HBNB_STORAGE') == 'memory':
+    data_manager = InMemoryStorage(seed_file=os.environ.get('HBNB_STORAGE_SEED', 'storage.json'),
+                                   change_feed=change_feed, relationships=relationships,
+                                   soft_delete=os.environ.get('HBNB_SOFT_DELETE', '1') == '1')
+elif os.environ.get('HBNB_STORAGE') == 'partitioned':
+    data_manager = PartitionedStorage(partition_dir=os.environ.get('HBNB_PARTITION_DIR', 'partitions'),
+                                      partition_count=int(os.environ.get('HBNB_PARTITIONS', 4)),
+                                      change_feed=change_feed, relationships=relationships)
+else:
+    data_manager = DataManager(change_feed=change_feed, relationships=relationships,
+                               soft_delete=os.environ.get('HBNB_SOFT_DELETE', '1') == '1')
+vacuum = Vacuum(data_manager, VacuumPolicy.from_env())
+
+# Serialize responses with the runtime-selected JSON backend and cache per-entity encodings
+app.json = FastJSONProvider(app)
+entity_cache = EntityEncodingCache(app.json.backend)
+change_feed.subscribe(entity_cache.on_change)  # Drop cached encodings when entities change
+
+# Compress large responses and cache compressed bodies under version-based ETags
+compressor = ResponseCompressor(app, version_source=lambda: getattr(data_manager, 'version', None))
+
+# Rate limit writes per client and route and bound the write queue (429 with Retry-After when exceeded)
+admission = AdmissionController(app, **AdmissionController.config_from_env())
+
+# Require `Authorization: Bearer $HBNB_ADMIN_TOKEN` for /admin/ routes and ?include_deleted; without
+# a token they are disabled
+admin = AdminAuth(app, **AdminAuth.config_from_env())
+
+# Profile a sample of requests when HBNB_PROFILE_RATE is set; collapsed stacks are served at /admin/profile
+profiler = SamplingProfiler(app, **SamplingProfiler.config_from_env())
+profiler.register_admin(app)
+
+# Dispatch POST /batch sub-requests in-process; their writes are charged to the same rate limits
+# and the change stream, which long-polls or streams, is refused inside batches
+batch_dispatcher = BatchDispatcher(app, persistence=lambda: data_manager, limiter=admission.charge,
+                                   unbatched=('/changes',), authorize=admin.check,
+                                   **BatchDispatcher.config_from_env())
+
+# Keep the version history of places and reviews for /history and ?as_of= reads; with a change log the
+# history recorded before a restart is replayed first, and seeding covers the entities it does not reach
+version_store = VersionStore(tracked_types=('Place', 'Review'))
+if change_feed.log_file:
+    version_store.load_log(change_feed.log_file)
+version_store.seed(data_manager.storage, change_feed.version)
+change_feed.subscribe(version_store.on_change)
+
+# Index per-day availability of every place for bookings and availability search
+availability = AvailabilityIndex()
+availability.build(data_manager.storage)
+change_feed.subscribe(availability.on_change)
+data_manager.add_write_check(availability.check_write)  # Refuse overlapping bookings before they are stored
+
+# Cache place prices in columns and compile the stored pricing rules for batch quotes
+quote_engine = QuoteEngine()
+quote_engine.build(data_manager.storage)
+change_feed.subscribe(quote_engine.on_change)
+
+# Keep place feature vectors and review signals for similar places and recommendations
+similarity = SimilarityIndex()
+similarity.build(data_manager.storage)
+change_feed.subscribe(similarity.on_change)
+
+# Keep place counts, sums and price sketches per city and country for /stats
+catalog_stats = CatalogStats()
+catalog_stats.build(data_manager.storage)
+change_feed.subscribe(catalog_stats.on_change)
+
+def rebuild_derived(storage):
+    """Rebuild the indexes and drop the caches derived from storage after an in-memory restore."""
+    availability.build(storage)
+    quote_engine.build(storage)
+    similarity.build(storage)
+    catalog_stats.build(storage)
+    entity_cache.clear()
+    compressor.clear(new_epoch=True)  # The feed version did not move, so earlier ETags must stop matching
+
+if isinstance(data_manager, InMemoryStorage):
+    data_manager.subscribe_restore(rebuild_derived)
+
+# Account for the memory held by each entity type and by the indexes and caches above (/admin/memory)
+memory = MemoryAccountant(data_manager, components={
+    'relationships': relationships,
+    'change_feed': change_feed,
+    'entity_cache': entity_cache,
+    'compression_cache': compressor,
+    'rate_limit_buckets': admission.backend,
+    'version_store': version_store,
+    'availability': availability,
+    'price_columns': quote_engine,
+    'similarity': similarity,
+    'catalog_stats': catalog_stats,
+})
+if isinstance(data_manager, DataManager):
+    memory.register('position_index', data_manager._positions)  # Only the in-process lists have a position index
+
+# Serve change feed deltas at /changes; created before the preloaded writes so their events are deltas too
+change_stream = ChangeStream(change_feed, persistence=lambda: data_manager,
+                             entity_types=('Country', 'City', 'Amenity', 'User', 'Place', 'Review', 'Booking',
+                                           'PricingRule'),
+                             **ChangeStream.config_from_env())
 
 # Pre-loaded country data
 preloaded_countries = [
@@ -24,59 +153,74 @@ preloaded_countries = [
     # Add more countries as needed
 ]
 
-# Save pre-loaded countries to data manager
-for country in preloaded_countries:
-    data_manager.save(country)
+# Save pre-loaded countries to data manager in a single flush (one write per country without transactions)
+with data_manager.transaction() if data_manager.supports_transactions else nullcontext():
+    for country in preloaded_countries:
+        data_manager.save(country)
+
+# Patterns shared by the models and the utility functions
+EMAIL_PATTERN = r'^\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+COUNTRY_CODE_PATTERN = r'^[A-Z]{2}$'
+DATE_PATTERN = r'^\d{4}-\d{2}-\d{2}$'
 
-# Define Models for documentation
+# Define Models for documentation and request validation
 country_model = api.model('Country', {
     'name': fields.String(required=True, description='The country name'),
-    'code': fields.String(required=True, description='The country code')
+    'code': fields.String(required=True, pattern=COUNTRY_CODE_PATTERN, description='The country code')
 })
 
 city_model = api.model('City', {
-    'id': fields.String(readOnly=True, description='The city unique identifier'),
+    'id': fields.String(readonly=True, description='The city unique identifier'),
     'name': fields.String(required=True, description='The city name'),
-    'country_code': fields.String(required=True, description='The country code of the city')
+    'country_code': fields.String(required=True, pattern=COUNTRY_CODE_PATTERN, description='The country code of the city')
 })
 
 amenity_model = api.model('Amenity', {
-    'id': fields.String(readOnly=True, description='The amenity unique identifier'),
+    'id': fields.String(readonly=True, description='The amenity unique identifier'),
     'name': fields.String(required=True, description='The amenity name'),
     'description': fields.String(description='The amenity description')
 })
 
 user_model = api.model('User', {
-    'id': fields.String(readOnly=True, description='The user unique identifier'),
-    'email': fields.String(required=True, description='The user email'),
+    'id': fields.String(readonly=True, description='The user unique identifier'),
+    'email': fields.String(required=True, pattern=EMAIL_PATTERN, description='The user email'),
     'first_name': fields.String(required=True, description='The user first name'),
     'last_name': fields.String(required=True, description='The user last name'),
     'password': fields.String(required=True, description='The user password')
 })
 
 review_model = api.model('Review', {
-    'id': fields.String(readOnly=True, description='The review unique identifier'),
+    'id': fields.String(readonly=True, description='The review unique identifier'),
     'place_id': fields.String(required=True, description='The place ID the review is for'),
     'user_id': fields.String(required=True, description='The user ID who wrote the review'),
-    'rating': fields.Integer(required=True, description='The rating given by the user'),
+    'rating': fields.Integer(required=True, min=1, max=5, description='The rating given by the user'),
     'comment': fields.String(description='The review comment')
 })
 
 place_model = api.model('Place', {
-    'id': fields.String(readOnly=True, description='The place unique identifier'),
+    'id': fields.String(readonly=True, description='The place unique identifier'),
     'name': fields.String(required=True, description='The place name'),
     'description': fields.String(required=True, description='The place description'),
     'city_id': fields.String(required=True, description='The city ID where the place is located'),
     'host_id': fields.String(required=True, description='The host ID of the place'),
-    'latitude': fields.Float(required=True, description='The latitude of the place'),
-    'longitude': fields.Float(required=True, description='The longitude of the place'),
-    'price_per_night': fields.Float(required=True, description='The price per night of the place'),
-    'max_guests': fields.Integer(required=True, description='The maximum number of guests the place can accommodate'),
-    'number_of_rooms': fields.Integer(required=True, description='The number of rooms in the place'),
-    'number_of_bathrooms': fields.Integer(required=True, description='The number of bathrooms in the place'),
+    'latitude': fields.Float(required=True, min=-90, max=90, description='The latitude of the place'),
+    'longitude': fields.Float(required=True, min=-180, max=180, description='The longitude of the place'),
+    'price_per_night': fields.Float(required=True, min=0, description='The price per night of the place'),
+    'max_guests': fields.Integer(required=True, min=1, description='The maximum number of guests the place can accommodate'),
+    'number_of_rooms': fields.Integer(required=True, min=0, description='The number of rooms in the place'),
+    'number_of_bathrooms': fields.Integer(required=True, min=0, description='The number of bathrooms in the place'),
     'amenity_ids': fields.List(fields.String, description='The list of amenity IDs associated with the place')
 })
 
+booking_model = api.model('Booking', {
+    'id': fields.String(readonly=True, description='The booking unique identifier'),
+    'place_id': fields.String(required=True, description='The booked place ID'),
+    'user_id': fields.String(required=True, description='The user ID who made the booking'),
+    'check_in': fields.String(required=True, pattern=DATE_PATTERN, description='The first night (YYYY-MM-DD)'),
+    'check_out': fields.String(required=True, pattern=DATE_PATTERN, description='The departure day (YYYY-MM-DD)'),
+    'guests': fields.Integer(min=1, description='The number of guests')
+})
+
 # Utility functions
 def is_valid_country_code(code):
     """
@@ -94,8 +238,7 @@ def is_valid_email(email):
     """
     Check if an email is valid using regex.
     """
-    regex = r'^\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    return re.match(regex, email) is not None
+    return isinstance(email, str) and EMAIL_REGEX.match(email) is not None
 
 def is_valid_rating(rating):
     """
@@ -103,25 +246,157 @@ def is_valid_rating(rating):
     """
     return isinstance(rating, int) and 1 <= rating <= 5
 
-# Custom JSON encoder for complex objects
-class CustomJSONEncoder():
-    def default(self, obj):
-        """
-        Custom JSON serialization for complex objects.
-        """
-        if isinstance(obj, Country):
-            return {"name": obj.name, "code": obj.code}
-        if isinstance(obj, City):
-            return {"id": obj.id, "name": obj.name, "country": self.default(obj.country)}
-        if isinstance(obj, Amenity):
-            return {"id": obj.id, "name": obj.name, "description": obj.description}
-        if isinstance(obj, User):
-            return {"id": obj.id, "email": obj.email, "first_name": obj.first_name, "last_name": obj.last_name}
-        if isinstance(obj, Review):
-            return {"id": obj.id, "place": self.default(obj.place), "user": self.default(obj.user), "rating": obj.rating, "comment": obj.comment}
-        return super().default(obj)
-
-app.json_encoder = CustomJSONEncoder
+def entity_exists(entity_type):
+    """
+    Return a reference check telling whether an entity of a type exists.
+    """
+    return lambda entity_id: data_manager.get(entity_id, entity_type) is not None
+
+def validation_error_response(errors):
+    """
+    Build the 400 response listing per-field validation errors.
+    """
+    return jsonify({"error": "Invalid request body", "errors": errors}), 400
+
+# Compile the models into request validators once. Cities must use a known country code; with
+# HBNB_VALIDATE_REFERENCES=1 places, reviews and bookings must also reference existing entities.
+EMAIL_REGEX = re.compile(EMAIL_PATTERN)
+check_references = relationships.validate_references
+city_validator = compile_model(city_model, references={
+    'country_code': (is_valid_country_code, "unknown country code"),
+})
+amenity_validator = compile_model(amenity_model)
+user_validator = compile_model(user_model)
+place_validator = compile_model(place_model, references={
+    'city_id': (entity_exists('City'), "unknown city"),
+    'host_id': (entity_exists('User'), "unknown user"),
+    'amenity_ids': (entity_exists('Amenity'), "unknown amenities"),
+} if check_references else None)
+review_validator = compile_model(review_model, references={
+    'place_id': (entity_exists('Place'), "unknown place"),
+    'user_id': (entity_exists('User'), "unknown user"),
+} if check_references else None)
+booking_validator = compile_model(booking_model, references={
+    'user_id': (entity_exists('User'), "unknown user"),
+} if check_references else None)
+
+def include_deleted():
+    """
+    Check if the request asks for soft-deleted entities too (?include_deleted=1).
+    Only admin requests may; for anyone else the parameter is ignored.
+    """
+    return admin.is_admin() and request.args.get('include_deleted', '').lower() in ('1', 'true', 'yes')
+
+def parse_as_of():
+    """
+    Parse ?as_of= as a change feed version (an integer) or an ISO 8601 timestamp.
+    Returns a (version, at) pair; raises ValueError if the value is neither.
+    """
+    value = request.args['as_of']
+    if value.isdigit():
+        return int(value), None
+    at = datetime.fromisoformat(value)
+    if at.tzinfo is not None:
+        at = at.astimezone().replace(tzinfo=None)  # History is recorded in naive local time
+    return None, at
+
+def historical_response(entity_type, entity_id=None):
+    """
+    Build the response for an ?as_of= read of one entity, or of every entity of the type.
+    """
+    try:
+        version, at = parse_as_of()
+    except ValueError:
+        return jsonify({"error": "as_of must be a version number or an ISO 8601 timestamp"}), 400
+    if entity_id is None:
+        return jsonify(version_store.snapshot(entity_type, version, at)), 200
+    entity = version_store.as_of(entity_type, entity_id, version, at)
+    if entity is None:
+        return jsonify({"error": f"{entity_type} not found at {request.args['as_of']}"}), 404
+    return jsonify(entity), 200
+
+def entities_response(entity_type, entities):
+    """
+    Build a JSON array response from the cached encodings of stored entities.
+    With ?format=columns the entities are returned in the compact columnar layout instead.
+    """
+    if request.args.get('format') == 'columns':
+        return app.json.response(to_columns(entities))
+    return app.json.raw_response(entity_cache.encode_list(entity_type, entities))
+
+def entity_response(entity_type, entity):
+    """
+    Build a JSON response from the cached encoding of a stored entity.
+    """
+    response = app.json.raw_response(entity_cache.encode(entity_type, entity))
+    response.set_etag(entity_etag(entity))  # Sent back in If-Match to update or delete exactly this version
+    return response
+
+def entity_etag(entity):
+    """
+    Return the strong ETag of a stored entity, built from its id and its version.
+    """
+    return f"{entity.get('id')}.{entity_version(entity)}"
+
+def if_match_version(entity_type, entity_id):
+    """
+    Check the If-Match header of a PUT or DELETE against the stored entity.
+    Returns the entity version the write must still find when it runs (a compare-and-swap), or None
+    without If-Match or when the entity does not exist (the write then reports 404 itself).
+    Raises VersionConflictError if the header does not match the entity's current ETag.
+    """
+    if not request.if_match:
+        return None
+    entity = data_manager.get(entity_id, entity_type)
+    if entity is None:
+        return None
+    if not any(request.if_match.contains(etag) for etag in compressor.etag_variants(entity_etag(entity))):
+        raise VersionConflictError(f"{entity_type} {entity_id} has changed; its ETag is now \"{entity_etag(entity)}\"")
+    return entity_version(entity)
+
+def precondition_failed_response(error):
+    """
+    Build the 412 response of a write whose If-Match does not match the stored entity.
+    """
+    return jsonify({"error": str(error)}), 412
+
+def update_entity_response(entity_type, entity_id, data, validator):
+    """
+    Validate a PUT payload, apply it to a stored entity and build the response.
+    Only the model's writable fields are merged (read-only and unknown keys are rejected with a 400), into
+    a copy of the stored dictionary that replace() swaps in after checking the version it was read at, so
+    the stored entity is never modified in place and a concurrent write is never overwritten. With If-Match
+    a conflict is a 412; without it the merge is retried on the new state.
+    """
+    errors = validator(data, partial=True)
+    if errors:
+        return validation_error_response(errors)
+    changes = {key: value for key, value in data.items() if key in validator.writable}
+    try:
+        expected_version = if_match_version(entity_type, entity_id)
+    except VersionConflictError as e:
+        return precondition_failed_response(e)
+    while True:
+        entity = data_manager.get(entity_id, entity_type)
+        if entity is None:
+            return jsonify({"error": f"{entity_type} not found"}), 404
+        updated = dict(entity, **changes)
+        updated['updated_at'] = datetime.now()  # Set the last updated timestamp
+        try:
+            data_manager.replace(entity_type, updated,
+                                 expected_version if expected_version is not None else entity_version(entity))
+        except VersionConflictError as e:
+            if expected_version is not None:
+                return precondition_failed_response(e)
+            continue  # Changed since it was read; merge the payload into the new state
+        except ReferentialIntegrityError as e:
+            return jsonify({"error": str(e)}), 400
+        except ValueError:
+            return jsonify({"error": f"{entity_type} not found"}), 404  # Deleted since it was read
+        stored = data_manager.get(entity_id, entity_type)
+        if stored is None:
+            return jsonify({"error": f"{entity_type} not found"}), 404  # Deleted right after the update
+        return entity_response(entity_type, stored), 200
 
 # Define Namespaces
 ns_country = api.namespace('countries', description='Country operations')
@@ -138,7 +413,7 @@ class CountryList(Resource):
     @ns_country.marshal_list_with(country_model)
     def get(self):
         """Retrieve all pre-loaded countries."""
-        countries = data_manager.storage.get('Country', [])
+        countries = data_manager.all('Country', include_deleted=include_deleted())
         return countries, 200
 
 @ns_country.route('/<string:country_code>')
@@ -149,7 +424,7 @@ class Country(Resource):
     @ns_country.marshal_with(country_model)
     def get(self, country_code):
         """Retrieve details of a specific country by its code."""
-        country = data_manager.get(country_code, 'Country')
+        country = data_manager.get(country_code, 'Country', include_deleted=include_deleted())
         if country:
             return country, 200
         else:
@@ -163,9 +438,9 @@ class CountryCities(Resource):
     @ns_country.marshal_list_with(city_model)
     def get(self, country_code):
         """Retrieve all cities belonging to a specific country."""
-        country = data_manager.get(country_code, 'Country')
+        country = data_manager.get(country_code, 'Country', include_deleted=include_deleted())
         if country:
-            cities = [city for city in data_manager.storage.get('City', []) if city['country_code'] == country_code]
+            cities = [city for city in data_manager.all('City', include_deleted=include_deleted()) if city['country_code'] == country_code]
             return cities, 200
         else:
             api.abort(404, "Country not found")
@@ -177,7 +452,7 @@ class CityList(Resource):
     @ns_city.marshal_list_with(city_model)
     def get(self):
         """Retrieve all cities."""
-        cities = data_manager.storage.get('City', [])
+        cities = data_manager.all('City', include_deleted=include_deleted())
         return cities, 200
 
     @ns_city.doc('create_city')
@@ -198,7 +473,7 @@ class City(Resource):
     @ns_city.marshal_with(city_model)
     def get(self, city_id):
         """Retrieve details of a specific city."""
-        city = data_manager.get(city_id, 'City')
+        city = data_manager.get(city_id, 'City', include_deleted=include_deleted())
         if city:
             return city, 200
         else:
@@ -210,11 +485,14 @@ class City(Resource):
     def put(self, city_id):
         """Update an existing city's information."""
         data = request.json
+        errors = city_validator(data, partial=True)
+        if errors:
+            api.abort(400, "Invalid request body", errors=errors)
         city = data_manager.get(city_id, 'City')
         if city:
-            for key, value in data.items():
-                setattr(city, key, value)
-            data_manager.update(city)
+            changes = {key: value for key, value in data.items() if key in city_validator.writable}
+            city = dict(city, **changes, updated_at=datetime.now())  # Never modify the stored dictionary in place
+            data_manager.replace('City', city)
             return city, 200
         else:
             api.abort(404, "City not found")
@@ -225,6 +503,8 @@ class City(Resource):
         try:
             data_manager.delete(city_id, 'City')
             return '', 204
+        except ReferentialIntegrityError as e:
+            api.abort(409, str(e))
         except ValueError:
             api.abort(404, "City not found")
 
@@ -234,17 +514,17 @@ def get_countries():
     """
     Retrieve all pre-loaded countries.
     """
-    countries = data_manager.storage.get('Country', [])
-    return jsonify(countries), 200
+    countries = data_manager.all('Country', include_deleted=include_deleted())
+    return entities_response('Country', countries), 200
 
 @app.route('/countries/<country_code>', methods=['GET'])
 def get_country(country_code):
     """
     Retrieve details of a specific country by its code.
     """
-    country = data_manager.get(country_code, 'Country')
+    country = data_manager.get(country_code, 'Country', include_deleted=include_deleted())
     if country:
-        return jsonify(country), 200
+        return entity_response('Country', country), 200
     else:
         return jsonify({"error": "Country not found"}), 404
 
@@ -253,10 +533,10 @@ def get_cities_by_country(country_code):
     """
     Retrieve all cities belonging to a specific country.
     """
-    country = data_manager.get(country_code, 'Country')
+    country = data_manager.get(country_code, 'Country', include_deleted=include_deleted())
     if country:
-        cities = [city for city in data_manager.storage.get('City', []) if city['country_code'] == country_code]
-        return jsonify(cities), 200
+        cities = [city for city in data_manager.all('City', include_deleted=include_deleted()) if city['country_code'] == country_code]
+        return entities_response('City', cities), 200
     else:
         return jsonify({"error": "Country not found"}), 404
 
@@ -269,11 +549,17 @@ def create_city():
     try:
         data = request.json
         logging.debug(f"Received data: {data}")
+        errors = city_validator(data)
+        if errors:
+            return validation_error_response(errors)
         city = City(name=data['name'], country_code=data['country_code'])
         data_manager.save(city)
         response = jsonify(city.__dict__), 201  # Return the city as JSON
         logging.debug(f"Created city: {city.__dict__}")
         return response
+    except ReferentialIntegrityError as e:
+        logging.error(f"Error creating city: {e}")
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Error creating city: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
@@ -283,17 +569,17 @@ def get_cities():
     """
     Retrieve all cities.
     """
-    cities = data_manager.storage.get('City', [])
-    return jsonify(cities), 200
+    cities = data_manager.all('City', include_deleted=include_deleted())
+    return entities_response('City', cities), 200
 
 @app.route('/cities/<city_id>', methods=['GET'])
 def get_city(city_id):
     """
     Retrieve details of a specific city.
     """
-    city = data_manager.get(city_id, 'City')
+    city = data_manager.get(city_id, 'City', include_deleted=include_deleted())
     if city:
-        return jsonify(city), 200
+        return entity_response('City', city), 200
     else:
         logging.debug(f"City with ID {city_id} not found.")
         return jsonify({"error": "City not found"}), 404
@@ -324,15 +610,7 @@ def update_city(city_id):
     """
     Update an existing city's information.
     """
-    data = request.json
-    city = data_manager.get(city_id, 'City')
-    if city:
-        for key, value in data.items():
-            setattr(city, key, value)
-        data_manager.update(city)
-        return jsonify(city), 200
-    else:
-        return jsonify({"error": "City not found"}), 404
+    return update_entity_response('City', city_id, request.json, city_validator)
 
 @app.route('/cities/<city_id>', methods=['DELETE'])
 def delete_city(city_id):
@@ -340,8 +618,12 @@ def delete_city(city_id):
     Delete a specific city.
     """
     try:
-        data_manager.delete(city_id, 'City')
+        data_manager.delete(city_id, 'City', expected_version=if_match_version('City', city_id))
         return '', 204
+    except VersionConflictError as e:
+        return precondition_failed_response(e)
+    except ReferentialIntegrityError as e:
+        return jsonify({"error": str(e)}), 409
     except ValueError:
         return jsonify({"error": "City not found"}), 404
 
@@ -354,6 +636,9 @@ def create_amenity():
     try:
         data = request.json
         logging.debug(f"Received data: {data}")
+        errors = amenity_validator(data)
+        if errors:
+            return validation_error_response(errors)
         amenity = Amenity(name=data['name'], description=data.get('description', ''))
         data_manager.save(amenity)
         response = jsonify(amenity.__dict__), 201  # Return the amenity as JSON
@@ -368,17 +653,17 @@ def get_amenities():
     """
     Retrieve a list of all amenities.
     """
-    amenities = data_manager.storage.get('Amenity', [])
-    return jsonify(amenities), 200
+    amenities = data_manager.all('Amenity', include_deleted=include_deleted())
+    return entities_response('Amenity', amenities), 200
 
 @app.route('/amenities/<amenity_id>', methods=['GET'])
 def get_amenity(amenity_id):
     """
     Retrieve detailed information about a specific amenity.
     """
-    amenity = data_manager.get(amenity_id, 'Amenity')
+    amenity = data_manager.get(amenity_id, 'Amenity', include_deleted=include_deleted())
     if amenity:
-        return jsonify(amenity), 200
+        return entity_response('Amenity', amenity), 200
     else:
         return jsonify({"error": "Amenity not found"}), 404
 
@@ -387,15 +672,7 @@ def update_amenity(amenity_id):
     """
     Update an existing amenity's information.
     """
-    data = request.json
-    amenity = data_manager.get(amenity_id, 'Amenity')
-    if amenity:
-        for key, value in data.items():
-            setattr(amenity, key, value)
-        data_manager.update(amenity)
-        return jsonify(amenity), 200
-    else:
-        return jsonify({"error": "Amenity not found"}), 404
+    return update_entity_response('Amenity', amenity_id, request.json, amenity_validator)
 
 @app.route('/amenities/<amenity_id>', methods=['DELETE'])
 def delete_amenity(amenity_id):
@@ -403,8 +680,12 @@ def delete_amenity(amenity_id):
     Delete a specific amenity.
     """
     try:
-        data_manager.delete(amenity_id, 'Amenity')
+        data_manager.delete(amenity_id, 'Amenity', expected_version=if_match_version('Amenity', amenity_id))
         return '', 204
+    except VersionConflictError as e:
+        return precondition_failed_response(e)
+    except ReferentialIntegrityError as e:
+        return jsonify({"error": str(e)}), 409
     except ValueError:
         return jsonify({"error": "Amenity not found"}), 404
 
@@ -418,11 +699,9 @@ def create_place():
         data = request.json
         logging.debug(f"Received data: {data}")
 
-        # Check for required fields
-        required_fields = ['name', 'description', 'city_id', 'host_id', 'latitude', 'longitude', 'price_per_night', 'max_guests', 'number_of_rooms', 'number_of_bathrooms']
-        for field in required_fields:
-            if field not in data:
-                raise KeyError(f"Missing required field: {field}")
+        errors = place_validator(data)
+        if errors:
+            return validation_error_response(errors)
 
         place = Place(
             name=data['name'],
@@ -444,6 +723,9 @@ def create_place():
     except KeyError as e:
         logging.error(f"Error creating place: {e}")
         return jsonify({"error": str(e)}), 400
+    except ReferentialIntegrityError as e:
+        logging.error(f"Error creating place: {e}")
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Error creating place: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
@@ -453,34 +735,40 @@ def get_places():
     """
     Retrieve a list of all places.
     """
-    places = data_manager.storage.get('Place', [])
-    return jsonify(places), 200
+    if 'as_of' in request.args:
+        return historical_response('Place')
+    places = data_manager.all('Place', include_deleted=include_deleted())
+    return entities_response('Place', places), 200
 
 @app.route('/places/<place_id>', methods=['GET'])
 def get_place(place_id):
     """
     Retrieve detailed information about a specific place.
     """
-    place = data_manager.get(place_id, 'Place')
+    if 'as_of' in request.args:
+        return historical_response('Place', place_id)
+    place = data_manager.get(place_id, 'Place', include_deleted=include_deleted())
     if place:
-        return jsonify(place), 200
+        return entity_response('Place', place), 200
     else:
         return jsonify({"error": "Place not found"}), 404
 
+@app.route('/places/<place_id>/history', methods=['GET'])
+def get_place_history(place_id):
+    """
+    Retrieve the recorded versions of a place, oldest first.
+    """
+    versions = version_store.history('Place', place_id)
+    if versions is None:
+        return jsonify({"error": "Place not found"}), 404
+    return jsonify(versions), 200
+
 @app.route('/places/<place_id>', methods=['PUT'])
 def update_place(place_id):
     """
     Update an existing place's information.
     """
-    data = request.json
-    place = data_manager.get(place_id, 'Place')
-    if place:
-        for key, value in data.items():
-            setattr(place, key, value)
-        data_manager.update(place)
-        return jsonify(place), 200
-    else:
-        return jsonify({"error": "Place not found"}), 404
+    return update_entity_response('Place', place_id, request.json, place_validator)
 
 @app.route('/places/<place_id>', methods=['DELETE'])
 def delete_place(place_id):
@@ -488,8 +776,12 @@ def delete_place(place_id):
     Delete a specific place.
     """
     try:
-        data_manager.delete(place_id, 'Place')
+        data_manager.delete(place_id, 'Place', expected_version=if_match_version('Place', place_id))
         return '', 204
+    except VersionConflictError as e:
+        return precondition_failed_response(e)
+    except ReferentialIntegrityError as e:
+        return jsonify({"error": str(e)}), 409
     except ValueError:
         return jsonify({"error": "Place not found"}), 404
 
@@ -503,11 +795,9 @@ def create_user():
         data = request.json
         logging.debug(f"Received data: {data}")
 
-        # Check for required fields
-        required_fields = ['email', 'password', 'first_name', 'last_name']
-        for field in required_fields:
-            if field not in data:
-                raise KeyError(f"Missing required field: {field}")
+        errors = user_validator(data)
+        if errors:
+            return validation_error_response(errors)
 
         user = User(
             email=data['email'],
@@ -522,6 +812,9 @@ def create_user():
     except KeyError as e:
         logging.error(f"Error creating user: {e}")
         return jsonify({"error": str(e)}), 400
+    except ReferentialIntegrityError as e:
+        logging.error(f"Error creating user: {e}")
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Error creating user: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
@@ -531,17 +824,17 @@ def get_users():
     """
     Retrieve a list of all users.
     """
-    users = data_manager.storage.get('User', [])
-    return jsonify(users), 200
+    users = data_manager.all('User', include_deleted=include_deleted())
+    return entities_response('User', users), 200
 
 @app.route('/users/<user_id>', methods=['GET'])
 def get_user(user_id):
     """
     Retrieve detailed information about a specific user.
     """
-    user = data_manager.get(user_id, 'User')
+    user = data_manager.get(user_id, 'User', include_deleted=include_deleted())
     if user:
-        return jsonify(user), 200
+        return entity_response('User', user), 200
     else:
         return jsonify({"error": "User not found"}), 404
 
@@ -550,15 +843,7 @@ def update_user(user_id):
     """
     Update an existing user's information.
     """
-    data = request.json
-    user = data_manager.get(user_id, 'User')
-    if user:
-        for key, value in data.items():
-            setattr(user, key, value)
-        data_manager.update(user)
-        return jsonify(user), 200
-    else:
-        return jsonify({"error": "User not found"}), 404
+    return update_entity_response('User', user_id, request.json, user_validator)
 
 @app.route('/users/<user_id>', methods=['DELETE'])
 def delete_user(user_id):
@@ -566,8 +851,12 @@ def delete_user(user_id):
     Delete a specific user.
     """
     try:
-        data_manager.delete(user_id, 'User')
+        data_manager.delete(user_id, 'User', expected_version=if_match_version('User', user_id))
         return '', 204
+    except VersionConflictError as e:
+        return precondition_failed_response(e)
+    except ReferentialIntegrityError as e:
+        return jsonify({"error": str(e)}), 409
     except ValueError:
         return jsonify({"error": "User not found"}), 404
 
@@ -580,16 +869,22 @@ def create_review(place_id):
     try:
         data = request.json
         logging.debug(f"Received data: {data}")
+        errors = review_validator(dict(data, place_id=place_id) if isinstance(data, dict) else data)
+        if errors:
+            return validation_error_response(errors)
         review = Review(
             user_id=data['user_id'],
             place_id=place_id,
             rating=data['rating'],
-            comment=data['comment']
+            comment=data.get('comment', '')  # The comment is optional in review_model
         )
         data_manager.save(review)
         response = jsonify(review.__dict__), 201  # Return the review as JSON
         logging.debug(f"Created review: {review.__dict__}")
         return response
+    except ReferentialIntegrityError as e:
+        logging.error(f"Error creating review: {e}")
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Error creating review: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
@@ -600,8 +895,8 @@ def get_reviews_by_user(user_id):
     Retrieve all reviews written by a specific user.
     """
     try:
-        reviews = [review for review in data_manager.storage.get('Review', []) if review['user_id'] == user_id]
-        return jsonify(reviews), 200
+        reviews = [review for review in data_manager.all('Review', include_deleted=include_deleted()) if review['user_id'] == user_id]
+        return entities_response('Review', reviews), 200
     except Exception as e:
         logging.error(f"Error retrieving reviews for user {user_id}: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
@@ -612,8 +907,8 @@ def get_reviews_by_place(place_id):
     Retrieve all reviews for a specific place.
     """
     try:
-        reviews = [review for review in data_manager.storage.get('Review', []) if review['place_id'] == place_id]
-        return jsonify(reviews), 200
+        reviews = [review for review in data_manager.all('Review', include_deleted=include_deleted()) if review['place_id'] == place_id]
+        return entities_response('Review', reviews), 200
     except Exception as e:
         logging.error(f"Error retrieving reviews for place {place_id}: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
@@ -623,26 +918,30 @@ def get_review(review_id):
     """
     Retrieve detailed information about a specific review.
     """
-    review = data_manager.get(review_id, 'Review')
+    if 'as_of' in request.args:
+        return historical_response('Review', review_id)
+    review = data_manager.get(review_id, 'Review', include_deleted=include_deleted())
     if review:
-        return jsonify(review), 200
+        return entity_response('Review', review), 200
     else:
         return jsonify({"error": "Review not found"}), 404
 
+@app.route('/reviews/<review_id>/history', methods=['GET'])
+def get_review_history(review_id):
+    """
+    Retrieve the recorded versions of a review, oldest first.
+    """
+    versions = version_store.history('Review', review_id)
+    if versions is None:
+        return jsonify({"error": "Review not found"}), 404
+    return jsonify(versions), 200
+
 @app.route('/reviews/<review_id>', methods=['PUT'])
 def update_review(review_id):
     """
     Update an existing review.
     """
-    data = request.json
-    review = data_manager.get(review_id, 'Review')
-    if review:
-        for key, value in data.items():
-            setattr(review, key, value)
-        data_manager.update(review)
-        return jsonify(review), 200
-    else:
-        return jsonify({"error": "Review not found"}), 404
+    return update_entity_response('Review', review_id, request.json, review_validator)
 
 @app.route('/reviews/<review_id>', methods=['DELETE'])
 def delete_review(review_id):
@@ -650,10 +949,313 @@ def delete_review(review_id):
     Delete a specific review.
     """
     try:
-        data_manager.delete(review_id, 'Review')
+        data_manager.delete(review_id, 'Review', expected_version=if_match_version('Review', review_id))
         return '', 204
+    except VersionConflictError as e:
+        return precondition_failed_response(e)
     except ValueError:
         return jsonify({"error": "Review not found"}), 404
 
+# Booking endpoints
+@app.route('/places/<place_id>/bookings', methods=['POST'])
+def create_booking(place_id):
+    """
+    Book a place for a stay. The storage write check reserves the nights
+    atomically with the write, so of two overlapping requests only the first
+    succeeds and the other gets a 409. Nothing is reserved before the write is
+    accepted: in worker processes the writer decides, and the index follows
+    its change events.
+    """
+    try:
+        data = request.json
+        logging.debug(f"Received data: {data}")
+        if data_manager.get(place_id, 'Place') is None:
+            return jsonify({"error": "Place not found"}), 404
+        errors = booking_validator(dict(data, place_id=place_id) if isinstance(data, dict) else data)
+        if errors:
+            return validation_error_response(errors)
+        booking = Booking(
+            place_id=place_id,
+            user_id=data['user_id'],
+            check_in=data['check_in'],
+            check_out=data['check_out'],
+            guests=data.get('guests', 1)
+        )
+        availability.check(booking.__dict__)  # Refuse known conflicts early; the write check has the final say
+        data_manager.save(booking)
+        logging.debug(f"Created booking: {booking.__dict__}")
+        return jsonify(booking.__dict__), 201
+    except BookingConflictError as e:
+        return jsonify({"error": str(e)}), 409
+    except (KeyError, ValueError, ReferentialIntegrityError) as e:
+        logging.error(f"Error creating booking: {e}")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error creating booking: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+@app.route('/places/<place_id>/bookings', methods=['GET'])
+def get_bookings_by_place(place_id):
+    """
+    Retrieve all bookings of a specific place.
+    """
+    place = data_manager.get(place_id, 'Place', include_deleted=include_deleted())
+    if place:
+        bookings = [booking for booking in data_manager.all('Booking', include_deleted=include_deleted()) if booking['place_id'] == place_id]
+        return entities_response('Booking', bookings), 200
+    else:
+        return jsonify({"error": "Place not found"}), 404
+
+@app.route('/places/available', methods=['GET'])
+def get_available_places():
+    """
+    Retrieve the places that can host a stay (?check_in=YYYY-MM-DD&check_out=YYYY-MM-DD&guests=N).
+    """
+    try:
+        guests = int(request.args.get('guests', 1))
+        place_ids = availability.search(request.args['check_in'], request.args['check_out'], guests)
+    except KeyError:
+        return jsonify({"error": "check_in and check_out are required"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    places = [place for place in (data_manager.get(place_id, 'Place') for place_id in place_ids) if place]
+    return entities_response('Place', places), 200
+
+@app.route('/bookings/<booking_id>', methods=['GET'])
+def get_booking(booking_id):
+    """
+    Retrieve detailed information about a specific booking.
+    """
+    booking = data_manager.get(booking_id, 'Booking', include_deleted=include_deleted())
+    if booking:
+        return entity_response('Booking', booking), 200
+    else:
+        return jsonify({"error": "Booking not found"}), 404
+
+@app.route('/bookings/<booking_id>', methods=['DELETE'])
+def delete_booking(booking_id):
+    """
+    Cancel a specific booking, freeing its nights.
+    """
+    try:
+        data_manager.delete(booking_id, 'Booking', expected_version=if_match_version('Booking', booking_id))
+        return '', 204
+    except VersionConflictError as e:
+        return precondition_failed_response(e)
+    except ValueError:
+        return jsonify({"error": "Booking not found"}), 404
+
+# Recommendation endpoints
+def top_k():
+    """
+    Parse ?k= (number of results, 1 to 100, default 10).
+    """
+    return min(max(int(request.args.get('k', 10)), 1), 100)
+
+@app.route('/places/<place_id>/similar', methods=['GET'])
+def get_similar_places(place_id):
+    """
+    Retrieve the places most similar to a specific place (?k= results).
+    """
+    try:
+        k = top_k()
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+    results = similarity.similar(place_id, k)
+    if results is None:
+        return jsonify({"error": "Place not found"}), 404
+    return jsonify(results), 200
+
+@app.route('/users/<user_id>/recommendations', methods=['GET'])
+def get_user_recommendations(user_id):
+    """
+    Recommend places to a specific user from the places they reviewed (?k= results).
+    """
+    try:
+        k = top_k()
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+    if data_manager.get(user_id, 'User') is None:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify(similarity.recommend(user_id, k)), 200
+
+# Pricing endpoints
+@app.route('/pricing-rules', methods=['POST'])
+def create_pricing_rule():
+    """
+    Create a new pricing rule.
+    """
+    try:
+        data = request.json
+        logging.debug(f"Received data: {data}")
+        rule = PricingRule(
+            kind=data.get('kind'),
+            multiplier=data.get('multiplier'),
+            start=data.get('start'),
+            end=data.get('end'),
+            min_nights=data.get('min_nights'),
+            min_occupancy=data.get('min_occupancy')
+        )
+        validate_rule(rule.__dict__)
+        data_manager.save(rule)
+        return jsonify(rule.__dict__), 201
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error creating pricing rule: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+@app.route('/pricing-rules', methods=['GET'])
+def get_pricing_rules():
+    """
+    Retrieve a list of all pricing rules.
+    """
+    rules = data_manager.all('PricingRule', include_deleted=include_deleted())
+    return entities_response('PricingRule', rules), 200
+
+@app.route('/pricing-rules/<rule_id>', methods=['DELETE'])
+def delete_pricing_rule(rule_id):
+    """
+    Delete a specific pricing rule.
+    """
+    try:
+        data_manager.delete(rule_id, 'PricingRule', expected_version=if_match_version('PricingRule', rule_id))
+        return '', 204
+    except VersionConflictError as e:
+        return precondition_failed_response(e)
+    except ValueError:
+        return jsonify({"error": "Pricing rule not found"}), 404
+
+@app.route('/places/quote', methods=['POST'])
+def quote_places():
+    """
+    Quote a stay at many places at once.
+    Body: {"check_in": "YYYY-MM-DD", "check_out": "YYYY-MM-DD", "guests": N, "place_ids": [...] (optional)}.
+    """
+    data = request.json or {}
+    try:
+        result = quote_engine.quote(data['check_in'], data['check_out'], data.get('guests', 1), data.get('place_ids'))
+    except KeyError:
+        return jsonify({"error": "check_in and check_out are required"}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), 200
+
+@app.route('/batch', methods=['POST'])
+def run_batch():
+    """
+    Run several sub-requests in one call.
+    Body: [{"method": "GET", "path": "/places/<id>", "body": {...}, "headers": {...}}, ...], or
+    {"requests": [...], "parallel": true} to run consecutive reads on a thread pool.
+    Returns {"responses": [{"status", "headers", "body"}, ...]} in request order.
+    """
+    data = request.get_json(silent=True)
+    parallel = False
+    if isinstance(data, dict):
+        data, parallel = data.get('requests'), bool(data.get('parallel'))
+    try:
+        results = batch_dispatcher.run(data, parallel=parallel)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"responses": results}), 200
+
+def stats_quantiles():
+    """
+    Parse the ?quantiles=0.5,0.9 parameter of the stats endpoints.
+
+    Raises:
+        ValueError: If a quantile is not a number between 0 and 1.
+    """
+    raw = request.args.get('quantiles')
+    if not raw:
+        return (0.25, 0.5, 0.75, 0.9)
+    quantiles = tuple(float(part) for part in raw.split(','))
+    if not all(0 <= q <= 1 for q in quantiles):
+        raise ValueError("quantiles must be between 0 and 1")
+    return quantiles
+
+@app.route('/stats/places', methods=['GET'])
+def get_place_stats():
+    """
+    Get the place count, field sums and averages, and price quantiles of the whole catalog.
+    """
+    try:
+        return jsonify(catalog_stats.overall(stats_quantiles())), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/stats/cities', methods=['GET'])
+@app.route('/stats/cities/<city_id>', methods=['GET'])
+def get_city_stats(city_id=None):
+    """
+    Get place figures for every city with places, or for one city.
+    """
+    try:
+        stats = catalog_stats.by_city(city_id, stats_quantiles())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if stats is None:
+        return jsonify({"error": "No places in this city"}), 404
+    return jsonify(stats), 200
+
+@app.route('/stats/countries', methods=['GET'])
+@app.route('/stats/countries/<country_code>', methods=['GET'])
+def get_country_stats(country_code=None):
+    """
+    Get place figures for every country with places, or for one country.
+    """
+    try:
+        stats = catalog_stats.by_country(country_code, stats_quantiles())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if stats is None:
+        return jsonify({"error": "No places in this country"}), 404
+    return jsonify(stats), 200
+
+@app.route('/changes', methods=['GET'])
+def get_changes():
+    """
+    Get the mutations after a cursor (?since=<version>), optionally limited to ?types=Place,Review.
+    Pass ?wait=<seconds> to long-poll until a change arrives, or Accept: text/event-stream for a
+    server-sent events stream (resumed through Last-Event-ID). Clients without a usable cursor get
+    a full snapshot ('reset': true) and resume from its cursor.
+    """
+    since = request.args.get('since', request.headers.get('Last-Event-ID'))
+    try:
+        since = int(since) if since not in (None, '') else None
+        types = change_stream.parse_types(request.args.get('types'))
+        wait = float(request.args.get('wait', 0))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    sse = request.accept_mimetypes.best == 'text/event-stream'
+    if sse or wait > 0:
+        admission.release()  # Waiting clients must not count as reads in flight and hold back the writes they wait for
+    if sse:
+        return Response(change_stream.stream(since, types), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    result = change_stream.poll(since, types, wait)
+    response = jsonify(result)
+    response.set_etag(compressor.etag_for(result['cursor']), weak=True)  # The body is fixed by the URL and cursor
+    return response
+
+@app.route('/admin/memory', methods=['GET'])
+def get_memory():
+    """
+    Report entity counts and deep sizes per type, index and cache sizes, and growth since the last report.
+    Pass ?tracemalloc=1 to also list the top allocating lines (the first call starts tracing).
+    """
+    report = memory.report(trace=request.args.get('tracemalloc') == '1')
+    return jsonify(report), 200, {'Cache-Control': 'no-store'}  # Live figures; never cached or answered with 304
+
+@app.route('/admin/memory/tracemalloc', methods=['DELETE'])
+def stop_memory_tracing():
+    """
+    Stop tracing allocations.
+    """
+    memory.stop_tracing()
+    return '', 204
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server; serve production traffic with `python -m api.multiprocess`
+    vacuum.start()
+    app.run(debug=os.environ.get('HBNB_DEBUG', '1') == '1')
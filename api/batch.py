@@ -0,0 +1,212 @@
+"""
+Batch request multiplexing for the API.
+
+POST /batch takes an array of sub-requests ({"method", "path", "body",
+"headers"}) and dispatches each one in-process to the matching view, with
+no HTTP round trip and without running the per-request hooks (compression,
+admission slots, profiling) again; the batch request itself went through
+them. Each sub-request gets its own app context, so its `g` and teardown
+hooks never touch the batch request's. An authorize callback stands in for the hooks that guard
+access (admin routes), so a batch cannot reach what a direct request cannot.
+Sub-requests run in order; every run
+of consecutive reads runs inside a persistence read snapshot, so those reads
+see the same state. Backends without snapshots (the workers' shared read
+index) give no such guarantee. The snapshot holds writers off, so it is never
+held across the batch's writes and is given up once a run has held it for
+max_snapshot_seconds (the rest of that run reads live state). With
+"parallel": true, runs of consecutive reads are spread over a thread pool;
+writes stay in order and act as barriers between those runs.
+
+Routes that stream or long-poll (GET /changes) are refused with a 400: they
+would hold the batch, and the snapshot with it, open for as long as they wait.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from flask import request
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+READ_METHODS = frozenset(('GET', 'HEAD'))
+METHODS = READ_METHODS | frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+class BatchDispatcher:
+    """
+    Dispatches batches of sub-requests against a Flask app's routes.
+
+    Attributes:
+        max_requests (int): Largest accepted batch.
+        threads (int): Threads of the pool for parallel reads; 0 disables parallel reads.
+        max_snapshot_seconds (float): Longest a run of reads holds the read snapshot, and writers off.
+    """
+
+    def __init__(self, app, persistence=None, limiter=None, max_requests=50, threads=4, unbatched=(),
+                 max_snapshot_seconds=0.5, authorize=None):
+        """
+        Initializes a new BatchDispatcher instance.
+
+        Args:
+            app (Flask): The app whose routes sub-requests are dispatched to.
+            persistence (callable, optional): Returns the current persistence manager, whose
+                read_snapshot() wraps each run of consecutive reads when it supports snapshots.
+            limiter (callable, optional): limiter(method, rule, client) returns 0 if a sub-request
+                may run, otherwise seconds until it may (see AdmissionController.charge).
+            max_requests (int): Largest accepted batch.
+            threads (int): Threads of the pool for parallel reads; 0 disables parallel reads.
+            unbatched (iterable): URL rules that cannot run inside a batch, e.g. '/changes'.
+            max_snapshot_seconds (float): Longest a run of reads holds the read snapshot.
+            authorize (callable, optional): Runs in each sub-request's context like a before_request
+                hook; a response it returns is the sub-request's result (see AdminAuth.check).
+        """
+        self.app = app  # Set the dispatched app
+        self.persistence = persistence  # Set the persistence manager callback
+        self.limiter = limiter  # Set the sub-request rate limiter
+        self.max_requests = max_requests  # Set the batch size bound
+        self.threads = threads  # Set the read pool size
+        self.unbatched = frozenset(unbatched)  # Set the streaming and long-poll routes refused in batches
+        self.max_snapshot_seconds = max_snapshot_seconds  # Set the bound on holding writers off
+        self.authorize = authorize  # Set the access check the sub-requests skip as hooks
+        self._pool = None  # Read pool, started on the first parallel batch
+
+    @staticmethod
+    def config_from_env():
+        """
+        Read options from HBNB_BATCH_MAX_REQUESTS, HBNB_BATCH_THREADS and HBNB_BATCH_SNAPSHOT_SECONDS.
+
+        Returns:
+            dict: Keyword arguments for BatchDispatcher.
+        """
+        options = {}
+        if os.environ.get('HBNB_BATCH_MAX_REQUESTS'):
+            options['max_requests'] = int(os.environ['HBNB_BATCH_MAX_REQUESTS'])
+        if os.environ.get('HBNB_BATCH_THREADS'):
+            options['threads'] = int(os.environ['HBNB_BATCH_THREADS'])
+        if os.environ.get('HBNB_BATCH_SNAPSHOT_SECONDS'):
+            options['max_snapshot_seconds'] = float(os.environ['HBNB_BATCH_SNAPSHOT_SECONDS'])
+        return options
+
+    def _invalid(self, item):
+        """Returns why a sub-request is malformed, or None."""
+        if not isinstance(item, dict):
+            return "Sub-request must be an object"
+        if str(item.get('method', 'GET')).upper() not in METHODS:
+            return f"Unsupported method {item.get('method')!r}"
+        path = item.get('path')
+        if not isinstance(path, str) or not path.startswith('/'):
+            return "Sub-request path must start with '/'"
+        if path.split('?', 1)[0].rstrip('/') == request.path.rstrip('/'):
+            return "Batches cannot be nested"
+        if not isinstance(item.get('headers', {}), dict):
+            return "Sub-request headers must be an object"
+        rule = self._rule(path.split('?', 1)[0], str(item.get('method', 'GET')).upper())
+        if rule in self.unbatched:
+            return f"{rule} streams or long-polls and cannot run inside a batch"
+        return None
+
+    def _rule(self, path, method):
+        """Returns the URL rule a path matches, or None; unmatched paths get their 404 or 405 from dispatch."""
+        try:
+            rule, _ = self.app.url_map.bind('localhost').match(path, method, return_rule=True)
+        except HTTPException:
+            return None
+        return rule.rule
+
+    def run(self, items, parallel=False):
+        """
+        Dispatch a batch.
+
+        Args:
+            items (list): The sub-requests.
+            parallel (bool): Whether runs of consecutive reads may run on the thread pool.
+
+        Returns:
+            list: One {'status', 'headers', 'body'} result per sub-request, in order.
+
+        Raises:
+            ValueError: If the batch is not a list or is larger than max_requests.
+        """
+        if not isinstance(items, list):
+            raise ValueError("Batch must be a list of sub-requests")
+        if len(items) > self.max_requests:
+            raise ValueError(f"Batch holds at most {self.max_requests} sub-requests")
+        client = request.remote_addr
+        results = [None] * len(items)
+        reads = []  # Positions of the pending run of consecutive reads
+        for position, item in enumerate(items):
+            error = self._invalid(item)
+            if error is not None:
+                results[position] = {'status': 400, 'headers': {}, 'body': {"error": error}}
+            elif str(item.get('method', 'GET')).upper() in READ_METHODS:
+                reads.append(position)
+            else:
+                self._run_reads(items, reads, results, client, parallel)
+                reads = []
+                results[position] = self.dispatch(item, client)  # Writes run outside any snapshot
+        self._run_reads(items, reads, results, client, parallel)
+        return results
+
+    def _run_reads(self, items, positions, results, client, parallel):
+        """Dispatch a run of reads inside a time-bounded read snapshot, on the pool when allowed and worthwhile."""
+        if not positions:
+            return
+        manager = self.persistence() if self.persistence is not None else None
+        with ExitStack() as snapshot:
+            if manager is not None and manager.supports_snapshots:
+                snapshot.enter_context(manager.read_snapshot())
+            deadline = time.monotonic() + self.max_snapshot_seconds
+            if parallel and self.threads and len(positions) > 1:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='batch')
+                futures = [(position, self._pool.submit(self.dispatch, items[position], client)) for position in positions]
+                wait([future for _, future in futures], timeout=max(0, deadline - time.monotonic()))
+                snapshot.close()  # Reads take no lock, so the pool finishes without holding writers off
+                for position, future in futures:
+                    results[position] = future.result()
+            else:
+                for position in positions:
+                    results[position] = self.dispatch(items[position], client)
+                    if time.monotonic() >= deadline:
+                        snapshot.close()  # Let writers in; the rest of the run reads live state
+
+    def dispatch(self, item, client):
+        """
+        Dispatch one sub-request to its view.
+
+        Args:
+            item (dict): The sub-request.
+            client (str): The address of the batch's client.
+
+        Returns:
+            dict: {'status', 'headers', 'body'} where body is decoded JSON when the response is JSON.
+        """
+        method = str(item.get('method', 'GET')).upper()
+        builder = EnvironBuilder(path=item['path'], method=method, headers=item.get('headers') or {},
+                                 json=item.get('body'), environ_base={'REMOTE_ADDR': client})
+        try:
+            environ = builder.get_environ()
+        finally:
+            builder.close()
+        with self.app.app_context(), self.app.request_context(environ):  # A fresh `g`, not the batch request's
+            try:
+                denied = self.authorize() if self.authorize is not None else None
+                if denied is not None:
+                    response = self.app.make_response(denied)
+                    body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+                    return {'status': response.status_code, 'headers': dict(response.headers), 'body': body}
+                if request.routing_exception is None and self.limiter is not None and method not in READ_METHODS:
+                    wait = self.limiter(method, request.url_rule.rule, client)
+                    if wait:
+                        return {'status': 429, 'headers': {'Retry-After': str(max(1, round(wait)))},
+                                'body': {"error": "Rate limit exceeded"}}
+                response = self.app.make_response(self.app.dispatch_request())
+            except HTTPException as e:
+                response = self.app.make_response(self.app.handle_user_exception(e))
+            except Exception:
+                logging.exception(f"Batch sub-request {method} {item['path']} failed")
+                return {'status': 500, 'headers': {}, 'body': {"error": "Internal server error"}}
+            body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+            headers = {key: value for key, value in response.headers.items() if key not in ('Content-Length',)}
+            return {'status': response.status_code, 'headers': headers, 'body': body}
@@ -0,0 +1,203 @@
+"""
+Change stream for the API.
+
+GET /changes?since=<cursor> returns the mutations recorded by the change
+feed after a cursor, so caches and indexers can follow the catalog by
+transferring deltas instead of re-reading whole collections. The cursor is
+the change feed version of the last event a client has processed; every
+response carries the cursor to resume from.
+
+A client whose cursor is older than the feed's in-memory buffer (or from
+before the process started, or with no cursor at all) cannot be given a
+complete delta, so it gets a full snapshot of the requested entity types
+taken at a known version instead, and resumes from that version.
+
+Clients can poll, long-poll (?wait=<seconds>) or keep a server-sent events
+stream open (Accept: text/event-stream); SSE clients resume after a
+reconnect through the standard Last-Event-ID header.
+"""
+
+import json
+import os
+import time
+from contextlib import nullcontext
+
+class ChangeStream:
+    """
+    Serves change feed deltas and snapshot fallbacks.
+
+    Attributes:
+        feed (ChangeFeed): The change feed events are read from.
+        entity_types (tuple): Types included by default and in snapshots.
+        max_events (int): Most events examined per response.
+        poll_timeout (float): Longest long-poll wait in seconds.
+        heartbeat (float): Seconds between SSE keep-alive comments.
+        stream_seconds (float): Lifetime of an SSE stream before the client is asked to reconnect.
+        origin (int): Oldest cursor a delta can be served from; older cursors get a snapshot.
+    """
+
+    def __init__(self, feed, persistence, entity_types=(), max_events=500, poll_timeout=25.0,
+                 heartbeat=15.0, stream_seconds=300.0):
+        """
+        Initializes a new ChangeStream instance.
+
+        Create it before anything is written at startup: entities loaded from
+        storage are not in the feed, so only cursors from now on are complete.
+
+        Args:
+            feed (ChangeFeed): The change feed events are read from.
+            persistence (callable): Returns the current persistence manager, used for snapshots.
+            entity_types (tuple): Types included by default and in snapshots.
+            max_events (int): Most events examined per response.
+            poll_timeout (float): Longest long-poll wait in seconds.
+            heartbeat (float): Seconds between SSE keep-alive comments.
+            stream_seconds (float): Lifetime of an SSE stream.
+        """
+        self.feed = feed  # Set the change feed
+        self.persistence = persistence  # Set the persistence manager callback
+        self.entity_types = tuple(entity_types)  # Set the default entity types
+        self.max_events = max_events  # Set the bound on events per response
+        self.poll_timeout = poll_timeout  # Set the long-poll bound
+        self.heartbeat = heartbeat  # Set the SSE keep-alive interval
+        self.stream_seconds = stream_seconds  # Set the SSE stream lifetime
+        self.origin = max(feed.version, 1)  # Version 0 is the loaded storage, which the feed never saw
+
+    @staticmethod
+    def config_from_env():
+        """
+        Read options from HBNB_CHANGES_MAX_EVENTS, HBNB_CHANGES_POLL_TIMEOUT,
+        HBNB_CHANGES_HEARTBEAT and HBNB_CHANGES_STREAM_SECONDS.
+
+        Returns:
+            dict: Keyword arguments for ChangeStream.
+        """
+        options = {}
+        if os.environ.get('HBNB_CHANGES_MAX_EVENTS'):
+            options['max_events'] = int(os.environ['HBNB_CHANGES_MAX_EVENTS'])
+        for name, option in (('HBNB_CHANGES_POLL_TIMEOUT', 'poll_timeout'), ('HBNB_CHANGES_HEARTBEAT', 'heartbeat'),
+                             ('HBNB_CHANGES_STREAM_SECONDS', 'stream_seconds')):
+            if os.environ.get(name):
+                options[option] = float(os.environ[name])
+        return options
+
+    def parse_types(self, value):
+        """
+        Parse a comma-separated ?types= value.
+
+        Returns:
+            tuple: The requested types, or every default type when value is empty.
+
+        Raises:
+            ValueError: If a type is unknown.
+        """
+        if not value:
+            return self.entity_types
+        types = tuple(name.strip() for name in value.split(',') if name.strip())
+        unknown = [name for name in types if name not in self.entity_types]
+        if unknown:
+            raise ValueError(f"Unknown entity types: {', '.join(unknown)}")
+        return types
+
+    def snapshot(self, types):
+        """
+        Take a full snapshot of some entity types.
+
+        Returns:
+            dict: {'reset': True, 'cursor': version of the snapshot, 'snapshot': {type: [entities]}}.
+        """
+        manager = self.persistence()
+        # Without snapshots, entities may already hold changes after the cursor; replaying them is harmless
+        with manager.read_snapshot() if manager.supports_snapshots else nullcontext():
+            cursor = self.feed.version
+            entities = {entity_type: [dict(entity) for entity in manager.all(entity_type)] for entity_type in types}
+        return {'reset': True, 'cursor': cursor, 'snapshot': entities}
+
+    def changes(self, since, types):
+        """
+        Collect the events after a cursor.
+
+        Args:
+            since (int): The client's cursor, or None.
+            types (tuple): The entity types to report.
+
+        Returns:
+            dict: {'cursor', 'events', 'more'} where cursor is the last examined version and more
+                is True when further events are already waiting, or None when the cursor is too
+                old, unknown or from an earlier process, and the client needs a snapshot.
+        """
+        latest = self.feed.version
+        if since is None or since < self.origin or since > latest:
+            return None
+        pending = self.feed.since(since)
+        if pending and pending[0].version > since + 1:
+            return None  # Events after the cursor already left the buffer
+        examined = pending[:self.max_events]
+        events = [event.to_dict() for event in examined if event.entity_type in types]
+        cursor = examined[-1].version if examined else since
+        return {'cursor': cursor, 'events': events, 'more': len(pending) > len(examined)}
+
+    def poll(self, since, types, wait=0.0):
+        """
+        Answer a poll or long-poll.
+
+        Args:
+            since (int): The client's cursor, or None.
+            types (tuple): The entity types to report.
+            wait (float): Seconds to wait for a matching event when there is none yet (capped by poll_timeout).
+
+        Returns:
+            dict: The result of changes() or snapshot(); on timeout the events are empty and the cursor
+                is where the client should resume.
+        """
+        deadline = time.monotonic() + min(max(wait, 0.0), self.poll_timeout)
+        while True:
+            result = self.changes(since, types)
+            if result is None:
+                return self.snapshot(types)
+            remaining = deadline - time.monotonic()
+            if result['events'] or result['more'] or remaining <= 0:
+                return result
+            since = result['cursor']  # Skip the events of other types while waiting
+            self.feed.wait_for(since + 1, remaining)
+
+    def stream(self, since, types):
+        """
+        Generate a server-sent events stream.
+
+        Emits 'snapshot' events (data: the snapshot() result) when the cursor
+        needs one and 'change' events (data: one event) otherwise; each carries
+        the cursor as its id so reconnecting clients resume via Last-Event-ID.
+        Keep-alive comments are sent while idle, and the stream ends after
+        stream_seconds.
+
+        Args:
+            since (int): The client's cursor, or None.
+            types (tuple): The entity types to report.
+
+        Yields:
+            str: SSE frames.
+        """
+        deadline = time.monotonic() + self.stream_seconds
+        yield 'retry: 1000\n\n'
+        while True:
+            result = self.changes(since, types)
+            if result is None:
+                result = self.snapshot(types)
+                yield self._frame('snapshot', result['cursor'], result)
+                since = result['cursor']
+                continue
+            for event in result['events']:
+                yield self._frame('change', event['version'], event)
+            since = result['cursor']
+            if result['more']:
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not self.feed.wait_for(since + 1, min(self.heartbeat, remaining)):
+                yield ': keep-alive\n\n'
+
+    @staticmethod
+    def _frame(event, cursor, data):
+        """Returns one SSE frame."""
+        return f'id: {cursor}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n'
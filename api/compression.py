@@ -0,0 +1,155 @@
+"""
+Response compression for the API.
+
+Responses are compressed with the best encoding the client accepts
+(brotli, zstd or gzip, whichever are installed) once they pass a size
+threshold. GET responses get a weak ETag derived from the persistence
+version and the request URL, and their compressed bytes are cached under
+that ETag and the full URL, so repeated reads of unchanged data skip
+compression entirely. The ETag only carries a CRC of the URL; the cache
+is keyed on the URL itself, so two URLs whose CRCs collide never share a
+cached body.
+
+Views whose body does not follow storage (live measurements, admin reports)
+send `Cache-Control: no-store`; they get no ETag and nothing of theirs is
+cached. A strong ETag set by a view names one representation, so when the
+response is compressed the encoding is appended to it ("<etag>-gzip").
+"""
+
+import gzip
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional
+    zstandard = None
+
+def _compressors():
+    """Return the available encodings, most preferred first."""
+    compressors = OrderedDict()
+    if brotli is not None:
+        compressors['br'] = lambda data: brotli.compress(data, quality=5)
+    if zstandard is not None:
+        compressors['zstd'] = zstandard.ZstdCompressor(level=3).compress
+    compressors['gzip'] = lambda data: gzip.compress(data, compresslevel=6)
+    return compressors
+
+class ResponseCompressor:
+    """
+    Flask after_request hook that negotiates and applies response compression.
+
+    Attributes:
+        min_size (int): Responses smaller than this many bytes are sent uncompressed.
+        max_cache_entries (int): Maximum number of compressed bodies kept.
+    """
+
+    def __init__(self, app=None, version_source=None, min_size=1024, max_cache_entries=256):
+        """
+        Initializes a new ResponseCompressor instance.
+
+        Args:
+            app (Flask, optional): The app to register with.
+            version_source (callable, optional): Returns the current persistence
+                version, or None when versions are unavailable. Without a version
+                no ETags are issued and nothing is cached.
+            min_size (int): Size threshold in bytes for compression.
+            max_cache_entries (int): Maximum number of compressed bodies kept.
+        """
+        self.version_source = version_source  # Set the persistence version callback
+        self.min_size = min_size  # Set the compression size threshold
+        self.max_cache_entries = max_cache_entries  # Set the cache bound
+        self.compressors = _compressors()  # Available encodings, most preferred first
+        self._cache = OrderedDict()  # (etag, full path, encoding) -> compressed bytes, least recently used first
+        self._lock = threading.Lock()  # Guards the cache across request threads
+        self._epoch = os.urandom(4).hex()  # Versions restart with the process, so ETags carry a per-process token
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the hook with a Flask app."""
+        app.after_request(self.process_response)
+
+    def etag_for(self, version):
+        """Returns the weak ETag for the current request URL at a persistence version."""
+        return f'{self._epoch}-{version}-{zlib.crc32(request.full_path.encode("utf-8")):08x}'
+
+    def _cached(self, key, data, compress):
+        """Returns the compressed bytes for key, compressing and caching data on a miss."""
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                return body
+        body = compress(data)
+        with self._lock:
+            self._cache[key] = body
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)  # Evict the least recently used body
+        return body
+
+    def etag_variants(self, etag):
+        """Returns a strong ETag and the per-encoding ETags it is sent as when compressed."""
+        return [etag] + [f'{etag}-{encoding}' for encoding in self.compressors]
+
+    def process_response(self, response):
+        """
+        Add an ETag to cacheable responses and compress them when worthwhile.
+
+        Args:
+            response (Response): The response produced by the view.
+
+        Returns:
+            Response: The (possibly 304 or compressed) response.
+        """
+        if response.direct_passthrough or response.status_code != 200 or response.mimetype != 'application/json':
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = None
+        if 'Content-Encoding' not in response.headers and (response.content_length or 0) >= self.min_size:
+            encoding = request.accept_encodings.best_match(list(self.compressors))
+        etag, weak = response.get_etag()  # Views may already have set a more specific ETag
+        if etag is not None and not weak and encoding is not None:
+            etag = f'{etag}-{encoding}'  # Strong: each encoding is a different representation
+            response.set_etag(etag)
+        if request.method != 'GET' or response.cache_control.no_store:
+            etag = None  # Never cache, or answer 304 for, a body that does not follow storage
+        elif etag is None and self.version_source is not None:
+            version = self.version_source()
+            if version is not None:
+                etag = self.etag_for(version)
+                response.set_etag(etag, weak=True)  # Weak: the same ETag covers every content encoding
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            response.status_code = 304
+            response.set_data(b'')
+            return response
+
+        if encoding is None:
+            return response
+        data = response.get_data()
+        compress = self.compressors[encoding]
+        body = self._cached((etag, request.full_path, encoding), data, compress) if etag else compress(data)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def clear(self, new_epoch=False):
+        """
+        Drop every cached compressed body.
+
+        Args:
+            new_epoch (bool): Also draw a new ETag token, for when storage changed without a new
+                version (a restored snapshot) and ETags already handed out must stop matching.
+        """
+        with self._lock:
+            self._cache.clear()
+            if new_epoch:
+                self._epoch = os.urandom(4).hex()
@@ -0,0 +1,204 @@
+"""
+Memory accounting for the API.
+
+MemoryAccountant reports how many entities of each type DataManager holds
+and their deep size in bytes, the deep size of every registered index and
+cache, and the growth of each figure since the previous report. Optionally
+it traces allocations with tracemalloc and lists the top allocating source
+lines and their growth.
+
+Objects are measured once per report: storage is walked first, then each
+component in registration order, so a component's size is what it holds on
+top of the entity dictionaries and the components before it.
+"""
+
+import sys
+import threading
+import time
+import tracemalloc
+from array import array
+from collections import deque
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from persistence.vacuum import is_deleted
+
+_SKIPPED = (type, ModuleType, FunctionType, MethodType, BuiltinFunctionType, threading.Thread)
+_CONTAINERS = (list, tuple, set, frozenset, deque)
+
+def deep_sizeof(obj, seen=None):
+    """
+    Return the size in bytes of an object and everything it references.
+
+    Containers, dictionaries and the attributes of plain instances are
+    followed; classes, modules, functions and threads are not. Objects
+    already in `seen` are not counted again.
+
+    Args:
+        obj (object): The object to measure.
+        seen (set, optional): IDs of objects already counted; updated in place.
+
+    Returns:
+        int: The size in bytes.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIPPED):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, _CONTAINERS):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, bytearray, array, int, float)):
+            continue
+        else:
+            attributes = getattr(current, '__dict__', None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(current), '__slots__', ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size
+
+class MemoryAccountant:
+    """
+    Reports entity, index and cache memory and its growth between reports.
+
+    Attributes:
+        data_manager (DataManager): The persistence manager whose storage is measured.
+        components (dict): Name -> object of the registered indexes and caches.
+        top (int): Number of tracemalloc allocators listed.
+    """
+
+    def __init__(self, data_manager, components=None, top=10):
+        """
+        Initializes a new MemoryAccountant instance.
+
+        Args:
+            data_manager (DataManager): The persistence manager whose storage is measured.
+            components (dict, optional): Name -> index or cache object to measure.
+            top (int): Number of tracemalloc allocators listed.
+        """
+        self.data_manager = data_manager  # Set the measured persistence manager
+        self.components = dict(components or {})  # Set the measured indexes and caches
+        self.top = top  # Set the number of allocators listed
+        self._previous = None  # The last report, for growth
+        self._previous_trace = None  # The last tracemalloc snapshot, for allocator growth
+        self._lock = threading.Lock()  # Serializes reports
+
+    def register(self, name, component):
+        """Add an index or cache to the report."""
+        self.components[name] = component
+
+    def _entities(self, seen):
+        """Returns {type: {'count', 'tombstones', 'bytes'}} for the storage (called with seen shared)."""
+        storage = self.data_manager.storage
+        if not isinstance(storage, dict):
+            # A view over rows held outside this process's heap (partitions, the shared read index)
+            entities = {}
+            for entity_type in storage.keys():
+                items = storage.get(entity_type, None) or []
+                entities[entity_type] = {'count': len(items), 'tombstones': sum(1 for item in items if is_deleted(item)),
+                                         'bytes': 0, 'decoded': False}
+            return entities
+        is_loaded = getattr(storage, 'is_loaded', None)
+        entities = {}
+        for entity_type in list(dict.keys(storage)) + sorted(getattr(storage, '_pending', ())):
+            if is_loaded is not None and not is_loaded(entity_type):
+                # Still in the mapped snapshot; nothing is decoded into memory yet
+                entities[entity_type] = {'count': storage.reader.count(entity_type), 'tombstones': 0,
+                                         'bytes': 0, 'decoded': False}
+                continue
+            items = dict.get(storage, entity_type) or []
+            entities[entity_type] = {'count': len(items), 'tombstones': sum(1 for item in items if is_deleted(item)),
+                                     'bytes': deep_sizeof(items, seen)}
+        return entities
+
+    @staticmethod
+    def _growth(current, previous, keys):
+        """Returns the change of the given numeric keys for every name present now or before."""
+        growth = {}
+        for name in set(current) | set(previous):
+            now, before = current.get(name, {}), previous.get(name, {})
+            change = {key: now.get(key, 0) - before.get(key, 0) for key in keys if key in now or key in before}
+            if any(change.values()):
+                growth[name] = change
+        return growth
+
+    def report(self, trace=False):
+        """
+        Measure storage and components.
+
+        Args:
+            trace (bool): If True, start tracemalloc if needed and list the top
+                allocating lines and their growth since the last traced report.
+
+        Returns:
+            dict: {'taken_at', 'seconds_since_last', 'entities': {type: {'count', 'tombstones', 'bytes'}},
+                'components': {name: {'bytes', 'entries'}}, 'total_bytes', 'growth': {'entities', 'components',
+                'total_bytes'}, and with trace 'tracemalloc': {'current_bytes', 'peak_bytes', 'top', 'growth'}}.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            traced = self._trace() if trace else None  # Snapshot before the walk allocates its bookkeeping
+            seen = set()
+            entities = self._entities(seen)
+            components = {}
+            for name, component in self.components.items():
+                components[name] = {'bytes': deep_sizeof(component, seen)}
+                try:
+                    components[name]['entries'] = len(component)
+                except TypeError:
+                    pass  # Not sized; only bytes are reported
+            total = sum(entry['bytes'] for entry in entities.values()) + sum(entry['bytes'] for entry in components.values())
+            report = {'taken_at': time.time(), 'entities': entities, 'components': components, 'total_bytes': total}
+            previous = self._previous
+            if previous is not None:
+                report['seconds_since_last'] = round(report['taken_at'] - previous['taken_at'], 3)
+                report['growth'] = {
+                    'entities': self._growth(entities, previous['entities'], ('count', 'tombstones', 'bytes')),
+                    'components': self._growth(components, previous['components'], ('bytes', 'entries')),
+                    'total_bytes': total - previous['total_bytes'],
+                }
+            if traced is not None:
+                report['tracemalloc'] = traced
+            report['measure_seconds'] = round(time.perf_counter() - started, 4)
+            self._previous = report
+            return report
+
+    def _trace(self):
+        """Returns the tracemalloc section of a report, starting tracing on first use."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._previous_trace = None
+            return {'started': True, 'top': [], 'growth': []}
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        section = {
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top': [{'location': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count}
+                    for stat in snapshot.statistics('lineno')[:self.top]],
+            'growth': [],
+        }
+        if self._previous_trace is not None:
+            section['growth'] = [{'location': str(stat.traceback), 'bytes': stat.size_diff, 'blocks': stat.count_diff}
+                                 for stat in snapshot.compare_to(self._previous_trace, 'lineno')[:self.top]
+                                 if stat.size_diff]
+        self._previous_trace = snapshot
+        return section
+
+    def stop_tracing(self):
+        """Stop tracemalloc and forget its last snapshot."""
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._previous_trace = None
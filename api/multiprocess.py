@@ -0,0 +1,491 @@
+"""
+Multi-process serving mode, the production entry point of the API.
+
+The parent process is the single writer: it owns the DataManager created by
+`api.app`, publishes its storage as a shared-memory read index and applies
+writes forwarded by the workers. Each forked worker serves the Flask app on
+the shared listening socket with a bounded pool of threads and HTTP/1.1
+keep-alive, reading from the shared index.
+
+The writer also sends the change events of every write to each worker, which
+replays them into its own copy of the change feed. The indexes and caches
+that follow the feed (availability, prices, similarity, stats, history,
+encodings, /changes) therefore stay current in every worker. Before a worker
+handles a request it waits until its feed has caught up with the version
+published with the read index, so reads see every write already acknowledged
+to any client. Bookings are checked against the writer's availability index
+when they are stored, so two workers cannot accept overlapping stays.
+
+Those derived indexes are per worker: each is built before the fork and
+shared copy-on-write, but the events a worker replays land in its own copy,
+so the memory they gain after startup grows with the number of workers, and
+/admin/memory in a worker reports that worker's copies. Entity storage is not
+duplicated: a worker reads it from the shared index and keeps the decoded
+lists of only HBNB_INDEX_CACHE_TYPES (default 4) recently listed types.
+
+Storage, indexes and caches are loaded in the parent before forking and the
+garbage collector's objects are frozen, so workers share those pages
+copy-on-write instead of each loading its own copy.
+
+Signals sent to the parent:
+    SIGTERM, SIGINT: graceful shutdown. Workers stop accepting connections and
+        finish in-flight requests, then the writer applies every queued write
+        before the process exits.
+    SIGHUP: graceful reload. A new generation of workers is forked, then the
+        old workers are shut down gracefully. Code changes need a restart.
+
+Run with: python -m api.multiprocess --workers 4 --threads 8
+"""
+
+import gc
+import importlib
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from persistence.shared_index import SharedIndexDataManager, SharedIndexPublisher
+
+def available_cpus():
+    """Returns the CPUs this process may run on (respecting affinity and container limits where visible)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+def tune_workers(cpus=None, workers=None, threads=None):
+    """
+    Derive worker and thread counts from the CPU count.
+
+    The GIL keeps a worker on one core at a time, so there is one worker per
+    CPU. Requests mostly wait on the writer or the network rather than the
+    CPU, so each worker gets a few threads to overlap those waits. Explicit
+    values, then HBNB_WORKERS and HBNB_THREADS, take precedence.
+
+    Args:
+        cpus (int, optional): The CPU count; defaults to available_cpus().
+        workers (int, optional): Explicit number of worker processes.
+        threads (int, optional): Explicit number of threads per worker.
+
+    Returns:
+        tuple: (workers, threads).
+    """
+    cpus = cpus or available_cpus()
+    workers = workers or int(os.environ.get('HBNB_WORKERS') or 0) or cpus
+    threads = threads or int(os.environ.get('HBNB_THREADS') or 0) or 4
+    return workers, threads
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """
+    Request handler that keeps HTTP/1.1 connections open between requests.
+
+    werkzeug's handler always answers 'Connection: close', because it drains
+    whatever the application left unread after each response, which would
+    swallow the next request on a reused connection. This handler reads
+    bodies of up to max_body bytes before the application runs and hides the
+    connection from that drain, so the next request stays on the stream.
+    Chunked and larger bodies still close the connection.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    max_body = 1 << 20  # Largest body read up front to keep the connection reusable
+
+    def run_wsgi(self):
+        """Serves one request, then restores the connection stream for the next one."""
+        self.reusable = False
+        self._stream = None
+        try:
+            super().run_wsgi()
+        finally:
+            if self._stream is not None:
+                self.rfile = self._stream
+
+    def make_environ(self):
+        """Builds the WSGI environ, buffering the request body when the connection can be reused."""
+        environ = super().make_environ()
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = -1
+        self.reusable = (not self.close_connection and 0 <= length <= self.max_body
+                         and 'chunked' not in environ.get('HTTP_TRANSFER_ENCODING', ''))
+        if self.reusable:
+            environ['wsgi.input'] = io.BytesIO(self.rfile.read(length) if length else b'')  # Drain the body now
+            self._stream, self.rfile = self.rfile, io.BytesIO()  # Keep the next request out of werkzeug's drain
+        return environ
+
+    def send_header(self, keyword, value):
+        """Drops werkzeug's 'Connection: close' when the connection can be reused."""
+        if keyword.lower() == 'connection' and value.lower() == 'close' and self.reusable:
+            return
+        super().send_header(keyword, value)
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    WSGI server that handles connections on a bounded thread pool with HTTP/1.1 keep-alive.
+
+    Unlike werkzeug's threaded development server, which starts a thread per
+    connection, at most `threads` connections are served at once; further
+    connections wait in the listen backlog.
+    """
+
+    def __init__(self, host, port, app, threads=4, keep_alive=5.0, fd=None):
+        """
+        Initializes a new PooledWSGIServer instance.
+
+        Args:
+            host (str): The interface to listen on.
+            port (int): The port to listen on.
+            app (callable): The WSGI application.
+            threads (int): Connections served at once.
+            keep_alive (float): Seconds an idle keep-alive connection is held open.
+            fd (int, optional): An already bound listening socket to serve on.
+        """
+        handler = type('KeepAliveRequestHandler', (KeepAliveRequestHandler,), {
+            'timeout': keep_alive,  # Close idle connections so they do not hold a pool thread
+        })
+        self._pool = None  # Created below; the base class closes its own socket while initializing
+        super().__init__(host, port, app, handler=handler, fd=fd)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')  # Serves connections
+
+    def process_request(self, request, client_address):
+        """Hand a connection to the thread pool."""
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        """Serve a connection on a pool thread, like socketserver.ThreadingMixIn."""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        """Wait for the connections in flight, then close the listening socket."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        super().server_close()
+
+def _writer_loop(data_manager, publisher, requests, replies, feeds=None, fork_lock=None, max_batch=64):
+    """
+    Apply writes forwarded by workers, republishing the read index after each batch.
+
+    Writes already queued when the writer wakes up are applied together and
+    published once, and only the entity types they changed are re-encoded,
+    so a burst of writes costs one publish instead of one per write. Their
+    change events are then sent to every worker in `feeds` (worker id ->
+    pipe). The batch runs under `fork_lock` so no worker is forked while the
+    writer holds locks or has sent only part of a batch.
+    """
+    feed = getattr(data_manager, 'change_feed', None)
+    stopping = False
+    while not stopping:
+        batch = [requests.get()]
+        while len(batch) < max_batch and batch[-1] is not None:
+            try:
+                batch.append(requests.get_nowait())
+            except queue.Empty:
+                break
+        if batch[-1] is None:
+            stopping = True
+            batch.pop()
+        if not batch:
+            continue
+        with fork_lock if fork_lock is not None else nullcontext():
+            start = feed.version if feed is not None else None
+            results = []
+            for worker_id, op, args in batch:
+                try:
+                    getattr(data_manager, op)(*args)
+                    results.append((worker_id, True))
+                except Exception as e:
+                    results.append((worker_id, e))
+            events = feed.since(start) if feed is not None else None
+            changed = {event.entity_type for event in events} if events is not None else None
+            if events and events[0].version > start + 1:
+                changed = None  # Events left the feed buffer; publish every type
+            version = getattr(data_manager, 'version', None)
+            if changed is None or changed:
+                # Publish before replying so workers read their own writes
+                publisher.publish(data_manager.storage, changed, version or 0)
+            if events and feeds:
+                for conn in list(feeds.values()):
+                    try:
+                        conn.send(events)
+                    except OSError:
+                        pass  # The worker is gone; the supervisor replaces it
+        for worker_id, outcome in results:
+            reply = replies.get(worker_id)
+            if reply is not None:
+                reply.send((True, version) if outcome is True else (False, outcome))
+
+def _follow_feed(conn, feed):
+    """Replay the writer's change events into a worker's change feed until the writer goes away."""
+    while True:
+        try:
+            events = conn.recv()
+        except (EOFError, OSError):
+            return
+        for event in events:
+            feed.replay(event)
+
+def _worker_main(worker_id, fd, host, port, prefix, requests, reply_conn, feed_conn, threads, keep_alive,
+                 catch_up_timeout=5.0):
+    """
+    Serve the Flask app in a worker process against the shared read index.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent coordinates shutdown on Ctrl-C
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)  # Nothing is in flight until the server starts
+    app_module = importlib.import_module('api.app')  # The module, not the Flask app re-exported by api/__init__
+    feed = app_module.change_feed  # The parent's feed as of the fork; the writer's events continue it
+    feed.log_file = None  # The writer's feed logs every event; mirrored events must not be logged again
+
+    lock = threading.Lock()
+
+    def submit(op, *args):
+        with lock:
+            requests.put((worker_id, op, args))
+            ok, value = reply_conn.recv()
+        if not ok:
+            raise value
+        if value is not None:
+            feed.wait_for(value, catch_up_timeout)  # Let the indexes see this write before the response
+        return value
+
+    app_module.data_manager = SharedIndexDataManager(submit, prefix=prefix,  # Routes read the module global
+                                                     cache_types=int(os.environ.get('HBNB_INDEX_CACHE_TYPES', 4)))
+    # Measure the shared index rather than the storage of the DataManager inherited from the parent, which
+    # the worker no longer touches (dropping it would write to its copy-on-write pages)
+    app_module.memory.data_manager = app_module.data_manager
+    app_module.memory.components.pop('position_index', None)
+    app_module.memory.register('shared_index_decoded', app_module.data_manager.reader.decoded)
+    threading.Thread(target=_follow_feed, args=(feed_conn, feed), daemon=True).start()
+
+    def catch_up():
+        # Writes acknowledged by other workers are published before they reply; wait for their events too
+        feed.wait_for(app_module.data_manager.reader.published_version(), catch_up_timeout)
+
+    app_module.app.before_request(catch_up)
+    server = PooledWSGIServer(host, port, app_module.app, threads=threads, keep_alive=keep_alive, fd=fd)
+
+    def shut_down(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it cannot run on the serving thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shut_down)
+    logging.info(f"Worker {worker_id} (pid {os.getpid()}) serving on {host}:{port} with {threads} threads")
+    server.serve_forever()
+    server.server_close()  # Finish the requests in flight before exiting
+
+class Supervisor:
+    """
+    Forks, replaces and stops the worker processes of the parent.
+
+    Attributes:
+        workers (int): Number of worker processes.
+        threads (int): Threads per worker.
+        keep_alive (float): Seconds an idle keep-alive connection is held open.
+        graceful_timeout (float): Seconds a stopping worker may take before it is killed.
+        boot_timeout (float): A worker exiting sooner than this after being forked stops the server.
+    """
+
+    def __init__(self, sock, host, port, prefix, requests, workers, threads, keep_alive, graceful_timeout):
+        """
+        Initializes a new Supervisor instance.
+
+        Args:
+            sock (socket): The bound listening socket shared with the workers.
+            host (str): The interface listened on.
+            port (int): The port listened on.
+            prefix (str): Shared memory name prefix of the read index.
+            requests (Queue): Queue the workers forward writes to.
+            workers (int): Number of worker processes.
+            threads (int): Threads per worker.
+            keep_alive (float): Seconds an idle keep-alive connection is held open.
+            graceful_timeout (float): Seconds a stopping worker may take before it is killed.
+        """
+        self.sock = sock  # Set the listening socket
+        self.host = host  # Set the interface
+        self.port = port  # Set the port
+        self.prefix = prefix  # Set the read index prefix
+        self.requests = requests  # Set the write queue
+        self.workers = workers  # Set the worker count
+        self.threads = threads  # Set the threads per worker
+        self.keep_alive = keep_alive  # Set the keep-alive timeout
+        self.graceful_timeout = graceful_timeout  # Set the worker stop timeout
+        self.replies = {}  # Worker id -> reply pipe, read by the writer thread
+        self.feeds = {}  # Worker id -> pipe the writer thread sends change events to
+        self.fork_lock = threading.Lock()  # Held by the writer per batch, so forks see no half-sent batch
+        self.processes = {}  # Worker id -> process of the current generation
+        self._context = multiprocessing.get_context('fork')  # Workers inherit the socket and loaded modules
+        self._next_id = 0  # Next worker id; ids are never reused
+        self._started = {}  # Worker id -> monotonic time it was forked
+        self.boot_timeout = 5.0  # Workers exiting sooner than this after forking failed to boot
+
+    def spawn(self):
+        """Fork one worker."""
+        worker_id, self._next_id = self._next_id, self._next_id + 1
+        reply_recv, reply_send = self._context.Pipe(duplex=False)
+        feed_recv, feed_send = self._context.Pipe(duplex=False)
+        self.replies[worker_id] = reply_send
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, self.sock.fileno(), self.host, self.port, self.prefix, self.requests, reply_recv,
+                  feed_recv, self.threads, self.keep_alive),
+            daemon=True,
+        )
+        with self.fork_lock:
+            # Registered before the fork: the worker's feed holds every event up to here, the pipe the rest
+            self.feeds[worker_id] = feed_send
+            process.start()
+        feed_recv.close()  # Only the worker reads it, so sends fail once the worker is gone
+        self.processes[worker_id] = process
+        self._started[worker_id] = time.monotonic()
+
+    def spawn_all(self):
+        """Fork a full generation of workers."""
+        for _ in range(self.workers):
+            self.spawn()
+
+    def stop(self, worker_ids):
+        """Ask workers to finish their requests and exit, killing those that exceed the graceful timeout."""
+        processes = [(worker_id, self.processes.pop(worker_id)) for worker_id in worker_ids]
+        for _, process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        for worker_id, process in processes:
+            process.join(self.graceful_timeout)
+            self._started.pop(worker_id, None)
+            if process.is_alive():
+                logging.warning(f"Worker {worker_id} did not stop in {self.graceful_timeout}s; killing it")
+                process.kill()
+                process.join()
+            self.replies.pop(worker_id, None)
+            self._close_feed(worker_id)
+
+    def _close_feed(self, worker_id):
+        """Stop sending change events to a worker."""
+        conn = self.feeds.pop(worker_id, None)
+        if conn is not None:
+            with self.fork_lock:  # Not while the writer is sending to it
+                conn.close()
+
+    def reload(self):
+        """Replace every worker: fork a new generation, then stop the old one gracefully."""
+        old = list(self.processes)
+        self.spawn_all()
+        self.stop(old)
+
+    def respawn_dead(self):
+        """
+        Replace workers that exited unexpectedly.
+
+        Raises:
+            RuntimeError: If a worker exited within boot_timeout of being forked, since its
+                replacement would most likely fail the same way.
+        """
+        for worker_id, process in list(self.processes.items()):
+            if not process.is_alive():
+                if time.monotonic() - self._started[worker_id] < self.boot_timeout:
+                    raise RuntimeError(f"Worker {worker_id} failed to boot (exit code {process.exitcode})")
+                logging.warning(f"Worker {worker_id} exited with code {process.exitcode}; replacing it")
+                self.processes.pop(worker_id)
+                self.replies.pop(worker_id, None)
+                self._close_feed(worker_id)
+                self._started.pop(worker_id, None)
+                self.spawn()
+
+def serve(host='127.0.0.1', port=5000, workers=None, threads=None, prefix=None, keep_alive=5.0,
+          graceful_timeout=30.0, backlog=2048):
+    """
+    Serve the API with one writer process and several reader worker processes.
+
+    Args:
+        host (str): The interface to listen on.
+        port (int): The port to listen on.
+        workers (int, optional): Number of worker processes; see tune_workers().
+        threads (int, optional): Threads per worker; see tune_workers().
+        prefix (str, optional): Shared memory name prefix; defaults to one derived from the pid.
+        keep_alive (float): Seconds an idle keep-alive connection is held open.
+        graceful_timeout (float): Seconds a stopping worker may take to finish its requests.
+        backlog (int): Listen backlog of the shared socket.
+    """
+    app_module = importlib.import_module('api.app')  # Preload storage, indexes and caches before forking
+
+    workers, threads = tune_workers(workers=workers, threads=threads)
+    prefix = prefix or f'hbnb-index-{os.getpid()}'
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+
+    publisher = SharedIndexPublisher(prefix)
+    publisher.publish(app_module.data_manager.storage, version=app_module.change_feed.version)  # Before any worker starts
+    supervisor = Supervisor(sock, host, port, prefix, multiprocessing.get_context('fork').Queue(),
+                            workers, threads, keep_alive, graceful_timeout)
+
+    gc.collect()
+    gc.freeze()  # Keep the collector from touching, and so copying, the preloaded objects in every worker
+    supervisor.spawn_all()
+
+    writer = threading.Thread(target=_writer_loop, args=(app_module.data_manager, publisher, supervisor.requests,
+                                                         supervisor.replies, supervisor.feeds, supervisor.fork_lock))
+    writer.start()
+    app_module.vacuum.start()  # Tombstones are compacted by the writer process only
+
+    signals = []  # Signals received, handled by the loop below
+    wake = threading.Event()
+
+    def on_signal(signum, frame):
+        signals.append(signum)
+        wake.set()
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, on_signal)
+    logging.info(f"Serving on {host}:{port} with {workers} workers x {threads} threads (pid {os.getpid()})")
+    try:
+        while True:
+            wake.wait(1.0)
+            wake.clear()
+            if signal.SIGTERM in signals or signal.SIGINT in signals:
+                break
+            if signal.SIGHUP in signals:
+                signals.clear()
+                logging.info("Reloading workers")
+                supervisor.reload()
+            supervisor.respawn_dead()
+    finally:
+        logging.info("Shutting down: waiting for workers to finish their requests")
+        supervisor.stop(list(supervisor.processes))
+        supervisor.requests.put(None)  # Queued after every pending write, so the writer applies them all first
+        writer.join()
+        app_module.vacuum.stop()
+        publisher.close()
+        sock.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve the API with a shared-memory read index.')
+    parser.add_argument('--host', default=os.environ.get('HBNB_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('HBNB_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--threads', type=int, default=None, help='threads per worker (default: 4)')
+    parser.add_argument('--keep-alive', type=float, default=float(os.environ.get('HBNB_KEEP_ALIVE', 5)),
+                        help='seconds an idle connection is kept open')
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.environ.get('HBNB_GRACEFUL_TIMEOUT', 30)),
+                        help='seconds workers get to finish their requests on reload and shutdown')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve(host=args.host, port=args.port, workers=args.workers, threads=args.threads, keep_alive=args.keep_alive,
+          graceful_timeout=args.graceful_timeout)
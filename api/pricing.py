@@ -0,0 +1,338 @@
+"""
+Batch price quotes for the API.
+
+QuoteEngine keeps the price and capacity of every place in a columnar
+cache that is updated incrementally from the change feed, and compiles the
+PricingRule entities from storage into lookup tables. A quote for any
+number of places is then a handful of vectorized operations over the
+columns: NumPy when it is installed, a plain loop over arrays otherwise.
+"""
+
+import bisect
+import calendar
+import threading
+from array import array
+from datetime import date
+from itertools import accumulate
+from persistence.availability import MAX_NIGHTS, to_date
+from persistence.vacuum import is_deleted
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; quotes fall back to a Python loop
+    np = None
+
+def _month_day(value):
+    """Parse a MM-DD string into a (month, day) tuple."""
+    month, day = (int(part) for part in str(value).split('-'))
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        raise ValueError(f"Invalid MM-DD date {value!r}.")
+    return month, day
+
+_LEAP_DAYS = [(day.month, day.day) for day in (date.fromordinal(date(2000, 1, 1).toordinal() + offset)
+                                               for offset in range(366))]  # Every month-day, Feb 29 included
+_DAY_INDEX = {month_day: index for index, month_day in enumerate(_LEAP_DAYS)}
+_FEB_29 = _DAY_INDEX[(2, 29)]
+
+def validate_rule(rule):
+    """
+    Check a pricing rule dictionary.
+
+    Raises:
+        ValueError: If the kind is unknown or a field the kind needs is missing or invalid.
+    """
+    kind = rule.get('kind')
+    multiplier = rule.get('multiplier')
+    if not isinstance(multiplier, (int, float)) or isinstance(multiplier, bool) or multiplier < 0:
+        raise ValueError("multiplier must be a non-negative number.")
+    if kind == 'season':
+        _month_day(rule.get('start'))
+        _month_day(rule.get('end'))
+    elif kind == 'length_of_stay':
+        if not isinstance(rule.get('min_nights'), int) or rule['min_nights'] < 1:
+            raise ValueError("min_nights must be a positive integer.")
+    elif kind == 'occupancy':
+        if not isinstance(rule.get('min_occupancy'), (int, float)) or not 0 <= rule['min_occupancy'] <= 1:
+            raise ValueError("min_occupancy must be between 0 and 1.")
+    else:
+        raise ValueError(f"Unknown pricing rule kind {kind!r}.")
+
+class PricingRules:
+    """
+    Compiled pricing rule tables.
+
+    Attributes:
+        seasons (list): (start, end, multiplier) with (month, day) bounds.
+        lengths (list): (min_nights, multiplier) sorted by min_nights.
+        occupancy_thresholds (list): Sorted minimum occupancy shares.
+        occupancy_multipliers (list): Multiplier of each occupancy threshold.
+    """
+
+    def __init__(self, rules=()):
+        """
+        Compile rule dictionaries; invalid rules are skipped.
+
+        Args:
+            rules (iterable): PricingRule dictionaries.
+        """
+        self.seasons = []
+        self.lengths = []
+        occupancy = []
+        for rule in rules:
+            try:
+                validate_rule(rule)
+            except (ValueError, TypeError):
+                continue
+            if rule['kind'] == 'season':
+                self.seasons.append((_month_day(rule['start']), _month_day(rule['end']), float(rule['multiplier'])))
+            elif rule['kind'] == 'length_of_stay':
+                self.lengths.append((rule['min_nights'], float(rule['multiplier'])))
+            else:
+                occupancy.append((float(rule['min_occupancy']), float(rule['multiplier'])))
+        self.lengths.sort()
+        occupancy.sort()
+        self.occupancy_thresholds = [threshold for threshold, _ in occupancy]
+        self.occupancy_multipliers = [multiplier for _, multiplier in occupancy]
+        self._day_factors = [self._factor(month_day) for month_day in _LEAP_DAYS]  # Multiplier of each month-day
+        self._prefix = [0.0] + list(accumulate(self._day_factors))  # Sums of the multipliers before each month-day
+
+    def _factor(self, month_day):
+        """Returns the product of the multipliers of the seasons containing a (month, day)."""
+        factor = 1.0
+        for start, end, multiplier in self.seasons:
+            inside = start <= month_day <= end if start <= end else (month_day >= start or month_day <= end)
+            if inside:
+                factor *= multiplier
+        return factor
+
+    def night_factor(self, check_in, nights):
+        """
+        Returns the sum over the nights of the stay of their seasonal multipliers.
+
+        The sum is taken from prefix sums over the calendar, one range per
+        calendar year the stay touches, so its cost does not grow with the
+        number of nights.
+        """
+        total = 0.0
+        day, remaining = check_in, nights
+        while remaining > 0:
+            year_end = date(day.year + 1, 1, 1) if day.year < date.max.year else date.max
+            count = min(remaining, (year_end - day).days)
+            first = _DAY_INDEX[(day.month, day.day)]
+            last = first + count
+            if not calendar.isleap(day.year) and first <= _FEB_29 < last:
+                last += 1  # Step over Feb 29, which this year does not have
+                total -= self._day_factors[_FEB_29]
+            total += self._prefix[last] - self._prefix[first]
+            remaining -= count
+            day = year_end
+        return total
+
+    def length_factor(self, nights):
+        """Returns the multiplier of the longest length_of_stay threshold the stay meets."""
+        factor = 1.0
+        for min_nights, multiplier in self.lengths:
+            if nights >= min_nights:
+                factor = multiplier
+        return factor
+
+class PriceColumns:
+    """
+    Columnar cache of place prices and capacities.
+
+    Rows are kept dense: removing a place moves the last row into its slot,
+    so the columns can be handed to vectorized code without gaps.
+    """
+
+    def __init__(self):
+        self.ids = []  # Place id of each row
+        self._rows = {}  # Place id -> row
+        self._prices = self._column(0)  # price_per_night of each row
+        self._capacities = self._column(0)  # max_guests of each row
+
+    @staticmethod
+    def _column(size):
+        """Returns a zeroed float column with room for size rows."""
+        return np.zeros(size) if np is not None else array('d', bytes(8 * size))
+
+    def _grow(self):
+        """Doubles the column capacity when every row is in use."""
+        if len(self.ids) < len(self._prices):
+            return
+        size = max(2 * len(self._prices), 64)
+        for name in ('_prices', '_capacities'):
+            column = self._column(size)
+            column[:len(self.ids)] = getattr(self, name)[:len(self.ids)]
+            setattr(self, name, column)
+
+    def upsert(self, place):
+        """Adds or updates the row of a place dictionary."""
+        row = self._rows.get(place['id'])
+        if row is None:
+            self._grow()
+            row = self._rows[place['id']] = len(self.ids)
+            self.ids.append(place['id'])
+        self._prices[row] = float(place.get('price_per_night') or 0)
+        self._capacities[row] = float(place.get('max_guests') or 0)
+
+    def remove(self, place_id):
+        """Removes the row of a place, if present."""
+        row = self._rows.pop(place_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            self.ids[row] = self.ids[last]  # Move the last row into the gap
+            self._rows[self.ids[row]] = row
+            self._prices[row] = self._prices[last]
+            self._capacities[row] = self._capacities[last]
+        self.ids.pop()
+
+    def row(self, place_id):
+        """Returns the row of a place, or None."""
+        return self._rows.get(place_id)
+
+    def columns(self):
+        """Returns the (prices, capacities) columns trimmed to the rows in use."""
+        count = len(self.ids)
+        return self._prices[:count], self._capacities[:count]
+
+    def __len__(self):
+        return len(self.ids)
+
+class QuoteEngine:
+    """
+    Quotes stays for many places at once.
+
+    The total of a stay at a place is price_per_night times the sum of the
+    seasonal multipliers of its nights, times the length-of-stay multiplier,
+    times the occupancy multiplier for the guests' share of max_guests.
+    Places whose max_guests is below the guest count are not quoted.
+
+    Subscribe `on_change` to the DataManager's change feed to keep the
+    columns and rule tables current.
+
+    Attributes:
+        max_nights (int): Longest stay quoted.
+    """
+
+    def __init__(self, max_nights=MAX_NIGHTS):
+        self.max_nights = max_nights  # Set the longest quoted stay
+        self.columns = PriceColumns()  # Columnar cache of prices and capacities
+        self._rule_entities = {}  # PricingRule id -> rule dictionary
+        self._rules = PricingRules()  # Compiled rule tables
+        self._lock = threading.Lock()  # Guards the columns and rules against concurrent quotes
+
+    def build(self, storage):
+        """
+        Load places and pricing rules from a storage dictionary.
+
+        Args:
+            storage (dict): Mapping of entity type name to a list of entity dictionaries.
+        """
+        with self._lock:
+            self.columns = PriceColumns()
+            for place in storage.get('Place', None) or []:
+                if not is_deleted(place):
+                    self.columns.upsert(place)
+            self._rule_entities = {rule['id']: rule for rule in storage.get('PricingRule', None) or [] if not is_deleted(rule)}
+            self._rules = PricingRules(self._rule_entities.values())
+
+    def on_change(self, event):
+        """Change feed subscriber that updates the columns and rule tables."""
+        if event.entity_type == 'Place':
+            with self._lock:
+                if event.op == 'delete':
+                    self.columns.remove(event.entity_id)
+                else:
+                    self.columns.upsert(event.data)
+        elif event.entity_type == 'PricingRule':
+            with self._lock:
+                if event.op == 'delete':
+                    self._rule_entities.pop(event.entity_id, None)
+                else:
+                    self._rule_entities[event.entity_id] = event.data
+                self._rules = PricingRules(self._rule_entities.values())
+
+    def quote(self, check_in, check_out, guests=1, place_ids=None):
+        """
+        Quote a stay at many places.
+
+        Args:
+            check_in (date or str): The first night.
+            check_out (date or str): The departure day.
+            guests (int): The number of guests.
+            place_ids (list, optional): The places to quote; defaults to every place.
+
+        Returns:
+            dict: {'nights', 'quotes': [{'place_id', 'total'}], 'unavailable': [place ids]},
+                where unavailable lists places that are unknown or too small for the guests.
+
+        Raises:
+            ValueError: If the dates or the guest count are invalid, or the stay is longer than max_nights.
+        """
+        check_in, check_out = to_date(check_in), to_date(check_out)
+        nights = (check_out - check_in).days
+        if nights <= 0:
+            raise ValueError("check_out must be after check_in.")
+        if nights > self.max_nights:
+            raise ValueError(f"Stays cannot be longer than {self.max_nights} nights.")
+        if not isinstance(guests, int) or guests < 1:
+            raise ValueError("guests must be a positive integer.")
+        with self._lock:
+            rules = self._rules
+            stay_factor = rules.night_factor(check_in, nights) * rules.length_factor(nights)
+            prices, capacities = self.columns.columns()
+            ids = self.columns.ids
+            unavailable = []
+            if place_ids is not None:
+                rows = []
+                for place_id in place_ids:
+                    row = self.columns.row(place_id)
+                    if row is None:
+                        unavailable.append(place_id)
+                    else:
+                        rows.append(row)
+            else:
+                rows = None
+            if np is not None:
+                totals, fits, quoted_ids = self._quote_numpy(rules, stay_factor, guests, prices, capacities, ids, rows)
+            else:
+                totals, fits, quoted_ids = self._quote_python(rules, stay_factor, guests, prices, capacities, ids, rows)
+        quotes = [{'place_id': place_id, 'total': total} for place_id, total, fit in zip(quoted_ids, totals, fits) if fit]
+        unavailable.extend(place_id for place_id, fit in zip(quoted_ids, fits) if not fit)
+        return {'nights': nights, 'quotes': quotes, 'unavailable': unavailable}
+
+    @staticmethod
+    def _quote_numpy(rules, stay_factor, guests, prices, capacities, ids, rows):
+        """Vectorized quote over the columns with NumPy."""
+        if rows is not None:
+            index = np.asarray(rows, dtype=np.intp)
+            prices, capacities, ids = prices[index], capacities[index], [ids[row] for row in rows]
+        fits = capacities >= guests
+        occupancy = np.divide(guests, capacities, out=np.full(len(capacities), np.inf), where=capacities > 0)
+        factors = np.ones(len(capacities))
+        if rules.occupancy_thresholds:
+            position = np.searchsorted(np.asarray(rules.occupancy_thresholds), occupancy, side='right') - 1
+            table = np.asarray(rules.occupancy_multipliers)
+            factors = np.where(position >= 0, table[np.maximum(position, 0)], 1.0)
+        totals = np.round(prices * stay_factor * factors, 2)
+        return totals.tolist(), fits.tolist(), list(ids)
+
+    @staticmethod
+    def _quote_python(rules, stay_factor, guests, prices, capacities, ids, rows):
+        """Quote over the columns with a plain loop when NumPy is not installed."""
+        rows = range(len(ids)) if rows is None else rows
+        thresholds, multipliers = rules.occupancy_thresholds, rules.occupancy_multipliers
+        totals, fits, quoted_ids = [], [], []
+        for row in rows:
+            capacity = capacities[row]
+            factor = 1.0
+            if thresholds and capacity > 0:
+                position = bisect.bisect_right(thresholds, guests / capacity) - 1
+                if position >= 0:
+                    factor = multipliers[position]
+            totals.append(round(prices[row] * stay_factor * factor, 2))
+            fits.append(capacity >= guests)
+            quoted_ids.append(ids[row])
+        return totals, fits, quoted_ids
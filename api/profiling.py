@@ -0,0 +1,276 @@
+"""
+Opt-in sampling profiler for the API.
+
+A configurable fraction of requests is profiled, either by a background
+thread that samples their Python stacks at a fixed interval ('stack' mode)
+or under cProfile ('cprofile' mode). Samples are tagged with the route and
+with the persistence operation (the outermost DataManager call, or any other
+persistence method) that was running, and aggregated into collapsed stacks
+that flamegraph tools (flamegraph.pl, speedscope, inferno) read directly.
+
+A disabled profiler registers no hooks and starts no thread, so requests
+pay nothing for it.
+"""
+
+import cProfile
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import g, jsonify, request
+
+import persistence
+
+PERSISTENCE_DIR = os.path.dirname(os.path.abspath(persistence.__file__)) + os.sep
+
+def _frame_name(filename, name):
+    """Returns the 'module:function' name of a frame or profiler entry."""
+    module = os.path.splitext(os.path.basename(filename))[0] if filename not in ('~', '') else 'builtins'
+    return f'{module}:{name}'
+
+def _is_persistence(filename):
+    """Returns True for code from the persistence package."""
+    return filename.startswith(PERSISTENCE_DIR)
+
+def _operation(name):
+    """Returns the 'op:' label of a persistence function, e.g. 'op:save'."""
+    return f'op:{name}'
+
+class SamplingProfiler:
+    """
+    Flask hooks that profile a fraction of requests.
+
+    Attributes:
+        sample_rate (float): Fraction of requests profiled, 0 to disable.
+        mode (str): 'stack' to sample stacks from a background thread, 'cprofile' to run cProfile.
+        interval (float): Seconds between stack samples in 'stack' mode.
+        max_stacks (int): Distinct stacks kept; samples of further stacks are counted as dropped.
+    """
+
+    MODES = ('stack', 'cprofile')
+
+    def __init__(self, app=None, sample_rate=0.0, mode='stack', interval=0.005, max_stacks=10000):
+        """
+        Initializes a new SamplingProfiler instance.
+
+        Args:
+            app (Flask, optional): The app to register with.
+            sample_rate (float): Fraction of requests profiled, 0 to disable.
+            mode (str): 'stack' or 'cprofile'.
+            interval (float): Seconds between stack samples in 'stack' mode.
+            max_stacks (int): Distinct stacks kept.
+
+        Raises:
+            ValueError: If the mode is unknown or the sample rate is not between 0 and 1.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiling mode {mode!r}.")
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1.")
+        self.sample_rate = sample_rate  # Set the sampled fraction of requests
+        self.mode = mode  # Set the profiling mode
+        self.interval = interval  # Set the stack sampling interval
+        self.max_stacks = max_stacks  # Set the bound on distinct stacks
+        self._lock = threading.Lock()  # Guards the aggregates and the active requests
+        self._active = {}  # Thread id -> route of the sampled requests in flight ('stack' mode)
+        self._wake = threading.Event()  # Set while sampled requests are in flight
+        self._sampler = None  # The stack sampling thread, started on the first sampled request
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def enabled(self):
+        """True when a fraction of requests is profiled."""
+        return self.sample_rate > 0
+
+    @staticmethod
+    def config_from_env():
+        """
+        Read options from HBNB_PROFILE_RATE (fraction of requests, default 0),
+        HBNB_PROFILE_MODE ('stack' or 'cprofile') and HBNB_PROFILE_INTERVAL_MS.
+
+        Returns:
+            dict: Keyword arguments for SamplingProfiler.
+        """
+        options = {}
+        if os.environ.get('HBNB_PROFILE_RATE'):
+            options['sample_rate'] = float(os.environ['HBNB_PROFILE_RATE'])
+        if os.environ.get('HBNB_PROFILE_MODE'):
+            options['mode'] = os.environ['HBNB_PROFILE_MODE']
+        if os.environ.get('HBNB_PROFILE_INTERVAL_MS'):
+            options['interval'] = float(os.environ['HBNB_PROFILE_INTERVAL_MS']) / 1000
+        return options
+
+    def init_app(self, app):
+        """Register the hooks with a Flask app; a disabled profiler registers nothing."""
+        if not self.enabled:
+            return
+        app.before_request(self.start_request)
+        app.teardown_request(self.finish_request)
+
+    def reset(self):
+        """Drop every collected sample."""
+        with self._lock:
+            self._stacks = Counter()  # Collapsed stack tuple -> samples ('stack') or microseconds ('cprofile')
+            self._requests = Counter()  # Route -> profiled requests
+            self._operations = defaultdict(Counter)  # Route -> persistence operation -> samples or microseconds
+            self.dropped = 0  # Samples of stacks beyond max_stacks
+            self.started_at = time.time()  # Start of the collection window
+
+    def _route(self):
+        """Returns the 'METHOD /rule' label of the current request."""
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        return f'{request.method} {rule}'
+
+    def start_request(self):
+        """before_request hook: decide whether to profile the request and start profiling it."""
+        if request.path.startswith('/admin/') or random.random() >= self.sample_rate:
+            return
+        route = self._route()
+        if self.mode == 'cprofile':
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                return  # Another profiler is active on this thread; skip this request
+            g.profile = (route, profile)
+            return
+        with self._lock:
+            self._active[threading.get_ident()] = route
+            self._wake.set()
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name='stack-sampler', daemon=True)
+                self._sampler.start()
+        g.profile = (route, None)
+
+    def finish_request(self, exc=None):
+        """teardown_request hook: stop profiling the request and fold its samples into the aggregates."""
+        sampled = g.pop('profile', None)
+        if sampled is None:
+            return
+        route, profile = sampled
+        if profile is None:
+            with self._lock:
+                self._active.pop(threading.get_ident(), None)
+                self._requests[route] += 1
+            return
+        profile.disable()
+        self._add_profile(route, profile)
+
+    def _add(self, stack, weight):
+        """Adds a collapsed stack sample (called with the lock held)."""
+        if stack in self._stacks or len(self._stacks) < self.max_stacks:
+            self._stacks[stack] += weight
+        else:
+            self.dropped += weight
+
+    def _add_profile(self, route, profile):
+        """
+        Fold one request's cProfile data into the aggregates.
+
+        cProfile records caller -> callee edges rather than whole stacks, so
+        each edge becomes a 'route;[op;]caller;callee' stack weighted by the
+        callee's own time in microseconds under that caller.
+        """
+        stats = pstats.Stats(profile).stats
+        with self._lock:
+            self._requests[route] += 1
+            for (filename, _, name), (_, _, _, _, callers) in stats.items():
+                callee = _frame_name(filename, name)
+                for (caller_file, _, caller_name), (_, _, own, cumulative) in callers.items():
+                    stack = (route,)
+                    if _is_persistence(filename) and not name.startswith('_') and not _is_persistence(caller_file):
+                        self._operations[route][_operation(name)] += round(cumulative * 1e6)
+                        stack += (_operation(name),)
+                    weight = round(own * 1e6)
+                    if weight:
+                        self._add(stack + (_frame_name(caller_file, caller_name), callee), weight)
+
+    def _sample_loop(self):
+        """Stack sampler thread: while sampled requests run, record their stacks every interval."""
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                active = dict(self._active)
+            frames = sys._current_frames()
+            samples = [(route, frames[ident]) for ident, route in active.items() if ident in frames]
+            with self._lock:
+                for route, frame in samples:
+                    stack, operation = self._walk(frame)
+                    if operation is not None:
+                        self._operations[route][operation] += 1
+                        stack = (operation,) + stack
+                    self._add((route,) + stack, 1)
+
+    @staticmethod
+    def _walk(frame):
+        """
+        Returns (frames, operation) for a thread's current frame: the frame names
+        below Flask's view dispatch, outermost first, and the 'op:' label of the
+        outermost persistence frame (or None).
+        """
+        names = []
+        operation = None
+        while frame is not None:
+            code = frame.f_code
+            if code.co_name == 'dispatch_request' and f'{os.sep}flask{os.sep}' in code.co_filename:
+                break  # Everything above the view is Flask and Werkzeug plumbing
+            name = getattr(code, 'co_qualname', code.co_name)
+            if _is_persistence(code.co_filename):
+                operation = _operation(code.co_name)
+            names.append(_frame_name(code.co_filename, name))
+            frame = frame.f_back
+        names.reverse()
+        return tuple(names), operation
+
+    def collapsed(self):
+        """
+        Returns the aggregated samples in collapsed-stack format: one
+        'frame;frame;... count' line per stack, heaviest first.
+        """
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in stacks)
+
+    def summary(self):
+        """
+        Returns per-route totals.
+
+        Returns:
+            dict: {'mode', 'sample_rate', 'window_seconds', 'dropped', 'routes': {route: {'requests',
+                'samples', 'operations': {op: samples or microseconds}}}}.
+        """
+        with self._lock:
+            samples = Counter()
+            for stack, count in self._stacks.items():
+                samples[stack[0]] += count
+            routes = {route: {'requests': self._requests[route], 'samples': samples[route],
+                              'operations': dict(self._operations[route].most_common())}
+                      for route in set(self._requests) | set(samples)}
+            return {'mode': self.mode, 'sample_rate': self.sample_rate, 'dropped': self.dropped,
+                    'window_seconds': round(time.time() - self.started_at, 3), 'routes': routes}
+
+    def register_admin(self, app):
+        """
+        Add GET /admin/profile (collapsed stacks, or ?format=json for the summary)
+        and DELETE /admin/profile (reset) to an app. Both return 404 while the
+        profiler is disabled.
+        """
+        def profile_view():
+            if not self.enabled:
+                return jsonify({"error": "Profiling is disabled; set HBNB_PROFILE_RATE"}), 404
+            if request.method == 'DELETE':
+                self.reset()
+                return '', 204
+            if request.args.get('format') == 'json':
+                return jsonify(self.summary()), 200, {'Cache-Control': 'no-store'}  # Live figures
+            return self.collapsed(), 200, {'Content-Type': 'text/plain; charset=utf-8', 'Cache-Control': 'no-store'}
+        app.add_url_rule('/admin/profile', 'admin_profile', profile_view, methods=['GET', 'DELETE'])
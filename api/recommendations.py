@@ -0,0 +1,355 @@
+"""
+Similar places and user recommendations for the API.
+
+SimilarityIndex keeps a feature vector per place, updated incrementally from
+the change feed: its amenities (from Place.amenity_ids) and its position on
+the unit sphere (from latitude/longitude). Co-review signals come from sparse
+reviewer sets built from Review.user_id/place_id. With NumPy installed the
+vectors are rows of dense matrices and a query is one matrix-vector product
+per signal; without it the same scores are computed from the sparse sets.
+Top-k results are cached until the next mutation.
+"""
+
+import heapq
+import math
+import threading
+from collections import OrderedDict
+from persistence.vacuum import is_deleted
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; scores fall back to a Python loop
+    np = None
+
+_EARTH_RADIUS_KM = 6371.0
+
+def _unit_vector(latitude, longitude):
+    """Returns the unit vector of a position on the sphere, or None if it has no coordinates."""
+    if not isinstance(latitude, (int, float)) or not isinstance(longitude, (int, float)):
+        return None
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+class SimilarityIndex:
+    """
+    Place feature vectors with batched cosine similarity.
+
+    The score of a candidate place is the weighted sum of three signals in [0, 1]:
+    the cosine similarity of the amenity sets, geographic closeness (1 at the
+    same spot, falling to 0 at `geo_radius_km`) and the cosine similarity of
+    the sets of users who reviewed both places.
+
+    Subscribe `on_change` to the DataManager's change feed to keep the index current.
+
+    Attributes:
+        amenity_weight (float): Weight of the amenity signal.
+        geo_weight (float): Weight of the geographic signal.
+        co_review_weight (float): Weight of the co-review signal.
+        geo_radius_km (float): Distance at which places stop counting as close.
+        cache_size (int): Maximum number of cached top-k results.
+    """
+
+    def __init__(self, amenity_weight=1.0, geo_weight=1.0, co_review_weight=1.0, geo_radius_km=50.0, cache_size=1024):
+        """
+        Initializes a new SimilarityIndex instance.
+
+        Args:
+            amenity_weight (float): Weight of the amenity signal.
+            geo_weight (float): Weight of the geographic signal.
+            co_review_weight (float): Weight of the co-review signal.
+            geo_radius_km (float): Distance at which places stop counting as close.
+            cache_size (int): Maximum number of cached top-k results.
+        """
+        self.amenity_weight = amenity_weight  # Set the amenity signal weight
+        self.geo_weight = geo_weight  # Set the geographic signal weight
+        self.co_review_weight = co_review_weight  # Set the co-review signal weight
+        self.geo_radius_km = geo_radius_km  # Set the closeness radius
+        self.cache_size = cache_size  # Set the result cache bound
+        self._min_dot = math.cos(min(geo_radius_km / _EARTH_RADIUS_KM, math.pi))  # Unit vector dot product at the radius
+        self._lock = threading.RLock()  # Guards the index against concurrent mutations and queries
+        self._reset()
+
+    def _reset(self):
+        """Empties the index."""
+        self.ids = []  # Place id of each row
+        self._rows = {}  # Place id -> row
+        self._amenities = []  # Amenity id set of each row
+        self._geo = []  # Unit vector (or None) of each row
+        self._vocabulary = {}  # Amenity id -> matrix column
+        self._amenity_matrix = None  # NumPy: L2-normalized amenity one-hot rows
+        self._geo_matrix = None  # NumPy: unit vector rows, zero without coordinates
+        self._reviews = {}  # Review id -> (user id, place id, weight)
+        self._place_reviewers = {}  # Place id -> {user id: number of reviews}
+        self._user_places = {}  # User id -> {place id: summed review weight}
+        self._cache = OrderedDict()  # Query key -> result, least recently used first
+        if np is not None:
+            self._amenity_matrix = np.zeros((64, 16))
+            self._geo_matrix = np.zeros((64, 3))
+
+    def build(self, storage):
+        """
+        Rebuild the index from a storage dictionary.
+
+        Args:
+            storage (dict): Mapping of entity type name to a list of entity dictionaries.
+        """
+        with self._lock:
+            self._reset()
+            for place in storage.get('Place', None) or []:
+                if not is_deleted(place):
+                    self.upsert_place(place)
+            for review in storage.get('Review', None) or []:
+                if not is_deleted(review):
+                    self.add_review(review)
+
+    def _invalidate(self):
+        """Drops every cached result after a mutation."""
+        self._cache.clear()
+
+    def _ensure_capacity(self, rows, columns):
+        """Grows the NumPy matrices by doubling so they hold rows x columns."""
+        height, width = self._amenity_matrix.shape
+        if rows <= height and columns <= width:
+            return
+        new_height, new_width = max(height, 1), max(width, 1)
+        while new_height < rows:
+            new_height *= 2
+        while new_width < columns:
+            new_width *= 2
+        amenity_matrix = np.zeros((new_height, new_width))
+        amenity_matrix[:height, :width] = self._amenity_matrix
+        geo_matrix = np.zeros((new_height, 3))
+        geo_matrix[:height] = self._geo_matrix
+        self._amenity_matrix, self._geo_matrix = amenity_matrix, geo_matrix
+
+    def upsert_place(self, place):
+        """Adds or updates the feature vector of a place dictionary."""
+        with self._lock:
+            row = self._rows.get(place['id'])
+            if row is None:
+                row = self._rows[place['id']] = len(self.ids)
+                self.ids.append(place['id'])
+                self._amenities.append(frozenset())
+                self._geo.append(None)
+            amenities = frozenset(amenity for amenity in place.get('amenity_ids') or [] if amenity is not None)
+            for amenity in amenities:
+                self._vocabulary.setdefault(amenity, len(self._vocabulary))
+            self._amenities[row] = amenities
+            self._geo[row] = _unit_vector(place.get('latitude'), place.get('longitude'))
+            if np is not None:
+                self._ensure_capacity(len(self.ids), len(self._vocabulary))
+                self._amenity_matrix[row] = 0.0
+                if amenities:
+                    self._amenity_matrix[row, [self._vocabulary[amenity] for amenity in amenities]] = 1.0 / math.sqrt(len(amenities))
+                self._geo_matrix[row] = self._geo[row] or (0.0, 0.0, 0.0)
+            self._invalidate()
+
+    def remove_place(self, place_id):
+        """Removes a place, moving the last row into its slot."""
+        with self._lock:
+            row = self._rows.pop(place_id, None)
+            if row is None:
+                return
+            last = len(self.ids) - 1
+            if row != last:
+                self.ids[row] = self.ids[last]
+                self._rows[self.ids[row]] = row
+                self._amenities[row] = self._amenities[last]
+                self._geo[row] = self._geo[last]
+                if np is not None:
+                    self._amenity_matrix[row] = self._amenity_matrix[last]
+                    self._geo_matrix[row] = self._geo_matrix[last]
+            self.ids.pop()
+            self._amenities.pop()
+            self._geo.pop()
+            if np is not None:
+                self._amenity_matrix[last] = 0.0
+                self._geo_matrix[last] = 0.0
+            self._invalidate()
+
+    def add_review(self, review):
+        """Records the co-review signal of a review dictionary."""
+        with self._lock:
+            self.remove_review(review['id'])
+            user_id, place_id = review.get('user_id'), review.get('place_id')
+            if user_id is None or place_id is None:
+                return
+            rating = review.get('rating')
+            weight = rating / 5.0 if isinstance(rating, (int, float)) else 1.0  # Better rated places shape the profile more
+            self._reviews[review['id']] = (user_id, place_id, weight)
+            reviewers = self._place_reviewers.setdefault(place_id, {})
+            reviewers[user_id] = reviewers.get(user_id, 0) + 1
+            places = self._user_places.setdefault(user_id, {})
+            places[place_id] = places.get(place_id, 0.0) + weight
+            self._invalidate()
+
+    def remove_review(self, review_id):
+        """Forgets the co-review signal of a review; unknown reviews are ignored."""
+        with self._lock:
+            entry = self._reviews.pop(review_id, None)
+            if entry is None:
+                return
+            user_id, place_id, weight = entry
+            reviewers = self._place_reviewers[place_id]
+            reviewers[user_id] -= 1
+            if not reviewers[user_id]:
+                del reviewers[user_id]
+                del self._user_places[user_id][place_id]
+            else:
+                self._user_places[user_id][place_id] -= weight
+            if not reviewers:
+                del self._place_reviewers[place_id]
+            if not self._user_places[user_id]:
+                del self._user_places[user_id]
+            self._invalidate()
+
+    def on_change(self, event):
+        """Change feed subscriber that updates place vectors and review signals."""
+        if event.entity_type == 'Place':
+            if event.op == 'delete':
+                self.remove_place(event.entity_id)
+            else:
+                self.upsert_place(event.data)
+        elif event.entity_type == 'Review':
+            if event.op == 'delete':
+                self.remove_review(event.entity_id)
+            else:
+                self.add_review(event.data)
+
+    def _co_review(self, place_ids):
+        """Returns place id -> co-review cosine with the places reviewed by the users who reviewed place_ids."""
+        scores = {}
+        for place_id in place_ids:
+            reviewers = self._place_reviewers.get(place_id, {})
+            counts = {}
+            for user_id in reviewers:
+                for other in self._user_places.get(user_id, ()):
+                    counts[other] = counts.get(other, 0) + 1
+            for other, shared in counts.items():
+                score = shared / math.sqrt(len(reviewers) * len(self._place_reviewers[other]))
+                scores[other] = scores.get(other, 0.0) + score / len(place_ids)
+        return scores
+
+    def _geo_score(self, dot):
+        """Maps the dot product of two unit vectors to closeness in [0, 1]."""
+        return min(max((dot - self._min_dot) / (1.0 - self._min_dot), 0.0), 1.0)
+
+    def _scores(self, amenity_profile, geo_profile, co_review):
+        """
+        Scores every place against a profile.
+
+        Args:
+            amenity_profile (dict): Amenity id -> weight, L2-normalized.
+            geo_profile (tuple): Unit vector, or None.
+            co_review (dict): Place id -> co-review score.
+
+        Returns:
+            list: The score of each row.
+        """
+        count = len(self.ids)
+        if np is not None:
+            vector = np.zeros(self._amenity_matrix.shape[1])
+            for amenity, weight in amenity_profile.items():
+                vector[self._vocabulary[amenity]] = weight
+            scores = self.amenity_weight * (self._amenity_matrix[:count] @ vector)
+            if geo_profile is not None:
+                dots = self._geo_matrix[:count] @ np.asarray(geo_profile)
+                closeness = np.clip((dots - self._min_dot) / (1.0 - self._min_dot), 0.0, 1.0)
+                scores += self.geo_weight * np.where(np.any(self._geo_matrix[:count] != 0.0, axis=1), closeness, 0.0)
+            scores = scores.tolist()
+        else:
+            scores = []
+            for row in range(count):
+                amenities = self._amenities[row]
+                score = 0.0
+                if amenities and amenity_profile:
+                    score += self.amenity_weight * sum(amenity_profile.get(amenity, 0.0) for amenity in amenities) / math.sqrt(len(amenities))
+                geo = self._geo[row]
+                if geo is not None and geo_profile is not None:
+                    score += self.geo_weight * self._geo_score(sum(a * b for a, b in zip(geo, geo_profile)))
+                scores.append(score)
+        for place_id, score in co_review.items():
+            row = self._rows.get(place_id)
+            if row is not None:
+                scores[row] += self.co_review_weight * score
+        return scores
+
+    def _top(self, scores, exclude, k):
+        """Returns the k best (place id, score) pairs, skipping excluded place ids."""
+        candidates = ((score, self.ids[row]) for row, score in enumerate(scores) if self.ids[row] not in exclude)
+        return [{'place_id': place_id, 'score': round(score, 4)} for score, place_id in heapq.nlargest(k, candidates)]
+
+    def _cached(self, key, compute):
+        """Returns a cached result, computing and caching it on a miss."""
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                return result
+            result = compute()
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)  # Evict the least recently used result
+            return result
+
+    def similar(self, place_id, k=10):
+        """
+        Find the places most similar to a place.
+
+        Args:
+            place_id (str): The ID of the place.
+            k (int): The number of results.
+
+        Returns:
+            list: Up to k {'place_id', 'score'} dictionaries, best first, or None if the place is unknown.
+        """
+        if place_id not in self._rows:
+            return None
+
+        def compute():
+            row = self._rows[place_id]
+            amenities = self._amenities[row]
+            profile = {amenity: 1.0 / math.sqrt(len(amenities)) for amenity in amenities}
+            scores = self._scores(profile, self._geo[row], self._co_review([place_id]))
+            return self._top(scores, {place_id}, k)
+
+        return self._cached(('similar', place_id, k), compute)
+
+    def recommend(self, user_id, k=10):
+        """
+        Recommend places to a user from the places they reviewed.
+
+        The user's profile is the rating-weighted mix of the amenities and
+        positions of the places they reviewed, plus the co-review signal of
+        those places. Users without reviews get the most reviewed places.
+
+        Args:
+            user_id (str): The ID of the user.
+            k (int): The number of results.
+
+        Returns:
+            list: Up to k {'place_id', 'score'} dictionaries, best first.
+        """
+        def compute():
+            reviewed = self._user_places.get(user_id, {})
+            if not reviewed:
+                popular = ((len(self._place_reviewers.get(place_id, ())), place_id) for place_id in self.ids)
+                return [{'place_id': place_id, 'score': float(count)} for count, place_id in heapq.nlargest(k, popular)]
+            amenity_profile, geo_sum = {}, [0.0, 0.0, 0.0]
+            for place_id, weight in reviewed.items():
+                row = self._rows.get(place_id)
+                if row is None:
+                    continue
+                amenities = self._amenities[row]
+                for amenity in amenities:
+                    amenity_profile[amenity] = amenity_profile.get(amenity, 0.0) + weight / math.sqrt(len(amenities))
+                if self._geo[row] is not None:
+                    geo_sum = [total + weight * value for total, value in zip(geo_sum, self._geo[row])]
+            norm = math.sqrt(sum(value * value for value in amenity_profile.values()))
+            amenity_profile = {amenity: value / norm for amenity, value in amenity_profile.items()} if norm else {}
+            geo_norm = math.sqrt(sum(value * value for value in geo_sum))
+            geo_profile = tuple(value / geo_norm for value in geo_sum) if geo_norm else None
+            scores = self._scores(amenity_profile, geo_profile, self._co_review(list(reviewed)))
+            return self._top(scores, set(reviewed), k)
+
+        return self._cached(('recommend', user_id, k), compute)
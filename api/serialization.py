@@ -0,0 +1,225 @@
+"""
+JSON serialization for the API.
+
+The backend (stdlib json or orjson) is chosen at runtime. FastJSONProvider
+plugs it into Flask so every jsonify() call uses it, and EntityEncodingCache
+keeps the encoded bytes of each stored entity so list responses are built by
+joining cached fragments instead of re-encoding unchanged entities.
+"""
+
+import dataclasses
+import decimal
+import json
+import os
+import threading
+import uuid
+from datetime import date
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+from persistence import VERSION_FIELD
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib backend is always available
+    orjson = None
+
+def _default(obj):
+    """
+    Convert values the JSON backends cannot encode natively.
+
+    Dates use the same HTTP date format as Flask's default provider, so
+    responses look the same whichever backend is active.
+    """
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__dict__'):
+        return vars(obj)  # Model instances serialize as their attributes
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class StdlibJSONBackend:
+    """JSON backend using the standard library json module."""
+
+    name = 'stdlib'
+
+    def dumps(self, obj):
+        """Encode obj as compact, key-sorted UTF-8 JSON bytes."""
+        return json.dumps(obj, default=_default, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        """Decode JSON from str or bytes."""
+        return json.loads(data)
+
+class OrjsonJSONBackend:
+    """JSON backend using orjson."""
+
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed.")
+        # Datetimes go through _default so they match the stdlib backend's HTTP date format
+        self._options = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj):
+        """Encode obj as compact, key-sorted UTF-8 JSON bytes."""
+        return orjson.dumps(obj, default=_default, option=self._options)
+
+    def loads(self, data):
+        """Decode JSON from str or bytes."""
+        return orjson.loads(data)
+
+def get_json_backend(name=None):
+    """
+    Return the JSON backend to use.
+
+    Args:
+        name (str, optional): 'stdlib', 'orjson' or 'auto'. Defaults to the
+            HBNB_JSON_BACKEND environment variable, then 'auto', which picks
+            orjson when it is installed.
+
+    Returns:
+        object: A backend with dumps() returning bytes and loads().
+    """
+    name = name or os.environ.get('HBNB_JSON_BACKEND', 'auto')
+    if name == 'stdlib':
+        return StdlibJSONBackend()
+    if name == 'orjson':
+        return OrjsonJSONBackend()
+    if name == 'auto':
+        return OrjsonJSONBackend() if orjson is not None else StdlibJSONBackend()
+    raise ValueError(f"Unknown JSON backend {name}.")
+
+def to_columns(entities):
+    """
+    Convert a list of entity dictionaries to the compact columnar layout.
+
+    The result is {"columns": [...], "rows": [[...], ...]}: field names are
+    listed once and each row holds the values in column order, with null for
+    fields an entity does not have.
+
+    Args:
+        entities (list): The entity dictionaries.
+
+    Returns:
+        dict: The columnar representation.
+    """
+    columns = sorted({key for entity in entities for key in entity})
+    return {'columns': columns, 'rows': [[entity.get(column) for column in columns] for entity in entities]}
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask JSON provider backed by the runtime-selected JSON backend.
+
+    Installed with `app.json = FastJSONProvider(app)`; Flask 2.2+ ignores
+    `app.json_encoder`, so this is what makes jsonify() use the backend.
+    """
+
+    mimetype = 'application/json'
+
+    def __init__(self, app, backend=None):
+        super().__init__(app)
+        self.backend = backend or get_json_backend()
+
+    def dumps(self, obj, **kwargs):
+        return self.backend.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return self.backend.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self.raw_response(self.backend.dumps(obj))
+
+    def raw_response(self, body):
+        """Wrap already encoded JSON bytes in a response."""
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+class EntityEncodingCache:
+    """
+    Cache of each stored entity's encoded JSON bytes.
+
+    Entries are keyed by (entity_type, entity id, version): every write bumps
+    the entity's version, so a new version is re-encoded even without an
+    explicit invalidation, and hits do not depend on getting the same
+    dictionary back (the workers' shared index decodes a fresh one per read).
+    Only the latest encoded version of an entity is kept. Entities without a
+    version field fall back to matching the dictionary they were encoded from.
+    Subscribing `on_change` to the DataManager's change feed drops entries as
+    soon as an entity is updated or deleted.
+
+    Attributes:
+        backend (object): The JSON backend used to encode entities.
+    """
+
+    def __init__(self, backend):
+        """
+        Initializes a new EntityEncodingCache instance.
+
+        Args:
+            backend (object): The JSON backend used to encode entities.
+        """
+        self.backend = backend  # Set the JSON backend
+        self._entries = {}  # (entity_type, entity_id) -> (version or entity dictionary, encoded bytes)
+        self._lock = threading.Lock()  # Guards _entries across request threads
+
+    def encode(self, entity_type, entity):
+        """
+        Return the encoded JSON bytes of an entity, encoding it at most once per version.
+
+        Args:
+            entity_type (str): The type of the entity.
+            entity (dict): The entity dictionary.
+
+        Returns:
+            bytes: The encoded entity.
+        """
+        key = (entity_type, entity.get('id'))
+        version = entity.get(VERSION_FIELD)
+        stamp = entity if version is None else version  # Unversioned entities match by identity
+        entry = self._entries.get(key)
+        if entry is not None and (entry[0] is stamp if version is None else entry[0] == stamp):
+            return entry[1]
+        encoded = self.backend.dumps(entity)
+        with self._lock:
+            self._entries[key] = (stamp, encoded)
+        return encoded
+
+    def encode_list(self, entity_type, entities):
+        """
+        Return the encoded JSON array of entities, joined from cached fragments.
+
+        Args:
+            entity_type (str): The type of the entities.
+            entities (list): The entity dictionaries.
+
+        Returns:
+            bytes: The encoded JSON array.
+        """
+        return b'[' + b','.join([self.encode(entity_type, entity) for entity in entities]) + b']'
+
+    def invalidate(self, entity_type, entity_id):
+        """
+        Drop the cached encoding of an entity.
+
+        Args:
+            entity_type (str): The type of the entity.
+            entity_id (str): The ID of the entity.
+        """
+        with self._lock:
+            self._entries.pop((entity_type, entity_id), None)
+
+    def on_change(self, event):
+        """Change feed subscriber that invalidates the mutated entity."""
+        self.invalidate(event.entity_type, event.entity_id)
+
+    def clear(self):
+        """Drop every cached encoding."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,209 @@
+"""
+Request validation compiled from the flask-restx API models.
+
+compile_model() turns a model's field definitions (types, required flags,
+min/max, patterns, lengths, enums) into a Validator once, at import time.
+Each field becomes a short list of precompiled checks, so validating a
+payload is a loop over plain functions with no per-request schema walking
+or regex compilation. Validators report every failing field, support
+partial payloads for updates and validate bulk payloads item by item.
+Partial payloads are merged into stored entities, so they may only name
+writable fields of the model and cannot null a required one.
+"""
+
+import re
+from flask_restx import fields
+
+class ValidationError(Exception):
+    """
+    Raised when a payload fails validation.
+
+    Attributes:
+        errors (dict): Field name -> error message.
+    """
+
+    def __init__(self, errors):
+        super().__init__("; ".join(f"{field}: {message}" for field, message in errors.items()))
+        self.errors = errors  # Set the per-field errors
+
+def _type_check(field):
+    """Returns (check, message) for the JSON type of a restx field, or None for untyped fields."""
+    if isinstance(field, fields.Boolean):
+        return (lambda value: isinstance(value, bool)), "must be a boolean"
+    if isinstance(field, fields.Integer):
+        return (lambda value: isinstance(value, int) and not isinstance(value, bool)), "must be an integer"
+    if isinstance(field, (fields.Float, fields.Arbitrary)):
+        return (lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)), "must be a number"
+    if isinstance(field, fields.String):
+        return (lambda value: isinstance(value, str)), "must be a string"
+    if isinstance(field, fields.List):
+        item = _type_check(field.container)
+        if item is None:
+            return (lambda value: isinstance(value, list)), "must be a list"
+        item_check, item_message = item
+        return (lambda value: isinstance(value, list) and all(item_check(entry) for entry in value)), f"must be a list ({item_message.replace('must be', 'each')})"
+    return None
+
+def _field_checks(field):
+    """Compiles the checks of one restx field into a list of (check, message) pairs, run in order."""
+    checks = []
+    type_check = _type_check(field)
+    if type_check is not None:
+        checks.append(type_check)
+    minimum, maximum = getattr(field, 'minimum', None), getattr(field, 'maximum', None)
+    if minimum is not None:
+        checks.append(((lambda value: value >= minimum), f"must be at least {minimum}"))
+    if maximum is not None:
+        checks.append(((lambda value: value <= maximum), f"must be at most {maximum}"))
+    min_length, max_length = getattr(field, 'min_length', None), getattr(field, 'max_length', None)
+    if min_length is not None:
+        checks.append(((lambda value: len(value) >= min_length), f"must be at least {min_length} characters"))
+    if max_length is not None:
+        checks.append(((lambda value: len(value) <= max_length), f"must be at most {max_length} characters"))
+    pattern = getattr(field, 'pattern', None)
+    if pattern:
+        match = re.compile(pattern).match  # Compiled once, when the model is compiled
+        checks.append(((lambda value: match(value) is not None), "has an invalid format"))
+    enum = getattr(field, 'enum', None)
+    if enum:
+        allowed = frozenset(enum)
+        checks.append(((lambda value: value in allowed), f"must be one of {', '.join(map(str, enum))}"))
+    return checks
+
+class Validator:
+    """
+    Compiled validator for one API model.
+
+    Calling the validator returns a dictionary of per-field errors, empty
+    when the payload is valid.
+
+    Attributes:
+        name (str): The model name.
+        required (tuple): Names of the required fields.
+        writable (frozenset): Names of the fields a payload may set.
+        readonly (frozenset): Names of the fields only the server sets.
+    """
+
+    def __init__(self, name, field_checks, required, references=None, readonly=()):
+        """
+        Initializes a new Validator instance. Use compile_model() to build one.
+
+        Args:
+            name (str): The model name.
+            field_checks (dict): Field name -> list of (check, message) pairs.
+            required (iterable): Names of the required fields.
+            references (dict, optional): Field name -> (exists, message) where exists(value)
+                tells whether a referenced entity exists.
+            readonly (iterable, optional): Names of the read-only fields of the model.
+        """
+        self.name = name  # Set the model name
+        self.required = tuple(required)  # Set the required field names
+        self.writable = frozenset(field_checks)  # Set the fields a payload may set
+        self.readonly = frozenset(readonly)  # Set the server-owned fields
+        self._checks = tuple(field_checks.items())  # Field checks in model order
+        self._references = tuple((references or {}).items())  # Reference checks, run only on valid fields
+
+    def __call__(self, data, partial=False):
+        """
+        Validate a payload.
+
+        Args:
+            data (dict): The payload.
+            partial (bool): If True (updates), missing required fields are allowed, but the payload
+                may only name writable fields and cannot set a required field to null.
+
+        Returns:
+            dict: Field name -> error message; empty if the payload is valid.
+        """
+        if not isinstance(data, dict):
+            return {'_payload': f"must be a JSON object describing a {self.name}"}
+        errors = {}
+        if partial:
+            for name in data:
+                if name in self.readonly:
+                    errors[name] = "is read-only"
+                elif name not in self.writable:
+                    errors[name] = f"is not a field of {self.name}"
+            for name in self.required:
+                if name in data and data[name] is None:
+                    errors[name] = "must not be null"
+        else:
+            for name in self.required:
+                if data.get(name) is None:
+                    errors[name] = "is required"
+        for name, checks in self._checks:
+            value = data.get(name)
+            if value is None or name in errors:
+                continue
+            for check, message in checks:
+                if not check(value):
+                    errors[name] = message
+                    break
+        for name, (exists, message) in self._references:
+            value = data.get(name)
+            if value is not None and name not in errors:
+                values = value if isinstance(value, list) else [value]
+                missing = [item for item in values if not exists(item)]
+                if missing:
+                    errors[name] = f"{message}: {', '.join(map(str, missing))}"
+        return errors
+
+    def check(self, data, partial=False):
+        """
+        Validate a payload and raise on failure.
+
+        Raises:
+            ValidationError: If any field fails validation.
+        """
+        errors = self(data, partial)
+        if errors:
+            raise ValidationError(errors)
+
+    def validate_many(self, items, partial=False):
+        """
+        Validate a bulk payload item by item.
+
+        Args:
+            items (list): The payloads.
+            partial (bool): If True, missing required fields are allowed.
+
+        Returns:
+            dict: Index of each invalid item -> its per-field errors; empty if every item is valid.
+        """
+        if not isinstance(items, list):
+            return {'_payload': {'_payload': "must be a JSON array"}}
+        results = {}
+        for index, item in enumerate(items):
+            errors = self(item, partial)
+            if errors:
+                results[index] = errors
+        return results
+
+def compile_model(model, references=None):
+    """
+    Compile a flask-restx model into a Validator.
+
+    Read-only fields (such as ids) are not validated; partial payloads may
+    not set them. Strings of required fields must not be blank.
+
+    Args:
+        model (Model): The flask-restx model, e.g. place_model.
+        references (dict, optional): Field name -> (exists, message) reference checks.
+
+    Returns:
+        Validator: The compiled validator.
+    """
+    field_checks = {}
+    required = []
+    readonly = []
+    for name, field in model.items():
+        if getattr(field, 'readonly', False):
+            readonly.append(name)
+            continue
+        checks = _field_checks(field)
+        if field.required:
+            required.append(name)
+            if isinstance(field, fields.String) and getattr(field, 'min_length', None) is None:
+                checks.append(((lambda value: bool(value.strip())), "must not be blank"))
+        field_checks[name] = checks
+    return Validator(model.name, field_checks, required, references, readonly)
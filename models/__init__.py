@@ -15,5 +15,11 @@ from .review import Review
 # Import the User model class
 from .user import User
 
+# Import the Booking model class
+from .booking import Booking
+
+# Import the PricingRule model class
+from .pricing_rule import PricingRule
+
 """This file ensures that all the model classes are accessible when the models package is imported.
 This allows for easy importing of the model classes throughout the application."""
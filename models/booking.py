@@ -0,0 +1,38 @@
+import uuid  # Import the uuid module to generate unique identifiers
+from datetime import datetime  # Import the datetime module to handle date and time
+
+class Booking:
+    """
+    Represents a booking of a place in the HBnB system.
+    
+    Attributes:
+        id (str): Unique identifier for the booking.
+        place_id (str): Identifier for the booked place.
+        user_id (str): Identifier for the user who made the booking.
+        check_in (str): First night of the stay, as an ISO date (YYYY-MM-DD).
+        check_out (str): Departure day, as an ISO date; the night before it is the last one booked.
+        guests (int): Number of guests staying.
+        created_at (datetime): Timestamp when the booking was created.
+        updated_at (datetime): Timestamp when the booking was last updated.
+    """
+    
+    def __init__(self, place_id, user_id, check_in, check_out, guests, id=None):
+        """
+        Initializes a new Booking instance.
+
+        Args:
+            place_id (str): Identifier for the booked place.
+            user_id (str): Identifier for the user who made the booking.
+            check_in (str): First night of the stay, as an ISO date (YYYY-MM-DD).
+            check_out (str): Departure day, as an ISO date.
+            guests (int): Number of guests staying.
+            id (str, optional): Unique identifier for the booking. If not provided, a new UUID will be generated.
+        """
+        self.id = id or str(uuid.uuid4())  # Generate a unique ID for the booking if not provided
+        self.place_id = place_id  # Set the booked place ID
+        self.user_id = user_id  # Set the user ID who made the booking
+        self.check_in = check_in  # Set the first night of the stay
+        self.check_out = check_out  # Set the departure day
+        self.guests = guests  # Set the number of guests
+        self.created_at = datetime.now()  # Set the creation timestamp
+        self.updated_at = datetime.now()  # Set the last updated timestamp
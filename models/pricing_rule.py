@@ -0,0 +1,51 @@
+import uuid  # Import the uuid module to generate unique identifiers
+from datetime import datetime  # Import the datetime module to handle date and time
+
+class PricingRule:
+    """
+    Represents a pricing rule applied to place prices in the HBnB system.
+
+    A rule multiplies the nightly price. 'season' rules apply to nights from
+    `start` to `end` (MM-DD, inclusive, recurring every year and allowed to
+    wrap around the new year); 'length_of_stay' rules apply to stays of at
+    least `min_nights` nights; 'occupancy' rules apply when guests fill at
+    least `min_occupancy` (0 to 1) of a place's max_guests. Of several
+    length or occupancy rules only the one with the highest threshold met
+    applies; overlapping seasons multiply.
+    
+    Attributes:
+        id (str): Unique identifier for the rule.
+        kind (str): 'season', 'length_of_stay' or 'occupancy'.
+        multiplier (float): Factor applied to the nightly price.
+        start (str): First day of a season, as MM-DD.
+        end (str): Last day of a season, as MM-DD.
+        min_nights (int): Minimum stay length of a length_of_stay rule.
+        min_occupancy (float): Minimum share of max_guests of an occupancy rule.
+        created_at (datetime): Timestamp when the rule was created.
+        updated_at (datetime): Timestamp when the rule was last updated.
+    """
+
+    KINDS = ('season', 'length_of_stay', 'occupancy')  # Supported rule kinds
+    
+    def __init__(self, kind, multiplier, start=None, end=None, min_nights=None, min_occupancy=None, id=None):
+        """
+        Initializes a new PricingRule instance.
+
+        Args:
+            kind (str): 'season', 'length_of_stay' or 'occupancy'.
+            multiplier (float): Factor applied to the nightly price.
+            start (str, optional): First day of a season, as MM-DD.
+            end (str, optional): Last day of a season, as MM-DD.
+            min_nights (int, optional): Minimum stay length of a length_of_stay rule.
+            min_occupancy (float, optional): Minimum share of max_guests of an occupancy rule.
+            id (str, optional): Unique identifier for the rule. If not provided, a new UUID will be generated.
+        """
+        self.id = id or str(uuid.uuid4())  # Generate a unique ID for the rule if not provided
+        self.kind = kind  # Set the rule kind
+        self.multiplier = multiplier  # Set the price multiplier
+        self.start = start  # Set the first day of the season
+        self.end = end  # Set the last day of the season
+        self.min_nights = min_nights  # Set the minimum stay length
+        self.min_occupancy = min_occupancy  # Set the minimum occupancy share
+        self.created_at = datetime.now()  # Set the creation timestamp
+        self.updated_at = datetime.now()  # Set the last updated timestamp
@@ -6,6 +6,27 @@ from .i_persistence_manager import IPersistenceManager
 from .data_manager import DataManager
 # Import the FileStorage class for file-based data storage
 from .file_storage import FileStorage
+# Import the PartitionedStorage class for hash-partitioned storage across several databases
+from .partitioned_storage import PartitionedStorage
+# Import the change feed and the read-only replica that follows it
+from .change_feed import ChangeEvent, ChangeFeed
+from .replica import ReplicaDataManager
+# Import the in-memory DataManager with copy-on-write snapshot and restore
+from .in_memory_storage import InMemoryStorage
+# Import the foreign key registry used for cascading deletes and reference checks
+from .relationships import Relationship, RelationshipRegistry, ReferentialIntegrityError
+# Import the background vacuum that removes soft-deleted entities
+from .vacuum import Vacuum, VacuumPolicy
+# Import the versioned entity history kept from the change feed
+from .history import HistoryRetention, VersionStore
+# Import the per-day availability index used for bookings
+from .availability import AvailabilityIndex, BookingConflictError
+# Import the incrementally maintained place aggregates by city and country
+from .catalog_stats import CatalogStats, QuantileSketch
+# Import the per-entity version helpers used for optimistic concurrency
+from .versioning import VERSION_FIELD, VersionConflictError, entity_version
+# Import the columnar analytics export and its memory-mapped reader
+from .columnar_export import ColumnarExport, export_columns
 
 """This file ensures that the persistence-related classes are accessible when the persistence package is imported.
 This allows for easy importing of these classes throughout the application."""
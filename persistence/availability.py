@@ -0,0 +1,274 @@
+import logging  # Import the logging module to report bookings the index cannot move
+import threading  # Import the threading module to make reservations atomic
+from datetime import date  # Import the date class for booking days
+from .vacuum import is_deleted  # Import the tombstone check; soft-deleted entities are not indexed
+
+MAX_NIGHTS = 365  # Longest stay that can be booked or quoted
+
+class BookingConflictError(Exception):
+    """
+    Raised when a reservation overlaps nights that are already booked.
+    """
+    pass
+
+def to_date(value):
+    """
+    Convert a date, datetime or ISO date string to a date.
+
+    Raises:
+        ValueError: If the value is not a date.
+    """
+    if isinstance(value, date):
+        return value if type(value) is date else value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    raise ValueError(f"Invalid date {value!r}.")
+
+class AvailabilityIndex:
+    """
+    Per-day availability of every place, kept as one bitset per place.
+
+    Bit n of a place's bitset is set when the night of `origin + n days` is
+    booked. Checking a stay is a single AND of the bitset with the mask of
+    its nights, so searching every place for a date range costs one integer
+    operation per place. Places are booked whole: a stay fits if the guests
+    do not exceed the place's `max_guests` and none of its nights is taken.
+
+    Subscribe `on_change` to the DataManager's change feed to keep the index
+    in step with saved, updated and deleted places and bookings.
+
+    Stays are bounded in length and must end by the horizon, so the bitset
+    of a place never grows past the horizon and a single request cannot make
+    the index build a mask of arbitrary size.
+
+    Attributes:
+        origin (date): Day 0 of every bitset; stays cannot start before it.
+        horizon (date): Last possible check-out day.
+        max_nights (int): Longest stay accepted.
+    """
+
+    def __init__(self, origin=date(2020, 1, 1), horizon=date(2070, 1, 1), max_nights=MAX_NIGHTS):
+        """
+        Initializes a new AvailabilityIndex instance.
+
+        Args:
+            origin (date): Day 0 of every bitset.
+            horizon (date): Last possible check-out day.
+            max_nights (int): Longest stay accepted.
+        """
+        self.origin = origin  # Set the first indexable day
+        self.horizon = horizon  # Set the last indexable check-out day
+        self.max_nights = max_nights  # Set the longest accepted stay
+        self._capacity = {}  # Place id -> max_guests
+        self._booked = {}  # Place id -> bitset of booked nights
+        self._bookings = {}  # Booking id -> (place id, mask of its nights)
+        self._lock = threading.Lock()  # Makes check-and-reserve atomic
+
+    def build(self, storage):
+        """
+        Rebuild the index from a storage dictionary.
+
+        Args:
+            storage (dict): Mapping of entity type name to a list of entity dictionaries.
+        """
+        with self._lock:
+            self._capacity.clear()
+            self._booked.clear()
+            self._bookings.clear()
+        for place in storage.get('Place', None) or []:
+            if not is_deleted(place):
+                self.add_place(place)
+        for booking in storage.get('Booking', None) or []:
+            if not is_deleted(booking):
+                try:
+                    self.reserve(booking)
+                except (BookingConflictError, ValueError):
+                    pass  # Keep serving; a stored booking that no longer fits is left out of the index
+
+    def _mask(self, check_in, check_out):
+        """
+        Return the bitset mask of the nights from check_in up to (not including) check_out.
+
+        Raises:
+            ValueError: If the dates are invalid, reversed, outside the origin and
+                horizon, or the stay is longer than max_nights.
+        """
+        check_in, check_out = to_date(check_in), to_date(check_out)
+        start = (check_in - self.origin).days
+        nights = (check_out - check_in).days
+        if start < 0:
+            raise ValueError(f"Stays cannot start before {self.origin.isoformat()}.")
+        if nights <= 0:
+            raise ValueError("check_out must be after check_in.")
+        if nights > self.max_nights:
+            raise ValueError(f"Stays cannot be longer than {self.max_nights} nights.")
+        if check_out > self.horizon:
+            raise ValueError(f"Stays cannot end after {self.horizon.isoformat()}.")
+        return ((1 << nights) - 1) << start
+
+    def add_place(self, place):
+        """Index a place dictionary, or update its capacity."""
+        with self._lock:
+            self._capacity[place['id']] = place.get('max_guests') or 0
+            self._booked.setdefault(place['id'], 0)
+
+    def remove_place(self, place_id):
+        """Drop a place and its bookings from the index."""
+        with self._lock:
+            self._capacity.pop(place_id, None)
+            self._booked.pop(place_id, None)
+            for booking_id in [key for key, (booked_place, _) in self._bookings.items() if booked_place == place_id]:
+                del self._bookings[booking_id]
+
+    def is_available(self, place_id, check_in, check_out, guests=1):
+        """
+        Check whether a place can host a stay.
+
+        Args:
+            place_id (str): The ID of the place.
+            check_in (date or str): The first night.
+            check_out (date or str): The departure day.
+            guests (int): The number of guests.
+
+        Returns:
+            bool: True if the place exists, fits the guests and is free every night.
+        """
+        mask = self._mask(check_in, check_out)
+        capacity = self._capacity.get(place_id)
+        return capacity is not None and guests <= capacity and not self._booked.get(place_id, 0) & mask
+
+    def search(self, check_in, check_out, guests=1):
+        """
+        Find every place that can host a stay.
+
+        Args:
+            check_in (date or str): The first night.
+            check_out (date or str): The departure day.
+            guests (int): The number of guests.
+
+        Returns:
+            list: The IDs of the available places.
+        """
+        mask = self._mask(check_in, check_out)
+        booked = self._booked
+        return [place_id for place_id, capacity in list(self._capacity.items())
+                if guests <= capacity and not booked.get(place_id, 0) & mask]
+
+    def _check(self, booking, mask):
+        """
+        Check a booking's nights against the index (called with the lock held).
+
+        The booking's own reservation does not count as a conflict, so a
+        booking can be checked again after reserve() or when it moves.
+
+        Raises:
+            ValueError: If the place is unknown or the guests exceed its capacity.
+            BookingConflictError: If any night is booked by another booking.
+        """
+        place_id = booking['place_id']
+        if place_id not in self._capacity:
+            raise ValueError(f"Place {place_id} not found.")
+        if (booking.get('guests') or 1) > self._capacity[place_id]:
+            raise ValueError(f"Place {place_id} hosts at most {self._capacity[place_id]} guests.")
+        booked = self._booked[place_id]
+        own = self._bookings.get(booking['id'])
+        if own is not None and own[0] == place_id:
+            booked &= ~own[1]
+        if booked & mask:
+            raise BookingConflictError(f"Place {place_id} is already booked for some of these nights.")
+
+    def check(self, booking):
+        """
+        Check that a booking fits without reserving its nights.
+
+        Args:
+            booking (dict): The booking dictionary (id, place_id, check_in, check_out, guests).
+
+        Raises:
+            ValueError: If the place is unknown, the dates are invalid or the guests exceed its capacity.
+            BookingConflictError: If any night is booked by another booking.
+        """
+        mask = self._mask(booking['check_in'], booking['check_out'])
+        with self._lock:
+            self._check(booking, mask)
+
+    def check_write(self, op, entity_type, data):
+        """
+        DataManager write check (see DataManager.add_write_check) that rejects
+        saved or updated bookings overlapping another booking, so a conflict is
+        refused before it is stored instead of being dropped by on_change.
+        """
+        if entity_type == 'Booking' and not is_deleted(data):
+            self.check(data)
+
+    def reserve(self, booking):
+        """
+        Atomically check a booking's nights and mark them as booked.
+
+        Reserving a booking that is already in the index does nothing, so
+        the change event of a saved booking can be replayed safely.
+
+        Args:
+            booking (dict): The booking dictionary (id, place_id, check_in, check_out, guests).
+
+        Raises:
+            ValueError: If the place is unknown, the dates are invalid or the guests exceed its capacity.
+            BookingConflictError: If any night is already booked.
+        """
+        mask = self._mask(booking['check_in'], booking['check_out'])
+        with self._lock:
+            if booking['id'] in self._bookings:
+                return
+            self._check(booking, mask)
+            self._booked[booking['place_id']] |= mask
+            self._bookings[booking['id']] = (booking['place_id'], mask)
+
+    def move(self, booking):
+        """
+        Atomically move a booking to its new place, dates or guests.
+
+        Nothing changes if the new nights do not fit; the booking keeps its
+        previous reservation.
+
+        Args:
+            booking (dict): The updated booking dictionary.
+
+        Raises:
+            ValueError: If the place is unknown, the dates are invalid or the guests exceed its capacity.
+            BookingConflictError: If any new night is booked by another booking.
+        """
+        mask = self._mask(booking['check_in'], booking['check_out'])
+        with self._lock:
+            self._check(booking, mask)
+            entry = self._bookings.pop(booking['id'], None)
+            if entry is not None and entry[0] in self._booked:
+                self._booked[entry[0]] &= ~entry[1]
+            self._booked[booking['place_id']] |= mask
+            self._bookings[booking['id']] = (booking['place_id'], mask)
+
+    def release(self, booking_id):
+        """Free the nights held by a booking; unknown bookings are ignored."""
+        with self._lock:
+            entry = self._bookings.pop(booking_id, None)
+            if entry is not None and entry[0] in self._booked:
+                self._booked[entry[0]] &= ~entry[1]
+
+    def on_change(self, event):
+        """Change feed subscriber that keeps places and bookings indexed."""
+        if event.entity_type == 'Place':
+            if event.op == 'delete':
+                self.remove_place(event.entity_id)
+            else:
+                self.add_place(event.data)
+        elif event.entity_type == 'Booking':
+            if event.op == 'delete':
+                self.release(event.entity_id)
+                return
+            try:
+                if event.op == 'save':
+                    self.reserve(event.data)
+                else:
+                    self.move(event.data)
+            except (BookingConflictError, ValueError) as e:
+                # Only writes that skipped check_write get here; keep what the index already holds
+                logging.warning(f"Booking {event.entity_id} was stored but does not fit the availability index: {e}")
@@ -0,0 +1,553 @@
+"""
+Binary snapshot format for DataManager storage.
+
+Layout (all integers little-endian):
+
+    header      MAGIC, u32 type count
+    directory   per type: name, u32 record count, u32 field count,
+                u64 field table offset, u64 id table offset
+    field table per type: the field names used by its records
+    id table    per type: id, u64 record offset, u32 record length
+    records     u16 value count, then (u16 field index, tagged value) pairs
+
+Strings are u32 length-prefixed UTF-8. Timestamps are stored as i64
+microseconds so they come back as datetime objects without parsing; naive
+timestamps are stored as they are and aware ones converted to naive UTC.
+"""
+
+import json  # Import the json module to convert to and from storage.json
+import mmap  # Import the mmap module to map snapshot files into memory
+import os  # Import the os module for atomic file replacement
+import struct  # Import the struct module to pack and unpack binary values
+from datetime import datetime, timedelta, timezone  # Import the datetime module to handle date and time
+
+MAGIC = b'HBNBSNP1'  # File signature and format version
+
+# Value tags for the record encoding
+_TAG_NONE = 0
+_TAG_FALSE = 1
+_TAG_TRUE = 2
+_TAG_INT = 3
+_TAG_FLOAT = 4
+_TAG_STR = 5
+_TAG_DATETIME = 6
+_TAG_LIST = 7
+_TAG_DICT = 8
+
+# Fields stored as timestamps when they hold a parsable date string
+TIMESTAMP_FIELDS = ('created_at', 'updated_at', 'deleted_at')
+
+_EPOCH = datetime(1970, 1, 1)  # Reference point for timestamp encoding
+
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+
+
+def _pack_str(value):
+    """Encode a string as a u32 length-prefixed UTF-8 byte string."""
+    data = value.encode('utf-8')
+    return _U32.pack(len(data)) + data
+
+
+def _unpack_str(buf, pos):
+    """Decode a length-prefixed string at pos, returning (string, new_pos)."""
+    (length,) = _U32.unpack_from(buf, pos)
+    pos += 4
+    return bytes(buf[pos:pos + length]).decode('utf-8'), pos + length
+
+
+def _to_timestamp(value):
+    """Return value as a datetime if it is one or parses as one, else None."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _encode_value(value, out):
+    """Append the tagged binary encoding of value to the bytearray out."""
+    if value is None:
+        out.append(_TAG_NONE)
+    elif value is True:
+        out.append(_TAG_TRUE)
+    elif value is False:
+        out.append(_TAG_FALSE)
+    elif isinstance(value, int):
+        out.append(_TAG_INT)
+        out += _I64.pack(value)
+    elif isinstance(value, float):
+        out.append(_TAG_FLOAT)
+        out += _F64.pack(value)
+    elif isinstance(value, datetime):
+        out.append(_TAG_DATETIME)
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)  # Same instant, naive UTC
+        delta = value - _EPOCH
+        out += _I64.pack((delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+    elif isinstance(value, (list, tuple)):
+        out.append(_TAG_LIST)
+        out += _U32.pack(len(value))
+        for item in value:
+            _encode_value(item, out)
+    elif isinstance(value, dict):
+        out.append(_TAG_DICT)
+        out += _U32.pack(len(value))
+        for key, item in value.items():
+            out += _pack_str(str(key))
+            _encode_value(item, out)
+    else:
+        out.append(_TAG_STR)
+        out += _pack_str(str(value))  # Fall back to the string form, like json.dump(default=str)
+
+
+def _decode_value(buf, pos):
+    """Decode a tagged value at pos, returning (value, new_pos)."""
+    tag = buf[pos]
+    pos += 1
+    if tag == _TAG_NONE:
+        return None, pos
+    if tag == _TAG_TRUE:
+        return True, pos
+    if tag == _TAG_FALSE:
+        return False, pos
+    if tag == _TAG_INT:
+        return _I64.unpack_from(buf, pos)[0], pos + 8
+    if tag == _TAG_FLOAT:
+        return _F64.unpack_from(buf, pos)[0], pos + 8
+    if tag == _TAG_STR:
+        return _unpack_str(buf, pos)
+    if tag == _TAG_DATETIME:
+        (micros,) = _I64.unpack_from(buf, pos)
+        return _EPOCH + timedelta(microseconds=micros), pos + 8
+    if tag == _TAG_LIST:
+        (count,) = _U32.unpack_from(buf, pos)
+        pos += 4
+        items = []
+        for _ in range(count):
+            item, pos = _decode_value(buf, pos)
+            items.append(item)
+        return items, pos
+    if tag == _TAG_DICT:
+        (count,) = _U32.unpack_from(buf, pos)
+        pos += 4
+        items = {}
+        for _ in range(count):
+            key, pos = _unpack_str(buf, pos)
+            items[key], pos = _decode_value(buf, pos)
+        return items, pos
+    raise ValueError(f"Unknown value tag {tag} at offset {pos - 1}.")
+
+
+def _encode_section(entity_type, entities):
+    """Encodes one entity type as (name, field names, [(id, record bytes)])."""
+    fields = {}  # Field name -> field index for this entity type
+    records = []
+    for entity in entities or []:
+        record = bytearray(_U16.pack(len(entity)))
+        for key, value in entity.items():
+            index = fields.setdefault(key, len(fields))
+            record += _U16.pack(index)
+            if key in TIMESTAMP_FIELDS and _to_timestamp(value) is not None:
+                value = _to_timestamp(value)
+            _encode_value(value, record)
+        records.append((str(entity.get('id')), bytes(record)))
+    return entity_type, list(fields), records
+
+
+def _assemble(sections):
+    """Lays out encoded sections as a snapshot: header, directory, tables, then records."""
+    # Size the header and directory first so every table offset is known up front
+    header = MAGIC + _U32.pack(len(sections))
+    offset = len(header) + sum(len(_pack_str(name)) + 24 for name, _, _ in sections)
+    field_tables = []
+    table_offsets = []
+    for name, fields, records in sections:
+        field_table = b''.join(_pack_str(field) for field in fields)
+        id_table_size = sum(len(_pack_str(entity_id)) + 12 for entity_id, _ in records)
+        field_tables.append(field_table)
+        table_offsets.append((offset, offset + len(field_table)))
+        offset += len(field_table) + id_table_size
+
+    directory = bytearray()
+    tables = bytearray()
+    body = bytearray()
+    for (name, fields, records), field_table, (field_offset, id_offset) in zip(sections, field_tables, table_offsets):
+        directory += _pack_str(name) + _U32.pack(len(records)) + _U32.pack(len(fields))
+        directory += _U64.pack(field_offset) + _U64.pack(id_offset)
+        tables += field_table
+        for entity_id, record in records:
+            tables += _pack_str(entity_id) + _U64.pack(offset + len(body)) + _U32.pack(len(record))
+            body += record
+
+    return b''.join((header, directory, tables, body))
+
+
+def encode_snapshot(storage):
+    """
+    Encode a storage dictionary in the binary snapshot format.
+
+    Args:
+        storage (dict): Mapping of entity type name to a list of entity dictionaries.
+
+    Returns:
+        bytes: The encoded snapshot.
+    """
+    return _assemble([_encode_section(entity_type, entities) for entity_type, entities in storage.items()])
+
+
+def write_snapshot(storage, snapshot_file, changed=None, previous=None):
+    """
+    Write a storage dictionary to a binary snapshot file.
+
+    Only the changed entity types are encoded again. The records of the
+    other types are copied as they are from `previous`, the snapshot this
+    one replaces, and types a SnapshotStorage has not decoded yet are copied
+    from its own mapping, so a write neither decodes nor re-encodes them.
+
+    The file is written to a temporary path and moved into place, so readers
+    never observe a partially written snapshot.
+
+    Args:
+        storage (dict): Mapping of entity type name to a list of entity dictionaries.
+        snapshot_file (str): The file path for the snapshot file.
+        changed (iterable, optional): The entity types changed since `previous` was
+            written; defaults to every type.
+        previous (SnapshotReader, optional): Reader over the snapshot last written
+            from this storage.
+    """
+    changed = None if changed is None else set(changed)
+    lazy = storage if isinstance(storage, SnapshotStorage) else None
+    sections = []
+    for entity_type in (lazy.entity_types() if lazy is not None else list(storage.keys())):
+        if lazy is not None and not lazy.is_loaded(entity_type):
+            sections.append(lazy.reader.section(entity_type))  # Untouched since it was loaded
+        elif (changed is not None and entity_type not in changed and previous is not None
+              and entity_type in previous.entity_types()):
+            sections.append(previous.section(entity_type))  # Unchanged since the last write
+        else:
+            sections.append(_encode_section(entity_type, dict.get(storage, entity_type)))
+    temp_file = snapshot_file + '.tmp'
+    with open(temp_file, 'wb') as f:
+        f.write(_assemble(sections))
+    os.replace(temp_file, snapshot_file)  # Atomically swap in the new snapshot
+
+
+class SnapshotReader:
+    """
+    Memory-mapped reader for binary snapshots.
+
+    Only the type directory is parsed when the reader is opened. Field and id
+    tables are parsed the first time a type is touched, and individual records
+    are decoded on first access and (unless caching is disabled) then cached.
+
+    Attributes:
+        snapshot_file (str): The file path for the snapshot file, or None for a buffer.
+    """
+
+    def __init__(self, snapshot_file=None, buffer=None, cache=True):
+        """
+        Opens and maps a snapshot file, or wraps an existing buffer.
+
+        Args:
+            snapshot_file (str, optional): The file path for the snapshot file.
+            buffer (buffer, optional): An already mapped snapshot, e.g. a shared memory block.
+            cache (bool): Whether decoded records are kept for later accesses.
+        """
+        self.snapshot_file = snapshot_file  # Set the path for the snapshot file
+        self._file = None
+        if buffer is None:
+            self._file = open(snapshot_file, 'rb')
+            buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)  # Map the file read-only
+        self._buf = buffer
+        self._cache = cache  # Set whether decoded records are cached
+        if bytes(self._buf[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"{snapshot_file or 'Buffer'} is not an HBnB snapshot.")
+        self._directory = {}  # Entity type -> (record count, field count, field table offset, id table offset)
+        self._fields = {}  # Entity type -> list of field names
+        self._ids = {}  # Entity type -> {id: (record offset, record length)}
+        self._offsets = {}  # Entity type -> record offsets in stored order
+        self._decoded = {}  # Record offset -> decoded entity dictionary
+        (count,) = _U32.unpack_from(self._buf, len(MAGIC))
+        pos = len(MAGIC) + 4
+        for _ in range(count):
+            name, pos = _unpack_str(self._buf, pos)
+            records, fields = struct.unpack_from('<II', self._buf, pos)
+            field_offset, id_offset = struct.unpack_from('<QQ', self._buf, pos + 8)
+            self._directory[name] = (records, fields, field_offset, id_offset)
+            pos += 24
+
+    def close(self):
+        """Releases the memory map and the underlying file; wrapped buffers are left to their owner."""
+        if self._file is not None:
+            self._buf.close()
+            self._file.close()
+
+    def entity_types(self):
+        """Returns the entity type names stored in the snapshot."""
+        return list(self._directory)
+
+    def count(self, entity_type):
+        """Returns the number of records stored for an entity type."""
+        entry = self._directory.get(entity_type)
+        return entry[0] if entry else 0
+
+    def _index(self, entity_type):
+        """Parses and caches the field and id tables for an entity type."""
+        if entity_type not in self._ids:
+            records, field_count, field_offset, id_offset = self._directory[entity_type]
+            fields = []
+            pos = field_offset
+            for _ in range(field_count):
+                field, pos = _unpack_str(self._buf, pos)
+                fields.append(field)
+            ids = {}
+            offsets = []
+            pos = id_offset
+            for _ in range(records):
+                entity_id, pos = _unpack_str(self._buf, pos)
+                location = struct.unpack_from('<QI', self._buf, pos)
+                ids.setdefault(entity_id, location)  # The first record wins, like a linear scan
+                offsets.append(location[0])
+                pos += 12
+            self._fields[entity_type] = fields
+            self._ids[entity_type] = ids
+            self._offsets[entity_type] = offsets
+        return self._ids[entity_type]
+
+    def _decode(self, entity_type, offset, cache=True):
+        """Decodes (or returns the cached decoding of) the record at offset."""
+        entity = self._decoded.get(offset)
+        if entity is None:
+            fields = self._fields[entity_type]
+            (count,) = _U16.unpack_from(self._buf, offset)
+            pos = offset + 2
+            entity = {}
+            for _ in range(count):
+                (index,) = _U16.unpack_from(self._buf, pos)
+                entity[fields[index]], pos = _decode_value(self._buf, pos + 2)
+            if self._cache and cache:
+                self._decoded[offset] = entity
+        return entity
+
+    def read_entity(self, entity_type, entity_id):
+        """
+        Decode a single entity through the id offset table.
+
+        Args:
+            entity_type (str): The type of the entity to retrieve.
+            entity_id (str): The ID of the entity to retrieve.
+
+        Returns:
+            dict: The decoded entity or None if not found.
+        """
+        if entity_type not in self._directory:
+            return None
+        location = self._index(entity_type).get(entity_id)
+        if location is None:
+            return None
+        return self._decode(entity_type, location[0])
+
+    def read_all(self, entity_type):
+        """
+        Decode every entity of a type, in stored order.
+
+        Args:
+            entity_type (str): The type of the entities to retrieve.
+
+        Returns:
+            list: The decoded entity dictionaries.
+        """
+        if entity_type not in self._directory:
+            return []
+        self._index(entity_type)
+        return [self._decode(entity_type, offset) for offset in self._offsets[entity_type]]
+
+    def section(self, entity_type):
+        """
+        Copy the records of an entity type without decoding them.
+
+        Args:
+            entity_type (str): The type to copy.
+
+        Returns:
+            tuple: (name, field names, [(id, record bytes)]), as written by write_snapshot().
+        """
+        records, field_count, field_offset, id_offset = self._directory[entity_type]
+        fields = []
+        pos = field_offset
+        for _ in range(field_count):
+            field, pos = _unpack_str(self._buf, pos)
+            fields.append(field)
+        copied = []
+        pos = id_offset
+        for _ in range(records):
+            entity_id, pos = _unpack_str(self._buf, pos)
+            offset, length = struct.unpack_from('<QI', self._buf, pos)
+            copied.append((entity_id, bytes(self._buf[offset:offset + length])))
+            pos += 12
+        return entity_type, fields, copied
+
+    def iter_all(self, entity_type):
+        """
+        Decode the entities of a type one at a time, in stored order.
+
+        Records decoded here are not cached, so walking a whole type keeps
+        only the record in hand in memory.
+
+        Args:
+            entity_type (str): The type of the entities to retrieve.
+
+        Yields:
+            dict: The decoded entity dictionaries.
+        """
+        if entity_type not in self._directory:
+            return
+        self._index(entity_type)
+        for offset in self._offsets[entity_type]:
+            yield self._decode(entity_type, offset, cache=False)
+
+
+class SnapshotStorage(dict):
+    """
+    Storage dictionary backed by a SnapshotReader.
+
+    Behaves like the plain dictionary DataManager keeps in `storage`, but each
+    entity type is only decoded from the snapshot the first time it is read.
+    """
+
+    def __init__(self, reader):
+        """
+        Initializes the storage with every type still pending.
+
+        Args:
+            reader (SnapshotReader): The reader for the mapped snapshot.
+        """
+        super().__init__()
+        self.reader = reader  # Set the snapshot reader
+        self._pending = set(reader.entity_types())  # Types not yet decoded into the dictionary
+
+    def _materialize(self, entity_type):
+        """Decodes an entity type into the dictionary if it is still pending."""
+        if entity_type in self._pending:
+            self._pending.discard(entity_type)
+            super().__setitem__(entity_type, self.reader.read_all(entity_type))
+
+    def materialize(self):
+        """Decodes every pending entity type."""
+        for entity_type in list(self._pending):
+            self._materialize(entity_type)
+
+    def entity_types(self):
+        """Returns every entity type, decoded or not, without decoding any."""
+        return list(super().keys()) + sorted(self._pending)
+
+    def is_loaded(self, entity_type):
+        """Returns True if the entity type has been decoded into the dictionary."""
+        return entity_type not in self._pending
+
+    def __getitem__(self, entity_type):
+        self._materialize(entity_type)
+        return super().__getitem__(entity_type)
+
+    def __setitem__(self, entity_type, value):
+        self._pending.discard(entity_type)
+        super().__setitem__(entity_type, value)
+
+    def __delitem__(self, entity_type):
+        self._pending.discard(entity_type)
+        super().__delitem__(entity_type)
+
+    def __contains__(self, entity_type):
+        return entity_type in self._pending or super().__contains__(entity_type)
+
+    def __iter__(self):
+        self.materialize()
+        return super().__iter__()
+
+    def __len__(self):
+        return len(self._pending) + super().__len__()
+
+    def get(self, entity_type, default=None):
+        self._materialize(entity_type)
+        return super().get(entity_type, default)
+
+    def setdefault(self, entity_type, default=None):
+        self._materialize(entity_type)
+        return super().setdefault(entity_type, default)
+
+    def keys(self):
+        self.materialize()
+        return super().keys()
+
+    def values(self):
+        self.materialize()
+        return super().values()
+
+    def items(self):
+        self.materialize()
+        return super().items()
+
+
+def load_snapshot(snapshot_file):
+    """
+    Open a snapshot file as a lazily decoded storage dictionary.
+
+    Args:
+        snapshot_file (str): The file path for the snapshot file.
+
+    Returns:
+        SnapshotStorage: The storage dictionary backed by the mapped file.
+    """
+    return SnapshotStorage(SnapshotReader(snapshot_file))
+
+
+def json_to_snapshot(json_file, snapshot_file):
+    """
+    Convert a storage.json file into a binary snapshot.
+
+    Args:
+        json_file (str): The file path of the JSON storage file.
+        snapshot_file (str): The file path for the snapshot file.
+    """
+    with open(json_file, 'r') as f:
+        storage = json.load(f)
+    write_snapshot({key: value if isinstance(value, list) else [] for key, value in storage.items()}, snapshot_file)
+
+
+def snapshot_to_json(snapshot_file, json_file):
+    """
+    Convert a binary snapshot back into a storage.json file.
+
+    Args:
+        snapshot_file (str): The file path of the snapshot file.
+        json_file (str): The file path for the JSON storage file.
+    """
+    reader = SnapshotReader(snapshot_file)
+    try:
+        storage = {entity_type: reader.read_all(entity_type) for entity_type in reader.entity_types()}
+        with open(json_file, 'w') as f:
+            json.dump(storage, f, default=str)  # Timestamps are written back in their str() form
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert between storage.json and binary snapshots.')
+    parser.add_argument('direction', choices=['to-snapshot', 'to-json'])
+    parser.add_argument('source')
+    parser.add_argument('target')
+    args = parser.parse_args()
+    if args.direction == 'to-snapshot':
+        json_to_snapshot(args.source, args.target)
+    else:
+        snapshot_to_json(args.source, args.target)
@@ -0,0 +1,305 @@
+import math  # Import the math module for the sketch's logarithmic buckets
+import threading  # Import the threading module to guard the aggregates
+from .vacuum import is_deleted  # Import the tombstone check; soft-deleted places are not counted
+
+UNKNOWN = 'unknown'  # Group key of places whose city or country is unknown
+
+def _round(value):
+    """Rounds an optional figure to cents."""
+    return None if value is None else round(value, 2)
+
+class QuantileSketch:
+    """
+    Quantile sketch with relative accuracy that supports removals.
+
+    Positive values are counted in logarithmic buckets: bucket i holds the
+    values in (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so any
+    quantile is returned within a relative error `a` of the true value.
+    Adding or removing a value touches one bucket; zero and negative values
+    share a single bucket. Quantiles walk the buckets, whose number grows
+    with the log of the value range rather than with the number of values.
+
+    Attributes:
+        relative_accuracy (float): The relative error bound of quantiles.
+        count (int): Number of values in the sketch.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        """
+        Initializes a new QuantileSketch instance.
+
+        Args:
+            relative_accuracy (float): The relative error bound of quantiles, between 0 and 1.
+        """
+        self.relative_accuracy = relative_accuracy  # Set the relative error bound
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)  # Ratio between bucket bounds
+        self._log_gamma = math.log(self._gamma)
+        self._buckets = {}  # Bucket index -> count of values
+        self._non_positive = 0  # Count of values <= 0
+        self.count = 0  # Number of values
+
+    def add(self, value, count=1):
+        """Add a value count times; a negative count removes it."""
+        if value <= 0:
+            self._non_positive += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            remaining = self._buckets.get(index, 0) + count
+            if remaining:
+                self._buckets[index] = remaining
+            else:
+                del self._buckets[index]
+        self.count += count
+
+    def remove(self, value):
+        """Remove one occurrence of a value."""
+        self.add(value, -1)
+
+    def merge(self, other, sign=1):
+        """Add (sign=1) or subtract (sign=-1) every value of another sketch with the same accuracy."""
+        self._non_positive += sign * other._non_positive
+        for index, count in other._buckets.items():
+            remaining = self._buckets.get(index, 0) + sign * count
+            if remaining:
+                self._buckets[index] = remaining
+            else:
+                del self._buckets[index]
+        self.count += sign * other.count
+
+    def quantile(self, q):
+        """
+        Estimate a quantile.
+
+        Args:
+            q (float): The quantile, between 0 and 1 (0.5 is the median).
+
+        Returns:
+            float: The estimate, or None if the sketch is empty.
+        """
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self._non_positive
+        if rank < seen:
+            return 0.0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if rank < seen:
+                return 2 * self._gamma ** index / (self._gamma + 1)  # Midpoint that is within a of every value in the bucket
+        return 2 * self._gamma ** max(self._buckets) / (self._gamma + 1)
+
+class _Aggregate:
+    """
+    Counts, per-field sums and a price sketch for one group of places.
+    """
+
+    def __init__(self, fields, relative_accuracy):
+        self.count = 0  # Places in the group
+        self.sums = dict.fromkeys(fields, 0.0)  # Field -> sum of its numeric values
+        self.counts = dict.fromkeys(fields, 0)  # Field -> number of numeric values
+        self.prices = QuantileSketch(relative_accuracy)  # Sketch of price_per_night
+
+    def add(self, contribution, sign=1):
+        """Add (sign=1) or subtract (sign=-1) the contribution of one place."""
+        self.count += sign
+        for field, value in contribution.items():
+            if value is not None:
+                self.sums[field] += sign * value
+                self.counts[field] += sign
+        price = contribution.get('price_per_night')
+        if price is not None:
+            self.prices.add(price, sign)
+
+    def merge(self, other, sign=1):
+        """Add (sign=1) or subtract (sign=-1) every place of another aggregate."""
+        self.count += sign * other.count
+        for field in self.sums:
+            self.sums[field] += sign * other.sums[field]
+            self.counts[field] += sign * other.counts[field]
+        self.prices.merge(other.prices, sign)
+
+    def summary(self, quantiles):
+        """Returns the group's figures as a dictionary."""
+        return {
+            'places': self.count,
+            'sums': {field: round(total, 2) for field, total in self.sums.items()},
+            'averages': {field: round(self.sums[field] / self.counts[field], 2) if self.counts[field] else None
+                         for field in self.sums},
+            'price_quantiles': {str(q): _round(self.prices.quantile(q)) for q in quantiles},
+        }
+
+class CatalogStats:
+    """
+    Materialized place aggregates grouped by city, by country and overall.
+
+    Each place contributes to its city's aggregate, to the aggregate of the
+    city's country (through City.country_code) and to the overall one. A
+    place mutation subtracts the place's previous contribution and adds the
+    new one, so it costs O(1) whatever the catalog size. A city that moves
+    to another country moves its whole aggregate across. Places whose city
+    is unknown are grouped under the country 'unknown'.
+
+    Subscribe `on_change` to the DataManager's change feed to keep the
+    aggregates current.
+
+    Attributes:
+        fields (tuple): Numeric place fields that are summed and averaged.
+        relative_accuracy (float): Relative error bound of the price quantiles.
+    """
+
+    FIELDS = ('price_per_night', 'number_of_rooms', 'number_of_bathrooms', 'max_guests')
+
+    def __init__(self, fields=FIELDS, relative_accuracy=0.01):
+        """
+        Initializes a new CatalogStats instance.
+
+        Args:
+            fields (tuple): Numeric place fields that are summed and averaged.
+            relative_accuracy (float): Relative error bound of the price quantiles.
+        """
+        self.fields = tuple(fields)  # Set the aggregated fields
+        self.relative_accuracy = relative_accuracy  # Set the price quantile accuracy
+        self._lock = threading.Lock()  # Guards the aggregates
+        self._reset()
+
+    def _reset(self):
+        """Drops every aggregate."""
+        self._places = {}  # Place id -> (city id, contribution)
+        self._city_country = {}  # City id -> country code
+        self._cities = {}  # City id -> _Aggregate
+        self._countries = {}  # Country code -> _Aggregate
+        self._overall = self._aggregate()  # Every place
+
+    def _aggregate(self):
+        """Returns an empty aggregate."""
+        return _Aggregate(self.fields, self.relative_accuracy)
+
+    def _contribution(self, place):
+        """Returns the numeric field values a place dictionary contributes."""
+        contribution = {}
+        for field in self.fields:
+            value = place.get(field)
+            numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+            contribution[field] = float(value) if numeric else None
+        return contribution
+
+    def _apply(self, city_id, contribution, sign):
+        """Adds or subtracts a place's contribution to its groups (called with the lock held)."""
+        city = self._cities.get(city_id)
+        if city is None:
+            city = self._cities[city_id] = self._aggregate()
+        country_code = self._city_country.get(city_id)
+        country = self._countries.get(country_code)
+        if country is None:
+            country = self._countries[country_code] = self._aggregate()
+        for aggregate in (city, country, self._overall):
+            aggregate.add(contribution, sign)
+        if not city.count:
+            del self._cities[city_id]
+        if not country.count:
+            del self._countries[country_code]
+
+    def build(self, storage):
+        """
+        Rebuild the aggregates from a storage dictionary.
+
+        Args:
+            storage (dict): Mapping of entity type name to a list of entity dictionaries.
+        """
+        with self._lock:
+            self._reset()
+            for city in storage.get('City', None) or []:
+                if not is_deleted(city) and city.get('id') is not None:
+                    self._city_country[city['id']] = city.get('country_code')
+        for place in storage.get('Place', None) or []:
+            if not is_deleted(place) and place.get('id') is not None:
+                self.upsert_place(place)
+
+    def upsert_place(self, place):
+        """Count a new place, or replace the contribution of a known one."""
+        contribution = self._contribution(place)
+        with self._lock:
+            previous = self._places.get(place['id'])
+            if previous is not None:
+                self._apply(previous[0], previous[1], -1)
+            self._places[place['id']] = (place.get('city_id'), contribution)
+            self._apply(place.get('city_id'), contribution, 1)
+
+    def remove_place(self, place_id):
+        """Stop counting a place; unknown places are ignored."""
+        with self._lock:
+            previous = self._places.pop(place_id, None)
+            if previous is not None:
+                self._apply(previous[0], previous[1], -1)
+
+    def set_city_country(self, city_id, country_code):
+        """Record a city's country, moving the city's aggregate if the country changed."""
+        with self._lock:
+            previous = self._city_country.get(city_id)
+            if city_id in self._city_country and previous == country_code:
+                return
+            self._city_country[city_id] = country_code
+            city = self._cities.get(city_id)
+            if city is None:
+                return
+            source = self._countries[previous]
+            source.merge(city, -1)
+            if not source.count:
+                del self._countries[previous]
+            target = self._countries.get(country_code)
+            if target is None:
+                target = self._countries[country_code] = self._aggregate()
+            target.merge(city)
+
+    def on_change(self, event):
+        """Change feed subscriber that keeps the aggregates current."""
+        if event.entity_type == 'Place':
+            if event.op == 'delete':
+                self.remove_place(event.entity_id)
+            else:
+                self.upsert_place(event.data)
+        elif event.entity_type == 'City':
+            # Places left behind by a deleted city move to the unknown country
+            self.set_city_country(event.entity_id, None if event.op == 'delete' else event.data.get('country_code'))
+
+    def overall(self, quantiles=(0.25, 0.5, 0.75, 0.9)):
+        """Returns the figures of every place."""
+        with self._lock:
+            return self._overall.summary(quantiles)
+
+    def by_city(self, city_id=None, quantiles=(0.25, 0.5, 0.75, 0.9)):
+        """
+        Return the figures of one city, or of every city with places.
+
+        Args:
+            city_id (str, optional): The city; omit for every city.
+            quantiles (tuple): The price quantiles to report.
+
+        Returns:
+            dict: The city's figures (None if it has no places), or city id -> figures,
+                with places without a city under the key 'unknown'.
+        """
+        with self._lock:
+            if city_id is not None:
+                aggregate = self._cities.get(city_id)
+                return aggregate.summary(quantiles) if aggregate is not None else None
+            return {UNKNOWN if key is None else key: aggregate.summary(quantiles) for key, aggregate in self._cities.items()}
+
+    def by_country(self, country_code=None, quantiles=(0.25, 0.5, 0.75, 0.9)):
+        """
+        Return the figures of one country, or of every country with places.
+
+        Args:
+            country_code (str, optional): The country code; omit for every country.
+            quantiles (tuple): The price quantiles to report.
+
+        Returns:
+            dict: The country's figures (None if it has no places), or country code -> figures,
+                with places of unknown cities under the key 'unknown'.
+        """
+        with self._lock:
+            if country_code is not None:
+                aggregate = self._countries.get(country_code)
+                return aggregate.summary(quantiles) if aggregate is not None else None
+            return {UNKNOWN if key is None else key: aggregate.summary(quantiles)
+                    for key, aggregate in self._countries.items()}
@@ -0,0 +1,340 @@
+import json  # Import the json module to encode events in the feed log
+import os  # Import the os module to inspect the feed log
+import threading  # Import the threading module to order appends and wake waiters
+from datetime import datetime  # Import the datetime module to timestamp events
+from collections import deque  # Import deque for the bounded in-memory event buffer
+
+class ChangeEvent:
+    """
+    Represents one mutation emitted by a persistence manager.
+
+    Attributes:
+        version (int): Monotonically increasing position of the event in the feed.
+        op (str): The mutation kind: 'save', 'update' or 'delete'.
+        entity_type (str): The type of the mutated entity.
+        entity_id (str): The ID of the mutated entity.
+        data (dict): The entity dictionary after the mutation, or None for deletes.
+        recorded_at (datetime): When the mutation happened, in naive local time.
+    """
+
+    OPS = ('save', 'update', 'delete')  # Supported mutation kinds
+
+    def __init__(self, version, op, entity_type, entity_id, data=None, recorded_at=None):
+        """
+        Initializes a new ChangeEvent instance.
+
+        Args:
+            version (int): Position of the event in the feed.
+            op (str): The mutation kind.
+            entity_type (str): The type of the mutated entity.
+            entity_id (str): The ID of the mutated entity.
+            data (dict, optional): The entity dictionary after the mutation.
+            recorded_at (datetime, optional): When the mutation happened; defaults to now.
+        """
+        if op not in self.OPS:
+            raise ValueError(f"Unknown change operation {op}.")
+        self.version = version  # Set the feed position
+        self.op = op  # Set the mutation kind
+        self.entity_type = entity_type  # Set the type of the mutated entity
+        self.entity_id = entity_id  # Set the ID of the mutated entity
+        self.data = data  # Set the entity dictionary after the mutation
+        self.recorded_at = recorded_at or datetime.now()  # Set the mutation time, kept through the log
+
+    def to_dict(self):
+        """Returns the event as a JSON-serializable dictionary."""
+        return {
+            'version': self.version,
+            'op': self.op,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'data': self.data,
+            'recorded_at': self.recorded_at.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds an event from the dictionary produced by to_dict()."""
+        recorded_at = datetime.fromisoformat(data['recorded_at']) if data.get('recorded_at') else None  # Older logs have none
+        return cls(data['version'], data['op'], data['entity_type'], data['entity_id'], data.get('data'), recorded_at)
+
+
+class ChangeFeed:
+    """
+    Ordered sequence of mutation events with a monotonically increasing version.
+
+    The leader DataManager appends to the feed on every save/update/delete.
+    Recent events are kept in a bounded in-memory buffer for in-process
+    subscribers; when a log file is configured every event is also appended
+    to it as a JSON line so followers in other processes can tail it.
+
+    The log is bounded by checkpoints. A checkpoint records a version in a
+    `<log_file>.checkpoint` file and rewrites the log without the events up
+    to it. The persistence manager has written its storage before it
+    appends an event, so the stored state always includes every event up to
+    the checkpoint: followers start from the storage and replay only what
+    follows the checkpoint.
+
+    Attributes:
+        log_file (str): The file path of the JSON lines event log, or None.
+        capacity (int): Maximum number of events kept in memory.
+        version (int): Version of the most recent event (0 before any event).
+        checkpoint_every (int): Events appended between automatic checkpoints, or None for none.
+        keep (int): Events left in the log after a checkpoint.
+    """
+
+    def __init__(self, log_file=None, capacity=10000, checkpoint_every=None, keep=None):
+        """
+        Initializes a new ChangeFeed instance, resuming from an existing log.
+
+        Args:
+            log_file (str, optional): The file path of the JSON lines event log.
+            capacity (int): Maximum number of events kept in memory.
+            checkpoint_every (int, optional): Checkpoint the log after this many appended events.
+            keep (int, optional): Most recent events left in the log by a checkpoint, so
+                history and cursors within them survive a restart; defaults to capacity.
+        """
+        self.log_file = log_file  # Set the path for the event log
+        self.capacity = capacity  # Set the in-memory buffer size
+        self.checkpoint_every = checkpoint_every  # Set the automatic checkpoint interval
+        self.keep = capacity if keep is None else keep  # Set the events kept past a checkpoint
+        self.events = deque(maxlen=capacity)  # Most recent events, oldest first
+        self.version = 0  # No events yet
+        self._since_checkpoint = 0  # Events appended since the last checkpoint
+        self._subscribers = []  # Callbacks invoked for every appended event
+        self._condition = threading.Condition()  # Orders appends and wakes version waiters
+        if log_file:
+            self.version = self.read_checkpoint(log_file)  # The log may hold nothing past the checkpoint
+            if os.path.exists(log_file):
+                for event in self.read_log(log_file)[0]:
+                    self.events.append(event)
+                    self.version = max(self.version, event.version)  # Resume numbering after the last logged event
+
+    @staticmethod
+    def read_checkpoint(log_file):
+        """
+        Read the version of the last checkpoint of a feed log.
+
+        Args:
+            log_file (str): The file path of the JSON lines event log.
+
+        Returns:
+            int: The checkpoint version; 0 if the log was never checkpointed.
+        """
+        try:
+            with open(log_file + '.checkpoint') as f:
+                return json.load(f)['version']
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def read_log(log_file, offset=0):
+        """
+        Read complete events from a feed log starting at a byte offset.
+
+        A trailing line without a newline is still being written and is left
+        for the next read.
+
+        Args:
+            log_file (str): The file path of the JSON lines event log.
+            offset (int): The byte offset to start reading from.
+
+        Returns:
+            tuple: (list of ChangeEvent, byte offset just past the last complete line)
+        """
+        events = []
+        try:
+            with open(log_file, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    offset += len(line)
+                    events.append(ChangeEvent.from_dict(json.loads(line)))
+        except FileNotFoundError:
+            pass
+        return events, offset
+
+    @staticmethod
+    def follow_log(log_file, cursor=None):
+        """
+        Read the events appended to a feed log since a cursor, across checkpoints.
+
+        A checkpoint replaces the log file, so the cursor remembers which file
+        it points into; once the log has been replaced it is read again from
+        its start. Callers skip the events they have already applied by
+        version, and must reload the stored state when the first event
+        returned is past the next one they expected (the events in between
+        were dropped by a checkpoint).
+
+        Args:
+            log_file (str): The file path of the JSON lines event log.
+            cursor (tuple, optional): The cursor returned by the previous call.
+
+        Returns:
+            tuple: (list of ChangeEvent, cursor for the next call)
+        """
+        identity, offset = cursor or (None, 0)
+        events = []
+        try:
+            with open(log_file, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if (stat.st_dev, stat.st_ino) != identity:
+                    identity, offset = (stat.st_dev, stat.st_ino), 0  # A new file since the last read
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    offset += len(line)
+                    events.append(ChangeEvent.from_dict(json.loads(line)))
+        except FileNotFoundError:
+            pass
+        return events, (identity, offset)
+
+    def append(self, op, entity_type, entity_id, data=None):
+        """
+        Append a mutation event and notify subscribers.
+
+        Args:
+            op (str): The mutation kind: 'save', 'update' or 'delete'.
+            entity_type (str): The type of the mutated entity.
+            entity_id (str): The ID of the mutated entity.
+            data (dict, optional): The entity dictionary after the mutation.
+
+        Returns:
+            ChangeEvent: The appended event.
+        """
+        with self._condition:
+            event = ChangeEvent(self.version + 1, op, entity_type, entity_id, dict(data) if data is not None else None)
+            subscribers = self._record(event)
+        for callback in subscribers:
+            callback(event)
+        return event
+
+    def replay(self, event):
+        """
+        Append an event numbered by another feed, such as the writer process's
+        feed mirrored into a worker, and notify subscribers.
+
+        Events at or below the current version were already seen and are
+        ignored, so the same event can be delivered twice safely.
+
+        Args:
+            event (ChangeEvent): The event, keeping its version.
+
+        Returns:
+            bool: True if the event was appended.
+        """
+        with self._condition:
+            if event.version <= self.version:
+                return False
+            subscribers = self._record(event)
+        for callback in subscribers:
+            callback(event)
+        return True
+
+    def _record(self, event):
+        """Logs and buffers an event and wakes waiters (called with the condition held); returns the subscribers."""
+        if self.log_file:
+            with open(self.log_file, 'a') as f:
+                f.write(json.dumps(event.to_dict(), default=str) + '\n')  # One complete line per event
+            self._since_checkpoint += 1
+        self.events.append(event)
+        self.version = event.version
+        if self.checkpoint_every and self._since_checkpoint >= self.checkpoint_every:
+            self._checkpoint(self.version - self.keep)
+        self._condition.notify_all()
+        return list(self._subscribers)
+
+    def checkpoint(self, version=None):
+        """
+        Record a checkpoint and drop the logged events up to it.
+
+        Only call it with a version the persistence manager's stored state
+        already reflects (any version it has emitted, since it writes before
+        it emits).
+
+        Args:
+            version (int, optional): The checkpoint version; defaults to the
+                current version minus `keep`.
+
+        Returns:
+            int: The checkpoint version.
+        """
+        with self._condition:
+            return self._checkpoint(self.version - self.keep if version is None else version)
+
+    def _checkpoint(self, version):
+        """Writes the checkpoint file, then rewrites the log (called with the condition held)."""
+        self._since_checkpoint = 0
+        if not self.log_file:
+            return 0
+        previous = self.read_checkpoint(self.log_file)
+        version = min(version, self.version)
+        if version <= previous:
+            return previous  # Checkpoints never move back, and an unchanged one needs no rewrite
+        temp_file = self.log_file + '.checkpoint.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump({'version': version}, f)
+        os.replace(temp_file, self.log_file + '.checkpoint')  # Recorded first, so a crash leaves a longer log, not a gap
+        events, _ = self.read_log(self.log_file)
+        temp_file = self.log_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            for event in events:
+                if event.version > version:
+                    f.write(json.dumps(event.to_dict(), default=str) + '\n')
+        os.replace(temp_file, self.log_file)  # Followers notice the new file and read it from the start
+        return version
+
+    def since(self, version):
+        """
+        Return the buffered events newer than a version.
+
+        Args:
+            version (int): The last version the caller has seen.
+
+        Returns:
+            list: The newer events, oldest first. If events after `version` have
+            already left the buffer the result starts later than version + 1;
+            callers can detect the gap by comparing the first event's version.
+        """
+        with self._condition:
+            return [event for event in self.events if event.version > version]
+
+    def oldest_version(self):
+        """Returns the version of the oldest buffered event, or None if the buffer is empty."""
+        with self._condition:
+            return self.events[0].version if self.events else None
+
+    def wait_for(self, version, timeout=None):
+        """
+        Block until the feed reaches a version.
+
+        Args:
+            version (int): The version to wait for.
+            timeout (float, optional): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if the version was reached, False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version >= version, timeout)
+
+    def subscribe(self, callback):
+        """
+        Register a callback invoked with every appended event.
+
+        Args:
+            callback (callable): Function taking a ChangeEvent.
+        """
+        with self._condition:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Remove a callback registered with subscribe().
+
+        Args:
+            callback (callable): The callback to remove.
+        """
+        with self._condition:
+            self._subscribers.remove(callback)
@@ -0,0 +1,530 @@
+"""
+Columnar export of DataManager storage for analytics.
+
+Each entity type is written in chunks of at most `chunk_rows` entities,
+with one file per column per chunk, so an export holds one chunk in memory
+whatever the size of the dataset. Entities are read from the persistence
+manager one at a time; types still in a mapped binary snapshot are decoded
+record by record without being loaded.
+
+Layout of an export directory:
+
+    manifest.json                          parts, entity types, chunks and column kinds
+    <part>/<Type>/00000.<column>.npy       column values ('npy' layout)
+    <part>/<Type>/00000.<column>.valid.npy null mask, only when the chunk has nulls
+    <part>/<Type>/00000.<column>.dict.json string dictionary of a 'string' or 'json' column
+    <part>/<Type>/00000.csv                every column of a chunk ('csv' layout)
+
+Column kinds and their .npy dtypes: int64 '<i8', float64 '<f8', bool '|b1',
+timestamp '<M8[us]' (microseconds since the epoch, naive local time like the
+stored timestamps), and string and json '<i4' codes into the chunk's
+dictionary (-1 for null; json values are JSON encoded). Kinds are inferred
+per chunk, so a column can change kind between chunks; the manifest records
+the kind of every column of every chunk. The .npy files follow NumPy format
+1.0 and are written without NumPy: `numpy.load(path, mmap_mode='r')` maps
+them directly, and ColumnarExport maps them with mmap with or without NumPy.
+
+A full export writes a new manifest with a single part. An incremental
+export appends a part holding the entities changed (updated_at, or
+deleted_at for tombstones) after the previous part's watermark, tombstones
+included, so consumers apply the parts in order and let later rows replace
+earlier ones by id. Hard deletes leave nothing to export; keep soft deletes
+on for incremental consumers. In the csv layout empty strings read back as
+nulls.
+"""
+
+import ast  # Import the ast module to parse .npy headers
+import csv  # Import the csv module for the csv layout
+import json  # Import the json module for the manifest and string dictionaries
+import mmap  # Import the mmap module to map column files
+import os  # Import the os module to manage export directories
+import shutil  # Import the shutil module to remove superseded parts
+import struct  # Import the struct module for .npy headers
+import sys  # Import the sys module to check the byte order
+from array import array  # Import array for typed column buffers
+from datetime import datetime, timedelta  # Import the datetime module to handle date and time
+from .binary_snapshot import MAGIC, TIMESTAMP_FIELDS, SnapshotStorage, _to_timestamp  # Import the snapshot helpers
+from .data_manager import DataManager  # Import the DataManager class to open export sources
+from .vacuum import TOMBSTONE_FIELD, is_deleted  # Import the soft delete tombstone helpers
+
+try:
+    import numpy  # Optional: column arrays are returned as NumPy memmaps when available
+except ImportError:
+    numpy = None
+
+FORMAT = 'hbnb-columns'  # Manifest format name
+FORMAT_VERSION = 1  # Manifest format version
+MANIFEST = 'manifest.json'  # Manifest file name inside an export directory
+LAYOUTS = ('npy', 'csv')  # Supported file layouts
+
+# Column kind -> (.npy dtype descriptor, array typecode)
+KINDS = {
+    'int64': ('<i8', 'q'),
+    'float64': ('<f8', 'd'),
+    'bool': ('|b1', 'B'),
+    'timestamp': ('<M8[us]', 'q'),
+    'string': ('<i4', 'i'),
+    'json': ('<i4', 'i'),
+}
+
+_NPY_MAGIC = b'\x93NUMPY'
+_EPOCH = datetime(1970, 1, 1)  # Reference point for timestamp encoding
+_MICROSECOND = timedelta(microseconds=1)
+_INT64_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def _naive(value):
+    """Returns a timestamp as naive local time, parsing strings; None if it is not a timestamp."""
+    value = _to_timestamp(value)
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def changed_at(entity):
+    """Returns when an entity dictionary last changed: its deletion, update or creation time, or None."""
+    for field in (TOMBSTONE_FIELD, 'updated_at', 'created_at'):
+        value = _naive(entity.get(field))
+        if value is not None:
+            return value
+    return None
+
+
+def write_npy(path, descr, data):
+    """
+    Write a one-dimensional array as a NumPy format 1.0 .npy file.
+
+    Args:
+        path (str): The file path.
+        descr (str): The little-endian dtype descriptor, e.g. '<i8'.
+        data (array): The values; an array.array or bytes for one-byte values.
+    """
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, len(data))
+    header += ' ' * (-(len(_NPY_MAGIC) + 4 + len(header) + 1) % 64) + '\n'  # Data starts 64-byte aligned
+    if isinstance(data, array) and data.itemsize > 1 and sys.byteorder == 'big':
+        data = array(data.typecode, data)
+        data.byteswap()
+    with open(path, 'wb') as f:
+        f.write(_NPY_MAGIC + b'\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1'))
+        f.write(data)
+
+
+def map_npy(path):
+    """
+    Map a .npy file written by write_npy.
+
+    Returns:
+        tuple: (mmap, dtype descriptor, data offset, number of values).
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # The map outlives the file object
+    if mapped[:len(_NPY_MAGIC)] != _NPY_MAGIC:
+        mapped.close()
+        raise ValueError(f"{path} is not a .npy file.")
+    (length,) = struct.unpack_from('<H', mapped, 8)
+    header = ast.literal_eval(mapped[10:10 + length].decode('latin1'))
+    return mapped, header['descr'], 10 + length, header['shape'][0]
+
+
+def _column_kind(name, values):
+    """Infers the kind of a chunk's column from its values."""
+    present = [value for value in values if value is not None]
+    if not present:
+        return 'string'
+    if all(isinstance(value, bool) for value in present):
+        return 'bool'
+    if all(isinstance(value, int) and not isinstance(value, bool) and value in _INT64_RANGE for value in present):
+        return 'int64'
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return 'float64'
+    if name in TIMESTAMP_FIELDS and all(_naive(value) is not None for value in present):
+        return 'timestamp'
+    if any(isinstance(value, (list, tuple, dict)) for value in present):
+        return 'json'
+    return 'string'
+
+
+def _micros(value):
+    """Returns a timestamp as microseconds since the epoch."""
+    return (_naive(value) - _EPOCH) // _MICROSECOND
+
+
+def _text(kind, value):
+    """Returns the dictionary text of a 'string' or 'json' value."""
+    if kind == 'json':
+        return json.dumps(value, default=str, sort_keys=True)
+    return value if isinstance(value, str) else str(value)
+
+
+def _encode_column(kind, values):
+    """
+    Encode a chunk's column.
+
+    Returns:
+        tuple: (array of values, null mask bytes or None, dictionary list or None).
+    """
+    if kind in ('string', 'json'):
+        dictionary = {}
+        codes = array('i', (-1 if value is None else dictionary.setdefault(_text(kind, value), len(dictionary))
+                            for value in values))
+        return codes, None, list(dictionary)
+    if kind == 'timestamp':
+        data = array('q', (0 if value is None else _micros(value) for value in values))
+    elif kind == 'float64':
+        data = array('d', (float('nan') if value is None else float(value) for value in values))
+    elif kind == 'bool':
+        data = array('B', (1 if value else 0 for value in values))
+    else:
+        data = array('q', (0 if value is None else value for value in values))
+    valid = bytes(value is not None for value in values)
+    return data, (valid if 0 in valid else None), None
+
+
+def _csv_value(kind, value):
+    """Returns the CSV cell of a value."""
+    if value is None:
+        return ''
+    if kind == 'timestamp':
+        return _naive(value).isoformat(sep=' ')
+    if kind == 'bool':
+        return 'true' if value else 'false'
+    if kind == 'float64':
+        return repr(float(value))
+    if kind in ('string', 'json'):
+        return _text(kind, value)
+    return str(value)
+
+
+def _parse_value(kind, text):
+    """Parses a CSV cell written by _csv_value."""
+    if text == '':
+        return None
+    if kind == 'int64':
+        return int(text)
+    if kind == 'float64':
+        return float(text)
+    if kind == 'bool':
+        return text == 'true'
+    if kind == 'timestamp':
+        return datetime.fromisoformat(text)
+    if kind == 'json':
+        return json.loads(text)
+    return text
+
+
+def _entity_types(manager):
+    """Returns the entity types a manager stores, without decoding types still in a snapshot."""
+    storage = manager.storage
+    if isinstance(storage, SnapshotStorage):
+        return list(dict.fromkeys(list(dict.keys(storage)) + storage.reader.entity_types()))
+    return list(storage.keys())
+
+
+def _iter_entities(manager, entity_type, include_deleted):
+    """Yields the entities of a type one at a time."""
+    storage = manager.storage
+    if isinstance(storage, SnapshotStorage) and not storage.is_loaded(entity_type):
+        for entity in storage.reader.iter_all(entity_type):  # Decoded record by record and not cached
+            if include_deleted or not is_deleted(entity):
+                yield entity
+        return
+    yield from list(manager.all(entity_type, include_deleted=include_deleted))  # Concurrent writes cannot shift the walk
+
+
+def read_manifest(out_dir):
+    """Returns the manifest of an export directory, or None if it has none."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST), 'r') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest.get('format') != FORMAT or manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"{out_dir} does not hold a {FORMAT} v{FORMAT_VERSION} export.")
+    return manifest
+
+
+def _write_chunk(out_dir, part, entity_type, number, entities, layout):
+    """Writes one chunk of entities and returns its manifest entry."""
+    type_dir = os.path.join(out_dir, part, entity_type)
+    os.makedirs(type_dir, exist_ok=True)
+    relative = f'{part}/{entity_type}/{number:05d}'
+    names = list(dict.fromkeys(name for entity in entities for name in entity))  # Columns in order of appearance
+    columns = {}
+    if layout == 'csv':
+        kinds = {name: _column_kind(name, [entity.get(name) for entity in entities]) for name in names}
+        with open(os.path.join(out_dir, relative + '.csv'), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            for entity in entities:
+                writer.writerow([_csv_value(kinds[name], entity.get(name)) for name in names])
+        return {'rows': len(entities), 'file': relative + '.csv', 'columns': {name: {'kind': kind} for name, kind in kinds.items()}}
+    for position, name in enumerate(names):
+        values = [entity.get(name) for entity in entities]
+        kind = _column_kind(name, values)
+        data, valid, dictionary = _encode_column(kind, values)
+        stem = f'{relative}.{name if name.isidentifier() else f"column{position}"}'
+        entry = {'kind': kind, 'file': stem + '.npy'}
+        write_npy(os.path.join(out_dir, entry['file']), KINDS[kind][0], data)
+        if valid is not None:
+            entry['valid'] = stem + '.valid.npy'
+            write_npy(os.path.join(out_dir, entry['valid']), '|b1', valid)
+        if dictionary is not None:
+            entry['dictionary'] = stem + '.dict.json'
+            with open(os.path.join(out_dir, entry['dictionary']), 'w', encoding='utf-8') as f:
+                json.dump(dictionary, f)
+        columns[name] = entry
+    return {'rows': len(entities), 'columns': columns}
+
+
+def export_columns(manager, out_dir, layout='npy', chunk_rows=65536, entity_types=None, incremental=False, now=None):
+    """
+    Export a persistence manager's entities as columnar files.
+
+    Args:
+        manager (IPersistenceManager): The manager to export from.
+        out_dir (str): The export directory.
+        layout (str): 'npy' for one .npy file per column per chunk, 'csv' for one CSV file per chunk.
+        chunk_rows (int): Most entities per chunk.
+        entity_types (list, optional): The types to export; every stored type by default.
+        incremental (bool): If True and out_dir holds an export, append a part with the entities
+            changed since its watermark instead of starting over.
+        now (datetime, optional): The watermark of this export; the current time by default.
+
+    Returns:
+        dict: The manifest entry of the written part.
+
+    Raises:
+        ValueError: If the layout is unknown or differs from the layout of the export being extended.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown export layout {layout!r}.")
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = read_manifest(out_dir) if incremental else None
+    if manifest is not None and manifest['layout'] != layout:
+        raise ValueError(f"{out_dir} holds a {manifest['layout']} export; incremental parts must use the same layout.")
+    if manifest is None:
+        manifest = {'format': FORMAT, 'format_version': FORMAT_VERSION, 'layout': layout, 'parts': []}
+    since = datetime.fromisoformat(manifest['parts'][-1]['until']) if manifest['parts'] else None
+    until = now or datetime.now()  # Stored timestamps are naive local time
+    part = {'name': f"part-{until:%Y%m%dT%H%M%S%f}", 'since': since and since.isoformat(sep=' '),
+            'until': until.isoformat(sep=' '), 'version': getattr(manager, 'version', None), 'types': {}}
+    for entity_type in entity_types or _entity_types(manager):
+        chunks, batch, rows = [], [], 0
+        for entity in _iter_entities(manager, entity_type, include_deleted=since is not None):
+            if since is not None:
+                changed = changed_at(entity)
+                if changed is None or changed <= since:
+                    continue  # Unchanged since the previous part
+            batch.append(entity)
+            if len(batch) == chunk_rows:
+                chunks.append(_write_chunk(out_dir, part['name'], entity_type, len(chunks), batch, layout))
+                rows += len(batch)
+                batch = []
+        if batch:
+            chunks.append(_write_chunk(out_dir, part['name'], entity_type, len(chunks), batch, layout))
+            rows += len(batch)
+        part['types'][entity_type] = {'rows': rows, 'chunks': chunks}
+    manifest['parts'].append(part)
+    temp_file = os.path.join(out_dir, MANIFEST + '.tmp')
+    with open(temp_file, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temp_file, os.path.join(out_dir, MANIFEST))  # Readers see the new part only once it is complete
+    live = {entry['name'] for entry in manifest['parts']}
+    for name in os.listdir(out_dir):
+        if name.startswith('part-') and name not in live:
+            shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)  # Parts of a superseded full export
+    return part
+
+
+class ColumnarExport:
+    """
+    Reader for a columnar export directory.
+
+    Column files are mapped with mmap rather than read. column_arrays() hands
+    out zero-copy views of the mapped files (NumPy memmaps when NumPy is
+    installed); rows() and current() decode chunks into Python values one
+    chunk at a time.
+
+    Attributes:
+        out_dir (str): The export directory.
+        manifest (dict): The parsed manifest.
+    """
+
+    def __init__(self, out_dir):
+        """
+        Opens an export directory.
+
+        Args:
+            out_dir (str): The export directory.
+
+        Raises:
+            ValueError: If the directory holds no export.
+        """
+        self.out_dir = out_dir  # Set the export directory
+        self.manifest = read_manifest(out_dir)  # Set the parsed manifest
+        if self.manifest is None:
+            raise ValueError(f"{out_dir} holds no {FORMAT} export.")
+        self._maps = []  # Maps handed out through column_arrays()
+
+    @property
+    def layout(self):
+        """The file layout of the export: 'npy' or 'csv'."""
+        return self.manifest['layout']
+
+    def entity_types(self):
+        """Returns the exported entity types."""
+        return list(dict.fromkeys(entity_type for part in self.manifest['parts'] for entity_type in part['types']))
+
+    def chunks(self, entity_type):
+        """Returns the manifest entries of a type's chunks, oldest part first."""
+        return [chunk for part in self.manifest['parts'] for chunk in part['types'].get(entity_type, {}).get('chunks', [])]
+
+    def _path(self, relative):
+        """Returns the absolute path of a file named in the manifest."""
+        return os.path.join(self.out_dir, *relative.split('/'))
+
+    def _view(self, relative):
+        """Maps a .npy file and returns (mmap, typed memoryview of its values)."""
+        mapped, descr, offset, count = map_npy(self._path(relative))
+        typecode = {descr: code for descr, code in KINDS.values()}.get(descr, 'B')
+        view = memoryview(mapped)[offset:offset + count * array(typecode).itemsize].cast(typecode)
+        return mapped, view
+
+    def _load(self, relative):
+        """Returns the values of a .npy file as a list, releasing the map."""
+        mapped, view = self._view(relative)
+        try:
+            values = array(view.format, view)
+            if values.itemsize > 1 and sys.byteorder == 'big':
+                values.byteswap()
+            return values.tolist()
+        finally:
+            view.release()
+            mapped.close()
+
+    def column_arrays(self, entity_type, name):
+        """
+        Map a column of every chunk of a type, without copying ('npy' layout only).
+
+        Args:
+            entity_type (str): The entity type.
+            name (str): The column name.
+
+        Yields:
+            tuple: (chunk manifest entry, values, null mask or None). Values are NumPy memmaps
+                when NumPy is installed, otherwise memoryviews of the mapped files (string and
+                json columns hold dictionary codes). Chunks without the column are skipped.
+                Release memoryviews before close().
+        """
+        if self.layout != 'npy':
+            raise ValueError("Only the npy layout can be mapped by column.")
+        for chunk in self.chunks(entity_type):
+            column = chunk['columns'].get(name)
+            if column is None:
+                continue
+            files = [column['file']] + ([column['valid']] if 'valid' in column else [])
+            if numpy is not None:
+                arrays = [numpy.load(self._path(relative), mmap_mode='r') for relative in files]
+            else:
+                arrays = []
+                for relative in files:
+                    mapped, view = self._view(relative)
+                    self._maps.append(mapped)
+                    arrays.append(view)
+            yield chunk, arrays[0], arrays[1] if len(arrays) > 1 else None
+
+    def _decode_chunk(self, chunk):
+        """Returns {column: list of Python values} for one chunk."""
+        if self.layout == 'csv':
+            kinds = {name: column['kind'] for name, column in chunk['columns'].items()}
+            with open(self._path(chunk['file']), newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                names = next(reader)
+                values = {name: [] for name in names}
+                for row in reader:
+                    for name, text in zip(names, row):
+                        values[name].append(_parse_value(kinds[name], text))
+            return values
+        values = {}
+        for name, column in chunk['columns'].items():
+            kind = column['kind']
+            data = self._load(column['file'])
+            if kind in ('string', 'json'):
+                with open(self._path(column['dictionary']), encoding='utf-8') as f:
+                    dictionary = json.load(f)
+                if kind == 'json':
+                    dictionary = [json.loads(text) for text in dictionary]
+                data = [None if code < 0 else dictionary[code] for code in data]
+            elif kind == 'timestamp':
+                data = [_EPOCH + timedelta(microseconds=micros) for micros in data]
+            elif kind == 'bool':
+                data = [bool(value) for value in data]
+            if 'valid' in column:
+                data = [value if valid else None for value, valid in zip(data, self._load(column['valid']))]
+            values[name] = data
+        return values
+
+    def rows(self, entity_type):
+        """
+        Yield every exported row of a type as a dictionary, oldest part first.
+
+        Null columns are left out of a row. Rows of later parts are newer
+        versions of the same ids; see current().
+        """
+        for chunk in self.chunks(entity_type):
+            values = self._decode_chunk(chunk)
+            for position in range(chunk['rows']):
+                yield {name: column[position] for name, column in values.items() if column[position] is not None}
+
+    def current(self, entity_type):
+        """
+        Apply every part in order.
+
+        Returns:
+            dict: Entity id -> the latest exported row, without deleted entities.
+        """
+        latest = {}
+        for row in self.rows(entity_type):
+            latest[row.get('id')] = row
+        return {entity_id: row for entity_id, row in latest.items() if not is_deleted(row)}
+
+    def close(self):
+        """Release the maps handed out by column_arrays()."""
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+
+def _open_source(path):
+    """Opens a storage.json file or a binary snapshot as a read-only source for export."""
+    with open(path, 'rb') as f:
+        is_snapshot = f.read(len(MAGIC)) == MAGIC
+    if is_snapshot:
+        return DataManager(storage_file=os.devnull, snapshot_file=path)
+    return DataManager(storage_file=path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export storage as columnar files for analytics.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='Export a storage.json file or binary snapshot.')
+    export_parser.add_argument('source')
+    export_parser.add_argument('out_dir')
+    export_parser.add_argument('--layout', choices=LAYOUTS, default='npy')
+    export_parser.add_argument('--chunk-rows', type=int, default=65536)
+    export_parser.add_argument('--types', help='Comma-separated entity types (default: all)')
+    export_parser.add_argument('--incremental', action='store_true', help='Append the entities changed since the last export')
+    info_parser = commands.add_parser('info', help='Summarize an export directory.')
+    info_parser.add_argument('out_dir')
+    args = parser.parse_args()
+    if args.command == 'export':
+        written = export_columns(_open_source(args.source), args.out_dir, layout=args.layout, chunk_rows=args.chunk_rows,
+                                 entity_types=args.types.split(',') if args.types else None, incremental=args.incremental)
+        print(json.dumps({entity_type: entry['rows'] for entity_type, entry in written['types'].items()}))
+    else:
+        export = ColumnarExport(args.out_dir)
+        for part in export.manifest['parts']:
+            print(part['name'], part['since'] or '-', part['until'],
+                  ' '.join(f"{entity_type}={entry['rows']}" for entity_type, entry in part['types'].items()))
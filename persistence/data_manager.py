@@ -1,25 +1,108 @@
 import json  # Import the json module to handle JSON data
-from datetime import datetime  # Import the datetime module to handle date and time
+import os  # Import the os module to check for the snapshot file and replace files atomically
+import threading  # Import the threading module to serialize whole-file flushes
+from contextlib import contextmanager  # Import contextmanager for the transaction API
+from datetime import datetime, timedelta  # Import the datetime module to handle date and time
 from .i_persistence_manager import IPersistenceManager  # Import the persistence manager interface
+from .binary_snapshot import SnapshotReader, SnapshotStorage, load_snapshot, write_snapshot  # Import the binary snapshot helpers
+from .locks import WriteLock  # Import the global and per-type write lock
+from .sharded_storage import ShardedStorage  # Import the per-type shard storage
+from .vacuum import TOMBSTONE_FIELD, is_deleted  # Import the soft delete tombstone helpers
+from .versioning import VERSION_FIELD, check_version, entity_version  # Import the per-entity version helpers
+
+class _PositionIndex:
+    """
+    Id -> list position map over one entity type's list, with its tombstone count.
+
+    The index remembers the list it was built from and that list's length,
+    so a list replaced, grown or shrunk behind the manager's back is detected
+    and the index rebuilt instead of returning wrong positions.
+    """
+
+    __slots__ = ('entities', 'length', 'positions', 'tombstones')
+
+    def __init__(self, entities):
+        self.entities = entities  # The indexed list
+        self.length = 0  # Length of the list when last indexed
+        self.positions = {}  # Entity id -> position of its first occurrence
+        self.tombstones = 0  # Number of soft-deleted entities in the list
+        for entity in entities:
+            self.appended(entity)
+
+    def is_current(self, entities):
+        """Returns True if the index still describes the list."""
+        return self.entities is entities and self.length == len(entities)
+
+    def appended(self, entity):
+        """Records an entity appended to the end of the list."""
+        entity_id = entity.get('id')
+        if entity_id is not None:
+            self.positions.setdefault(entity_id, self.length)
+        if is_deleted(entity):
+            self.tombstones += 1
+        self.length += 1
 
 class DataManager(IPersistenceManager):
     """
     DataManager class implementing the IPersistenceManager interface
     to handle CRUD operations for various entities.
+
+    Writes to a single entity lock only its entity type, so writes to
+    different types run concurrently; transactions, read snapshots and
+    deletes that cascade through relationships lock every type.
     """
     
-    def __init__(self, storage_file='storage.json'):
+    supports_transactions = True  # transaction() commits or rolls back as a whole
+    supports_snapshots = True  # read_snapshot() holds writers off
+
+    def __init__(self, storage_file='storage.json', snapshot_file=None, shard_dir=None, change_feed=None,
+                 relationships=None, soft_delete=False):
         """
         Initializes a new DataManager instance.
 
         Args:
             storage_file (str): The file path for the storage file.
+            snapshot_file (str, optional): The file path for a binary snapshot. When set, storage is
+                loaded lazily from the snapshot (falling back to the storage file if the snapshot
+                does not exist yet) and every save writes the snapshot instead of JSON.
+            shard_dir (str, optional): A directory holding one JSON file per entity type. When set,
+                shards are loaded in parallel (falling back to the storage file if there are none
+                yet) and each write only flushes the shard of the affected entity type.
+            change_feed (ChangeFeed, optional): Feed that every save, update and delete is
+                appended to, so followers can replicate this manager's storage.
+            relationships (RelationshipRegistry, optional): Foreign keys to enforce. Deletes then
+                cascade to, are restricted by, or are pulled from dependents, and (if the registry
+                validates references) writes must point at existing parents.
+            soft_delete (bool): If True, delete() replaces the entity with a tombstone carrying
+                a `deleted_at` timestamp instead of removing it; vacuum() removes tombstones later.
         """
         self.storage_file = storage_file  # Set the path for the storage file
+        self.snapshot_file = snapshot_file  # Set the path for the binary snapshot file
+        self.shards = ShardedStorage(shard_dir) if shard_dir else None  # Set up per-type shards if requested
+        self.change_feed = change_feed  # Set the feed that mutations are emitted to
+        self._write_lock = WriteLock()  # Per-type for single-entity writes, global for transactions
+        self._flush_lock = threading.Lock()  # Serializes writes of the whole storage file
+        self._last_snapshot = None  # Reader over the snapshot last loaded or written; unchanged types are copied from it
+        self._transaction_depth = 0  # Nesting depth of open transactions
+        self._dirty = set()  # Entity types changed inside the open transaction (None means all)
+        self._pending_events = []  # Change events held back until the transaction commits
+        self.relationships = relationships  # Set the foreign key registry
+        self.soft_delete = soft_delete  # Set whether deletes leave tombstones
+        self._positions = {}  # Entity type -> _PositionIndex, built on first lookup
+        self._write_checks = []  # Callbacks that may reject a save or replace before it is applied
         self._load_storage()  # Load storage data from the storage file
+        if self.relationships is not None:
+            self.relationships.build(self.storage)  # Build the reverse indexes once from the loaded data
 
     def _load_storage(self):
-        """Loads storage data from the storage file."""
+        """Loads storage data from the snapshot file or the storage file."""
+        if self.snapshot_file and os.path.exists(self.snapshot_file):
+            self.storage = load_snapshot(self.snapshot_file)  # Map the snapshot; entities decode on first access
+            self._last_snapshot = self.storage.reader
+            return
+        if self.shards and self.shards.entity_types():
+            self.storage = self.shards.load()  # Load every shard in parallel
+            return
         try:
             with open(self.storage_file, 'r') as f:
                 self.storage = json.load(f)  # Load JSON data from the file into the storage attribute
@@ -30,10 +113,123 @@ class DataManager(IPersistenceManager):
         except FileNotFoundError:
             self.storage = {}  # If the file is not found, initialize an empty storage dictionary
 
-    def _save_storage(self):
-        """Saves storage data to the storage file."""
-        with open(self.storage_file, 'w') as f:
-            json.dump(self.storage, f, default=str)  # Write the storage data as JSON to the file
+    def _save_storage(self, entity_type=None):
+        """
+        Saves storage data to the snapshot file, the shard files or the storage file.
+
+        Inside a transaction nothing is written; the entity type is only recorded
+        so the commit can flush everything at once.
+
+        Args:
+            entity_type (str, optional): The entity type that changed. With sharded storage only
+                that type's shard is written; otherwise the whole storage is written.
+        """
+        if self._transaction_depth:
+            self._dirty.add(entity_type)  # Defer the write to the end of the transaction
+            return
+        self._flush_storage({entity_type})
+
+    def _flush_storage(self, entity_types):
+        """
+        Writes storage data for the given entity types.
+
+        Args:
+            entity_types (set): The entity types that changed; None in the set means all of them.
+        """
+        if self.shards:
+            if None in entity_types:
+                self.shards.flush_all(self.storage)  # Write every shard
+            else:
+                for entity_type in entity_types:
+                    self.shards.flush(self.storage, entity_type)  # Write only the affected shards
+            return
+        with self._flush_lock:  # Writers of different types share the one file
+            if self.snapshot_file:
+                # Encode only the changed types; the rest are copied from the last snapshot without decoding
+                write_snapshot(self.storage, self.snapshot_file, changed=None if None in entity_types else entity_types,
+                               previous=self._last_snapshot)
+                previous, self._last_snapshot = self._last_snapshot, SnapshotReader(self.snapshot_file)
+                if previous is not None and previous is not getattr(self.storage, 'reader', None):
+                    previous.close()  # The lazily loaded storage still decodes from its own mapping
+                return
+            temp_file = self.storage_file + '.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump(dict(self.storage), f, default=str)  # A copy, so another type can be added meanwhile
+            os.replace(temp_file, self.storage_file)  # Atomically swap in the new file so a crash never leaves it half written
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group several mutations into one atomic flush.
+
+        Inside the block, save/update/delete only change memory. When the
+        outermost block exits normally, storage is written once (a single
+        temp file plus os.replace for JSON and snapshot storage) and the held
+        back change events are published. If the block raises, storage is
+        restored to its state before the block and no events are published.
+        Other threads' writes, of any type, wait until the transaction finishes.
+
+        Yields:
+            DataManager: This manager.
+        """
+        with self._write_lock:
+            if self._transaction_depth:
+                self._transaction_depth += 1  # Nested blocks join the outer transaction
+                try:
+                    yield self
+                finally:
+                    self._transaction_depth -= 1
+                return
+            before = {entity_type: list(entities) for entity_type, entities in self.storage.items()}
+            self._transaction_depth = 1
+            try:
+                yield self
+                self._transaction_depth = 0
+                if self._dirty:
+                    self._flush_storage(self._dirty)  # One write for the whole transaction
+            except BaseException:
+                self.storage.clear()
+                self.storage.update(before)  # Roll back to the lists as they were before the block
+                self._pending_events = []
+                if self.relationships is not None:
+                    self.relationships.build(self.storage)  # Reverse indexes must match the restored lists
+                raise
+            finally:
+                self._transaction_depth = 0
+                self._dirty = set()
+            events, self._pending_events = self._pending_events, []
+            for event in events:
+                self.change_feed.append(*event)
+
+    @contextmanager
+    def read_snapshot(self):
+        """
+        Give a block a consistent view of storage across several reads.
+
+        Other threads' writes wait until the block exits, so every read in it
+        sees the same state apart from the block's own writes. Reads from
+        other threads, including threads the block hands work to, are not
+        blocked since reads take no lock.
+
+        Yields:
+            DataManager: This manager.
+        """
+        with self._write_lock:
+            yield self
+
+    @property
+    def version(self):
+        """The change feed version of the most recent mutation (0 without a feed)."""
+        return self.change_feed.version if self.change_feed else 0
+
+    def _emit(self, op, entity_type, entity_id, data=None):
+        """Appends a mutation event to the change feed, or holds it back inside a transaction."""
+        if self.change_feed is None:
+            return
+        if self._transaction_depth:
+            self._pending_events.append((op, entity_type, entity_id, dict(data) if data is not None else None))
+        else:
+            self.change_feed.append(op, entity_type, entity_id, data)
 
     def save(self, entity):
         """
@@ -43,60 +239,258 @@ class DataManager(IPersistenceManager):
             entity (object): The entity to save.
         """
         entity_type = type(entity).__name__  # Get the type name of the entity
-        if entity_type not in self.storage:
-            self.storage[entity_type] = []  # Initialize the list for this entity type if it doesn't exist
-        elif not isinstance(self.storage[entity_type], list):
-            self.storage[entity_type] = []  # Ensure it is a list
-        self.storage[entity_type].append(entity.__dict__)  # Add the entity's dictionary representation to the storage
-        self._save_storage()  # Save the updated storage data to the file
+        with self._write_lock.writing(entity_type):  # Serialize writers of this type
+            if entity_type not in self.storage:
+                self.storage[entity_type] = []  # Initialize the list for this entity type if it doesn't exist
+            elif not isinstance(self.storage[entity_type], list):
+                self.storage[entity_type] = []  # Ensure it is a list
+            if self.relationships is not None:
+                self.relationships.check_references(entity_type, entity.__dict__)  # Reject dangling references
+            for check in self._write_checks:
+                check('save', entity_type, entity.__dict__)
+            entities = self.storage[entity_type]
+            index = self._positions.get(entity_type)
+            current = index is not None and index.is_current(entities)
+            entity.__dict__.setdefault(VERSION_FIELD, 1)  # New entities start at version 1
+            entities.append(entity.__dict__)  # Add the entity's dictionary representation to the storage
+            if current:
+                index.appended(entity.__dict__)  # Keep the position index valid without a rebuild
+            if self.relationships is not None:
+                self.relationships.index(entity_type, entity.__dict__)  # Record the new references
+            self._save_storage(entity_type)  # Save the updated storage data to the file
+            self._emit('save', entity_type, entity.__dict__.get('id'), entity.__dict__)  # Publish the new entity to followers
+
+    def add_write_check(self, callback):
+        """
+        Register a check run under the write lock before every save and replace.
+
+        The check sees the write before it is applied, and no other write of
+        the same type can slip in between it and the write, so it can enforce
+        constraints across the entities of a type (such as non-overlapping
+        bookings). Raising rejects the write.
+
+        Args:
+            callback (callable): Function taking (op, entity_type, data), where op is 'save' or 'update'.
+        """
+        self._write_checks.append(callback)
+
+    def _index_for(self, entity_type):
+        """Returns the up-to-date position index of an entity type, or None if the type has no list."""
+        entities = self.storage.get(entity_type)
+        if not isinstance(entities, list):
+            return None
+        index = self._positions.get(entity_type)
+        if index is None or not index.is_current(entities):
+            index = self._positions[entity_type] = _PositionIndex(entities)
+        return index
 
-    def get(self, entity_id, entity_type):
+    def _find(self, entity_type, entity_id):
+        """
+        Look up the list position of an entity by id.
+
+        Returns:
+            tuple: (entities list, position), or (None, None) if the entity is not stored.
+        """
+        index = self._index_for(entity_type)
+        if index is None:
+            return None, None
+        position = index.positions.get(entity_id)
+        if position is not None and index.entities[position].get('id') != entity_id:
+            index = self._positions[entity_type] = _PositionIndex(index.entities)  # An entry was swapped in place
+            position = index.positions.get(entity_id)
+        if position is None:
+            return None, None
+        return index.entities, position
+
+    def get(self, entity_id, entity_type, include_deleted=False):
         """
         Retrieve an entity from the storage.
 
         Args:
             entity_id (str): The ID of the entity to retrieve.
             entity_type (str): The type of the entity to retrieve.
+            include_deleted (bool): Whether to return soft-deleted entities too.
 
         Returns:
             object: The retrieved entity or None if not found.
         """
-        entities = self.storage.get(entity_type, [])  # Get the list of entities of the given type
-        if entities is None:
-            return None
-        for entity in entities:
-            if entity['id'] == entity_id:
-                return entity  # Return the entity if the ID matches
-        return None  # Return None if the entity is not found
+        if isinstance(self.storage, SnapshotStorage) and not self.storage.is_loaded(entity_type):
+            entity = self.storage.reader.read_entity(entity_type, entity_id)  # Decode just this entity via the id table
+        else:
+            entities, position = self._find(entity_type, entity_id)
+            entity = entities[position] if entities is not None else None
+        if entity is None or (is_deleted(entity) and not include_deleted):
+            return None  # Return None if the entity is not found
+        return entity
 
-    def update(self, entity):
+    def all(self, entity_type, include_deleted=False):
         """
-        Update an entity in the storage.
+        Retrieve every entity of a type.
+
+        Args:
+            entity_type (str): The type of the entities to retrieve.
+            include_deleted (bool): Whether to include soft-deleted entities.
+
+        Returns:
+            list: The entity dictionaries. Without tombstones this is the stored list itself.
+        """
+        index = self._index_for(entity_type)
+        if index is None:
+            return []
+        if include_deleted or not index.tombstones:
+            return index.entities
+        return [entity for entity in index.entities if not is_deleted(entity)]
+
+    def update(self, entity, expected_version=None):
+        """
+        Update an entity in the storage and bump its version.
 
         Args:
             entity (object): The entity to update.
+            expected_version (int, optional): The version the stored entity must be at (compare-and-swap).
+
+        Raises:
+            VersionConflictError: If the stored entity is at another version.
         """
-        entity_type = type(entity).__name__  # Get the type name of the entity
-        entities = self.storage.get(entity_type, [])  # Get the list of entities of the given type
-        for idx, existing_entity in enumerate(entities):
-            if existing_entity['id'] == entity.id:
-                entities[idx] = entity.__dict__  # Update the entity's dictionary representation in the storage
-                self._save_storage()  # Save the updated storage data to the file
-                return
-        raise ValueError(f"Entity of type {entity_type} with ID {entity.id} not found.")  # Raise an error if the entity is not found
+        self.replace(type(entity).__name__, entity.__dict__, expected_version)
+
+    def replace(self, entity_type, data, expected_version=None):
+        """
+        Replace the stored dictionary of an entity and bump its version.
+
+        The version check and the write happen under the type's write lock,
+        so a compare-and-swap never holds a lock while the caller computes
+        the new state.
+
+        Args:
+            entity_type (str): The type of the entity.
+            data (dict): The new entity dictionary; its 'id' selects the entity to replace.
+            expected_version (int, optional): The version the stored entity must be at.
+
+        Raises:
+            VersionConflictError: If the stored entity is at another version.
+        """
+        with self._write_lock.writing(entity_type):  # Serialize writers of this type
+            entity_id = data.get('id')  # Get the ID of the entity
+            entities, position = self._find(entity_type, entity_id)
+            if entities is None or is_deleted(entities[position]):
+                raise ValueError(f"Entity of type {entity_type} with ID {entity_id} not found.")  # Raise an error if the entity is not found
+            check_version(entity_type, entities[position], expected_version)
+            for check in self._write_checks:
+                check('update', entity_type, data)
+            data[VERSION_FIELD] = entity_version(entities[position]) + 1  # Readers holding the old version now conflict
+            if self.relationships is not None:
+                self.relationships.check_references(entity_type, data)  # Reject dangling references
+                self.relationships.unindex(entity_type, entities[position])
+                self.relationships.index(entity_type, data)
+            entities[position] = data  # Update the entity's dictionary representation in the storage
+            self._save_storage(entity_type)  # Save the updated storage data to the file
+            self._emit('update', entity_type, entity_id, data)  # Publish the new state to followers
 
-    def delete(self, entity_id, entity_type):
+    def delete(self, entity_id, entity_type, expected_version=None):
         """
         Delete an entity from the storage.
 
+        With soft deletes the entity is replaced by a tombstone, which every
+        read skips unless asked for deleted entities. With a relationship
+        registry, dependents are cascaded, pulled or cause the delete to be
+        rejected, and everything commits in one flush.
+
         Args:
             entity_id (str): The ID of the entity to delete.
             entity_type (str): The type of the entity to delete.
+            expected_version (int, optional): The version the stored entity must be at (compare-and-swap).
+
+        Raises:
+            VersionConflictError: If the stored entity is at another version.
         """
-        entities = self.storage.get(entity_type, [])  # Get the list of entities of the given type
-        for idx, entity in enumerate(entities):
-            if entity['id'] == entity_id:
-                entities.pop(idx)  # Remove the entity from the list if the ID matches
-                self._save_storage()  # Save the updated storage data to the file
-                return
-        raise ValueError(f"Entity of type {entity_type} with ID {entity_id} not found.")  # Raise an error if the entity is not found
+        if self.relationships is not None:
+            with self.transaction():  # Dependents span types, so every type is locked
+                entity = self.get(entity_id, entity_type)
+                if entity is None:
+                    raise ValueError(f"Entity of type {entity_type} with ID {entity_id} not found.")
+                check_version(entity_type, entity, expected_version)
+                self.relationships.on_delete(self, entity_type, entity)  # Handle dependents first
+                self._delete(entity_id, entity_type)
+            return
+        with self._write_lock.writing(entity_type):  # Serialize writers of this type
+            if expected_version is not None:
+                entity = self.get(entity_id, entity_type)
+                if entity is None:
+                    raise ValueError(f"Entity of type {entity_type} with ID {entity_id} not found.")
+                check_version(entity_type, entity, expected_version)
+            self._delete(entity_id, entity_type)
+
+    def _delete(self, entity_id, entity_type):
+        """Removes or tombstones one entity without looking at its dependents."""
+        entities, position = self._find(entity_type, entity_id)
+        if entities is None or is_deleted(entities[position]):
+            raise ValueError(f"Entity of type {entity_type} with ID {entity_id} not found.")  # Raise an error if the entity is not found
+        entity = entities[position]
+        if self.soft_delete:
+            tombstone = dict(entity)  # A new dictionary, so transaction rollback and encoding caches see the change
+            tombstone[TOMBSTONE_FIELD] = datetime.now()
+            tombstone[VERSION_FIELD] = entity_version(entity) + 1
+            entities[position] = tombstone  # Replace in place; no list shift
+            self._positions[entity_type].tombstones += 1
+        else:
+            entities.pop(position)  # Remove the entity from the list
+        if self.relationships is not None:
+            self.relationships.unindex(entity_type, entity)  # Forget the removed references
+        self._save_storage(entity_type)  # Save the updated storage data to the file
+        self._emit('delete', entity_type, entity_id)  # Publish the removal to followers
+
+    def tombstone_stats(self):
+        """
+        Count tombstones per entity type.
+
+        Returns:
+            dict: Entity type -> (number of tombstones, number of stored entities).
+        """
+        stats = {}
+        for entity_type in list(self.storage.keys()):
+            index = self._index_for(entity_type)
+            if index is not None:
+                stats[entity_type] = (index.tombstones, index.length)
+        return stats
+
+    def vacuum(self, entity_types=None, older_than=0):
+        """
+        Physically remove tombstones left by soft deletes.
+
+        Readers never see tombstones, so no change events are published; the
+        affected types are written in a single flush.
+
+        Args:
+            entity_types (iterable, optional): The types to compact; defaults to every type.
+            older_than (float): Only remove tombstones deleted at least this many seconds ago.
+
+        Returns:
+            int: The number of tombstones removed.
+        """
+        cutoff = datetime.now() - timedelta(seconds=older_than)
+        removed = 0
+        with self.transaction():
+            for entity_type in list(entity_types if entity_types is not None else self.storage.keys()):
+                index = self._index_for(entity_type)
+                if index is None or not index.tombstones:
+                    continue
+                kept = [entity for entity in index.entities if not self._expired(entity, cutoff)]
+                if len(kept) != index.length:
+                    removed += index.length - len(kept)
+                    index.entities[:] = kept  # Compact in place; the position index rebuilds on next use
+                    self._save_storage(entity_type)
+        return removed
+
+    @staticmethod
+    def _expired(entity, cutoff):
+        """Returns True if an entity is a tombstone deleted before the cutoff."""
+        deleted_at = entity.get(TOMBSTONE_FIELD)
+        if deleted_at is None:
+            return False
+        if isinstance(deleted_at, str):
+            try:
+                deleted_at = datetime.fromisoformat(deleted_at)  # Tombstones reloaded from JSON hold strings
+            except ValueError:
+                return True
+        return deleted_at <= cutoff
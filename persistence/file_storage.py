@@ -1,5 +1,6 @@
 import json  # Import the json module to handle JSON data
 from datetime import datetime  # Import the datetime module to handle date and time
+from .sharded_storage import ShardedStorage  # Import the per-type shard storage
 
 class FileStorage:
     """
@@ -10,26 +11,44 @@ class FileStorage:
         storage (dict): The in-memory storage representation of the JSON data.
     """
     
-    def __init__(self, storage_file='storage.json'):
+    def __init__(self, storage_file='storage.json', shard_dir=None):
         """
         Initializes a new FileStorage instance.
 
         Args:
             storage_file (str): The file path for the storage file.
+            shard_dir (str, optional): A directory holding one JSON file per entity type. When set,
+                each write only flushes the shard of the affected entity type.
         """
         self.storage_file = storage_file  # Set the path for the storage file
+        self.shards = ShardedStorage(shard_dir) if shard_dir else None  # Set up per-type shards if requested
         self._load_storage()  # Load storage data from the storage file
 
     def _load_storage(self):
-        """Loads storage data from the storage file."""
+        """Loads storage data from the shard files or the storage file."""
+        if self.shards and self.shards.entity_types():
+            self.storage = self.shards.load()  # Load every shard in parallel
+            return
         try:
             with open(self.storage_file, 'r') as f:
                 self.storage = json.load(f)  # Load JSON data from the file into the storage attribute
         except FileNotFoundError:
             self.storage = {}  # If the file is not found, initialize an empty storage dictionary
 
-    def _save_storage(self):
-        """Saves storage data to the storage file."""
+    def _save_storage(self, entity_type=None):
+        """
+        Saves storage data to the shard files or the storage file.
+
+        Args:
+            entity_type (str, optional): The entity type that changed. With sharded storage only
+                that type's shard is written; otherwise the whole storage is written.
+        """
+        if self.shards:
+            if entity_type is None:
+                self.shards.flush_all(self.storage)  # Write every shard
+            else:
+                self.shards.flush(self.storage, entity_type)  # Write only the affected shard
+            return
         with open(self.storage_file, 'w') as f:
             json.dump(self.storage, f, default=str)  # Write the storage data as JSON to the file
 
@@ -44,7 +63,7 @@ class FileStorage:
         if entity_type not in self.storage:
             self.storage[entity_type] = []  # Initialize the list for this entity type if it doesn't exist
         self.storage[entity_type].append(entity.__dict__)  # Add the entity's dictionary representation to the storage
-        self._save_storage()  # Save the updated storage data to the file
+        self._save_storage(entity_type)  # Save the updated storage data to the file
 
     def get(self, entity_id, entity_type):
         """
@@ -75,7 +94,7 @@ class FileStorage:
         for idx, existing_entity in enumerate(entities):
             if existing_entity['id'] == entity.id:
                 entities[idx] = entity.__dict__  # Update the entity's dictionary representation in the storage
-                self._save_storage()  # Save the updated storage data to the file
+                self._save_storage(entity_type)  # Save the updated storage data to the file
                 return
         raise ValueError(f"Entity of type {entity_type} with ID {entity.id} not found.")  # Raise an error if the entity is not found
 
@@ -91,6 +110,6 @@ class FileStorage:
         for idx, entity in enumerate(entities):
             if entity['id'] == entity_id:
                 entities.pop(idx)  # Remove the entity from the list if the ID matches
-                self._save_storage()  # Save the updated storage data to the file
+                self._save_storage(entity_type)  # Save the updated storage data to the file
                 return
         raise ValueError(f"Entity of type {entity_type} with ID {entity_id} not found.")  # Raise an error if the entity is not found
@@ -0,0 +1,275 @@
+import threading  # Import the threading module to serialize history writers
+from collections import OrderedDict  # Import OrderedDict to expire deleted entities in delete order
+from datetime import datetime, timedelta  # Import the datetime module to timestamp and expire versions
+from .change_feed import ChangeFeed  # Import the change feed to rebuild history from its log
+from .vacuum import is_deleted  # Import the tombstone check; soft-deleted entities are not seeded
+
+_REMOVED = object()  # Marks a field removed by a delta
+
+def _copy_state(data):
+    """Returns a copy of an entity dictionary that later in-place edits to the original cannot reach."""
+    return {key: list(value) if isinstance(value, list) else value for key, value in data.items()}
+
+def _diff(old, new):
+    """Returns the delta turning entity dictionary old into new: changed fields, with _REMOVED for dropped ones."""
+    delta = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    delta.update((key, _REMOVED) for key in old if key not in new)
+    return delta
+
+def _apply(state, op, delta):
+    """Returns the entity state after applying one delta (None once the entity is deleted)."""
+    if op == 'delete':
+        return None
+    result = dict(state) if state is not None and op != 'save' else {}
+    for key, value in delta.items():
+        if value is _REMOVED:
+            result.pop(key, None)
+        else:
+            result[key] = value
+    return result
+
+class HistoryRetention:
+    """
+    Bounds how much history the VersionStore keeps per entity.
+
+    Versions beyond `max_versions`, or recorded more than `max_age` seconds
+    ago, are folded into the entity's base state, so the oldest reachable
+    version moves forward but the current state is never lost. A deleted
+    entity has no current state: its whole history is dropped once the
+    delete is older than `deleted_max_age` (or `max_age`, if shorter).
+
+    Attributes:
+        max_versions (int): Maximum number of deltas kept per entity.
+        max_age (float): Maximum age in seconds of a kept delta, or None for no limit.
+        deleted_max_age (float): Seconds the history of a deleted entity is kept after the delete.
+    """
+
+    def __init__(self, max_versions=100, max_age=None, deleted_max_age=86400.0):
+        """
+        Initializes a new HistoryRetention instance.
+
+        Args:
+            max_versions (int): Maximum number of deltas kept per entity.
+            max_age (float, optional): Maximum age in seconds of a kept delta.
+            deleted_max_age (float): Seconds the history of a deleted entity is kept after the delete.
+        """
+        self.max_versions = max_versions  # Set the per-entity delta bound
+        self.max_age = max_age  # Set the delta age bound
+        self.deleted_max_age = deleted_max_age  # Set how long deleted entities stay readable
+
+class _EntityHistory:
+    """
+    Version chain of one entity: a base state plus the deltas recorded after it.
+
+    `chain` is an immutable (base, base_version, base_time, deltas) tuple
+    that is swapped as a whole when old deltas are folded into the base;
+    new deltas are only ever appended. A reader that grabs `chain` once
+    therefore sees a consistent history without taking any lock.
+    """
+
+    __slots__ = ('chain', 'latest')
+
+    def __init__(self, base, version, recorded_at):
+        self.chain = (base, version, recorded_at, [])  # Base state and the deltas after it
+        self.latest = base  # Current state, kept to diff the next version against
+
+class VersionStore:
+    """
+    MVCC-style history of entity versions, fed by a ChangeFeed.
+
+    For every tracked entity the store keeps the state at a base version
+    and a compact delta (just the changed fields) for each later save,
+    update or delete, keyed by the change feed version. Any past state
+    within the retention window can be rebuilt by replaying deltas onto
+    the base, either at a feed version or at a point in time.
+
+    Usage: `change_feed.subscribe(version_store.on_change)`.
+
+    Attributes:
+        tracked_types (set): The entity types whose history is kept.
+        retention (HistoryRetention): How much history is kept per entity.
+    """
+
+    def __init__(self, tracked_types=('Place', 'Review'), retention=None):
+        """
+        Initializes a new VersionStore instance.
+
+        Args:
+            tracked_types (iterable): The entity types whose history is kept.
+            retention (HistoryRetention, optional): Defaults to HistoryRetention().
+        """
+        self.tracked_types = set(tracked_types)  # Set the tracked entity types
+        self.retention = retention or HistoryRetention()  # Set the retention policy
+        self._histories = {}  # Entity type -> {entity id -> _EntityHistory}
+        self._deleted = OrderedDict()  # (entity_type, entity_id) of deleted entities -> delete time, oldest first
+        self._lock = threading.Lock()  # Serializes writers; readers never take it
+
+    def seed(self, storage, version=0):
+        """
+        Record the current state of stored entities as their base version.
+
+        Entities that existed before the store was created have no recorded
+        history; seeding makes their current state reachable.
+
+        Args:
+            storage (dict): Mapping of entity type name to a list of entity dictionaries.
+            version (int): The change feed version the storage reflects.
+        """
+        now = datetime.now()
+        with self._lock:
+            for entity_type in self.tracked_types:
+                histories = self._histories.setdefault(entity_type, {})
+                for entity in storage.get(entity_type, None) or []:
+                    entity_id = entity.get('id')
+                    if entity_id is not None and entity_id not in histories and not is_deleted(entity):
+                        histories[entity_id] = _EntityHistory(_copy_state(entity), version, now)
+
+    def load_log(self, log_file):
+        """
+        Rebuild history from a change feed log file.
+
+        Versions keep the time their event was recorded at, so history and
+        ?as_of= reads by time survive a restart. A checkpointed log only holds
+        the events after its checkpoint, so replay starts there; call it
+        before seed(), which records the entities those events do not reach.
+
+        Args:
+            log_file (str): The file path of the change feed log.
+        """
+        events, _ = ChangeFeed.read_log(log_file, 0)
+        for event in events:
+            self.on_change(event)
+
+    def on_change(self, event):
+        """Change feed subscriber that records a new version of the mutated entity."""
+        if event.entity_type not in self.tracked_types:
+            return
+        key = (event.entity_type, event.entity_id)
+        state = _copy_state(event.data) if event.data is not None else None
+        now = datetime.now()
+        recorded_at = event.recorded_at  # Replayed events keep the time they were first recorded at
+        with self._lock:
+            self._expire_deleted(now)
+            histories = self._histories.setdefault(event.entity_type, {})
+            history = histories.get(event.entity_id)
+            if history is None:
+                if event.op != 'delete':  # Nothing to keep for an entity deleted before it was tracked
+                    histories[event.entity_id] = _EntityHistory(state, event.version, recorded_at)
+                return
+            if event.version <= history.chain[1] or (history.chain[3] and event.version <= history.chain[3][-1][0]):
+                return  # Already recorded, e.g. when a log is replayed twice
+            self._deleted.pop(key, None)
+            if event.op == 'delete':
+                self._deleted[key] = recorded_at  # Dropped with its history once the delete leaves the window
+            if event.op == 'delete' or history.latest is None:
+                delta = state or {}
+            else:
+                delta = _diff(history.latest, state)
+            op = 'save' if history.latest is None and event.op != 'delete' else event.op
+            history.chain[3].append((event.version, recorded_at, op, delta))
+            history.latest = state
+            self._trim(history, now)
+
+    def _expire_deleted(self, now):
+        """Drops the histories of entities deleted longer ago than the retention allows (called with the lock held)."""
+        ages = [age for age in (self.retention.max_age, self.retention.deleted_max_age) if age is not None]
+        if not ages or not self._deleted:
+            return
+        cutoff = now - timedelta(seconds=min(ages))
+        while self._deleted:
+            key, deleted_at = next(iter(self._deleted.items()))
+            if deleted_at >= cutoff:
+                break
+            del self._deleted[key]
+            histories = self._histories.get(key[0], {})
+            histories.pop(key[1], None)
+            if not histories:
+                self._histories.pop(key[0], None)
+
+    def _trim(self, history, now):
+        """Folds deltas beyond the retention policy into the base state."""
+        base, base_version, base_time, deltas = history.chain
+        cutoff = now - timedelta(seconds=self.retention.max_age) if self.retention.max_age is not None else None
+        fold = max(len(deltas) - self.retention.max_versions, 0)
+        while cutoff is not None and fold < len(deltas) and deltas[fold][1] < cutoff:
+            fold += 1
+        if not fold:
+            return
+        for version, recorded_at, op, delta in deltas[:fold]:
+            base, base_version, base_time = _apply(base, op, delta), version, recorded_at
+        history.chain = (base, base_version, base_time, deltas[fold:])  # Swap the whole chain for lock-free readers
+
+    def history(self, entity_type, entity_id):
+        """
+        List the recorded versions of an entity, oldest first.
+
+        The first entry holds the full base state; later entries hold only
+        the fields that changed (removed fields are listed under 'removed').
+
+        Args:
+            entity_type (str): The type of the entity.
+            entity_id (str): The ID of the entity.
+
+        Returns:
+            list: Version dictionaries, or None if the entity has no history.
+        """
+        history = self._histories.get(entity_type, {}).get(entity_id)
+        if history is None:
+            return None
+        base, base_version, base_time, deltas = history.chain
+        versions = [{'version': base_version, 'op': 'base', 'recorded_at': base_time, 'changes': base, 'removed': []}]
+        for version, recorded_at, op, delta in list(deltas):
+            versions.append({
+                'version': version,
+                'op': op,
+                'recorded_at': recorded_at,
+                'changes': {key: value for key, value in delta.items() if value is not _REMOVED},
+                'removed': sorted(key for key, value in delta.items() if value is _REMOVED),
+            })
+        return versions
+
+    def as_of(self, entity_type, entity_id, version=None, at=None):
+        """
+        Rebuild an entity as it was at a feed version or a point in time.
+
+        Args:
+            entity_type (str): The type of the entity.
+            entity_id (str): The ID of the entity.
+            version (int, optional): The change feed version to read at.
+            at (datetime, optional): The time to read at (used when version is None).
+
+        Returns:
+            dict: The entity state, or None if it did not exist, was deleted,
+                or the requested point is older than the retained history.
+        """
+        history = self._histories.get(entity_type, {}).get(entity_id)
+        if history is None:
+            return None
+        base, base_version, base_time, deltas = history.chain
+        if (version is not None and version < base_version) or (version is None and at is not None and at < base_time):
+            return None
+        state = base
+        for delta_version, recorded_at, op, delta in list(deltas):
+            if (version is not None and delta_version > version) or (version is None and at is not None and recorded_at > at):
+                break
+            state = _apply(state, op, delta)
+        return state
+
+    def snapshot(self, entity_type, version=None, at=None):
+        """
+        Rebuild every tracked entity of a type at a feed version or a point in time.
+
+        Args:
+            entity_type (str): The type of the entities.
+            version (int, optional): The change feed version to read at.
+            at (datetime, optional): The time to read at (used when version is None).
+
+        Returns:
+            list: The entity states that existed at that point.
+        """
+        entity_ids = list(self._histories.get(entity_type, {}))  # Only this type's keys
+        states = (self.as_of(entity_type, entity_id, version, at) for entity_id in entity_ids)
+        return [state for state in states if state is not None]
+
+    def __len__(self):
+        return sum(len(histories) for histories in list(self._histories.values()))
@@ -1,9 +1,19 @@
 from abc import ABC, abstractmethod  # Import ABC and abstractmethod for defining abstract base classes
+from .vacuum import is_deleted  # Import the soft delete tombstone check
 
 class IPersistenceManager(ABC):
     """
     Interface for persistence manager to handle CRUD operations for various entities.
+
+    Attributes:
+        supports_transactions (bool): Whether transaction() groups mutations atomically; callers
+            must check it, since backends without it raise NotImplementedError.
+        supports_snapshots (bool): Whether read_snapshot() isolates reads from concurrent writers;
+            callers must check it, since backends without it raise NotImplementedError.
     """
+
+    supports_transactions = False  # Backends that implement transaction() set this
+    supports_snapshots = False  # Backends that implement read_snapshot() set this
     
     @abstractmethod
     def save(self, entity):
@@ -16,36 +26,98 @@ class IPersistenceManager(ABC):
         pass
 
     @abstractmethod
-    def get(self, entity_id, entity_type):
+    def get(self, entity_id, entity_type, include_deleted=False):
         """
         Retrieve an entity from the storage.
 
         Args:
             entity_id (str): The ID of the entity to retrieve.
             entity_type (str): The type of the entity to retrieve.
+            include_deleted (bool): Whether to return soft-deleted entities too.
 
         Returns:
             object: The retrieved entity.
         """
         pass
 
+    def all(self, entity_type, include_deleted=False):
+        """
+        Retrieve every entity of a type.
+
+        The default reads the `storage` mapping of entity type to entity
+        dictionaries that the implementations expose and skips tombstones.
+
+        Args:
+            entity_type (str): The type of the entities to retrieve.
+            include_deleted (bool): Whether to include soft-deleted entities.
+
+        Returns:
+            list: The entity dictionaries.
+        """
+        entities = self.storage.get(entity_type, None) or []
+        if include_deleted:
+            return entities
+        return [entity for entity in entities if not is_deleted(entity)]
+
     @abstractmethod
-    def update(self, entity):
+    def update(self, entity, expected_version=None):
         """
-        Update an entity in the storage.
+        Update an entity in the storage and bump its version.
+
+        With expected_version the update is a compare-and-swap: it only
+        applies if the stored entity is still at that version, so writers
+        detect lost updates without holding a lock across read and write.
 
         Args:
             entity (object): The entity to update.
+            expected_version (int, optional): The version the stored entity must be at.
+
+        Raises:
+            VersionConflictError: If the stored entity is at another version.
         """
         pass
 
     @abstractmethod
-    def delete(self, entity_id, entity_type):
+    def delete(self, entity_id, entity_type, expected_version=None):
         """
         Delete an entity from the storage.
 
         Args:
             entity_id (str): The ID of the entity to delete.
             entity_type (str): The type of the entity to delete.
+            expected_version (int, optional): The version the stored entity must be at.
+
+        Raises:
+            VersionConflictError: If the stored entity is at another version.
         """
         pass
+
+    def transaction(self):
+        """
+        Group several mutations so they are persisted together.
+
+        Usage: `with data_manager.transaction(): ...`. Implementations that can
+        batch writes and roll back override this and set supports_transactions.
+
+        Returns:
+            contextmanager: Yields this persistence manager.
+
+        Raises:
+            NotImplementedError: If the backend cannot make a block atomic.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support transactions")
+
+    def read_snapshot(self):
+        """
+        Give a block a consistent view of storage across several reads.
+
+        Usage: `with data_manager.read_snapshot(): ...`. Implementations that
+        can hold off concurrent writers override this and set supports_snapshots.
+
+        Returns:
+            contextmanager: Yields this persistence manager.
+
+        Raises:
+            NotImplementedError: If the backend cannot isolate reads from writers.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support read snapshots")
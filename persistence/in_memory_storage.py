@@ -0,0 +1,155 @@
+import json  # Import the json module to read the seed file
+from .data_manager import DataManager  # Import the DataManager class the in-memory storage extends
+
+class InMemoryStorage(DataManager):
+    """
+    DataManager that keeps its storage in memory only.
+
+    Storage is seeded once from a dictionary or a JSON file, which is never
+    written back, so any number of processes can share a seed file. Every
+    DataManager feature (transactions, soft deletes, relationships, entity
+    versions, the change feed) works as usual.
+
+    snapshot() and restore() are copy-on-write at the level of an entity
+    type's list: a snapshot only holds the lists as they are, and the first
+    write to a type after a snapshot copies that type's list (its entity
+    dictionaries are shared, since writes replace entity dictionaries rather
+    than change them). Taking a snapshot costs O(number of types) and a
+    write after it at most one list copy.
+
+    Restores are not published on the change feed; callbacks registered
+    with subscribe_restore() rebuild whatever is derived from storage.
+    """
+
+    def __init__(self, initial=None, seed_file=None, **kwargs):
+        """
+        Initializes a new InMemoryStorage instance.
+
+        Args:
+            initial (dict, optional): Mapping of entity type name to a list of entity dictionaries
+                to start from; the dictionaries are copied.
+            seed_file (str, optional): A storage.json file to start from when `initial` is not
+                given; a missing file starts empty.
+            **kwargs: Other DataManager options (change_feed, relationships, soft_delete).
+        """
+        self._initial = initial  # Set the initial storage
+        self._seed_file = seed_file  # Set the seed file
+        self._shared = {}  # Entity type -> list still held by a snapshot, copied before the next write
+        self._restore_callbacks = []  # Callbacks invoked with the storage after every restore
+        super().__init__(storage_file=None, **kwargs)
+
+    def _load_storage(self):
+        """Copies the initial storage or the seed file into memory."""
+        storage = self._initial
+        if storage is None and self._seed_file:
+            try:
+                with open(self._seed_file, 'r') as f:
+                    storage = json.load(f)
+            except FileNotFoundError:
+                storage = None
+        self.storage = {entity_type: [dict(entity) for entity in entities] if isinstance(entities, list) else []
+                        for entity_type, entities in (storage or {}).items()}
+
+    def _flush_storage(self, entity_types):
+        """Nothing is written; storage lives in memory only."""
+        pass
+
+    def _own(self, entity_type):
+        """Gives a type its own list if a snapshot still shares it (called with the write lock held)."""
+        shared = self._shared.pop(entity_type, None)
+        entities = self.storage.get(entity_type)
+        if shared is None or entities is not shared:
+            return
+        copy = list(entities)
+        index = self._positions.get(entity_type)
+        if index is not None and index.is_current(entities):
+            index.entities = copy  # Same positions, so the index carries over to the copy
+        self.storage[entity_type] = copy
+
+    def save(self, entity):
+        """
+        Save an entity to the storage.
+
+        Args:
+            entity (object): The entity to save.
+        """
+        with self._write_lock.writing(type(entity).__name__):
+            self._own(type(entity).__name__)
+            super().save(entity)
+
+    def replace(self, entity_type, data, expected_version=None):
+        """
+        Replace the stored dictionary of an entity and bump its version.
+
+        Args:
+            entity_type (str): The type of the entity.
+            data (dict): The new entity dictionary; its 'id' selects the entity to replace.
+            expected_version (int, optional): The version the stored entity must be at.
+        """
+        with self._write_lock.writing(entity_type):
+            self._own(entity_type)
+            super().replace(entity_type, data, expected_version)
+
+    def _delete(self, entity_id, entity_type):
+        """Removes or tombstones one entity (called with the write lock held)."""
+        self._own(entity_type)
+        super()._delete(entity_id, entity_type)
+
+    def vacuum(self, entity_types=None, older_than=0):
+        """
+        Physically remove tombstones left by soft deletes.
+
+        Args:
+            entity_types (iterable, optional): The types to compact; defaults to every type.
+            older_than (float): Only remove tombstones deleted at least this many seconds ago.
+
+        Returns:
+            int: The number of tombstones removed.
+        """
+        with self._write_lock:
+            for entity_type in list(entity_types if entity_types is not None else self.storage.keys()):
+                self._own(entity_type)
+            return super().vacuum(entity_types, older_than)
+
+    def snapshot(self):
+        """
+        Capture the current storage.
+
+        Returns:
+            dict: Entity type -> entity list, to pass to restore(); treat it as read-only.
+        """
+        with self._write_lock:
+            if self._transaction_depth:
+                raise RuntimeError("Cannot take a snapshot inside a transaction.")
+            lists = dict(self.storage)
+            self._shared = dict(lists)  # Every list is now shared with the snapshot
+            return lists
+
+    def restore(self, snapshot):
+        """
+        Return the storage to a snapshot; the snapshot stays valid for later restores.
+
+        Args:
+            snapshot (dict): A result of snapshot().
+        """
+        with self._write_lock:
+            if self._transaction_depth:
+                raise RuntimeError("Cannot restore a snapshot inside a transaction.")
+            self.storage.clear()
+            self.storage.update(snapshot)  # The same dictionary object, so holders of `storage` see the restore
+            self._shared = dict(snapshot)
+            self._positions.clear()  # Position indexes rebuild on next use
+            if self.relationships is not None:
+                self.relationships.build(self.storage)  # Reverse indexes must match the restored lists
+            callbacks = list(self._restore_callbacks)
+        for callback in callbacks:
+            callback(self.storage)
+
+    def subscribe_restore(self, callback):
+        """
+        Register a callback invoked with the storage after every restore().
+
+        Args:
+            callback (callable): Function taking the storage dictionary.
+        """
+        self._restore_callbacks.append(callback)
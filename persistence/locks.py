@@ -0,0 +1,95 @@
+import threading  # Import the threading module for the lock primitives
+from contextlib import contextmanager  # Import contextmanager for the per-type write API
+
+class WriteLock:
+    """
+    Write lock of a persistence manager: one lock per entity type under a global lock.
+
+    A write to a single entity holds the global lock shared and the lock of
+    its entity type, so writes to different types run concurrently while
+    writes to the same type stay serialized. Transactions, read snapshots and
+    other operations spanning types hold the global lock exclusively with
+    `with lock:`, which waits for running writes to finish and keeps new ones
+    out. The exclusive lock is reentrant, and its owner may also write
+    without waiting for itself.
+
+    A thread holding the lock shared cannot take it exclusively (the two
+    would wait for each other); code that may span types must take the
+    exclusive lock first.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()  # Guards the counters below
+        self._shared = 0  # Threads currently writing a single entity
+        self._exclusive = False  # Whether the exclusive lock is held or being waited for
+        self._owner = None  # Thread holding the exclusive lock
+        self._depth = 0  # Nesting depth of the owner's exclusive holds
+        self._local = threading.local()  # Per-thread nesting depth of shared holds
+        self._type_locks = {}  # Entity type -> lock serializing that type's writes
+        self._type_locks_guard = threading.Lock()  # Guards creation of new type locks
+
+    def owned(self):
+        """Returns True if the calling thread holds the lock exclusively."""
+        return self._owner == threading.get_ident()
+
+    def __enter__(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner == me:
+                self._depth += 1  # Nested transactions and snapshots
+                return self
+            if getattr(self._local, 'depth', 0):
+                raise RuntimeError("Cannot take the write lock exclusively while writing a single entity.")
+            while self._exclusive:
+                self._condition.wait()
+            self._exclusive = True  # New single-entity writes wait from here on
+            while self._shared:
+                self._condition.wait()
+            self._owner, self._depth = me, 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._condition:
+            self._depth -= 1
+            if not self._depth:
+                self._exclusive = False
+                self._owner = None
+                self._condition.notify_all()
+        return False
+
+    def _type_lock(self, entity_type):
+        """Returns the lock of an entity type, creating it on first use."""
+        lock = self._type_locks.get(entity_type)
+        if lock is None:
+            with self._type_locks_guard:
+                lock = self._type_locks.setdefault(entity_type, threading.RLock())
+        return lock
+
+    @contextmanager
+    def writing(self, entity_type):
+        """
+        Hold the lock for a write to one entity of a type.
+
+        Args:
+            entity_type (str): The type of the written entity.
+        """
+        if self.owned():
+            yield  # The exclusive holder already keeps every other writer out
+            return
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            with self._condition:
+                while self._exclusive:
+                    self._condition.wait()
+                self._shared += 1
+        self._local.depth = depth + 1
+        try:
+            with self._type_lock(entity_type):
+                yield
+        finally:
+            self._local.depth = depth
+            if not depth:
+                with self._condition:
+                    self._shared -= 1
+                    if not self._shared:
+                        self._condition.notify_all()
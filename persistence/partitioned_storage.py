@@ -0,0 +1,623 @@
+import bisect  # Import the bisect module to look ids up on the hash ring
+import hashlib  # Import the hashlib module for a stable, well-spread id hash
+import json  # Import the json module to encode entities for the partitions
+import os  # Import the os module to manage partition files
+import sqlite3  # Import the sqlite3 module for the partition backends
+import threading  # Import the threading module to serialize access to each partition
+from concurrent.futures import ThreadPoolExecutor  # Import the executor for scatter-gather queries
+from contextlib import contextmanager  # Import contextmanager for the routing lock and transactions
+from functools import lru_cache  # Import lru_cache to build each hash ring once
+from .i_persistence_manager import IPersistenceManager  # Import the persistence manager interface
+from .versioning import VERSION_FIELD, check_version, entity_version  # Import the per-entity version helpers
+
+_VIRTUAL_NODES = 64  # Points per partition on the hash ring; more points spread ids more evenly
+
+def _hash(key):
+    """Returns a stable 64-bit hash of a string, the same in every process."""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+@lru_cache(maxsize=8)
+def _hash_ring(partition_count):
+    """
+    Returns the consistent hash ring of a partition count as (sorted points, owning partition of each point).
+
+    Each partition owns the same points whatever the count, so growing from n to n + 1
+    partitions only moves the ids that land on the new partition's points (about 1 / (n + 1)
+    of them), and shrinking only moves the ids of the removed partitions.
+    """
+    ring = sorted((_hash(f'partition-{number}#{point}'), number)
+                  for number in range(partition_count) for point in range(_VIRTUAL_NODES))
+    return [point for point, _ in ring], [number for _, number in ring]
+
+class SQLitePartition:
+    """
+    A single partition backed by a local SQLite file.
+
+    Attributes:
+        path (str): The file path of the SQLite database.
+    """
+
+    def __init__(self, path):
+        """
+        Opens (and creates if needed) a partition database.
+
+        Args:
+            path (str): The file path of the SQLite database.
+        """
+        self.path = path  # Set the path for the partition database
+        self._lock = threading.Lock()  # One statement at a time per connection
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            "type TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (type, id))"
+        )
+        self._conn.commit()
+
+    def close(self):
+        """Closes the partition database."""
+        self._conn.close()
+
+    def put(self, entity_type, entity_id, data):
+        """Inserts or replaces one entity dictionary."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entities (type, id, data) VALUES (?, ?, ?)",
+                (entity_type, entity_id, json.dumps(data, default=str)),
+            )
+            self._conn.commit()
+
+    def put_many(self, rows):
+        """Inserts or replaces many (entity_type, entity_id, data) rows in one transaction."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entities (type, id, data) VALUES (?, ?, ?)",
+                [(entity_type, entity_id, json.dumps(data, default=str)) for entity_type, entity_id, data in rows],
+            )
+            self._conn.commit()
+
+    def exists(self, entity_type, entity_id):
+        """Returns True if the partition holds the entity."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM entities WHERE type = ? AND id = ?", (entity_type, entity_id)
+            ).fetchone()
+        return row is not None
+
+    def get(self, entity_type, entity_id):
+        """Returns one entity dictionary or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM entities WHERE type = ? AND id = ?", (entity_type, entity_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, entity_type, entity_id):
+        """Deletes one entity, returning True if it existed."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM entities WHERE type = ? AND id = ?", (entity_type, entity_id))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def compare_and_set(self, entity_type, entity_id, data, expected_version=None):
+        """
+        Replace (or with data None, delete) one entity if it is at the expected version.
+
+        The read, the version check and the write run under the partition
+        lock in one database transaction. A replaced entity's version is bumped
+        in `data`.
+
+        Returns:
+            bool: False if the entity does not exist.
+
+        Raises:
+            VersionConflictError: If the stored entity is at another version.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM entities WHERE type = ? AND id = ?", (entity_type, entity_id)
+            ).fetchone()
+            if row is None:
+                return False
+            current = json.loads(row[0])
+            check_version(entity_type, current, expected_version)
+            if data is None:
+                self._conn.execute("DELETE FROM entities WHERE type = ? AND id = ?", (entity_type, entity_id))
+            else:
+                data[VERSION_FIELD] = entity_version(current) + 1
+                self._conn.execute(
+                    "UPDATE entities SET data = ? WHERE type = ? AND id = ?",
+                    (json.dumps(data, default=str), entity_type, entity_id),
+                )
+            self._conn.commit()
+        return True
+
+    def find(self, entity_type, filters=None):
+        """
+        Returns the entities of a type whose fields equal the given filters.
+
+        Args:
+            entity_type (str): The entity type name.
+            filters (dict, optional): Field name -> required value.
+
+        Returns:
+            list: The matching entity dictionaries.
+        """
+        sql = "SELECT data FROM entities WHERE type = ?"
+        params = [entity_type]
+        for field, value in (filters or {}).items():
+            sql += " AND json_extract(data, ?) = ?"
+            params += ['$.' + field, value]
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY rowid", params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def entity_types(self):
+        """Returns the entity types present in the partition."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT type FROM entities")]
+
+    def rows(self):
+        """Returns every (entity_type, entity_id, data) row in the partition."""
+        with self._lock:
+            rows = self._conn.execute("SELECT type, id, data FROM entities").fetchall()
+        return [(entity_type, entity_id, json.loads(data)) for entity_type, entity_id, data in rows]
+
+    def delete_many(self, keys):
+        """Deletes many (entity_type, entity_id) keys in one transaction."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM entities WHERE type = ? AND id = ?", keys)
+            self._conn.commit()
+
+
+class _RoutingLock:
+    """
+    Shared/exclusive lock over the partition layout.
+
+    Every read and write holds it shared while it routes and runs, so they
+    still run concurrently; rebalance() holds it exclusively so no operation
+    routes with a partition count that is about to change.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()  # Guards the counters below
+        self._shared = 0  # Operations currently routing through the layout
+        self._exclusive = False  # Whether a rebalance holds the layout
+        self._owner = None  # Thread holding the exclusive lock, which may also take it shared
+
+    @contextmanager
+    def shared(self):
+        """Hold the layout for one operation."""
+        if self._owner == threading.get_ident():
+            yield  # The rebalancing thread already excludes everyone else
+            return
+        with self._condition:
+            while self._exclusive:
+                self._condition.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._shared -= 1
+                if not self._shared:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the layout for a rebalance, waiting for running operations to finish."""
+        if self._owner == threading.get_ident():
+            yield  # Already held by this thread
+            return
+        with self._condition:
+            while self._exclusive:
+                self._condition.wait()
+            self._exclusive = True  # New operations wait from here on
+            while self._shared:
+                self._condition.wait()
+            self._owner = threading.get_ident()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._owner = None
+                self._condition.notify_all()
+
+
+class _ScatterGatherView:
+    """
+    Read-only stand-in for DataManager.storage.
+
+    `api/app.py` reads whole entity lists through `data_manager.storage.get(...)`;
+    this view answers those reads by gathering from every partition.
+    """
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def get(self, entity_type, default=None):
+        entities = self._manager.find(entity_type)
+        return entities if entities else default
+
+    def __getitem__(self, entity_type):
+        return self._manager.find(entity_type)
+
+    def __contains__(self, entity_type):
+        return entity_type in self.keys()
+
+    def keys(self):
+        return self._manager.entity_types()
+
+    def items(self):
+        return [(entity_type, self._manager.find(entity_type)) for entity_type in self.keys()]
+
+
+class PartitionedStorage(IPersistenceManager):
+    """
+    PartitionedStorage class implementing the IPersistenceManager interface
+    by hash-partitioning every entity type across several SQLite files.
+
+    Point lookups go to the partition that owns the id; list and foreign-key
+    queries run on every partition in parallel and are merged. Ids are placed
+    on a consistent hash ring, so a rebalance only moves the ids whose owner
+    changes rather than nearly all of them.
+
+    Like DataManager it publishes mutations to a change feed, enforces a
+    relationship registry and write checks, and groups mutations in
+    transactions, so `api/app.py` can run on it (HBNB_STORAGE=partitioned).
+    Deletes remove rows outright; there are no tombstones to vacuum.
+
+    Attributes:
+        partition_dir (str): The directory holding the partition databases.
+        partitions (list): The SQLitePartition backends, indexed by partition number.
+        storage (_ScatterGatherView): Read view compatible with DataManager.storage.
+        change_feed (ChangeFeed): The feed mutations are published to, or None.
+        relationships (RelationshipRegistry): Foreign keys to enforce, or None.
+    """
+
+    supports_transactions = True  # transaction() commits or rolls back as a whole
+    supports_snapshots = True  # read_snapshot() holds writers off
+
+    def __init__(self, partition_dir='partitions', partition_count=4, change_feed=None, relationships=None):
+        """
+        Initializes a new PartitionedStorage instance.
+
+        Args:
+            partition_dir (str): The directory holding the partition databases.
+            partition_count (int): The number of partitions to hash entities across.
+            change_feed (ChangeFeed, optional): Feed to publish every mutation to.
+            relationships (RelationshipRegistry, optional): Foreign keys to enforce. Deletes then
+                cascade or pull references, inside one transaction.
+        """
+        if partition_count < 1:
+            raise ValueError("partition_count must be at least 1.")
+        self.partition_dir = partition_dir  # Set the directory for the partition databases
+        os.makedirs(partition_dir, exist_ok=True)  # Create the partition directory if it doesn't exist
+        self.partitions = [self._open_partition(number) for number in range(partition_count)]
+        self._layout = _RoutingLock()  # Keeps operations off the partitions while a rebalance moves rows
+        self._executor = ThreadPoolExecutor(max_workers=partition_count)  # Scatter-gather worker pool
+        self.storage = _ScatterGatherView(self)
+        self.change_feed = change_feed  # Set the feed mutations are published to
+        self.relationships = relationships  # Set the foreign key registry
+        self._write_lock = threading.RLock()  # Serializes writers so transactions and snapshots see a consistent state
+        self._write_checks = []  # Callbacks that may reject a save or replace before it is applied
+        self._transaction_depth = 0  # Nesting depth of the running transaction
+        self._undo = []  # (entity_type, entity_id, previous data or None) per mutation of the running transaction
+        self._pending_events = []  # Change events held back until the running transaction commits
+        if self.relationships is not None:
+            self.relationships.build(self.storage)  # Build the reverse indexes once from the stored rows
+
+    def _open_partition(self, number):
+        """Opens the partition database with the given number."""
+        return SQLitePartition(os.path.join(self.partition_dir, f'partition-{number}.sqlite3'))
+
+    @staticmethod
+    def partition_for(entity_id, partition_count):
+        """
+        Return the partition number that owns an id.
+
+        The id is hashed onto the consistent hash ring of the partition count;
+        the hash is stable across processes, unlike the built-in hash() of a
+        string.
+
+        Args:
+            entity_id (str): The ID of the entity.
+            partition_count (int): The number of partitions.
+
+        Returns:
+            int: The owning partition number.
+        """
+        points, owners = _hash_ring(partition_count)
+        return owners[bisect.bisect_right(points, _hash(str(entity_id))) % len(points)]
+
+    def _partition(self, entity_id):
+        """Returns the partition that owns an id."""
+        return self.partitions[self.partition_for(entity_id, len(self.partitions))]
+
+    def _scatter(self, func):
+        """Runs func on every partition in parallel and returns the results in partition order."""
+        return list(self._executor.map(func, self.partitions))
+
+    def close(self):
+        """Stops the worker pool and closes every partition."""
+        self._executor.shutdown()
+        for partition in self.partitions:
+            partition.close()
+
+    @property
+    def version(self):
+        """The change feed version of the most recent mutation (0 without a feed)."""
+        return self.change_feed.version if self.change_feed else 0
+
+    def _emit(self, op, entity_type, entity_id, data=None):
+        """Appends a mutation event to the change feed, or holds it back inside a transaction."""
+        if self.change_feed is None:
+            return
+        if self._transaction_depth:
+            self._pending_events.append((op, entity_type, entity_id, dict(data) if data is not None else None))
+        else:
+            self.change_feed.append(op, entity_type, entity_id, data)
+
+    def _remember(self, entity_type, entity_id, previous):
+        """Records the row a mutation inside a transaction overwrites, so a rollback can restore it."""
+        if self._transaction_depth:
+            self._undo.append((entity_type, entity_id, previous))
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group several mutations so they commit or roll back together.
+
+        Other threads' writes wait until the transaction finishes, and the
+        change events of the block are published only when it commits. If
+        the block raises, every row it changed is restored. Each partition
+        commits its own rows, so a crash part-way through can still leave a
+        partial transaction on disk.
+
+        Yields:
+            PartitionedStorage: This manager.
+        """
+        with self._write_lock:
+            if self._transaction_depth:
+                self._transaction_depth += 1  # Nested blocks join the outer transaction
+                try:
+                    yield self
+                finally:
+                    self._transaction_depth -= 1
+                return
+            self._transaction_depth = 1
+            try:
+                yield self
+            except BaseException:
+                self._transaction_depth = 0
+                self._rollback()
+                self._pending_events = []
+                raise
+            finally:
+                self._transaction_depth = 0
+                self._undo = []
+            events, self._pending_events = self._pending_events, []
+            for event in events:
+                self.change_feed.append(*event)
+
+    def _rollback(self):
+        """Restores the rows changed by the running transaction, newest change first."""
+        with self._layout.shared():
+            for entity_type, entity_id, previous in reversed(self._undo):
+                partition = self._partition(entity_id)
+                if previous is None:
+                    partition.delete(entity_type, entity_id)
+                else:
+                    partition.put(entity_type, entity_id, previous)
+        if self.relationships is not None:
+            self.relationships.build(self.storage)  # Reverse indexes must match the restored rows
+
+    @contextmanager
+    def read_snapshot(self):
+        """
+        Give a block a consistent view of storage across several reads.
+
+        Other threads' writes wait until the block exits; reads are not blocked.
+
+        Yields:
+            PartitionedStorage: This manager.
+        """
+        with self._write_lock:
+            yield self
+
+    def add_write_check(self, callback):
+        """
+        Register a callback that may reject a write before it is applied.
+
+        Args:
+            callback (callable): Called as callback(op, entity_type, data) with op 'save' or
+                'update', under the write lock; raising rejects the write.
+        """
+        self._write_checks.append(callback)
+
+    def save(self, entity):
+        """
+        Save an entity to the partition that owns its id.
+
+        Args:
+            entity (object): The entity to save.
+        """
+        entity_type = type(entity).__name__  # Get the type name of the entity
+        data = entity.__dict__
+        data.setdefault(VERSION_FIELD, 1)  # New entities start at version 1
+        with self._write_lock:
+            if self.relationships is not None:
+                self.relationships.check_references(entity_type, data)  # Reject dangling references
+            for check in self._write_checks:
+                check('save', entity_type, data)
+            with self._layout.shared():
+                partition = self._partition(entity.id)
+                if self._transaction_depth:
+                    self._remember(entity_type, entity.id, partition.get(entity_type, entity.id))
+                partition.put(entity_type, entity.id, data)
+            if self.relationships is not None:
+                self.relationships.index(entity_type, data)  # Record the new references
+            self._emit('save', entity_type, entity.id, data)  # Publish the new entity to followers
+
+    def get(self, entity_id, entity_type, include_deleted=False):
+        """
+        Retrieve an entity from the partition that owns its id.
+
+        Args:
+            entity_id (str): The ID of the entity to retrieve.
+            entity_type (str): The type of the entity to retrieve.
+            include_deleted (bool): Unused; partitions delete rows outright.
+
+        Returns:
+            object: The retrieved entity or None if not found.
+        """
+        with self._layout.shared():
+            return self._partition(entity_id).get(entity_type, entity_id)
+
+    def update(self, entity, expected_version=None):
+        """
+        Update an entity in the partition that owns its id and bump its version.
+
+        Args:
+            entity (object): The entity to update.
+            expected_version (int, optional): The version the stored entity must be at.
+        """
+        self.replace(type(entity).__name__, entity.__dict__, expected_version)
+
+    def replace(self, entity_type, data, expected_version=None):
+        """
+        Replace the stored dictionary of an entity and bump its version.
+
+        Args:
+            entity_type (str): The type of the entity.
+            data (dict): The new entity dictionary; its 'id' selects the entity to replace.
+            expected_version (int, optional): The version the stored entity must be at.
+
+        Raises:
+            VersionConflictError: If the stored entity is at another version.
+        """
+        entity_id = data.get('id')  # Get the ID of the entity
+        with self._write_lock:
+            with self._layout.shared():
+                partition = self._partition(entity_id)
+                current = partition.get(entity_type, entity_id)
+                if current is None:
+                    raise ValueError(f"Entity of type {entity_type} with ID {entity_id} not found.")
+                check_version(entity_type, current, expected_version)
+                for check in self._write_checks:
+                    check('update', entity_type, data)
+                if self.relationships is not None:
+                    self.relationships.check_references(entity_type, data)  # Reject dangling references
+                self._remember(entity_type, entity_id, current)
+                partition.compare_and_set(entity_type, entity_id, data)  # Bumps the version in data
+            if self.relationships is not None:
+                self.relationships.unindex(entity_type, current)
+                self.relationships.index(entity_type, data)
+            self._emit('update', entity_type, entity_id, data)  # Publish the new state to followers
+
+    def delete(self, entity_id, entity_type, expected_version=None):
+        """
+        Delete an entity from the partition that owns its id.
+
+        With a relationship registry, dependents are cascaded, pulled or cause
+        the delete to be rejected, all in one transaction.
+
+        Args:
+            entity_id (str): The ID of the entity to delete.
+            entity_type (str): The type of the entity to delete.
+            expected_version (int, optional): The version the stored entity must be at.
+        """
+        with self._write_lock:
+            entity = self.get(entity_id, entity_type)
+            if entity is None:
+                raise ValueError(f"Entity of type {entity_type} with ID {entity_id} not found.")
+            check_version(entity_type, entity, expected_version)
+            if self.relationships is not None:
+                with self.transaction():
+                    self.relationships.on_delete(self, entity_type, entity)  # Handle dependents first
+                    self._delete(entity_id, entity_type)
+                return
+            self._delete(entity_id, entity_type)
+
+    def _delete(self, entity_id, entity_type):
+        """Removes one entity without looking at its dependents."""
+        with self._layout.shared():
+            partition = self._partition(entity_id)
+            entity = partition.get(entity_type, entity_id)
+            if entity is None:
+                raise ValueError(f"Entity of type {entity_type} with ID {entity_id} not found.")
+            self._remember(entity_type, entity_id, entity)
+            partition.delete(entity_type, entity_id)
+        if self.relationships is not None:
+            self.relationships.unindex(entity_type, entity)  # Forget the removed references
+        self._emit('delete', entity_type, entity_id)  # Publish the removal to followers
+
+    def tombstone_stats(self):
+        """Returns no tombstones: deletes remove rows outright."""
+        return {}
+
+    def vacuum(self, entity_types=None, older_than=0):
+        """Removes nothing: deletes remove rows outright. Returns 0."""
+        return 0
+
+    def find(self, entity_type, **filters):
+        """
+        Retrieve every entity of a type matching field filters from all partitions.
+
+        Args:
+            entity_type (str): The type of the entities to retrieve.
+            **filters: Field name -> required value, e.g. place_id='...'.
+
+        Returns:
+            list: The matching entity dictionaries.
+        """
+        with self._layout.shared():
+            results = self._scatter(lambda partition: partition.find(entity_type, filters))
+        return [entity for partition_entities in results for entity in partition_entities]
+
+    def entity_types(self):
+        """Returns the entity types present in any partition."""
+        types = set()
+        with self._layout.shared():
+            for partition_types in self._scatter(SQLitePartition.entity_types):
+                types.update(partition_types)
+        return sorted(types)
+
+    def rebalance(self, partition_count):
+        """
+        Change the number of partitions and move entities to their new owners.
+
+        Only entities whose owning partition changes are moved. When shrinking,
+        the partitions beyond the new count are emptied and their files removed.
+        Other operations wait until the move is finished, then route with the
+        new partition count.
+
+        Args:
+            partition_count (int): The new number of partitions.
+        """
+        if partition_count < 1:
+            raise ValueError("partition_count must be at least 1.")
+        with self._layout.exclusive():
+            partitions = list(self.partitions)  # The new layout; self.partitions is swapped once rows have moved
+            for number in range(len(partitions), partition_count):
+                partitions.append(self._open_partition(number))
+            moves = {}  # Target partition number -> rows to insert
+            leaving = {}  # Source partition number -> keys to delete once copied
+            for number, partition in enumerate(self.partitions):
+                for entity_type, entity_id, data in partition.rows():
+                    target = self.partition_for(entity_id, partition_count)
+                    if target != number:
+                        moves.setdefault(target, []).append((entity_type, entity_id, data))
+                        leaving.setdefault(number, []).append((entity_type, entity_id))
+            # Copy before deleting so an interruption leaves duplicates rather than losing entities
+            for target, rows in moves.items():
+                partitions[target].put_many(rows)
+            for number, keys in leaving.items():
+                partitions[number].delete_many(keys)
+            for partition in partitions[partition_count:]:
+                partition.close()
+                os.remove(partition.path)
+            self.partitions = partitions[:partition_count]
+            self._executor.shutdown()
+            self._executor = ThreadPoolExecutor(max_workers=partition_count)
@@ -0,0 +1,225 @@
+from .vacuum import is_deleted  # Import the tombstone check; soft-deleted entities hold no references
+
+class ReferentialIntegrityError(Exception):
+    """
+    Raised when a write would leave a dangling reference: a new or updated
+    entity points at a missing parent, or a delete is restricted by dependents.
+    """
+    pass
+
+class Relationship:
+    """
+    Describes a foreign key from one entity type to another.
+
+    Attributes:
+        child_type (str): The type holding the reference, e.g. 'Review'.
+        field (str): The referencing field, e.g. 'place_id'.
+        parent_type (str): The referenced type, e.g. 'Place'.
+        parent_key (str): The referenced field on the parent, usually 'id'.
+        on_delete (str): What deleting a parent does to its dependents:
+            'cascade' deletes them, 'restrict' rejects the delete and 'pull'
+            removes the parent key from a list field.
+        many (bool): Whether the field holds a list of keys.
+    """
+
+    ON_DELETE = ('cascade', 'restrict', 'pull')  # Supported delete behaviours
+
+    def __init__(self, child_type, field, parent_type, parent_key='id', on_delete='cascade', many=False):
+        """
+        Initializes a new Relationship instance.
+
+        Args:
+            child_type (str): The type holding the reference.
+            field (str): The referencing field.
+            parent_type (str): The referenced type.
+            parent_key (str): The referenced field on the parent.
+            on_delete (str): 'cascade', 'restrict' or 'pull'.
+            many (bool): Whether the field holds a list of keys.
+        """
+        if on_delete not in self.ON_DELETE:
+            raise ValueError(f"Unknown on_delete behaviour {on_delete}.")
+        if on_delete == 'pull' and not many:
+            raise ValueError("on_delete='pull' needs a list field (many=True).")
+        self.child_type = child_type  # Set the type holding the reference
+        self.field = field  # Set the referencing field
+        self.parent_type = parent_type  # Set the referenced type
+        self.parent_key = parent_key  # Set the referenced field on the parent
+        self.on_delete = on_delete  # Set the delete behaviour
+        self.many = many  # Set whether the field holds a list of keys
+
+    def values(self, entity):
+        """Returns the parent keys an entity dictionary references through this relationship."""
+        value = entity.get(self.field)
+        if self.many:
+            return [item for item in value or [] if item is not None]
+        return [] if value is None else [value]
+
+# Foreign keys between the model classes
+DEFAULT_RELATIONSHIPS = (
+    Relationship('Review', 'place_id', 'Place', on_delete='cascade'),
+    Relationship('Review', 'user_id', 'User', on_delete='cascade'),
+    Relationship('Place', 'host_id', 'User', on_delete='cascade'),
+    Relationship('Place', 'city_id', 'City', on_delete='restrict'),
+    Relationship('Place', 'amenity_ids', 'Amenity', on_delete='pull', many=True),
+    Relationship('City', 'country_code', 'Country', parent_key='code', on_delete='restrict'),
+    Relationship('Booking', 'place_id', 'Place', on_delete='cascade'),
+    Relationship('Booking', 'user_id', 'User', on_delete='cascade'),
+)
+
+class RelationshipRegistry:
+    """
+    Registry of foreign keys with reverse indexes over the stored entities.
+
+    For every relationship the registry keeps parent key -> set of child ids,
+    and for every referenced parent key the number of parents holding each
+    value. Finding the dependents of a parent or checking that a referenced
+    parent exists is then a dictionary lookup instead of a scan.
+
+    Attributes:
+        relationships (list): The registered Relationship objects.
+        validate_references (bool): Whether saves and updates must reference existing parents.
+    """
+
+    def __init__(self, relationships=DEFAULT_RELATIONSHIPS, validate_references=True):
+        """
+        Initializes a new RelationshipRegistry instance.
+
+        Args:
+            relationships (iterable): The Relationship objects to register.
+            validate_references (bool): Whether saves and updates must reference existing parents.
+        """
+        self.relationships = list(relationships)  # Set the registered relationships
+        self.validate_references = validate_references  # Set whether references are checked on write
+        self._children = {}  # Relationship -> {parent key value: set of child ids}
+        self._keys = {}  # (parent type, parent key) -> {value: number of parents holding it}
+        self.clear()
+
+    def clear(self):
+        """Empties every index."""
+        self._children = {relationship: {} for relationship in self.relationships}
+        self._keys = {(relationship.parent_type, relationship.parent_key): {} for relationship in self.relationships}
+
+    def build(self, storage):
+        """
+        Rebuild every index from a storage dictionary.
+
+        Args:
+            storage (dict): Mapping of entity type name to a list of entity dictionaries.
+        """
+        self.clear()
+        types = {relationship.child_type for relationship in self.relationships}
+        types.update(parent_type for parent_type, _ in self._keys)
+        for entity_type in types:
+            for entity in storage.get(entity_type, None) or []:
+                if not is_deleted(entity):
+                    self.index(entity_type, entity)
+
+    def index(self, entity_type, entity):
+        """Adds an entity dictionary to the indexes."""
+        for (parent_type, parent_key), counts in self._keys.items():
+            if parent_type == entity_type and entity.get(parent_key) is not None:
+                value = entity[parent_key]
+                counts[value] = counts.get(value, 0) + 1
+        entity_id = entity.get('id')
+        if entity_id is None:
+            return
+        for relationship, children in self._children.items():
+            if relationship.child_type == entity_type:
+                for value in relationship.values(entity):
+                    children.setdefault(value, set()).add(entity_id)
+
+    def unindex(self, entity_type, entity):
+        """Removes an entity dictionary from the indexes."""
+        for (parent_type, parent_key), counts in self._keys.items():
+            if parent_type == entity_type and entity.get(parent_key) is not None:
+                value = entity[parent_key]
+                if counts.get(value, 0) <= 1:
+                    counts.pop(value, None)
+                else:
+                    counts[value] -= 1
+        entity_id = entity.get('id')
+        if entity_id is None:
+            return
+        for relationship, children in self._children.items():
+            if relationship.child_type == entity_type:
+                for value in relationship.values(entity):
+                    dependents = children.get(value)
+                    if dependents is not None:
+                        dependents.discard(entity_id)
+                        if not dependents:
+                            del children[value]
+
+    def exists(self, parent_type, parent_key, value):
+        """Returns True if some stored parent holds the key value."""
+        return self._keys.get((parent_type, parent_key), {}).get(value, 0) > 0
+
+    def dependents(self, relationship, value):
+        """Returns the ids of the children referencing a parent key value."""
+        return set(self._children[relationship].get(value, ()))
+
+    def check_references(self, entity_type, entity):
+        """
+        Check that every parent an entity references exists.
+
+        Args:
+            entity_type (str): The type of the entity being written.
+            entity (dict): The entity dictionary being written.
+
+        Raises:
+            ReferentialIntegrityError: If a referenced parent is missing.
+        """
+        if not self.validate_references:
+            return
+        for relationship in self.relationships:
+            if relationship.child_type != entity_type:
+                continue
+            for value in relationship.values(entity):
+                if not self.exists(relationship.parent_type, relationship.parent_key, value):
+                    raise ReferentialIntegrityError(
+                        f"{entity_type}.{relationship.field} references missing "
+                        f"{relationship.parent_type} with {relationship.parent_key} {value}."
+                    )
+
+    def on_delete(self, manager, entity_type, entity):
+        """
+        Apply the delete behaviour of every relationship pointing at an entity.
+
+        Restrictions are checked before anything is changed. The caller is
+        expected to run this inside a transaction so cascades commit together.
+
+        Args:
+            manager (DataManager): The manager performing the delete.
+            entity_type (str): The type of the entity being deleted.
+            entity (dict): The entity dictionary being deleted.
+
+        Raises:
+            ReferentialIntegrityError: If a 'restrict' relationship has dependents.
+        """
+        actions = []
+        for relationship in self.relationships:
+            if relationship.parent_type != entity_type:
+                continue
+            value = entity.get(relationship.parent_key)
+            counts = self._keys[(relationship.parent_type, relationship.parent_key)]
+            if value is None or counts.get(value, 0) > 1:
+                continue  # Another parent still holds this key, so the dependents stay valid
+            dependents = self.dependents(relationship, value)
+            if not dependents:
+                continue
+            if relationship.on_delete == 'restrict':
+                raise ReferentialIntegrityError(
+                    f"Cannot delete {entity_type} {value}: referenced by "
+                    f"{len(dependents)} {relationship.child_type} entities."
+                )
+            actions.append((relationship, value, dependents))
+        for relationship, value, dependents in actions:
+            for child_id in dependents:
+                if relationship.on_delete == 'cascade':
+                    if manager.get(child_id, relationship.child_type) is not None:
+                        manager.delete(child_id, relationship.child_type)
+                else:
+                    child = manager.get(child_id, relationship.child_type)
+                    if child is not None:
+                        pulled = dict(child)
+                        pulled[relationship.field] = [item for item in child.get(relationship.field) or [] if item != value]
+                        manager.replace(relationship.child_type, pulled)
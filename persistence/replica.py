@@ -0,0 +1,170 @@
+import threading  # Import the threading module for the background follower
+import time  # Import the time module for polling deadlines
+from .change_feed import ChangeFeed  # Import the change feed
+from .data_manager import DataManager  # Import the DataManager class the replica extends
+
+class ReplicaDataManager(DataManager):
+    """
+    Read-only DataManager that follows a leader through its change feed.
+
+    The replica starts from the leader's storage file and replays the feed
+    log after its last checkpoint on top of it. Replay is idempotent (saves
+    and updates upsert by id, deletes of missing entities are ignored), so it
+    converges to the leader's state no matter how recent the storage file is,
+    as long as the file includes the checkpoint. A replica that falls behind
+    a later checkpoint reloads the storage file and continues from there.
+
+    Attributes:
+        feed_log (str): The file path of the leader's change feed log.
+        applied_version (int): Version of the last event applied to this replica.
+    """
+
+    def __init__(self, feed_log, storage_file='storage.json', **kwargs):
+        """
+        Initializes a new ReplicaDataManager and catches up with the feed.
+
+        Args:
+            feed_log (str): The file path of the leader's change feed log.
+            storage_file (str): The leader's storage file to bootstrap from.
+            **kwargs: Other DataManager options (snapshot_file, shard_dir).
+        """
+        self.feed_log = feed_log  # Set the path of the leader's feed log
+        self.applied_version = ChangeFeed.read_checkpoint(feed_log)  # Read before the storage, which includes it
+        self._cursor = None  # Position of the next unread event in the feed log
+        self._lock = threading.Lock()  # Serializes catch-up between readers and the follower thread
+        self._follower = None  # Background follower thread
+        self._stop = threading.Event()  # Signals the follower thread to exit
+        super().__init__(storage_file=storage_file, **kwargs)
+        self.catch_up()
+
+    @property
+    def version(self):
+        """The version of the last event applied to this replica."""
+        return self.applied_version
+
+    def _flush_storage(self, entity_types):
+        """Replicas never write the leader's files."""
+        pass
+
+    def save(self, entity):
+        """Replicas are read-only."""
+        raise PermissionError("ReplicaDataManager is read-only; write to the leader.")
+
+    def update(self, entity, expected_version=None):
+        """Replicas are read-only."""
+        raise PermissionError("ReplicaDataManager is read-only; write to the leader.")
+
+    def replace(self, entity_type, data, expected_version=None):
+        """Replicas are read-only."""
+        raise PermissionError("ReplicaDataManager is read-only; write to the leader.")
+
+    def delete(self, entity_id, entity_type, expected_version=None):
+        """Replicas are read-only."""
+        raise PermissionError("ReplicaDataManager is read-only; write to the leader.")
+
+    def apply(self, event):
+        """
+        Apply one change event to the replica's storage.
+
+        Args:
+            event (ChangeEvent): The event to apply.
+        """
+        self.storage.setdefault(event.entity_type, [])
+        entities, position = self._find(event.entity_type, event.entity_id)
+        if entities is not None:
+            if event.op == 'delete':
+                entities.pop(position)  # Replicas drop deleted entities instead of keeping tombstones
+            else:
+                entities[position] = event.data
+        elif event.op != 'delete':
+            entities = self.storage[event.entity_type]
+            index = self._positions.get(event.entity_type)  # Made current by _find above
+            current = index is not None and index.is_current(entities)
+            entities.append(event.data)
+            if current:
+                index.appended(event.data)  # Keep the position index valid so replaying inserts stays linear
+        self.applied_version = event.version
+
+    def catch_up(self):
+        """
+        Apply every complete event appended to the feed log since the last call.
+
+        Returns:
+            int: The replica version after catching up.
+        """
+        with self._lock:
+            events, self._cursor = ChangeFeed.follow_log(self.feed_log, self._cursor)
+            if events and events[0].version > self.applied_version + 1:
+                self._reload()  # A checkpoint dropped events this replica never applied
+            for event in events:
+                if event.version > self.applied_version:
+                    self.apply(event)
+            return self.applied_version
+
+    def _reload(self):
+        """Reloads the leader's storage file and continues from the checkpoint it includes."""
+        checkpoint = ChangeFeed.read_checkpoint(self.feed_log)  # Before the storage, so the storage includes it
+        self._load_storage()
+        self._positions.clear()  # Position indexes rebuild on next use
+        if self.relationships is not None:
+            self.relationships.build(self.storage)
+        self.applied_version = checkpoint
+
+    def wait_for_version(self, version, timeout=5.0, poll_interval=0.01):
+        """
+        Block until the replica has applied a version (read-your-writes).
+
+        Args:
+            version (int): The leader version returned after the caller's write.
+            timeout (float): Maximum number of seconds to wait.
+            poll_interval (float): Seconds between feed log polls.
+
+        Raises:
+            TimeoutError: If the replica has not reached the version in time.
+        """
+        deadline = time.monotonic() + timeout
+        while self.catch_up() < version:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Replica at version {self.applied_version} did not reach version {version}.")
+            time.sleep(poll_interval)
+
+    def get(self, entity_id, entity_type, include_deleted=False, min_version=None):
+        """
+        Retrieve an entity, optionally after reaching a minimum version.
+
+        Args:
+            entity_id (str): The ID of the entity to retrieve.
+            entity_type (str): The type of the entity to retrieve.
+            include_deleted (bool): Whether to return soft-deleted entities too.
+            min_version (int, optional): Leader version the read must reflect.
+
+        Returns:
+            object: The retrieved entity or None if not found.
+        """
+        if min_version is not None and self.applied_version < min_version:
+            self.wait_for_version(min_version)
+        return super().get(entity_id, entity_type, include_deleted)
+
+    def start(self, poll_interval=0.1):
+        """
+        Start a daemon thread that keeps the replica caught up.
+
+        Args:
+            poll_interval (float): Seconds between feed log polls.
+        """
+        if self._follower is None:
+            self._stop.clear()
+            self._follower = threading.Thread(target=self._follow, args=(poll_interval,), daemon=True)
+            self._follower.start()
+
+    def stop(self):
+        """Stop the background follower thread."""
+        if self._follower is not None:
+            self._stop.set()
+            self._follower.join()
+            self._follower = None
+
+    def _follow(self, poll_interval):
+        """Polls the feed log until stop() is called."""
+        while not self._stop.wait(poll_interval):
+            self.catch_up()
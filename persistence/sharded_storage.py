@@ -0,0 +1,112 @@
+import json  # Import the json module to handle JSON data
+import os  # Import the os module to manage shard files
+import threading  # Import the threading module for per-shard locks
+from concurrent.futures import ThreadPoolExecutor  # Import the executor to load shards in parallel
+
+class ShardedStorage:
+    """
+    One JSON file per entity type, each with its own lock.
+
+    Used by DataManager and FileStorage when a shard directory is configured,
+    so a write only rewrites the shard of the entity type it touched.
+
+    Attributes:
+        shard_dir (str): The directory holding one `<EntityType>.json` file per type.
+    """
+
+    SUFFIX = '.json'  # File extension for shard files
+
+    def __init__(self, shard_dir):
+        """
+        Initializes a new ShardedStorage instance.
+
+        Args:
+            shard_dir (str): The directory holding the shard files.
+        """
+        self.shard_dir = shard_dir  # Set the shard directory
+        self._locks = {}  # Entity type -> lock guarding that shard
+        self._locks_guard = threading.Lock()  # Guards creation of new shard locks
+        os.makedirs(shard_dir, exist_ok=True)  # Create the shard directory if it doesn't exist
+
+    def lock(self, entity_type):
+        """
+        Return the lock for an entity type's shard.
+
+        Args:
+            entity_type (str): The entity type name.
+
+        Returns:
+            threading.RLock: The lock for the shard.
+        """
+        lock = self._locks.get(entity_type)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(entity_type, threading.RLock())
+        return lock
+
+    def shard_path(self, entity_type):
+        """Returns the file path of an entity type's shard."""
+        return os.path.join(self.shard_dir, entity_type + self.SUFFIX)
+
+    def entity_types(self):
+        """Returns the entity types that currently have a shard file."""
+        return [name[:-len(self.SUFFIX)] for name in sorted(os.listdir(self.shard_dir)) if name.endswith(self.SUFFIX)]
+
+    def _load_shard(self, entity_type):
+        """Loads one shard, returning an empty list for malformed content."""
+        with self.lock(entity_type):
+            with open(self.shard_path(entity_type), 'r') as f:
+                entities = json.load(f)
+        return entities if isinstance(entities, list) else []
+
+    def load(self, max_workers=None):
+        """
+        Load every shard in parallel.
+
+        Args:
+            max_workers (int, optional): Maximum number of loader threads.
+
+        Returns:
+            dict: Mapping of entity type name to its list of entity dictionaries.
+        """
+        entity_types = self.entity_types()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(entity_types, executor.map(self._load_shard, entity_types)))
+
+    def flush(self, storage, entity_type):
+        """
+        Write one entity type's shard.
+
+        Args:
+            storage (dict): Mapping of entity type name to a list of entity dictionaries.
+            entity_type (str): The entity type whose shard should be written.
+        """
+        path = self.shard_path(entity_type)
+        temp_path = path + '.tmp'
+        with self.lock(entity_type):
+            with open(temp_path, 'w') as f:
+                json.dump(storage.get(entity_type, []), f, default=str)  # Write only this type's entities
+            os.replace(temp_path, path)  # Atomically swap in the new shard
+
+    def flush_all(self, storage):
+        """
+        Write every entity type's shard.
+
+        Args:
+            storage (dict): Mapping of entity type name to a list of entity dictionaries.
+        """
+        for entity_type in list(storage):
+            self.flush(storage, entity_type)
+
+
+def split_storage(storage_file, shard_dir):
+    """
+    Split a single storage.json file into per-type shard files.
+
+    Args:
+        storage_file (str): The file path of the JSON storage file.
+        shard_dir (str): The directory for the shard files.
+    """
+    with open(storage_file, 'r') as f:
+        storage = json.load(f)
+    ShardedStorage(shard_dir).flush_all({key: value if isinstance(value, list) else [] for key, value in storage.items()})
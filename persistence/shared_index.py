@@ -0,0 +1,397 @@
+"""
+Shared-memory read index for multi-process serving.
+
+The writer process encodes each entity type of its storage in the binary
+snapshot format into its own shared memory block, lists the blocks of the
+current generation in a small manifest block and then bumps a generation
+counter in a control block. Only the types a write changed are re-encoded;
+the other types keep their blocks from generation to generation. Readers
+attach to the blocks of the current generation and decode entities straight
+out of shared memory, so worker processes do not each hold a copy of the
+dataset. Each reader keeps the decoded lists of only its few most recently
+listed types, so list reads do not decode a whole type every time while a
+worker's memory stays bounded.
+"""
+
+import json  # Import the json module to encode the manifest of a generation
+import struct  # Import the struct module to read and write the generation counter
+import threading  # Import the threading module to switch generations once per reader
+from collections import OrderedDict  # Import OrderedDict for the bounded cache of decoded types
+from multiprocessing import shared_memory  # Import shared memory for the cross-process read index
+from .binary_snapshot import SnapshotReader, encode_snapshot  # Import the snapshot encoding used for the index
+from .i_persistence_manager import IPersistenceManager  # Import the persistence manager interface
+from .vacuum import is_deleted  # Import the soft delete tombstone check
+
+_CONTROL = struct.Struct('<QQ')  # Layout of the control block: generation, change feed version
+_LENGTH = struct.Struct('<I')  # Length prefix of the manifest
+
+
+class SharedIndexPublisher:
+    """
+    Publishes immutable per-type snapshots of a storage dictionary into shared memory.
+
+    Attributes:
+        prefix (str): Name prefix of the control, manifest and type blocks.
+        generation (int): The generation most recently published.
+    """
+
+    def __init__(self, prefix='hbnb-index'):
+        """
+        Creates the control block.
+
+        Args:
+            prefix (str): Name prefix of the control, manifest and type blocks.
+        """
+        self.prefix = prefix  # Set the shared memory name prefix
+        self.generation = 0  # Nothing published yet
+        self._control = shared_memory.SharedMemory(name=f'{prefix}-ctl', create=True, size=_CONTROL.size)
+        _CONTROL.pack_into(self._control.buf, 0, 0, 0)
+        self._manifest = None  # Manifest block of the current generation
+        self._segments = {}  # Entity type -> block holding that type in the current generation
+
+    def _create(self, name, data):
+        """Returns a new shared memory block holding data."""
+        block = shared_memory.SharedMemory(name=name, create=True, size=max(len(data), 1))
+        block.buf[:len(data)] = data
+        return block
+
+    def publish(self, storage, entity_types=None, version=0):
+        """
+        Publish a new generation of the read index.
+
+        Only the given entity types are encoded again; every other type keeps
+        its block. Blocks that left the index are unlinked once the new
+        generation is visible; readers still attached to them keep a valid
+        mapping until they move on.
+
+        Args:
+            storage (dict): Mapping of entity type name to a list of entity dictionaries.
+            entity_types (iterable, optional): The types that changed since the last
+                publish; defaults to every type in storage.
+            version (int): The writer's change feed version the storage reflects, so
+                readers can tell when their mirrored feed has caught up.
+
+        Returns:
+            int: The published generation.
+        """
+        generation = self.generation + 1
+        segments = dict(self._segments)
+        for entity_type in (list(storage.keys()) if entity_types is None else set(entity_types)):
+            entities = storage.get(entity_type)
+            if entities is None:
+                segments.pop(entity_type, None)  # The type left storage
+                continue
+            segments[entity_type] = self._create(f'{self.prefix}-{generation}-{entity_type}',
+                                                 encode_snapshot({entity_type: entities}))
+        manifest = json.dumps({entity_type: block.name for entity_type, block in segments.items()}).encode('utf-8')
+        manifest_block = self._create(f'{self.prefix}-{generation}', _LENGTH.pack(len(manifest)) + manifest)
+        _CONTROL.pack_into(self._control.buf, 0, generation, version)  # Readers switch on their next access
+        retired = [block for block in self._segments.values() if block not in segments.values()]
+        if self._manifest is not None:
+            retired.append(self._manifest)
+        self._manifest, self._segments, self.generation = manifest_block, segments, generation
+        for block in retired:
+            block.close()
+            block.unlink()
+        return generation
+
+    def close(self):
+        """Unlinks the control block and the current generation."""
+        for block in list(self._segments.values()) + [self._manifest, self._control]:
+            if block is not None:
+                block.close()
+                block.unlink()
+        self._segments = {}
+        self._manifest = None
+
+
+class _DecodedTypes:
+    """
+    Bounded least-recently-used cache of decoded entity lists.
+
+    Lists are keyed by the name of the block they were decoded from. Blocks
+    are immutable and a changed type gets a new block, so entries never go
+    stale; they are only evicted, or dropped once their block is retired.
+    """
+
+    def __init__(self, size):
+        self.size = size  # Most decoded types kept; 0 decodes on every access
+        self._lists = OrderedDict()  # Block name -> decoded entity list
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._lists)
+
+    def get(self, name, decode):
+        """Returns the cached list decoded from a block, calling decode() on a miss."""
+        if not self.size:
+            return decode()
+        with self._lock:
+            entities = self._lists.get(name)
+            if entities is not None:
+                self._lists.move_to_end(name)
+                return entities
+        entities = decode()  # Outside the lock; two threads may decode the same block once each
+        with self._lock:
+            self._lists[name] = entities
+            self._lists.move_to_end(name)
+            while len(self._lists) > self.size:
+                self._lists.popitem(last=False)
+        return entities
+
+    def retain(self, names):
+        """Drops the lists of blocks that are not in names."""
+        with self._lock:
+            for name in [name for name in self._lists if name not in names]:
+                del self._lists[name]
+
+
+class _GenerationView:
+    """
+    Snapshot reader interface over the per-type blocks of one generation.
+    """
+
+    def __init__(self, readers, decoded):
+        self._readers = readers  # Entity type -> (block name, SnapshotReader over that type's block)
+        self._decoded = decoded  # The reader's cache of decoded lists
+
+    def entity_types(self):
+        return list(self._readers)
+
+    def read_all(self, entity_type):
+        segment = self._readers.get(entity_type)
+        if segment is None:
+            return []
+        name, reader = segment
+        return self._decoded.get(name, lambda: reader.read_all(entity_type))
+
+    def read_entity(self, entity_type, entity_id):
+        segment = self._readers.get(entity_type)
+        return segment[1].read_entity(entity_type, entity_id) if segment is not None else None
+
+
+class SharedIndexReader:
+    """
+    Attaches to the generation currently published by a SharedIndexPublisher.
+
+    Attributes:
+        prefix (str): Name prefix of the control, manifest and type blocks.
+        generation (int): The generation this reader is attached to.
+        decoded (_DecodedTypes): The decoded lists of the most recently listed types.
+    """
+
+    def __init__(self, prefix='hbnb-index', cache_types=4):
+        """
+        Attaches to the control block.
+
+        Args:
+            prefix (str): Name prefix of the control, manifest and type blocks.
+            cache_types (int): Most entity types whose decoded lists are kept; 0 decodes every list read.
+        """
+        self.prefix = prefix  # Set the shared memory name prefix
+        self.generation = 0  # Not attached to any generation yet
+        self.decoded = _DecodedTypes(cache_types)  # Decoded lists, keyed by block
+        self._control = shared_memory.SharedMemory(name=f'{prefix}-ctl')
+        self._segments = {}  # Entity type -> (block, SnapshotReader) of the attached generation
+        self._retired = []  # Blocks left by the previous switch, closed at the next one
+        self._view = None  # Reader over the attached generation
+        self._lock = threading.Lock()  # One thread attaches a new generation at a time
+
+    def current(self):
+        """
+        Return a reader over the latest published generation.
+
+        Types whose block did not change keep their reader, and with it the
+        id tables already parsed.
+
+        Returns:
+            _GenerationView: A reader decoding entities from shared memory, or
+            None if nothing has been published yet.
+        """
+        generation, _ = _CONTROL.unpack_from(self._control.buf, 0)
+        if generation == self.generation:
+            return self._view
+        with self._lock:
+            while True:
+                generation, _ = _CONTROL.unpack_from(self._control.buf, 0)
+                if generation == self.generation:
+                    return self._view
+                attached = []
+                try:
+                    names = self._read_manifest(generation)
+                    segments = {}
+                    for entity_type, name in names.items():
+                        segment = self._segments.get(entity_type)
+                        if segment is None or segment[0].name != name:
+                            block = shared_memory.SharedMemory(name=name)
+                            attached.append(block)
+                            segment = (block, SnapshotReader(buffer=block.buf, cache=False))  # Decode per access
+                        segments[entity_type] = segment
+                except FileNotFoundError:
+                    for block in attached:
+                        block.close()
+                    continue  # Superseded while we were attaching; read the counter again
+                kept = {id(segment[0]) for segment in segments.values()}
+                retired = [segment[0] for segment in self._segments.values() if id(segment[0]) not in kept]
+                self._close(self._retired)  # Requests have had a whole generation to finish with these
+                self._retired = retired
+                self._segments = segments
+                self._view = _GenerationView({entity_type: (segment[0].name, segment[1])
+                                              for entity_type, segment in segments.items()}, self.decoded)
+                self.decoded.retain({segment[0].name for segment in segments.values()})
+                self.generation = generation
+
+    def published_version(self):
+        """Returns the writer's change feed version at the latest published generation."""
+        return _CONTROL.unpack_from(self._control.buf, 0)[1]
+
+    def _read_manifest(self, generation):
+        """Returns the type -> block name manifest of a generation."""
+        block = shared_memory.SharedMemory(name=f'{self.prefix}-{generation}')
+        try:
+            (length,) = _LENGTH.unpack_from(block.buf, 0)
+            return json.loads(bytes(block.buf[_LENGTH.size:_LENGTH.size + length]))
+        finally:
+            block.close()
+
+    @staticmethod
+    def _close(blocks):
+        """Closes blocks that no reader uses any more."""
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass  # Still exported by a decode in flight; the mapping goes with the process
+
+    def close(self):
+        """Detaches from the current generation and the control block."""
+        self._view = None
+        self.decoded.retain(())
+        self._close(self._retired + [segment[0] for segment in self._segments.values()])
+        self._segments = {}
+        self._retired = []
+        self._control.close()
+
+
+class _SharedIndexView:
+    """
+    Read-only stand-in for DataManager.storage over the shared read index.
+    """
+
+    def __init__(self, reader):
+        self._reader = reader
+
+    def get(self, entity_type, default=None):
+        snapshot = self._reader.current()
+        if snapshot is None or entity_type not in snapshot.entity_types():
+            return default
+        return snapshot.read_all(entity_type)
+
+    def __getitem__(self, entity_type):
+        entities = self.get(entity_type)
+        if entities is None:
+            raise KeyError(entity_type)
+        return entities
+
+    def __contains__(self, entity_type):
+        return entity_type in self.keys()
+
+    def keys(self):
+        snapshot = self._reader.current()
+        return snapshot.entity_types() if snapshot is not None else []
+
+
+class SharedIndexDataManager(IPersistenceManager):
+    """
+    SharedIndexDataManager class implementing the IPersistenceManager interface
+    for worker processes in multi-process serving mode.
+
+    Reads are answered from the shared read index. Writes are handed to the
+    writer process through `submit`, which returns once the writer has
+    applied the mutation and published a new generation, so a worker always
+    reads its own writes.
+
+    Lists returned by all() and storage may be shared with later reads of the
+    same generation and must not be modified, as with DataManager.storage.
+
+    Attributes:
+        storage (_SharedIndexView): Read view compatible with DataManager.storage.
+    """
+
+    def __init__(self, submit, prefix='hbnb-index', cache_types=4):
+        """
+        Initializes a new SharedIndexDataManager instance.
+
+        Args:
+            submit (callable): Function called as submit(op, *args) that runs a
+                mutation on the writer's DataManager and returns its version.
+            prefix (str): Name prefix of the shared index blocks.
+            cache_types (int): Most entity types whose decoded lists the reader keeps.
+        """
+        self._submit = submit  # Set the function that forwards writes to the writer
+        self.reader = SharedIndexReader(prefix, cache_types=cache_types)  # Attach to the shared read index
+        self.storage = _SharedIndexView(self.reader)
+
+    @property
+    def version(self):
+        """The writer's change feed version at the published generation, for ETags."""
+        return self.reader.published_version()
+
+    def save(self, entity):
+        """
+        Save an entity through the writer process.
+
+        Args:
+            entity (object): The entity to save.
+        """
+        return self._submit('save', entity)
+
+    def get(self, entity_id, entity_type, include_deleted=False):
+        """
+        Retrieve an entity from the shared read index.
+
+        Args:
+            entity_id (str): The ID of the entity to retrieve.
+            entity_type (str): The type of the entity to retrieve.
+            include_deleted (bool): Whether to return soft-deleted entities too.
+
+        Returns:
+            object: The retrieved entity or None if not found.
+        """
+        snapshot = self.reader.current()
+        entity = snapshot.read_entity(entity_type, entity_id) if snapshot is not None else None
+        if entity is None or (is_deleted(entity) and not include_deleted):
+            return None
+        return entity
+
+    def update(self, entity, expected_version=None):
+        """
+        Update an entity through the writer process, which checks the version.
+
+        Args:
+            entity (object): The entity to update.
+            expected_version (int, optional): The version the stored entity must be at.
+        """
+        return self._submit('update', entity, expected_version)
+
+    def replace(self, entity_type, data, expected_version=None):
+        """
+        Replace the stored dictionary of an entity through the writer process, which checks the version.
+
+        Args:
+            entity_type (str): The type of the entity.
+            data (dict): The new entity dictionary; its 'id' selects the entity to replace.
+            expected_version (int, optional): The version the stored entity must be at.
+        """
+        return self._submit('replace', entity_type, data, expected_version)
+
+    def delete(self, entity_id, entity_type, expected_version=None):
+        """
+        Delete an entity through the writer process, which checks the version.
+
+        Args:
+            entity_id (str): The ID of the entity to delete.
+            entity_type (str): The type of the entity to delete.
+            expected_version (int, optional): The version the stored entity must be at.
+        """
+        return self._submit('delete', entity_id, entity_type, expected_version)
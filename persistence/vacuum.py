@@ -0,0 +1,123 @@
+import os  # Import the os module to read the policy from the environment
+import threading  # Import the threading module for the background vacuum
+
+TOMBSTONE_FIELD = 'deleted_at'  # Field set on soft-deleted entities
+
+def is_deleted(entity):
+    """Returns True if an entity dictionary is a tombstone left by a soft delete."""
+    return entity.get(TOMBSTONE_FIELD) is not None
+
+class VacuumPolicy:
+    """
+    Decides when soft-deleted entities are physically removed.
+
+    An entity type is vacuumed once it holds at least `min_tombstones`
+    tombstones, or once tombstones make up at least `min_ratio` of its
+    entities. Only tombstones older than `min_age` seconds are removed, so
+    recently deleted entities stay visible to `include_deleted` reads for a while.
+
+    Attributes:
+        interval (float): Seconds between checks of the background vacuum.
+        min_tombstones (int): Tombstone count that makes a type due.
+        min_ratio (float): Tombstone share of a type's entities that makes it due.
+        min_age (float): Seconds a tombstone must be old before it is removed.
+    """
+
+    def __init__(self, interval=60.0, min_tombstones=100, min_ratio=0.2, min_age=0.0):
+        """
+        Initializes a new VacuumPolicy instance.
+
+        Args:
+            interval (float): Seconds between checks of the background vacuum.
+            min_tombstones (int): Tombstone count that makes a type due.
+            min_ratio (float): Tombstone share of a type's entities that makes it due.
+            min_age (float): Seconds a tombstone must be old before it is removed.
+        """
+        self.interval = interval  # Set the check interval
+        self.min_tombstones = min_tombstones  # Set the tombstone count threshold
+        self.min_ratio = min_ratio  # Set the tombstone ratio threshold
+        self.min_age = min_age  # Set the minimum tombstone age
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a policy from the HBNB_VACUUM_INTERVAL, HBNB_VACUUM_MIN_TOMBSTONES,
+        HBNB_VACUUM_MIN_RATIO and HBNB_VACUUM_MIN_AGE environment variables,
+        using the defaults for any that are unset.
+        """
+        defaults = cls()
+        return cls(
+            interval=float(os.environ.get('HBNB_VACUUM_INTERVAL', defaults.interval)),
+            min_tombstones=int(os.environ.get('HBNB_VACUUM_MIN_TOMBSTONES', defaults.min_tombstones)),
+            min_ratio=float(os.environ.get('HBNB_VACUUM_MIN_RATIO', defaults.min_ratio)),
+            min_age=float(os.environ.get('HBNB_VACUUM_MIN_AGE', defaults.min_age)),
+        )
+
+    def due(self, tombstones, total):
+        """
+        Check whether an entity type should be vacuumed.
+
+        Args:
+            tombstones (int): Number of tombstones of the type.
+            total (int): Number of stored entities of the type, tombstones included.
+
+        Returns:
+            bool: True if the type should be vacuumed.
+        """
+        if not tombstones:
+            return False
+        return tombstones >= self.min_tombstones or tombstones >= self.min_ratio * total
+
+class Vacuum:
+    """
+    Background thread that compacts a DataManager's tombstones under a policy.
+
+    Attributes:
+        manager (DataManager): The manager to vacuum.
+        policy (VacuumPolicy): When and what to vacuum.
+    """
+
+    def __init__(self, manager, policy=None):
+        """
+        Initializes a new Vacuum instance.
+
+        Args:
+            manager (DataManager): The manager to vacuum.
+            policy (VacuumPolicy, optional): The policy; defaults to VacuumPolicy().
+        """
+        self.manager = manager  # Set the manager to vacuum
+        self.policy = policy or VacuumPolicy()  # Set the vacuum policy
+        self._thread = None  # Background vacuum thread
+        self._stop = threading.Event()  # Signals the vacuum thread to exit
+
+    def run_once(self):
+        """
+        Vacuum every entity type the policy considers due.
+
+        Returns:
+            int: The number of tombstones removed.
+        """
+        stats = self.manager.tombstone_stats()
+        due = [entity_type for entity_type, (tombstones, total) in stats.items() if self.policy.due(tombstones, total)]
+        if not due:
+            return 0
+        return self.manager.vacuum(entity_types=due, older_than=self.policy.min_age)
+
+    def start(self):
+        """Start a daemon thread that runs the vacuum every policy interval."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background vacuum thread."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """Runs the vacuum until stop() is called."""
+        while not self._stop.wait(self.policy.interval):
+            self.run_once()
@@ -0,0 +1,28 @@
+VERSION_FIELD = 'version'  # Field holding an entity's own version, bumped by every update or delete
+
+class VersionConflictError(Exception):
+    """
+    Raised when a compare-and-swap write expected another version of the
+    entity than the stored one, i.e. someone else wrote it in between.
+    """
+    pass
+
+def entity_version(entity):
+    """Returns the version of an entity dictionary; entities stored before versioning count as version 1."""
+    return entity.get(VERSION_FIELD) or 1
+
+def check_version(entity_type, entity, expected_version):
+    """
+    Compare an entity's version with the version a write expects.
+
+    Args:
+        entity_type (str): The type of the entity, for the error message.
+        entity (dict): The stored entity dictionary.
+        expected_version (int): The expected version, or None to skip the check.
+
+    Raises:
+        VersionConflictError: If the stored version differs.
+    """
+    if expected_version is not None and entity_version(entity) != expected_version:
+        raise VersionConflictError(f"{entity_type} {entity.get('id')} is at version {entity_version(entity)}, "
+                                   f"not {expected_version}.")
@@ -1,3 +1,6 @@
+import gzip
+import json
+import importlib
 import unittest
 import sys
 import os
@@ -5,7 +8,37 @@ import os
 # Add the parent directory to the sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+os.environ.setdefault('HBNB_STORAGE', 'memory')  # Keep the suite's writes out of storage.json
+os.environ.setdefault('HBNB_ADMIN_TOKEN', 'test-admin-token')  # Enable the admin routes for the suite
+ADMIN = {'Authorization': f"Bearer {os.environ['HBNB_ADMIN_TOKEN']}"}
+
 from api.app import app
+from api.serialization import EntityEncodingCache, StdlibJSONBackend, get_json_backend
+from api.pricing import QuoteEngine
+from api.recommendations import SimilarityIndex
+from api.admission import AdmissionController, MemoryBucketBackend, SQLiteBucketBackend
+from api.admin import AdminAuth
+from api.validation import ValidationError, compile_model
+from api.profiling import SamplingProfiler
+from api.memory import MemoryAccountant, deep_sizeof
+from api.compression import ResponseCompressor
+from api.multiprocess import PooledWSGIServer, tune_workers, _writer_loop
+from api.changes import ChangeStream
+from api.batch import BatchDispatcher
+import http.client
+import queue
+import signal
+import socket
+import subprocess
+import threading
+from persistence import DataManager
+import time
+from flask import Flask, g, request
+from contextlib import contextmanager
+import tempfile
+from persistence import ChangeEvent, ChangeFeed
+from models import Amenity, Booking
+from datetime import datetime
 
 class TestCityEndpoints(unittest.TestCase):
     def setUp(self):
@@ -50,7 +83,7 @@ class TestCityEndpoints(unittest.TestCase):
             'name': 'San Francisco Updated',
             'country_code': 'US'
         })
-        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.status_code, 200)
 
     def test_delete_city(self):
         create_response = self.app.post('/cities', json={
@@ -84,7 +117,9 @@ class TestAmenityEndpoints(unittest.TestCase):
         create_response = self.app.post('/amenities', json={'name': 'Gym'})
         amenity_id = create_response.get_json()['id']
         response = self.app.put(f'/amenities/{amenity_id}', json={'name': 'Fitness Center'})
-        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['name'], 'Fitness Center')
+        self.assertEqual(self.app.get(f'/amenities/{amenity_id}').get_json()['name'], 'Fitness Center')
 
     def test_delete_amenity(self):
         create_response = self.app.post('/amenities', json={'name': 'Spa'})
@@ -92,6 +127,17 @@ class TestAmenityEndpoints(unittest.TestCase):
         response = self.app.delete(f'/amenities/{amenity_id}')
         self.assertEqual(response.status_code, 204)
 
+    def test_deleted_amenity_hidden_unless_requested(self):
+        create_response = self.app.post('/amenities', json={'name': 'Sauna'})
+        amenity_id = create_response.get_json()['id']
+        self.app.delete(f'/amenities/{amenity_id}')
+        self.assertEqual(self.app.get(f'/amenities/{amenity_id}').status_code, 404)
+        self.assertNotIn(amenity_id, [amenity['id'] for amenity in self.app.get('/amenities').get_json()])
+        self.assertEqual(self.app.get(f'/amenities/{amenity_id}?include_deleted=1').status_code, 404)  # Admins only
+        response = self.app.get(f'/amenities/{amenity_id}?include_deleted=1', headers=ADMIN)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.get_json()['deleted_at'])
+
 class TestReviewEndpoints(unittest.TestCase):
     def setUp(self):
         self.app = app.test_client()
@@ -124,6 +170,10 @@ class TestReviewEndpoints(unittest.TestCase):
         self.assertEqual(review['rating'], 5)
         self.assertEqual(review['comment'], 'Great place!')
         
+        response = self.app.post(f'/places/{place_id}/reviews', json={'user_id': 'some-user-id', 'rating': 4})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['comment'], '')
+
         create_user_response = self.app.post('/users', json={
             'email': 'reviewer@example.com',
             'password': 'password',
@@ -228,7 +278,8 @@ class TestReviewEndpoints(unittest.TestCase):
             'rating': 4,
             'comment': 'Updated comment'
         })
-        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['rating'], 4)
 
     def test_delete_review(self):
         create_review_response = self.app.post(f'/places/some-place-id/reviews', json={
@@ -241,5 +292,881 @@ class TestReviewEndpoints(unittest.TestCase):
         response = self.app.delete(f'/reviews/{review_id}')
         self.assertEqual(response.status_code, 204)
 
+    def test_place_history_and_as_of(self):
+        create_place_response = self.app.post('/places', json={
+            'name': 'History Place',
+            'description': 'A place for testing history',
+            'address': '1 History St',
+            'city_id': 'some-city-id',
+            'latitude': 0.0,
+            'longitude': 0.0,
+            'host_id': 'some-host-id',
+            'price_per_night': 100.0,
+            'max_guests': 4,
+            'number_of_rooms': 2,
+            'number_of_bathrooms': 1
+        })
+        place_id = create_place_response.get_json()['id']
+        self.app.delete(f'/places/{place_id}')
+        versions = self.app.get(f'/places/{place_id}/history').get_json()
+        self.assertEqual([version['op'] for version in versions], ['base', 'delete'])
+        created = versions[0]['version']
+        response = self.app.get(f'/places/{place_id}?as_of={created}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['name'], 'History Place')
+        self.assertEqual(self.app.get(f'/places/{place_id}?as_of={created - 1}').status_code, 404)
+        self.assertEqual(self.app.get(f'/places/{place_id}?as_of=yesterday').status_code, 400)
+        self.assertEqual(self.app.get(f'/places/unknown-id/history').status_code, 404)
+
+class TestPersistentHistory(unittest.TestCase):
+    def run_app(self, script):
+        env = dict(os.environ, HBNB_STORAGE='memory', HBNB_CHANGE_LOG=self.log_file)
+        output = subprocess.run([sys.executable, '-c', 'from api.app import app\nclient = app.test_client()\n' + script],
+                                cwd=os.path.join(os.path.dirname(__file__), '..'), env=env,
+                                capture_output=True, text=True, timeout=60, check=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def test_history_survives_restart(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.log_file = os.path.join(tmpdir.name, 'changes.log')
+        place = {'name': 'Logged Place', 'description': 'Outlives the process', 'city_id': 'some-city-id',
+                 'latitude': 0.0, 'longitude': 0.0, 'host_id': 'some-host-id', 'price_per_night': 100.0,
+                 'max_guests': 4, 'number_of_rooms': 2, 'number_of_bathrooms': 1}
+        written = self.run_app(f"""
+import json
+created = client.post('/places', json={place!r})
+place_id = created.get_json()['id']
+etag = client.get(f'/places/{{place_id}}').headers['ETag']
+updated = client.put(f'/places/{{place_id}}', json={{'price_per_night': 150.0}}, headers={{'If-Match': etag}})
+print(json.dumps({{'id': place_id, 'status': updated.status_code,
+                  'history': client.get(f'/places/{{place_id}}/history').get_json()}}))
+""")
+        self.assertEqual(written['status'], 200)
+        self.assertEqual([version['op'] for version in written['history']], ['base', 'update'])
+        restarted = self.run_app(f"""
+import json
+history = client.get('/places/{written['id']}/history').get_json()
+created = history[0]['version']
+print(json.dumps({{'history': history,
+                  'before': client.get(f'/places/{written['id']}?as_of={{created}}').get_json(),
+                  'after': client.get(f'/places/{written['id']}?as_of={{created + 1}}').get_json()}}))
+""")
+        self.assertEqual([(version['version'], version['op'], version['recorded_at']) for version in restarted['history']],
+                         [(version['version'], version['op'], version['recorded_at']) for version in written['history']])
+        self.assertEqual(restarted['history'][1]['changes']['price_per_night'], 150.0)
+        self.assertEqual(restarted['before']['price_per_night'], 100.0)
+        self.assertEqual(restarted['after']['price_per_night'], 150.0)
+
+class TestPartitionedBackend(unittest.TestCase):
+    def test_app_runs_on_partitioned_storage(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        env = dict(os.environ, HBNB_STORAGE='partitioned', HBNB_PARTITION_DIR=tmpdir.name, HBNB_PARTITIONS='3',
+                   HBNB_ADMIN_TOKEN='t')
+        script = """
+import json
+from api.app import app
+client = app.test_client()
+place = client.post('/places', json={'name': 'Sharded Loft', 'description': 'd', 'city_id': 'c', 'host_id': 'h',
+                                     'latitude': 0.0, 'longitude': 0.0, 'price_per_night': 80.0, 'max_guests': 2,
+                                     'number_of_rooms': 1, 'number_of_bathrooms': 1}).get_json()
+review = client.post(f"/places/{place['id']}/reviews", json={'user_id': 'u', 'rating': 5}).get_json()
+etag = client.get(f"/places/{place['id']}").headers['ETag']
+updated = client.put(f"/places/{place['id']}", json={'price_per_night': 90.0}, headers={'If-Match': etag})
+batch = client.post('/batch', json=[{'path': f"/places/{place['id']}"}, {'path': '/places'}]).get_json()
+deleted = client.delete(f"/places/{place['id']}")
+print(json.dumps({'updated': [updated.status_code, updated.get_json()['price_per_night']],
+                  'batch': [result['status'] for result in batch['responses']],
+                  'deleted': deleted.status_code,
+                  'review': client.get(f"/reviews/{review['id']}").status_code,
+                  'history': [version['op'] for version in client.get(f"/places/{place['id']}/history").get_json()],
+                  'memory': client.get('/admin/memory', headers={'Authorization': 'Bearer t'}).get_json()['entities']['Country']['count']}))
+"""
+        output = subprocess.run([sys.executable, '-c', script], cwd=os.path.join(os.path.dirname(__file__), '..'),
+                                env=env, capture_output=True, text=True, timeout=60, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        self.assertEqual(result['updated'], [200, 90.0])
+        self.assertEqual(result['batch'], [200, 200])
+        self.assertEqual(result['deleted'], 204)
+        self.assertEqual(result['review'], 404)  # Cascaded with the place
+        self.assertEqual(result['history'], ['base', 'update', 'delete'])
+        self.assertEqual(result['memory'], 3)
+
+class TestBookingEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_book_search_and_cancel(self):
+        create_place_response = self.app.post('/places', json={
+            'name': 'Booking Place',
+            'description': 'A place for testing bookings',
+            'address': '1 Booking St',
+            'city_id': 'some-city-id',
+            'latitude': 0.0,
+            'longitude': 0.0,
+            'host_id': 'some-host-id',
+            'price_per_night': 100.0,
+            'max_guests': 3,
+            'number_of_rooms': 2,
+            'number_of_bathrooms': 1
+        })
+        place_id = create_place_response.get_json()['id']
+        stay = {'user_id': 'some-user-id', 'check_in': '2031-05-01', 'check_out': '2031-05-03', 'guests': 2}
+        response = self.app.post(f'/places/{place_id}/bookings', json=stay)
+        self.assertEqual(response.status_code, 201)
+        booking_id = response.get_json()['id']
+        self.assertEqual(self.app.post(f'/places/{place_id}/bookings', json=stay).status_code, 409)
+        self.assertEqual(self.app.post(f'/places/{place_id}/bookings', json=dict(stay, guests=4)).status_code, 400)
+        available = self.app.get('/places/available?check_in=2031-05-02&check_out=2031-05-04&guests=2').get_json()
+        self.assertNotIn(place_id, [place['id'] for place in available])
+        self.assertEqual(len(self.app.get(f'/places/{place_id}/bookings').get_json()), 1)
+        self.assertEqual(self.app.delete(f'/bookings/{booking_id}').status_code, 204)
+        available = self.app.get('/places/available?check_in=2031-05-02&check_out=2031-05-04&guests=2').get_json()
+        self.assertIn(place_id, [place['id'] for place in available])
+        self.assertEqual(self.app.get('/places/available?check_in=2031-05-02').status_code, 400)
+
+    def test_rejected_booking_keeps_concurrent_booking_indexed(self):
+        app_module = importlib.import_module('api.app')
+        place_id = self.app.post('/places', json={
+            'name': 'Raced Place', 'description': 'Booked from two workers', 'city_id': 'some-city-id',
+            'latitude': 0.0, 'longitude': 0.0, 'host_id': 'some-host-id', 'price_per_night': 100.0,
+            'max_guests': 2, 'number_of_rooms': 1, 'number_of_bathrooms': 1}).get_json()['id']
+        stay = {'user_id': 'some-user-id', 'check_in': '2031-09-01', 'check_out': '2031-09-03'}
+        save = app_module.data_manager.save
+
+        def writer_accepts_other_worker_first(booking):
+            # Another worker's overlapping booking is stored and mirrored first; the writer then rejects this one
+            save(Booking(place_id=place_id, user_id='other-user-id', check_in='2031-09-02', check_out='2031-09-04',
+                         guests=1))
+            return save(booking)
+
+        app_module.data_manager.save = writer_accepts_other_worker_first
+        try:
+            response = self.app.post(f'/places/{place_id}/bookings', json=stay)
+        finally:
+            del app_module.data_manager.save
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(app_module.availability.is_available(place_id, '2031-09-03', '2031-09-04'))
+        self.assertTrue(app_module.availability.is_available(place_id, '2031-09-01', '2031-09-02'))
+
+class TestPricing(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_quote_engine_applies_rules(self):
+        engine = QuoteEngine()
+        engine.build({
+            'Place': [{'id': 'a', 'price_per_night': 100.0, 'max_guests': 4},
+                      {'id': 'b', 'price_per_night': 50.0, 'max_guests': 2}],
+            'PricingRule': [{'id': 'r1', 'kind': 'season', 'start': '12-31', 'end': '01-01', 'multiplier': 2.0},
+                            {'id': 'r2', 'kind': 'length_of_stay', 'min_nights': 3, 'multiplier': 0.5},
+                            {'id': 'r3', 'kind': 'occupancy', 'min_occupancy': 0.75, 'multiplier': 1.2}],
+        })
+        # Nights 12-30, 12-31 and 01-01: 1 + 2 + 2 season factors, halved for a 3-night stay
+        result = engine.quote('2030-12-30', '2031-01-02', 3)
+        self.assertEqual(result['nights'], 3)
+        self.assertEqual(result['quotes'], [{'place_id': 'a', 'total': 300.0}])
+        self.assertEqual(result['unavailable'], ['b'])
+        self.assertEqual(engine.quote('2030-06-01', '2030-06-02', 1, ['b', 'missing'])['quotes'],
+                         [{'place_id': 'b', 'total': 50.0}])
+
+    def test_quote_endpoint(self):
+        response = self.app.post('/pricing-rules', json={'kind': 'season', 'multiplier': 'high'})
+        self.assertEqual(response.status_code, 400)
+        response = self.app.post('/places/quote', json={'check_in': '2030-06-01', 'check_out': '2030-06-03', 'guests': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['nights'], 2)
+        response = self.app.post('/places/quote', json={'check_in': '2030-06-03', 'check_out': '2030-06-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.app.post('/places/quote', json={'check_in': '0001-01-01', 'check_out': '9999-12-31'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_night_factor_spans_years(self):
+        engine = QuoteEngine()
+        engine.build({'Place': [{'id': 'a', 'price_per_night': 10.0, 'max_guests': 2}],
+                      'PricingRule': [{'id': 'r1', 'kind': 'season', 'start': '02-28', 'end': '03-01', 'multiplier': 2.0}]})
+        # Across a new year: Feb 28 and Mar 1 in 2031, plus Feb 29 in leap 2032, are season nights at 2.0
+        self.assertEqual(engine.quote('2030-12-01', '2031-04-01')['quotes'], [{'place_id': 'a', 'total': (121 + 2) * 10.0}])
+        self.assertEqual(engine.quote('2031-12-01', '2032-04-01')['quotes'], [{'place_id': 'a', 'total': (122 + 3) * 10.0}])
+        self.assertEqual(engine.quote('2032-02-27', '2032-03-03')['quotes'], [{'place_id': 'a', 'total': (4 + 4) * 10.0}])
+
+class TestRecommendations(unittest.TestCase):
+    def setUp(self):
+        self.index = SimilarityIndex()
+        self.index.build({
+            'Place': [{'id': 'beach', 'amenity_ids': ['wifi', 'pool'], 'latitude': 40.0, 'longitude': -74.0},
+                      {'id': 'resort', 'amenity_ids': ['wifi', 'pool'], 'latitude': 40.01, 'longitude': -74.0},
+                      {'id': 'cabin', 'amenity_ids': ['fireplace'], 'latitude': 45.0, 'longitude': -110.0},
+                      {'id': 'loft', 'amenity_ids': ['wifi'], 'latitude': 45.01, 'longitude': -110.0}],
+            'Review': [{'id': 'r1', 'user_id': 'ann', 'place_id': 'beach', 'rating': 5},
+                       {'id': 'r2', 'user_id': 'ann', 'place_id': 'cabin', 'rating': 4},
+                       {'id': 'r3', 'user_id': 'bob', 'place_id': 'beach', 'rating': 5}],
+        })
+
+    def test_similar_places(self):
+        results = self.index.similar('beach', 3)
+        self.assertEqual(results[0]['place_id'], 'resort')  # Same amenities, a kilometre away
+        self.assertIsNone(self.index.similar('missing'))
+
+    def test_recommendations_and_invalidation(self):
+        self.assertEqual(self.index.recommend('bob', 1)[0]['place_id'], 'resort')
+        self.assertEqual(self.index.recommend('carl', 1), [{'place_id': 'beach', 'score': 2.0}])  # Most reviewed
+        self.assertEqual(self.index.similar('beach', 3)[0]['place_id'], 'resort')
+        self.index.on_change(ChangeEvent(1, 'delete', 'Place', 'resort'))  # Drops the cached result too
+        self.assertEqual({result['place_id'] for result in self.index.similar('beach', 3)}, {'cabin', 'loft'})
+
+class TestAdmission(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.admission = AdmissionController(self.app, write_rate=0.001, write_burst=2,
+                                             route_limits={'GET /slow': (0.001, 1)})
+        self.app.add_url_rule('/items', 'create', lambda: ('', 201), methods=['POST'])
+        self.app.add_url_rule('/items', 'list', lambda: ('', 200), methods=['GET'])
+        self.app.add_url_rule('/slow', 'slow', lambda: ('', 200), methods=['GET'])
+        self.client = self.app.test_client()
+
+    def test_write_bucket_per_client_and_route(self):
+        self.assertEqual(self.client.post('/items').status_code, 201)
+        self.assertEqual(self.client.post('/items').status_code, 201)
+        response = self.client.post('/items')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers['Retry-After']), 0)
+        self.assertEqual(self.client.post('/items', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code, 201)
+        self.assertEqual([self.client.get('/items').status_code for _ in range(5)], [200] * 5)  # Reads are unlimited
+        self.assertEqual([self.client.get('/slow').status_code for _ in range(2)], [200, 429])
+
+    def test_write_queue_bound(self):
+        self.admission.max_pending_writes = 0
+        self.admission.write_concurrency = 0
+        self.assertEqual(self.client.post('/items').status_code, 429)
+        self.assertEqual(self.admission._pending_writes, 0)
+
+    def test_buckets_refill(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        for backend in (MemoryBucketBackend(), SQLiteBucketBackend(os.path.join(tmpdir.name, 'buckets.db'))):
+            self.assertEqual(backend.take('key', 1.0, 1, now=100.0), 0.0)
+            self.assertAlmostEqual(backend.take('key', 1.0, 1, now=100.5), 0.5)
+            self.assertEqual(backend.take('key', 1.0, 1, now=101.5), 0.0)
+
+class TestValidation(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_compiled_place_model(self):
+        app_module = importlib.import_module('api.app')
+        validator = compile_model(app_module.place_model)
+        place = {'name': 'Loft', 'description': 'Bright', 'city_id': 'c', 'host_id': 'u', 'latitude': 45.5,
+                 'longitude': -73.6, 'price_per_night': 80, 'max_guests': 2, 'number_of_rooms': 1,
+                 'number_of_bathrooms': 1, 'amenity_ids': ['a']}
+        self.assertEqual(validator(place), {})
+        errors = validator(dict(place, name=' ', latitude=120, max_guests='2', amenity_ids=[1]))
+        self.assertEqual(set(errors), {'name', 'latitude', 'max_guests', 'amenity_ids'})
+        self.assertEqual(validator({'latitude': 10}, partial=True), {})
+        self.assertEqual(validator({}, partial=True), {})
+        self.assertEqual(validator({'price_per_night': None, 'amenity_ids': None}, partial=True),
+                         {'price_per_night': 'must not be null'})
+        self.assertEqual(set(validator({'id': 'x', 'deleted_at': '2020-01-01', 'version': 3}, partial=True)),
+                         {'id', 'deleted_at', 'version'})
+        self.assertEqual(validator({'id': 'x'}, partial=True)['id'], 'is read-only')
+        self.assertIn('city_id', validator({'name': 'Loft'}))
+        self.assertEqual(set(validator.validate_many([place, {}, place])), {1})
+        with self.assertRaises(ValidationError):
+            validator.check([])
+
+    def test_endpoint_reports_every_field(self):
+        response = self.app.post('/users', json={'email': 'not-an-email', 'first_name': 5})
+        self.assertEqual(response.status_code, 400)
+        errors = response.get_json()['errors']
+        self.assertEqual(set(errors), {'email', 'first_name', 'last_name', 'password'})
+        response = self.app.post('/cities', json={'name': 'Atlantis', 'country_code': 'ZZ'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('country_code', response.get_json()['errors'])
+
+    def test_updates_cannot_null_required_or_set_unknown_fields(self):
+        amenity_id = self.app.post('/amenities', json={'name': 'Null Spa'}).get_json()['id']
+        for payload in ({'name': None}, {'deleted_at': '2020-01-01T00:00:00'}, {'version': 9}, {'id': 'other'}):
+            response = self.app.put(f'/amenities/{amenity_id}', json=payload)
+            self.assertEqual(response.status_code, 400, payload)
+            self.assertEqual(set(response.get_json()['errors']), set(payload))
+        self.assertEqual(self.app.get(f'/amenities/{amenity_id}').get_json()['name'], 'Null Spa')
+
+class TestProfiling(unittest.TestCase):
+    def make_app(self, **options):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        data_manager = DataManager(storage_file=os.path.join(tmpdir.name, 'storage.json'))
+        flask_app = Flask(__name__)
+        profiler = SamplingProfiler(flask_app, **options)
+        profiler.register_admin(flask_app)
+        flask_app.add_url_rule('/things', 'things', lambda: {'count': len(data_manager.all('Country'))})
+        flask_app.add_url_rule('/slow', 'slow', lambda: (time.sleep(0.05), '')[1])
+        return flask_app, profiler
+
+    def test_disabled_registers_nothing(self):
+        flask_app, profiler = self.make_app()
+        self.assertEqual(dict(flask_app.before_request_funcs), {})
+        self.assertEqual(flask_app.test_client().get('/admin/profile').status_code, 404)
+
+    def test_stack_sampling(self):
+        flask_app, profiler = self.make_app(sample_rate=1.0, interval=0.001)
+        client = flask_app.test_client()
+        client.get('/slow')
+        response = client.get('/admin/profile?format=json')
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+        summary = response.get_json()
+        self.assertEqual(summary['routes']['GET /slow']['requests'], 1)
+        self.assertGreater(summary['routes']['GET /slow']['samples'], 0)
+        lines = client.get('/admin/profile').get_data(as_text=True).splitlines()
+        self.assertTrue(lines and all(line.startswith('GET /slow;') for line in lines))
+        self.assertEqual(client.delete('/admin/profile').status_code, 204)
+        self.assertEqual(client.get('/admin/profile').get_data(as_text=True), '')
+
+    def test_cprofile_persistence_labels(self):
+        flask_app, profiler = self.make_app(sample_rate=1.0, mode='cprofile')
+        flask_app.test_client().get('/things')
+        operations = profiler.summary()['routes']['GET /things']['operations']
+        self.assertIn('op:all', operations)
+        self.assertIn('GET /things;op:all;', profiler.collapsed())
+
+class TestMemoryAccounting(unittest.TestCase):
+    def test_deep_sizeof_counts_shared_objects_once(self):
+        shared = ['x' * 1000]
+        seen = set()
+        first = deep_sizeof({'a': shared}, seen)
+        self.assertGreater(first, 1000)
+        self.assertLess(deep_sizeof({'b': shared}, seen), 1000)
+
+    def test_report_growth_and_tracing(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        data_manager = DataManager(storage_file=os.path.join(tmpdir.name, 'storage.json'))
+        cache = {}
+        accountant = MemoryAccountant(data_manager, components={'cache': cache})
+        self.addCleanup(accountant.stop_tracing)
+        first = accountant.report()
+        self.assertNotIn('growth', first)
+        data_manager.storage['Country'] = [{'id': str(i), 'name': 'Country %d' % i} for i in range(20)]
+        cache.update((i, 'value %d' % i) for i in range(10))
+        second = accountant.report(trace=True)
+        self.assertEqual(second['entities']['Country']['count'], 20)
+        self.assertEqual(second['growth']['entities']['Country']['count'], 20)
+        self.assertEqual(second['growth']['components']['cache']['entries'], 10)
+        self.assertTrue(second['tracemalloc']['started'])
+        self.assertIn('top', accountant.report(trace=True)['tracemalloc'])
+
+    def test_endpoint(self):
+        response = app.test_client().get('/admin/memory', headers=ADMIN)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Country', response.get_json()['entities'])
+
+    def test_endpoint_requires_admin_token(self):
+        client = app.test_client()
+        response = client.get('/admin/memory?tracemalloc=1')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.headers['WWW-Authenticate'], 'Bearer')
+        self.assertEqual(client.get('/admin/memory', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        self.assertEqual(client.delete('/admin/memory/tracemalloc').status_code, 401)
+        self.assertEqual(client.get('/admin/profile').status_code, 401)
+        batch = client.post('/batch', json=[{'path': '/admin/memory?tracemalloc=1'},
+                                            {'path': '/admin/memory', 'headers': ADMIN}]).get_json()
+        self.assertEqual([result['status'] for result in batch['responses']], [401, 200])
+
+    def test_admin_routes_disabled_without_token(self):
+        flask_app = Flask(__name__)
+        auth = AdminAuth(flask_app)
+        flask_app.add_url_rule('/admin/memory', 'memory', lambda: 'ok')
+        flask_app.add_url_rule('/public', 'public', lambda: str(auth.is_admin()))
+        client = flask_app.test_client()
+        self.assertEqual(client.get('/admin/memory', headers={'Authorization': 'Bearer '}).status_code, 404)
+        self.assertEqual(client.get('/public', headers={'Authorization': 'Bearer '}).get_data(as_text=True), 'False')
+
+    def test_endpoint_is_never_cached(self):
+        client = app.test_client()
+        self.addCleanup(client.delete, '/admin/memory/tracemalloc', headers=ADMIN)
+
+        def current_bytes():
+            response = client.get('/admin/memory?tracemalloc=1', headers={'Accept-Encoding': 'gzip', **ADMIN})
+            self.assertEqual(response.headers['Cache-Control'], 'no-store')
+            self.assertIsNone(response.headers.get('ETag'))
+            body = gzip.decompress(response.data) if response.headers.get('Content-Encoding') == 'gzip' else response.data
+            return json.loads(body)['tracemalloc'].get('current_bytes')
+
+        current_bytes()  # Starts tracing
+        before = current_bytes()
+        blob = bytearray(8 << 20)
+        after = current_bytes()
+        self.assertGreater(after - before, 4 << 20)
+        del blob
+
+class TestServing(unittest.TestCase):
+    def test_tune_workers(self):
+        self.assertEqual(tune_workers(cpus=8), (8, 4))
+        self.assertEqual(tune_workers(cpus=8, workers=2, threads=16), (2, 16))
+
+    def test_keep_alive_connection(self):
+        flask_app = Flask(__name__)
+        flask_app.add_url_rule('/echo', 'echo', lambda: request.get_data(), methods=['POST'])
+        flask_app.add_url_rule('/ping', 'ping', lambda: 'pong')
+        server = PooledWSGIServer('127.0.0.1', 0, flask_app, threads=2, keep_alive=2)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+        self.addCleanup(connection.close)
+        connection.request('POST', '/echo', body=b'hello')
+        self.assertEqual(connection.getresponse().read(), b'hello')
+        local = connection.sock.getsockname()
+        connection.request('GET', '/ping')
+        response = connection.getresponse()
+        self.assertEqual(response.read(), b'pong')
+        self.assertIsNone(response.getheader('Connection'))
+        self.assertEqual(connection.sock.getsockname(), local)  # Same connection reused
+
+class TestMultiProcessServing(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+        env = dict(os.environ, HBNB_STORAGE='memory', HBNB_STORAGE_SEED=os.path.join(tmpdir.name, 'seed.json'))
+        self.server = subprocess.Popen([sys.executable, '-m', 'api.multiprocess', '--port', str(self.port),
+                                        '--workers', '2', '--threads', '2'],
+                                       cwd=os.path.join(os.path.dirname(__file__), '..'), env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.addCleanup(self.stop)
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                self.request('GET', '/countries')
+                break
+            except OSError:
+                if time.monotonic() > deadline or self.server.poll() is not None:
+                    self.fail("The multi-process server did not start")
+                time.sleep(0.1)
+
+    def stop(self):
+        self.server.send_signal(signal.SIGTERM)
+        try:
+            self.server.wait(20)
+        except subprocess.TimeoutExpired:
+            self.server.kill()
+            self.server.wait()
+
+    def request(self, method, path, body=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)  # New connection: any worker
+        try:
+            connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                               headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            data = response.read()
+            return response.status, json.loads(data) if data else None
+        finally:
+            connection.close()
+
+    def test_writes_reach_every_worker_index(self):
+        place = {'name': 'Shared Loft', 'description': 'Served by every worker', 'city_id': 'some-city-id',
+                 'latitude': 0.0, 'longitude': 0.0, 'host_id': 'some-host-id', 'price_per_night': 90.0,
+                 'max_guests': 2, 'number_of_rooms': 1, 'number_of_bathrooms': 1}
+        status, created = self.request('POST', '/places', place)
+        self.assertEqual(status, 201)
+        status, other = self.request('POST', '/places', dict(place, name='Other Loft', price_per_night=95.0))
+        self.assertEqual(status, 201)
+        for _ in range(6):  # Spread over both workers
+            self.assertEqual(self.request('GET', '/stats/places')[1]['places'], 2)
+            status, similar = self.request('GET', f"/places/{created['id']}/similar")
+            self.assertEqual(status, 200)
+            self.assertIn(other['id'], [entry['place_id'] for entry in similar])
+            status, quote = self.request('POST', '/places/quote', {'check_in': '2031-07-01', 'check_out': '2031-07-03'})
+            self.assertEqual(status, 200)
+            self.assertEqual(len(quote['quotes']), 2)
+        stay = {'user_id': 'some-user-id', 'check_in': '2031-07-01', 'check_out': '2031-07-04', 'guests': 2}
+        status, booking = self.request('POST', f"/places/{created['id']}/bookings", stay)
+        self.assertEqual(status, 201)
+        for _ in range(6):
+            self.assertEqual(self.request('POST', f"/places/{created['id']}/bookings",
+                                          dict(stay, check_in='2031-07-02'))[0], 409)
+            available = self.request('GET', '/places/available?check_in=2031-07-02&check_out=2031-07-03')[1]
+            self.assertEqual([entry['id'] for entry in available], [other['id']])
+            changes = self.request('GET', '/changes?since=1&types=Booking')[1]
+            self.assertIn(booking['id'], [event['entity_id'] for event in changes['events']])
+        status, updated = self.request('PUT', f"/places/{other['id']}", {'price_per_night': 120.0})
+        self.assertEqual(status, 200)
+        for _ in range(6):
+            self.assertEqual(self.request('GET', f"/places/{other['id']}")[1]['price_per_night'], 120.0)
+
+    def test_workers_send_etags_and_measure_the_shared_index(self):
+        for _ in range(4):  # Spread over both workers
+            connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+            try:
+                connection.request('GET', '/countries')
+                response = connection.getresponse()
+                response.read()
+                self.assertIsNotNone(response.getheader('ETag'))
+                connection.request('GET', '/admin/memory', headers=ADMIN)
+                report = json.loads(connection.getresponse().read())
+            finally:
+                connection.close()
+            self.assertGreater(report['entities']['Country']['count'], 0)
+            self.assertFalse(report['entities']['Country']['decoded'])  # Read from shared memory
+            self.assertNotIn('position_index', report['components'])
+            self.assertIn('shared_index_decoded', report['components'])
+
+    def test_concurrent_overlapping_bookings(self):
+        place = {'name': 'Contested Loft', 'description': 'One stay at a time', 'city_id': 'some-city-id',
+                 'latitude': 0.0, 'longitude': 0.0, 'host_id': 'some-host-id', 'price_per_night': 90.0,
+                 'max_guests': 2, 'number_of_rooms': 1, 'number_of_bathrooms': 1}
+        place_id = self.request('POST', '/places', place)[1]['id']
+        statuses = []
+        stays = [{'user_id': 'user-%d' % i, 'check_in': '2031-08-0%d' % (1 + i % 3), 'check_out': '2031-08-05'}
+                 for i in range(8)]
+        threads = [threading.Thread(target=lambda stay=stay: statuses.append(
+            self.request('POST', f'/places/{place_id}/bookings', stay)[0])) for stay in stays]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(statuses), [201] + [409] * 7)
+        self.assertEqual(len(self.request('GET', f'/places/{place_id}/bookings')[1]), 1)
+
+class TestWriterLoop(unittest.TestCase):
+    class Publisher:
+        def __init__(self):
+            self.published = []
+
+        def publish(self, storage, entity_types=None, version=0):
+            self.published.append((entity_types, version))
+
+    class Reply:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, value):
+            self.sent.append(value)
+
+    def test_queued_writes_publish_once(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        manager = DataManager(storage_file=os.path.join(tmpdir.name, 'storage.json'), change_feed=ChangeFeed())
+        publisher, reply = self.Publisher(), self.Reply()
+        requests = queue.Queue()
+        for i in range(5):
+            requests.put((0, 'save', (Amenity(name='Amenity %d' % i),)))
+        requests.put((0, 'delete', ('missing', 'Amenity')))
+        requests.put(None)
+        feed = self.Reply()
+        _writer_loop(manager, publisher, requests, {0: reply}, feeds={0: feed})
+        self.assertEqual(publisher.published, [({'Amenity'}, 5)])
+        self.assertEqual([[event.version for event in events] for events in feed.sent], [[1, 2, 3, 4, 5]])
+        self.assertEqual([ok for ok, _ in reply.sent], [True] * 5 + [False])
+        self.assertEqual(reply.sent[0], (True, 5))
+
+class TestStatsEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_place_stats(self):
+        response = self.app.get('/stats/places?quantiles=0.5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.get_json()['price_quantiles']), ['0.5'])
+        self.assertEqual(self.app.get('/stats/countries/ZZ').status_code, 404)
+        self.assertEqual(self.app.get('/stats/cities?quantiles=1.5').status_code, 400)
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_mixed_batch_keeps_order(self):
+        amenity_id = self.app.get('/amenities').get_json()[0]['id']
+        response = self.app.post('/batch', json=[
+            {'method': 'GET', 'path': f'/amenities/{amenity_id}'},
+            {'method': 'POST', 'path': '/amenities', 'body': {'name': 'Batch Sauna'}},
+            {'method': 'GET', 'path': '/amenities/missing'},
+            {'method': 'POST', 'path': '/amenities', 'body': {}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['responses']
+        self.assertEqual([result['status'] for result in results], [200, 201, 404, 400])
+        self.assertEqual(results[0]['body']['id'], amenity_id)
+        created = self.app.get(f"/amenities/{results[1]['body']['id']}")
+        self.assertEqual(created.get_json()['name'], 'Batch Sauna')
+
+    def test_parallel_reads(self):
+        amenities = self.app.get('/amenities').get_json()[:6]
+        response = self.app.post('/batch', json={'parallel': True, 'requests': [
+            {'path': f"/amenities/{amenity['id']}"} for amenity in amenities]})
+        results = response.get_json()['responses']
+        self.assertEqual([result['body']['id'] for result in results], [amenity['id'] for amenity in amenities])
+
+    def test_invalid_batches(self):
+        nested = self.app.post('/batch', json=[{'method': 'POST', 'path': '/batch', 'body': []}])
+        self.assertEqual(nested.get_json()['responses'][0]['status'], 400)
+        self.assertEqual(self.app.post('/batch', json={'requests': 'nope'}).status_code, 400)
+        self.assertEqual(self.app.post('/batch', json=[{'path': '/countries'}] * 51).status_code, 400)
+
+    def test_change_stream_is_refused(self):
+        response = self.app.post('/batch', json=[
+            {'path': '/changes?since=1&wait=5'},
+            {'path': '/changes', 'headers': {'Accept': 'text/event-stream'}},
+            {'path': '/countries'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['responses']
+        self.assertEqual([result['status'] for result in results], [400, 400, 200])
+        self.assertIn('/changes', results[0]['body']['error'])
+
+    def dispatcher_app(self, **options):
+        events = []
+
+        class Persistence:
+            supports_snapshots = True
+
+            @contextmanager
+            def read_snapshot(self):
+                events.append('enter')
+                yield self
+                events.append('exit')
+
+        standalone = Flask(__name__)
+        dispatcher = BatchDispatcher(standalone, persistence=Persistence, **options)
+
+        @standalone.route('/read')
+        def read():
+            events.append('read')
+            return {'batch_marker': g.get('marker')}
+
+        @standalone.route('/write', methods=['POST'])
+        def write():
+            events.append('write')
+            g.marker = 'sub-request'
+            return {}, 201
+
+        @standalone.route('/batch', methods=['POST'])
+        def batch():
+            g.marker = 'batch'
+            results = dispatcher.run(request.json)
+            return {'responses': results, 'marker': g.get('marker')}
+
+        return standalone.test_client(), events
+
+    def test_snapshot_only_wraps_runs_of_reads(self):
+        client, events = self.dispatcher_app()
+        response = client.post('/batch', json=[{'path': '/read'}, {'path': '/read'},
+                                               {'method': 'POST', 'path': '/write'}, {'path': '/read'}])
+        self.assertEqual(events, ['enter', 'read', 'read', 'exit', 'write', 'enter', 'read', 'exit'])
+        body = response.get_json()
+        self.assertEqual([result['body'].get('batch_marker') for result in body['responses']], [None, None, None, None])
+        self.assertEqual(body['marker'], 'batch')  # Sub-requests have their own g
+
+    def test_snapshot_is_time_bounded(self):
+        client, events = self.dispatcher_app(max_snapshot_seconds=0)
+        client.post('/batch', json=[{'path': '/read'}] * 3)
+        self.assertEqual(events, ['enter', 'read', 'exit', 'read', 'read'])
+
+class TestChangeStream(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_snapshot_then_deltas(self):
+        first = self.app.get('/changes?types=Amenity').get_json()
+        self.assertTrue(first['reset'])
+        self.assertIn('Amenity', first['snapshot'])
+        created = self.app.post('/amenities', json={'name': 'Change Sauna'}).get_json()
+        self.app.post('/countries', json={'name': 'Nowhere', 'code': 'NW'})
+        delta = self.app.get(f"/changes?since={first['cursor']}&types=Amenity").get_json()
+        self.assertEqual([event['entity_id'] for event in delta['events']], [created['id']])
+        self.assertGreater(delta['cursor'], first['cursor'])
+        self.assertEqual(self.app.get('/changes?types=Unknown').status_code, 400)
+
+    def test_long_poll_wakes_on_change(self):
+        cursor = self.app.get('/changes?types=Amenity').get_json()['cursor']
+        writer = threading.Timer(0.2, lambda: app.test_client().post('/amenities', json={'name': 'Late Spa'}))
+        writer.start()
+        started = time.monotonic()
+        delta = self.app.get(f'/changes?since={cursor}&types=Amenity&wait=5').get_json()
+        writer.join()
+        self.assertLess(time.monotonic() - started, 4)
+        self.assertEqual(delta['events'][0]['data']['name'], 'Late Spa')
+
+    def test_fallback_and_stream(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        feed = ChangeFeed(capacity=2)
+        manager = DataManager(storage_file=os.path.join(tmpdir.name, 'storage.json'), change_feed=feed)
+        stream = ChangeStream(feed, lambda: manager, entity_types=('Amenity',), heartbeat=0.01, stream_seconds=0.05)
+        for name in ('Gym', 'Spa', 'Sauna', 'Pool'):
+            manager.save(Amenity(name))
+        self.assertIsNone(stream.changes(1, ('Amenity',)))  # Version 2 already left the buffer
+        self.assertEqual(stream.changes(2, ('Amenity',))['cursor'], 4)
+        frames = list(stream.stream(1, ('Amenity',)))
+        self.assertTrue(frames[1].startswith('id: 4\nevent: snapshot\n'))
+        self.assertEqual(len(json.loads(frames[1].split('data: ', 1)[1])['snapshot']['Amenity']), 4)
+        self.assertTrue(frames[-1].startswith(': keep-alive'))
+
+class TestConditionalWrites(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_etag_and_if_match(self):
+        amenity = self.app.post('/amenities', json={'name': 'Conditional Spa'}).get_json()
+        response = self.app.get(f"/amenities/{amenity['id']}")
+        etag = response.headers['ETag']
+        self.assertEqual(etag, f'"{amenity["id"]}.1"')
+        self.assertEqual(self.app.get(f"/amenities/{amenity['id']}", headers={'If-None-Match': etag}).status_code, 304)
+        stale = self.app.delete(f"/amenities/{amenity['id']}", headers={'If-Match': f'"{amenity["id"]}.0"'})
+        self.assertEqual(stale.status_code, 412)
+        self.assertIn(etag, stale.get_json()['error'])
+        self.assertEqual(self.app.put(f"/amenities/{amenity['id']}", json={'name': 'Spa'},
+                                      headers={'If-Match': '"other"'}).status_code, 412)
+        updated = self.app.put(f"/amenities/{amenity['id']}", json={'name': 'Spa'}, headers={'If-Match': etag})
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual(updated.get_json()['name'], 'Spa')
+        self.assertEqual(updated.headers['ETag'], f'"{amenity["id"]}.2"')
+        self.assertEqual(self.app.put(f"/amenities/{amenity['id']}", json={'name': 'Old Spa'},
+                                      headers={'If-Match': etag}).status_code, 412)  # The first write moved the version on
+        self.assertEqual(self.app.delete(f"/amenities/{amenity['id']}", headers={'If-Match': etag}).status_code, 412)
+        self.assertEqual(self.app.delete(f"/amenities/{amenity['id']}",
+                                         headers={'If-Match': updated.headers['ETag']}).status_code, 204)
+
+    def test_put_only_merges_writable_fields(self):
+        place = self.app.post('/places', json={
+            'name': 'Guarded Place', 'description': 'Server fields stay put', 'city_id': 'some-city-id',
+            'latitude': 0.0, 'longitude': 0.0, 'host_id': 'some-host-id', 'price_per_night': 100.0,
+            'max_guests': 2, 'number_of_rooms': 1, 'number_of_bathrooms': 1}).get_json()
+        for payload in ({'deleted_at': '2020-01-01T00:00:00'}, {'created_at': 'yesterday'}, {'nickname': 'x'}):
+            self.assertEqual(self.app.put(f"/places/{place['id']}", json=payload).status_code, 400, payload)
+        self.assertEqual(self.app.get(f"/places/{place['id']}").status_code, 200)
+        self.assertIn(place['id'], [entry['id'] for entry in self.app.get('/places').get_json()])
+        updated = self.app.put(f"/places/{place['id']}", json={'name': 'Guarded Loft'})
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual(updated.get_json()['created_at'], self.app.get(f"/places/{place['id']}").get_json()['created_at'])
+
+class TestInMemoryStorage(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        self.data_manager = importlib.import_module('api.app').data_manager
+        if not hasattr(self.data_manager, 'snapshot'):
+            self.skipTest("HBNB_STORAGE is not 'memory'")
+        self.snapshot = self.data_manager.snapshot()
+
+    def tearDown(self):
+        if hasattr(self, 'snapshot'):
+            self.data_manager.restore(self.snapshot)
+
+    def test_restore_discards_writes(self):
+        count = len(self.app.get('/amenities').get_json())
+        listing = self.app.get('/amenities')
+        amenity = self.app.post('/amenities', json={'name': 'Restored Sauna'}).get_json()
+        self.assertEqual(len(self.app.get('/amenities').get_json()), count + 1)
+        self.data_manager.restore(self.snapshot)
+        self.assertEqual(len(self.app.get('/amenities').get_json()), count)
+        self.assertEqual(self.app.get(f"/amenities/{amenity['id']}").status_code, 404)
+        revalidated = self.app.get('/amenities', headers={'If-None-Match': listing.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 200)  # Same feed version, but storage changed under it
+
+    def test_restore_rebuilds_indexes(self):
+        before = self.app.get('/stats/places').get_json()
+        place = self.app.post('/places', json={
+            'name': 'Snapshot Loft', 'description': 'A place for testing restores', 'city_id': 'some-city-id',
+            'latitude': 0.0, 'longitude': 0.0, 'host_id': 'some-host-id', 'price_per_night': 80.0,
+            'max_guests': 2, 'number_of_rooms': 1, 'number_of_bathrooms': 1
+        }).get_json()
+        self.assertNotEqual(self.app.get('/stats/places').get_json(), before)
+        self.data_manager.restore(self.snapshot)
+        self.assertEqual(self.app.get('/stats/places').get_json(), before)
+        available = self.app.get('/places/available?check_in=2031-06-01&check_out=2031-06-02&guests=1').get_json()
+        self.assertNotIn(place['id'], [entry['id'] for entry in available])
+
+class TestSerialization(unittest.TestCase):
+    def test_backends_agree(self):
+        entity = {'id': 'x', 'name': 'Café', 'created_at': datetime(2024, 6, 11, 17, 39, 15), 'amenity_ids': ['a']}
+        stdlib = StdlibJSONBackend()
+        for name in ('stdlib', 'auto'):
+            backend = get_json_backend(name)
+            self.assertEqual(backend.loads(backend.dumps(entity)), stdlib.loads(stdlib.dumps(entity)))
+
+    def test_cache_reuses_and_invalidates(self):
+        cache = EntityEncodingCache(StdlibJSONBackend())
+        entity = {'id': 'x', 'name': 'Pool'}
+        first = cache.encode('Amenity', entity)
+        self.assertIs(cache.encode('Amenity', entity), first)
+        self.assertEqual(cache.encode_list('Amenity', [entity, entity]), b'[' + first + b',' + first + b']')
+        entity['name'] = 'Spa'
+        cache.on_change(ChangeEvent(1, 'update', 'Amenity', 'x', entity))
+        self.assertIn(b'Spa', cache.encode('Amenity', entity))
+        self.assertIn(b'Gym', cache.encode('Amenity', {'id': 'x', 'name': 'Gym'}))
+
+    def test_cache_keys_on_version_not_identity(self):
+        cache = EntityEncodingCache(StdlibJSONBackend())
+        first = cache.encode('Amenity', {'id': 'x', 'name': 'Pool', 'version': 1})
+        self.assertIs(cache.encode('Amenity', {'id': 'x', 'name': 'Pool', 'version': 1}), first)  # A decoded copy still hits
+        self.assertIn(b'Spa', cache.encode('Amenity', {'id': 'x', 'name': 'Spa', 'version': 2}))
+        self.assertEqual(len(cache), 1)  # Only the latest version is kept
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_gzip_and_etag(self):
+        plain = self.app.get('/countries')
+        self.assertEqual(plain.status_code, 200)
+        self.assertIsNone(plain.headers.get('Content-Encoding'))
+        compressed = self.app.get('/countries', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressed.headers.get('Content-Encoding'), 'gzip')
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        cached = self.app.get('/countries', headers={'If-None-Match': plain.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_no_store_and_per_encoding_etags(self):
+        flask_app = Flask(__name__)
+        ResponseCompressor(flask_app, version_source=lambda: 1)
+        counter = iter(range(100))
+        flask_app.add_url_rule('/live', 'live', lambda: ({'value': next(counter), 'pad': 'x' * 2000}, 200,
+                                                          {'Cache-Control': 'no-store'}))
+        client = flask_app.test_client()
+        first = client.get('/live', headers={'Accept-Encoding': 'gzip'})
+        second = client.get('/live', headers={'Accept-Encoding': 'gzip'})
+        self.assertIsNone(first.headers.get('ETag'))
+        self.assertNotEqual(json.loads(gzip.decompress(first.data)), json.loads(gzip.decompress(second.data)))
+        amenity = self.app.post('/amenities', json={'name': 'Spa', 'description': 'x' * 2000}).get_json()
+        plain = self.app.get(f"/amenities/{amenity['id']}")
+        compressed = self.app.get(f"/amenities/{amenity['id']}", headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressed.headers['ETag'], plain.headers['ETag'][:-1] + '-gzip"')
+        self.assertEqual(self.app.get(f"/amenities/{amenity['id']}", headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']}).status_code, 304)
+        self.assertEqual(self.app.get(f"/amenities/{amenity['id']}", headers={
+            'If-None-Match': compressed.headers['ETag']}).status_code, 200)
+        self.assertEqual(self.app.delete(f"/amenities/{amenity['id']}",
+                                         headers={'If-Match': compressed.headers['ETag']}).status_code, 204)
+
+    def test_colliding_etags_do_not_share_cached_bodies(self):
+        flask_app = Flask(__name__)
+        compressor = ResponseCompressor(flask_app, version_source=lambda: 1)
+        compressor.etag_for = lambda version: 'colliding'  # As if two URLs had the same CRC
+        flask_app.add_url_rule('/echo', 'echo', lambda: {'query': request.args.get('q'), 'pad': 'x' * 2000})
+        client = flask_app.test_client()
+        for query in ('first', 'second'):
+            response = client.get(f'/echo?q={query}', headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(json.loads(gzip.decompress(response.data))['query'], query)
+
+    def test_columns_format(self):
+        response = self.app.get('/countries?format=columns')
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertIn('code', body['columns'])
+        self.assertEqual(len(body['rows']), len(self.app.get('/countries').get_json()))
+
 if __name__ == '__main__':
     unittest.main()
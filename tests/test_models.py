@@ -7,6 +7,7 @@ from models.place import Place
 from models.review import Review
 from models.amenity import Amenity
 from models.location import Country, City
+from models.booking import Booking
 
 class TestModels(unittest.TestCase):
     def test_user_creation(self):
@@ -35,6 +36,12 @@ class TestModels(unittest.TestCase):
         self.assertEqual(review.rating, 5)
         self.assertEqual(review.comment, "Great place!")
 
+    def test_booking_creation(self):
+        booking = Booking(place_id="place-id", user_id="user-id", check_in="2030-01-01", check_out="2030-01-04", guests=2)
+        self.assertIsNotNone(booking.id)
+        self.assertEqual(booking.check_in, "2030-01-01")
+        self.assertEqual(booking.guests, 2)
+
     def test_amenity_creation(self):
         amenity = Amenity(name="WiFi", description="Free WiFi")
         self.assertIsNotNone(amenity.id)
@@ -0,0 +1,868 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from models.user import User
+from models.place import Place
+from persistence.data_manager import DataManager
+from persistence.binary_snapshot import SnapshotReader, json_to_snapshot, snapshot_to_json, write_snapshot
+from persistence.sharded_storage import split_storage
+from persistence.partitioned_storage import PartitionedStorage
+from models.review import Review
+from persistence.change_feed import ChangeFeed
+from persistence.replica import ReplicaDataManager
+from persistence.relationships import RelationshipRegistry, ReferentialIntegrityError
+from models.amenity import Amenity
+from models.location import City, Country
+from persistence.shared_index import SharedIndexDataManager, SharedIndexPublisher
+from persistence.vacuum import Vacuum, VacuumPolicy
+from persistence.history import HistoryRetention, VersionStore
+from persistence.availability import AvailabilityIndex, BookingConflictError
+from models.booking import Booking
+from persistence.catalog_stats import CatalogStats, QuantileSketch
+from persistence.versioning import VersionConflictError
+from persistence.columnar_export import ColumnarExport, export_columns
+from persistence.in_memory_storage import InMemoryStorage
+import random
+
+class TestBinarySnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.json_file = os.path.join(self.tmpdir, 'storage.json')
+        self.snapshot_file = os.path.join(self.tmpdir, 'storage.snap')
+        manager = DataManager(storage_file=self.json_file)
+        self.user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        self.place = Place(name="Test Place", description="A place for testing", city_id="city-id", host_id=self.user.id,
+                           latitude=1.5, longitude=-2.5, price_per_night=100.0, max_guests=4, number_of_rooms=2,
+                           number_of_bathrooms=1, amenity_ids=["a", "b"])
+        manager.save(self.user)
+        manager.save(self.place)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        json_to_snapshot(self.json_file, self.snapshot_file)
+        out_file = os.path.join(self.tmpdir, 'out.json')
+        snapshot_to_json(self.snapshot_file, out_file)
+        with open(self.json_file) as f, open(out_file) as g:
+            self.assertEqual(json.load(f), json.load(g))
+
+    def test_lazy_point_lookup(self):
+        json_to_snapshot(self.json_file, self.snapshot_file)
+        manager = DataManager(storage_file=self.json_file, snapshot_file=self.snapshot_file)
+        place = manager.get(self.place.id, 'Place')
+        self.assertEqual(place['amenity_ids'], ["a", "b"])
+        self.assertIsInstance(place['created_at'], datetime)
+        self.assertFalse(manager.storage.is_loaded('Place'))
+        self.assertIs(manager.storage['Place'][0], place)
+
+    def test_save_writes_snapshot(self):
+        manager = DataManager(storage_file=self.json_file, snapshot_file=self.snapshot_file)
+        manager.delete(self.user.id, 'User')
+        reader = SnapshotReader(self.snapshot_file)
+        try:
+            self.assertEqual(reader.count('User'), 0)
+            self.assertEqual(reader.read_entity('Place', self.place.id)['name'], "Test Place")
+        finally:
+            reader.close()
+
+    def test_writes_reencode_only_changed_types(self):
+        json_to_snapshot(self.json_file, self.snapshot_file)
+        manager = DataManager(storage_file=self.json_file, snapshot_file=self.snapshot_file)
+        other = User(email="other@example.com", password="password", first_name="A", last_name="B")
+        manager.save(other)
+        self.assertFalse(manager.storage.is_loaded('Place'))  # Copied from the mapping, not decoded
+        manager.replace('User', dict(manager.get(other.id, 'User'), first_name="C"))
+        manager.save(Review(user_id=other.id, place_id=self.place.id, rating=5, comment="ok"))
+        reloaded = DataManager(storage_file=self.json_file, snapshot_file=self.snapshot_file)
+        self.assertEqual(reloaded.get(self.place.id, 'Place')['amenity_ids'], ["a", "b"])
+        self.assertEqual(reloaded.get(other.id, 'User')['first_name'], "C")
+        self.assertEqual(len(reloaded.storage['User']), 2)
+        self.assertEqual(len(reloaded.storage['Review']), 1)
+
+    def test_aware_timestamps_are_stored_in_utc(self):
+        aware = datetime(2030, 1, 1, 12, 0, tzinfo=timezone(timedelta(hours=2)))
+        write_snapshot({'User': [{'id': 'u', 'created_at': aware}]}, self.snapshot_file)
+        reader = SnapshotReader(self.snapshot_file)
+        try:
+            self.assertEqual(reader.read_entity('User', 'u')['created_at'], datetime(2030, 1, 1, 10, 0))
+        finally:
+            reader.close()
+
+class TestShardedStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.shard_dir = os.path.join(self.tmpdir, 'shards')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_write_touches_only_affected_shard(self):
+        manager = DataManager(storage_file=os.path.join(self.tmpdir, 'storage.json'), shard_dir=self.shard_dir)
+        user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        manager.save(user)
+        self.assertEqual(os.listdir(self.shard_dir), ['User.json'])
+        reloaded = DataManager(storage_file=os.path.join(self.tmpdir, 'missing.json'), shard_dir=self.shard_dir)
+        self.assertEqual(reloaded.get(user.id, 'User')['email'], "test@example.com")
+
+    def test_writes_to_other_types_do_not_wait(self):
+        manager = DataManager(storage_file=os.path.join(self.tmpdir, 'storage.json'), shard_dir=self.shard_dir)
+        entered, release = threading.Event(), threading.Event()
+
+        def slow_user_writes(op, entity_type, data):
+            if entity_type == 'User':
+                entered.set()
+                release.wait(5)
+
+        manager.add_write_check(slow_user_writes)
+        user_writer = threading.Thread(target=manager.save, args=(
+            User(email="slow@example.com", password="password", first_name="S", last_name="W"),))
+        user_writer.start()
+        self.assertTrue(entered.wait(5))
+        review = Review(user_id="user-id", place_id="place-id", rating=5, comment="ok")
+        review_writer = threading.Thread(target=manager.save, args=(review,))
+        review_writer.start()
+        review_writer.join(5)
+        self.assertFalse(review_writer.is_alive())  # Not held up by the User write
+        transaction_done = threading.Event()
+
+        def transact():
+            with manager.transaction():
+                transaction_done.set()
+
+        threading.Thread(target=transact).start()
+        self.assertFalse(transaction_done.wait(0.2))  # Transactions wait for every type
+        release.set()
+        user_writer.join(5)
+        self.assertTrue(transaction_done.wait(5))
+        self.assertEqual(sorted(os.listdir(self.shard_dir)), ['Review.json', 'User.json'])
+
+    def test_split_storage(self):
+        json_file = os.path.join(self.tmpdir, 'storage.json')
+        manager = DataManager(storage_file=json_file)
+        manager.save(User(email="a@example.com", password="password", first_name="A", last_name="B"))
+        split_storage(json_file, self.shard_dir)
+        reloaded = DataManager(storage_file=os.path.join(self.tmpdir, 'missing.json'), shard_dir=self.shard_dir)
+        self.assertEqual(reloaded.storage.keys(), manager.storage.keys())
+
+class TestPartitionedStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.manager = PartitionedStorage(partition_dir=self.tmpdir, partition_count=3)
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_crud_and_foreign_key_query(self):
+        reviews = [Review(user_id="user-%d" % (i % 2), place_id="place-id", rating=5, comment="ok") for i in range(10)]
+        for review in reviews:
+            self.manager.save(review)
+        self.assertEqual(self.manager.get(reviews[0].id, 'Review')['user_id'], "user-0")
+        self.assertEqual(len(self.manager.find('Review', user_id="user-1")), 5)
+        self.assertEqual(len(self.manager.storage.get('Review', [])), 10)
+        self.manager.delete(reviews[0].id, 'Review')
+        self.assertIsNone(self.manager.get(reviews[0].id, 'Review'))
+        with self.assertRaises(ValueError):
+            self.manager.delete(reviews[0].id, 'Review')
+
+    def test_compare_and_set(self):
+        review = Review(user_id="user-id", place_id="place-id", rating=3, comment="ok")
+        self.manager.save(review)
+        review.rating = 4
+        self.manager.update(review, expected_version=1)
+        self.assertEqual(self.manager.get(review.id, 'Review')['version'], 2)
+        with self.assertRaises(VersionConflictError):
+            self.manager.update(review, expected_version=1)
+        with self.assertRaises(VersionConflictError):
+            self.manager.delete(review.id, 'Review', expected_version=1)
+        self.manager.delete(review.id, 'Review', expected_version=2)
+        self.assertIsNone(self.manager.get(review.id, 'Review'))
+
+    def test_rebalance(self):
+        reviews = [Review(user_id="user-id", place_id="place-id", rating=4, comment="ok") for _ in range(20)]
+        for review in reviews:
+            self.manager.save(review)
+        self.manager.rebalance(5)
+        self.assertEqual(len(self.manager.partitions), 5)
+        for review in reviews:
+            self.assertIsNotNone(self.manager.get(review.id, 'Review'))
+        self.assertEqual(len(self.manager.find('Review')), 20)
+
+    def test_writes_during_rebalance(self):
+        reviews = [Review(user_id="user-id", place_id="place-id", rating=4, comment="ok") for _ in range(200)]
+        writer = threading.Thread(target=lambda: [self.manager.save(review) for review in reviews])
+        writer.start()
+        self.manager.rebalance(7)
+        self.manager.rebalance(2)
+        writer.join()
+        for review in reviews:
+            self.assertIsNotNone(self.manager.get(review.id, 'Review'))
+        self.assertEqual(len(self.manager.find('Review')), 200)
+
+    def test_rebalance_moves_few_ids(self):
+        ids = ['entity-%d' % i for i in range(2000)]
+        moved = sum(PartitionedStorage.partition_for(entity_id, 4) != PartitionedStorage.partition_for(entity_id, 5)
+                    for entity_id in ids)
+        self.assertLess(moved, len(ids) * 0.35)  # About a fifth; modulo placement moves about four fifths
+        owners = {PartitionedStorage.partition_for(entity_id, 4) for entity_id in ids}
+        self.assertEqual(owners, {0, 1, 2, 3})
+
+    def test_feed_relationships_and_transactions(self):
+        self.manager.close()
+        feed = ChangeFeed()
+        self.manager = PartitionedStorage(partition_dir=self.tmpdir, partition_count=3, change_feed=feed,
+                                          relationships=RelationshipRegistry(validate_references=False))
+        place = Place(name="Loft", description="d", city_id="c", host_id="h", latitude=0, longitude=0,
+                      price_per_night=10, max_guests=1, number_of_rooms=1, number_of_bathrooms=1, amenity_ids=[])
+        self.manager.save(place)
+        reviews = [Review(user_id="u", place_id=place.id, rating=4, comment="ok") for _ in range(3)]
+        for review in reviews:
+            self.manager.save(review)
+        with self.assertRaises(RuntimeError):
+            with self.manager.transaction():
+                self.manager.replace('Place', dict(self.manager.get(place.id, 'Place'), name="Changed"))
+                self.manager.delete(reviews[0].id, 'Review')
+                raise RuntimeError("roll back")
+        self.assertEqual(self.manager.get(place.id, 'Place')['name'], "Loft")
+        self.assertIsNotNone(self.manager.get(reviews[0].id, 'Review'))
+        self.assertEqual(feed.version, 4)  # Nothing from the rolled back block was published
+        self.manager.delete(place.id, 'Place')  # Cascades to the reviews
+        self.assertEqual(self.manager.find('Review'), [])
+        self.assertEqual([event.op for event in feed.since(4)], ['delete'] * 4)
+
+class TestChangeFeedReplication(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage_file = os.path.join(self.tmpdir, 'storage.json')
+        self.feed_log = os.path.join(self.tmpdir, 'feed.log')
+        self.leader = DataManager(storage_file=self.storage_file, change_feed=ChangeFeed(log_file=self.feed_log))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_versions_are_monotonic(self):
+        user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        self.leader.save(user)
+        self.leader.update(user)
+        self.leader.delete(user.id, 'User')
+        self.assertEqual([event.op for event in self.leader.change_feed.since(0)], ['save', 'update', 'delete'])
+        self.assertEqual(self.leader.version, 3)
+        self.assertEqual(ChangeFeed(log_file=self.feed_log).version, 3)
+
+    def test_checkpoints_truncate_the_log(self):
+        feed = ChangeFeed(log_file=self.feed_log, checkpoint_every=4, keep=2)
+        leader = DataManager(storage_file=self.storage_file, change_feed=feed)
+        replica = ReplicaDataManager(self.feed_log, storage_file=self.storage_file)
+        users = [User(email="u%d@example.com" % i, password="password", first_name="U", last_name="N") for i in range(10)]
+        for user in users[:3]:
+            leader.save(user)
+        replica.catch_up()
+        for user in users[3:]:
+            leader.save(user)  # Checkpoints at 4 and 8 drop every event the replica has not applied
+        self.assertEqual(ChangeFeed.read_checkpoint(self.feed_log), 6)
+        self.assertEqual([event.version for event in ChangeFeed.read_log(self.feed_log)[0]], [7, 8, 9, 10])
+        self.assertEqual(replica.catch_up(), 10)  # Reloads the storage file and replays past the checkpoint
+        self.assertEqual(len(replica.storage['User']), 10)
+        late = ReplicaDataManager(self.feed_log, storage_file=self.storage_file)
+        self.assertEqual((late.version, len(late.storage['User'])), (10, 10))
+        feed.checkpoint(10)
+        self.assertEqual(ChangeFeed.read_log(self.feed_log)[0], [])
+        self.assertEqual(ChangeFeed(log_file=self.feed_log).version, 10)  # Numbering resumes from the checkpoint
+        leader.delete(users[0].id, 'User')
+        self.assertEqual(replica.catch_up(), 11)
+        self.assertIsNone(replica.get(users[0].id, 'User'))
+
+    def test_replica_read_your_writes(self):
+        replica = ReplicaDataManager(self.feed_log, storage_file=self.storage_file)
+        user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        self.leader.save(user)
+        self.assertEqual(replica.get(user.id, 'User', min_version=self.leader.version)['email'], "test@example.com")
+        user.first_name = "Jane"
+        self.leader.update(user)
+        self.leader.save(User(email="other@example.com", password="password", first_name="A", last_name="B"))
+        self.leader.delete(user.id, 'User')
+        replica.wait_for_version(self.leader.version)
+        self.assertIsNone(replica.get(user.id, 'User'))
+        self.assertEqual(len(replica.storage['User']), 1)
+        with self.assertRaises(PermissionError):
+            replica.save(user)
+
+    def test_replica_converges_from_newer_storage_file(self):
+        user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        self.leader.save(user)
+        self.leader.delete(user.id, 'User')
+        replica = ReplicaDataManager(self.feed_log, storage_file=self.storage_file)
+        self.assertEqual(replica.storage['User'], [])
+        self.assertEqual(replica.version, 2)
+
+    def test_replay_keeps_position_index(self):
+        replica = ReplicaDataManager(self.feed_log, storage_file=self.storage_file)
+        users = [User(email="user%d@example.com" % i, password="password", first_name="A", last_name="B")
+                 for i in range(50)]
+        self.leader.save(users[0])
+        replica.catch_up()
+        index = replica._positions['User']
+        for user in users[1:]:
+            self.leader.save(user)
+        replica.catch_up()
+        self.assertIs(replica._positions['User'], index)  # Appended to, never rebuilt
+        self.assertEqual(index.length, 50)
+        self.assertEqual(replica.get(users[-1].id, 'User')['email'], "user49@example.com")
+        with open(self.storage_file) as f:
+            stored = f.read()
+        replica.vacuum()
+        with open(self.storage_file) as f:
+            self.assertEqual(f.read(), stored)
+
+class TestSharedIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.leader = DataManager(storage_file=os.path.join(self.tmpdir, 'storage.json'))
+        self.publisher = SharedIndexPublisher(prefix='hbnb-test-%d' % os.getpid())
+
+    def tearDown(self):
+        self.publisher.close()
+        shutil.rmtree(self.tmpdir)
+
+    def submit(self, op, *args):
+        getattr(self.leader, op)(*args)
+        self.publisher.publish(self.leader.storage)
+
+    def test_reads_follow_published_generations(self):
+        user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        self.leader.save(user)
+        self.publisher.publish(self.leader.storage)
+        worker = SharedIndexDataManager(self.submit, prefix=self.publisher.prefix)
+        try:
+            self.assertEqual(worker.get(user.id, 'User')['email'], "test@example.com")
+            other = User(email="other@example.com", password="password", first_name="A", last_name="B")
+            worker.save(other)
+            self.assertEqual(len(worker.storage.get('User', [])), 2)
+            worker.delete(user.id, 'User')
+            self.assertIsNone(worker.get(user.id, 'User'))
+            self.assertFalse(worker.supports_transactions or worker.supports_snapshots)
+            with self.assertRaises(NotImplementedError):
+                worker.transaction()
+            with self.assertRaises(NotImplementedError):
+                worker.read_snapshot()
+        finally:
+            worker.reader.close()
+
+    def test_publish_reencodes_changed_types_only(self):
+        user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        review = Review(user_id=user.id, place_id="place-id", rating=5, comment="ok")
+        self.leader.save(user)
+        self.leader.save(review)
+        self.publisher.publish(self.leader.storage)
+        review_block = self.publisher._segments['Review']
+        self.leader.save(User(email="other@example.com", password="password", first_name="A", last_name="B"))
+        self.publisher.publish(self.leader.storage, {'User'})
+        self.assertIs(self.publisher._segments['Review'], review_block)
+        worker = SharedIndexDataManager(self.submit, prefix=self.publisher.prefix)
+        try:
+            self.assertEqual(len(worker.storage.get('User', [])), 2)
+            self.assertEqual(worker.get(review.id, 'Review')['rating'], 5)
+            self.leader.delete(user.id, 'User')
+            self.publisher.publish(self.leader.storage, {'User'})
+            self.assertEqual(len(worker.storage.get('User', [])), 1)
+            self.assertEqual(sorted(worker.storage.keys()), ['Review', 'User'])
+        finally:
+            worker.reader.close()
+
+    def test_list_reads_reuse_decoded_types(self):
+        user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        self.leader.save(user)
+        self.leader.save(Review(user_id=user.id, place_id="place-id", rating=5, comment="ok"))
+        self.publisher.publish(self.leader.storage, version=7)
+        worker = SharedIndexDataManager(self.submit, prefix=self.publisher.prefix, cache_types=1)
+        try:
+            self.assertEqual(worker.version, 7)
+            users = worker.storage.get('User')
+            self.assertIs(worker.storage.get('User'), users)  # Decoded once per block
+            worker.storage.get('Review')
+            self.assertEqual(len(worker.reader.decoded), 1)  # Bounded: User was evicted
+            self.assertIsNot(worker.storage.get('User'), users)
+            self.leader.save(User(email="other@example.com", password="password", first_name="A", last_name="B"))
+            self.publisher.publish(self.leader.storage, {'User'}, version=8)
+            self.assertEqual(len(worker.storage.get('User')), 2)  # A new block is decoded again
+            self.assertEqual(worker.version, 8)
+        finally:
+            worker.reader.close()
+
+class TestTransactions(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage_file = os.path.join(self.tmpdir, 'storage.json')
+        self.manager = DataManager(storage_file=self.storage_file, change_feed=ChangeFeed())
+        self.user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        self.manager.save(self.user)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_commit_flushes_once(self):
+        place = Place(name="Test Place", description="A place for testing", city_id="city-id", host_id=self.user.id,
+                      latitude=0.0, longitude=0.0, price_per_night=100.0, max_guests=4, number_of_rooms=2,
+                      number_of_bathrooms=1, amenity_ids=[])
+        with self.manager.transaction():
+            self.manager.save(place)
+            self.manager.delete(self.user.id, 'User')
+            with open(self.storage_file) as f:
+                self.assertNotIn('Place', json.load(f))
+            self.assertEqual(self.manager.version, 1)
+        with open(self.storage_file) as f:
+            stored = json.load(f)
+        self.assertEqual(len(stored['Place']), 1)
+        self.assertEqual(stored['User'], [])
+        self.assertEqual(self.manager.version, 3)
+
+    def test_exception_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with self.manager.transaction():
+                self.manager.delete(self.user.id, 'User')
+                self.manager.save(Review(user_id=self.user.id, place_id="place-id", rating=5, comment="ok"))
+                raise RuntimeError("boom")
+        self.assertIsNotNone(self.manager.get(self.user.id, 'User'))
+        self.assertNotIn('Review', self.manager.storage)
+        self.assertEqual(self.manager.version, 1)
+        with open(self.storage_file) as f:
+            self.assertEqual(len(json.load(f)['User']), 1)
+
+class TestRelationships(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage_file = os.path.join(self.tmpdir, 'storage.json')
+        self.manager = DataManager(storage_file=self.storage_file, relationships=RelationshipRegistry())
+        self.manager.save(Country(name="United States", code="US"))
+        self.city = City(name="New York", country_code="US")
+        self.user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        self.amenity = Amenity(name="WiFi")
+        self.manager.save(self.city)
+        self.manager.save(self.user)
+        self.manager.save(self.amenity)
+        self.place = Place(name="Test Place", description="A place for testing", city_id=self.city.id,
+                           host_id=self.user.id, latitude=0.0, longitude=0.0, price_per_night=100.0, max_guests=4,
+                           number_of_rooms=2, number_of_bathrooms=1, amenity_ids=[self.amenity.id])
+        self.manager.save(self.place)
+        self.review = Review(user_id=self.user.id, place_id=self.place.id, rating=5, comment="Great place!")
+        self.manager.save(self.review)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_rejects_dangling_references(self):
+        with self.assertRaises(ReferentialIntegrityError):
+            self.manager.save(Review(user_id=self.user.id, place_id="missing", rating=5, comment="ok"))
+        with self.assertRaises(ReferentialIntegrityError):
+            self.manager.save(City(name="Paris", country_code="FR"))
+
+    def test_delete_user_cascades(self):
+        self.manager.delete(self.user.id, 'User')
+        self.assertIsNone(self.manager.get(self.place.id, 'Place'))
+        self.assertIsNone(self.manager.get(self.review.id, 'Review'))
+        with open(self.storage_file) as f:
+            stored = json.load(f)
+        self.assertEqual((stored['User'], stored['Place'], stored['Review']), ([], [], []))
+
+    def test_delete_city_restricted(self):
+        with self.assertRaises(ReferentialIntegrityError):
+            self.manager.delete(self.city.id, 'City')
+        self.assertIsNotNone(self.manager.get(self.city.id, 'City'))
+
+    def test_delete_amenity_pulls_from_places(self):
+        self.manager.delete(self.amenity.id, 'Amenity')
+        self.assertEqual(self.manager.get(self.place.id, 'Place')['amenity_ids'], [])
+
+class TestSoftDeletes(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage_file = os.path.join(self.tmpdir, 'storage.json')
+        self.manager = DataManager(storage_file=self.storage_file, relationships=RelationshipRegistry(validate_references=False),
+                                   soft_delete=True)
+        self.user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        self.other = User(email="other@example.com", password="password", first_name="Jane", last_name="Doe")
+        self.manager.save(self.user)
+        self.manager.save(self.other)
+        self.place = Place(name="Test Place", description="A place for testing", city_id="city-id", host_id=self.user.id,
+                           latitude=0.0, longitude=0.0, price_per_night=100.0, max_guests=4, number_of_rooms=2,
+                           number_of_bathrooms=1, amenity_ids=[])
+        self.manager.save(self.place)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_delete_leaves_tombstone(self):
+        self.manager.delete(self.user.id, 'User')
+        self.assertIsNone(self.manager.get(self.user.id, 'User'))
+        self.assertIsNone(self.manager.get(self.place.id, 'Place'))  # Cascades tombstone dependents too
+        self.assertEqual([user['id'] for user in self.manager.all('User')], [self.other.id])
+        self.assertIsNotNone(self.manager.get(self.user.id, 'User', include_deleted=True)['deleted_at'])
+        self.assertEqual(len(self.manager.all('User', include_deleted=True)), 2)
+        with self.assertRaises(ValueError):
+            self.manager.delete(self.user.id, 'User')
+        with self.assertRaises(ValueError):
+            self.manager.update(self.user)
+
+    def test_tombstones_survive_reload(self):
+        self.manager.delete(self.other.id, 'User')
+        reloaded = DataManager(storage_file=self.storage_file, soft_delete=True)
+        self.assertIsNone(reloaded.get(self.other.id, 'User'))
+        self.assertEqual(reloaded.tombstone_stats()['User'], (1, 2))
+
+    def test_vacuum_removes_tombstones(self):
+        self.manager.delete(self.other.id, 'User')
+        self.assertEqual(self.manager.vacuum(older_than=3600), 0)  # Too recent for the policy
+        self.assertEqual(Vacuum(self.manager, VacuumPolicy(min_tombstones=2, min_ratio=1.0)).run_once(), 0)
+        self.assertEqual(Vacuum(self.manager, VacuumPolicy(min_ratio=0.5)).run_once(), 1)
+        self.assertEqual(len(self.manager.all('User', include_deleted=True)), 1)
+        self.assertIsNotNone(self.manager.get(self.user.id, 'User'))
+        with open(self.storage_file) as f:
+            self.assertEqual([user['id'] for user in json.load(f)['User']], [self.user.id])
+
+class TestVersionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.feed = ChangeFeed()
+        self.store = VersionStore(retention=HistoryRetention(max_versions=2))
+        self.feed.subscribe(self.store.on_change)
+        self.manager = DataManager(storage_file=os.path.join(self.tmpdir, 'storage.json'), change_feed=self.feed)
+        self.place = Place(name="Test Place", description="A place for testing", city_id="city-id", host_id="host-id",
+                           latitude=0.0, longitude=0.0, price_per_night=100.0, max_guests=4, number_of_rooms=2,
+                           number_of_bathrooms=1, amenity_ids=[])
+        self.manager.save(self.place)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_deltas_and_as_of(self):
+        self.place.price_per_night = 120.0
+        self.manager.update(self.place)
+        versions = self.store.history('Place', self.place.id)
+        self.assertEqual(versions[1]['changes'], {'price_per_night': 120.0, 'version': 2})  # The entity version moves with every update
+        self.assertEqual(self.store.as_of('Place', self.place.id, version=1)['price_per_night'], 100.0)
+        self.assertEqual(self.store.as_of('Place', self.place.id)['price_per_night'], 120.0)
+        self.manager.delete(self.place.id, 'Place')
+        self.assertIsNone(self.store.as_of('Place', self.place.id))
+        self.assertEqual(len(self.store.snapshot('Place', version=2)), 1)
+
+    def test_retention_folds_old_versions(self):
+        for price in (110.0, 120.0, 130.0):
+            self.place.price_per_night = price
+            self.manager.update(self.place)
+        versions = self.store.history('Place', self.place.id)
+        self.assertEqual([version['version'] for version in versions], [2, 3, 4])
+        self.assertEqual(versions[0]['changes']['price_per_night'], 110.0)
+        self.assertIsNone(self.store.as_of('Place', self.place.id, version=1))  # Folded away
+
+    def test_deleted_history_dropped_after_window(self):
+        self.store.retention.deleted_max_age = 0.0
+        review = Review(user_id="user-id", place_id="other-place-id", rating=5, comment="ok")
+        self.manager.save(review)
+        self.manager.delete(self.place.id, 'Place')
+        self.assertEqual(len(self.store.history('Place', self.place.id)), 2)  # Still readable inside the window
+        time.sleep(0.01)
+        self.manager.save(Place(name="Other", description="Another place", city_id="city-id", host_id="host-id",
+                                latitude=0.0, longitude=0.0, price_per_night=90.0, max_guests=2, number_of_rooms=1,
+                                number_of_bathrooms=1, amenity_ids=[]))
+        self.assertIsNone(self.store.history('Place', self.place.id))
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual([state['id'] for state in self.store.snapshot('Review')], [review.id])  # Other types untouched
+
+class TestAvailabilityIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.feed = ChangeFeed()
+        self.index = AvailabilityIndex()
+        self.feed.subscribe(self.index.on_change)
+        self.manager = DataManager(storage_file=os.path.join(self.tmpdir, 'storage.json'), change_feed=self.feed,
+                                   relationships=RelationshipRegistry(validate_references=False))
+        self.small = Place(name="Small", description="Two guests", city_id="city-id", host_id="host-id", latitude=0.0,
+                           longitude=0.0, price_per_night=80.0, max_guests=2, number_of_rooms=1, number_of_bathrooms=1,
+                           amenity_ids=[])
+        self.large = Place(name="Large", description="Six guests", city_id="city-id", host_id="host-id", latitude=0.0,
+                           longitude=0.0, price_per_night=200.0, max_guests=6, number_of_rooms=3, number_of_bathrooms=2,
+                           amenity_ids=[])
+        self.manager.save(self.small)
+        self.manager.save(self.large)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_reserve_and_search(self):
+        booking = Booking(place_id=self.large.id, user_id="user-id", check_in="2030-01-01", check_out="2030-01-04", guests=4)
+        self.index.reserve(booking.__dict__)
+        self.manager.save(booking)  # The replayed change event is a no-op
+        self.assertEqual(self.index.search("2030-01-03", "2030-01-05", 1), [self.small.id])
+        self.assertEqual(self.index.search("2030-01-04", "2030-01-06", 3), [self.large.id])  # Check-out day is free
+        with self.assertRaises(BookingConflictError):
+            self.index.reserve(Booking(place_id=self.large.id, user_id="user-id", check_in="2029-12-30",
+                                       check_out="2030-01-02", guests=1).__dict__)
+        with self.assertRaises(ValueError):
+            self.index.reserve(Booking(place_id=self.small.id, user_id="user-id", check_in="2030-01-01",
+                                       check_out="2030-01-02", guests=3).__dict__)
+        self.manager.delete(booking.id, 'Booking')
+        self.assertTrue(self.index.is_available(self.large.id, "2030-01-01", "2030-01-04", 6))
+
+    def test_stays_are_bounded(self):
+        with self.assertRaises(ValueError):
+            self.index.search("2030-01-01", "2031-06-01")  # Longer than max_nights
+        with self.assertRaises(ValueError):
+            self.index.is_available(self.small.id, "2070-01-01", "2070-01-02")  # Past the horizon
+        with self.assertRaises(ValueError):
+            self.index.check(Booking(place_id=self.small.id, user_id="user-id", check_in="2021-01-01",
+                                     check_out="9999-12-31", guests=1).__dict__)
+        self.assertEqual(len(self.index.search("2030-01-01", "2030-12-31")), 2)
+
+    def test_build_and_cascade(self):
+        booking = Booking(place_id=self.small.id, user_id="user-id", check_in="2030-02-01", check_out="2030-02-02", guests=1)
+        self.manager.save(booking)
+        rebuilt = AvailabilityIndex()
+        rebuilt.build(self.manager.storage)
+        self.assertFalse(rebuilt.is_available(self.small.id, "2030-02-01", "2030-02-03"))
+        self.manager.delete(self.small.id, 'Place')
+        self.assertIsNone(self.manager.get(booking.id, 'Booking'))
+        self.assertEqual(self.index.search("2030-02-01", "2030-02-02"), [self.large.id])
+
+    def test_conflicting_update_is_rejected(self):
+        self.manager.add_write_check(self.index.check_write)
+        first = Booking(place_id=self.large.id, user_id="user-id", check_in="2030-03-01", check_out="2030-03-03", guests=2)
+        second = Booking(place_id=self.large.id, user_id="user-id", check_in="2030-03-05", check_out="2030-03-07", guests=2)
+        self.manager.save(first)
+        self.manager.save(second)
+        moved = dict(self.manager.get(second.id, 'Booking'), check_in="2030-03-02", check_out="2030-03-06")
+        with self.assertRaises(BookingConflictError):
+            self.manager.replace('Booking', moved)
+        self.assertEqual(self.manager.get(second.id, 'Booking')['check_in'], "2030-03-05")
+        self.assertFalse(self.index.is_available(self.large.id, "2030-03-05", "2030-03-06"))  # Still reserved
+        self.manager.replace('Booking', dict(moved, check_in="2030-03-03"))  # Overlaps only its own nights
+        self.assertTrue(self.index.is_available(self.large.id, "2030-03-06", "2030-03-08"))
+        self.assertFalse(self.index.is_available(self.large.id, "2030-03-03", "2030-03-04"))
+        with self.assertRaises(BookingConflictError):
+            self.manager.save(Booking(place_id=self.large.id, user_id="user-id", check_in="2030-03-01",
+                                      check_out="2030-03-02", guests=1))
+
+    def test_unchecked_conflicting_update_keeps_reservation(self):
+        first = Booking(place_id=self.small.id, user_id="user-id", check_in="2030-04-01", check_out="2030-04-03", guests=1)
+        second = Booking(place_id=self.small.id, user_id="user-id", check_in="2030-04-05", check_out="2030-04-07", guests=1)
+        self.manager.save(first)
+        self.manager.save(second)
+        with self.assertLogs(level='WARNING'):
+            self.manager.replace('Booking', dict(self.manager.get(second.id, 'Booking'), check_in="2030-04-02"))
+        self.assertFalse(self.index.is_available(self.small.id, "2030-04-05", "2030-04-06"))
+
+if __name__ == "__main__":
+    unittest.main()
+
+class TestCatalogStats(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.feed = ChangeFeed()
+        self.stats = CatalogStats()
+        self.feed.subscribe(self.stats.on_change)
+        self.manager = DataManager(storage_file=os.path.join(self.tmpdir, 'storage.json'), change_feed=self.feed,
+                                   relationships=RelationshipRegistry(validate_references=False))
+        self.paris = City(name="Paris", country_code="FR")
+        self.lyon = City(name="Lyon", country_code="FR")
+        self.manager.save(self.paris)
+        self.manager.save(self.lyon)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def place(self, city, price, rooms=1):
+        place = Place(name="Flat", description="", city_id=city.id, host_id="host-id", latitude=0.0, longitude=0.0,
+                      price_per_night=price, max_guests=2, number_of_rooms=rooms, number_of_bathrooms=1, amenity_ids=[])
+        self.manager.save(place)
+        return place
+
+    def test_sketch_accuracy_and_removal(self):
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        values = [random.uniform(10, 1000) for _ in range(2000)]
+        for value in values:
+            sketch.add(value)
+        for value in values[:1000]:
+            sketch.remove(value)
+        median = sorted(values[1000:])[499]
+        self.assertAlmostEqual(sketch.quantile(0.5), median, delta=median * 0.02)
+        self.assertEqual(sketch.count, 1000)
+
+    def test_groups_follow_mutations(self):
+        first = self.place(self.paris, 100.0, rooms=2)
+        self.place(self.paris, 300.0)
+        self.place(self.lyon, 50.0)
+        paris = self.stats.by_city(self.paris.id)
+        self.assertEqual(paris['places'], 2)
+        self.assertEqual(paris['averages']['price_per_night'], 200.0)
+        self.assertEqual(self.stats.by_country('FR')['sums']['number_of_rooms'], 4.0)
+        first.price_per_night = 500.0
+        self.manager.update(first)
+        self.assertEqual(self.stats.by_city(self.paris.id)['sums']['price_per_night'], 800.0)
+        self.manager.delete(first.id, 'Place')
+        self.assertEqual(self.stats.by_city(self.paris.id)['places'], 1)
+        self.assertEqual(self.stats.overall()['places'], 2)
+
+    def test_city_moves_country(self):
+        self.place(self.lyon, 50.0)
+        self.lyon.country_code = "BE"
+        self.manager.update(self.lyon)
+        self.assertIsNone(self.stats.by_country('FR'))
+        self.assertEqual(self.stats.by_country('BE')['places'], 1)
+        rebuilt = CatalogStats()
+        rebuilt.build(self.manager.storage)
+        self.assertEqual(rebuilt.by_country(), self.stats.by_country())
+
+class TestOptimisticConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.manager = DataManager(storage_file=os.path.join(self.tmpdir, 'storage.json'), soft_delete=True)
+        self.amenity = Amenity(name="Pool")
+        self.manager.save(self.amenity)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_versions_and_compare_and_swap(self):
+        self.assertEqual(self.amenity.version, 1)
+        self.amenity.name = "Heated pool"
+        self.manager.update(self.amenity)
+        self.assertEqual(self.manager.get(self.amenity.id, 'Amenity')['version'], 2)
+        stale = Amenity(name="Indoor pool", id=self.amenity.id)
+        with self.assertRaises(VersionConflictError):
+            self.manager.update(stale, expected_version=1)  # Lost update detected
+        self.assertEqual(self.manager.get(self.amenity.id, 'Amenity')['name'], "Heated pool")
+        self.manager.update(stale, expected_version=2)
+        self.assertEqual(stale.version, 3)
+        with self.assertRaises(VersionConflictError):
+            self.manager.delete(self.amenity.id, 'Amenity', expected_version=2)
+        self.manager.delete(self.amenity.id, 'Amenity', expected_version=3)
+        self.assertEqual(self.manager.get(self.amenity.id, 'Amenity', include_deleted=True)['version'], 4)
+
+class TestColumnarExport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage_file = os.path.join(self.tmpdir, 'storage.json')
+        self.out_dir = os.path.join(self.tmpdir, 'export')
+        self.manager = DataManager(storage_file=self.storage_file, soft_delete=True)
+        self.places = []
+        for i in range(5):
+            place = Place(name="Place %d" % i, description="", city_id="city-id", host_id="host-id",
+                          latitude=1.5 * i, longitude=0.0, price_per_night=100.0 + i, max_guests=i or None,
+                          number_of_rooms=2, number_of_bathrooms=1, amenity_ids=["a%d" % i])
+            self.manager.save(place)
+            self.places.append(place)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_npy_round_trip(self):
+        part = export_columns(self.manager, self.out_dir, chunk_rows=2, now=datetime.now() + timedelta(seconds=1))
+        self.assertEqual(len(part['types']['Place']['chunks']), 3)
+        chunk = part['types']['Place']['chunks'][0]
+        self.assertEqual(chunk['columns']['max_guests']['kind'], 'int64')
+        self.assertIn('valid', chunk['columns']['max_guests'])  # The first place has no max_guests
+        self.assertEqual(chunk['columns']['created_at']['kind'], 'timestamp')
+        with open(os.path.join(self.out_dir, chunk['columns']['latitude']['file']), 'rb') as f:
+            self.assertEqual(f.read(6), b'\x93NUMPY')
+            f.seek(8)
+            self.assertEqual((10 + int.from_bytes(f.read(2), 'little')) % 64, 0)
+        export = ColumnarExport(self.out_dir)
+        rows = list(export.rows('Place'))
+        self.assertEqual([row['name'] for row in rows], [place.name for place in self.places])
+        self.assertNotIn('max_guests', rows[0])
+        self.assertEqual(rows[1]['amenity_ids'], ['a1'])
+        self.assertEqual(rows[2]['created_at'], self.places[2].created_at)
+        prices = [value for _, values, _ in export.column_arrays('Place', 'price_per_night') for value in values]
+        self.assertEqual(prices, [100.0, 101.0, 102.0, 103.0, 104.0])
+        export.close()
+
+    def test_incremental_parts(self):
+        start = datetime.now()
+        export_columns(self.manager, self.out_dir, layout='csv', now=start + timedelta(seconds=1))
+        changed = self.places[3]
+        changed.price_per_night = 250.0
+        changed.updated_at = start + timedelta(seconds=2)
+        self.manager.update(changed)
+        self.manager.delete(self.places[4].id, 'Place')
+        self.manager.storage['Place'][-1]['deleted_at'] = start + timedelta(seconds=2)
+        part = export_columns(self.manager, self.out_dir, layout='csv', incremental=True, now=start + timedelta(seconds=3))
+        self.assertEqual(part['types']['Place']['rows'], 2)
+        export = ColumnarExport(self.out_dir)
+        current = export.current('Place')
+        self.assertEqual(len(current), 4)
+        self.assertEqual(current[changed.id]['price_per_night'], 250.0)
+        self.assertEqual(current[changed.id]['version'], 2)
+        with self.assertRaises(ValueError):
+            export_columns(self.manager, self.out_dir, layout='npy', incremental=True)
+
+    def test_export_from_snapshot_stays_lazy(self):
+        snapshot_file = os.path.join(self.tmpdir, 'storage.snap')
+        json_to_snapshot(self.storage_file, snapshot_file)
+        manager = DataManager(storage_file=self.storage_file, snapshot_file=snapshot_file)
+        part = export_columns(manager, self.out_dir)
+        self.assertEqual(part['types']['Place']['rows'], 5)
+        self.assertFalse(manager.storage.is_loaded('Place'))
+
+class TestInMemoryStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.seed_file = os.path.join(self.tmpdir, 'storage.json')
+        self.user = User(email="test@example.com", password="password", first_name="John", last_name="Doe")
+        with open(self.seed_file, 'w') as f:
+            json.dump({'User': [self.user.__dict__]}, f, default=str)
+        self.manager = InMemoryStorage(seed_file=self.seed_file, change_feed=ChangeFeed(), soft_delete=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_seed_file_is_never_written(self):
+        with open(self.seed_file) as f:
+            seeded = f.read()
+        self.manager.save(Amenity(name="Pool", description="Outdoor"))
+        self.manager.delete(self.user.id, 'User')
+        with open(self.seed_file) as f:
+            self.assertEqual(f.read(), seeded)
+        self.assertEqual(os.listdir(self.tmpdir), ['storage.json'])
+        self.assertEqual(InMemoryStorage(initial={'User': [self.user.__dict__]}).get(self.user.id, 'User')['email'],
+                         "test@example.com")
+
+    def test_snapshot_and_restore(self):
+        snapshot = self.manager.snapshot()
+        self.assertIs(snapshot['User'], self.manager.storage['User'])  # Nothing is copied until a write
+        amenity = Amenity(name="Pool", description="Outdoor")
+        self.manager.save(amenity)
+        self.manager.replace('User', dict(self.manager.get(self.user.id, 'User'), first_name="Jane"))
+        self.assertEqual(len(snapshot['User']), 1)
+        self.assertEqual(snapshot['User'][0]['first_name'], "John")
+        self.assertNotIn('Amenity', snapshot)
+        for _ in range(2):
+            self.manager.restore(snapshot)
+            self.assertEqual(self.manager.get(self.user.id, 'User')['first_name'], "John")
+            self.assertIsNone(self.manager.get(amenity.id, 'Amenity'))
+            self.manager.delete(self.user.id, 'User')
+            self.assertIsNone(self.manager.get(self.user.id, 'User'))
+            self.assertEqual(self.manager.vacuum(), 1)
+        self.assertEqual(len(snapshot['User']), 1)
+
+    def test_restore_callbacks_and_transactions(self):
+        restored = []
+        self.manager.subscribe_restore(restored.append)
+        snapshot = self.manager.snapshot()
+        with self.assertRaises(RuntimeError):
+            with self.manager.transaction():
+                self.manager.save(Amenity(name="Pool", description="Outdoor"))
+                self.manager.restore(snapshot)
+        self.assertEqual(restored, [])
+        self.assertNotIn('Amenity', self.manager.storage)
+        with self.manager.transaction():
+            self.manager.delete(self.user.id, 'User')
+        self.manager.restore(snapshot)
+        self.assertEqual(restored, [self.manager.storage])
+        self.assertIsNotNone(self.manager.get(self.user.id, 'User'))